@@ -24,6 +24,19 @@ except ImportError:
     print("Install with: pip install google-generativeai")
     sys.exit(1)
 
+from semantic_cache import SemanticCache
+from history import ConversationHistory
+from retrieval import grounded_prompt
+from llm_scheduler import PRIORITY_INTERACTIVE, QuotaExceededError, estimate_request_tokens, get_scheduler
+from usage import get_tracker
+from fake_genai import fake_llm_enabled, generative_model
+
+# Shared by every agent in the process: opening questions are often
+# paraphrases of ones another session already asked
+semantic_cache = SemanticCache(
+    threshold=float(os.getenv('SEMANTIC_CACHE_THRESHOLD', 0.8))
+)
+
 class AdvancedSchoolooAgent:
     """Advanced Schooloo AI Agent with Real Gemini API"""
     
@@ -31,110 +44,91 @@ class AdvancedSchoolooAgent:
         """Initialize the advanced agent"""
         self.api_key = os.getenv('API_KEY')
         
-        if not self.api_key:
+        if not self.api_key and not fake_llm_enabled():
             print("❌ Error: API_KEY not found in .env file")
             sys.exit(1)
         
         # Configure Gemini API
         genai.configure(api_key=self.api_key)
         self.model_name = os.getenv('AGENT_MODEL', 'gemini-2.5-flash')
-        self.model = genai.GenerativeModel(self.model_name)
-        self.conversation_history = []
+        self.model = generative_model(self.model_name)
+        self.session_id = f"advanced-{os.getpid()}"
+        self.conversation_history = ConversationHistory(
+            max_recent_turns=int(os.getenv('HISTORY_RECENT_TURNS', 6)),
+            max_prompt_tokens=int(os.getenv('HISTORY_MAX_PROMPT_TOKENS', 6000))
+        )
         
         print("✅ Gemini API configured successfully")
         print(f"✅ Using model: {self.model_name}\n")
         
-        # Enhanced system prompt for school search
+        # System prompt for school search; the catalog records relevant to each
+        # message are appended per request by grounded_prompt
         self.system_prompt = """You are Schooloo AI Assistant - an expert school discovery assistant for India.
 
-You have comprehensive knowledge about schools across all major Indian cities including:
-- Delhi, Mumbai, Bangalore, Hyderabad, Kolkata, Chennai, Pune, Ahmedabad, Jaipur, Lucknow, 
-- Indore, Surat, Nagpur, Chandigarh, Kochi, Bhopal, Gurgaon, Noida, Prayagraj, Varanasi, etc.
-
-When a user asks about schools in ANY city, you should:
-
-1. PROVIDE REAL SCHOOL NAMES: Give authentic school names that actually exist in that city
-2. DETAILED INFORMATION: Include:
-   - School name and location
-   - Type (Private/Government/CBSE/ICSE/State Board)
-   - Fee structure (approximate annual fees)
-   - Classes offered
-   - Key facilities
-   - Contact information (if known)
-   - Entrance exam (Yes/No)
-
-3. SMART RECOMMENDATIONS: Suggest schools based on:
-   - Budget range (if mentioned)
-   - Curriculum preference (CBSE/ICSE/State Board)
-   - Type of school (day/boarding)
-   - Special features (sports, STEM, arts, etc.)
-
-4. COMPARISON: When comparing schools, highlight:
-   - Fee differences
-   - Academic programs
-   - Facilities comparison
-   - Student outcomes
-   - Entrance exam requirements
+When a user asks about schools:
+1. Be specific to the city mentioned, never generic
+2. Cover type and board, annual fees (₹), classes, facilities, entrance exam and admission steps as relevant
+3. Take the facts for schools in the catalog records below from those records; never invent fees or contacts
+4. For other schools, give general guidance and say details should be verified with the school
+5. Recommend by budget, board, day/boarding and special features; compare in a table
 
-5. ADDITIONAL HELP:
-   - Admission process and documents
-   - Entrance exam patterns
-   - Eligibility criteria
-   - Hostel and transport facilities
-   - Extracurricular activities
-
-FORMAT YOUR RESPONSES WITH:
-- Emojis for better readability
-- Bullet points for lists
-- Clear sections with headers
-- Organized comparison tables when comparing
-
-IMPORTANT: Always be specific to the city mentioned. Don't give generic responses.
-If user asks about Prayagraj, mention schools in Prayagraj specifically.
-If user asks about Delhi, mention schools in Delhi specifically.
-
-Be helpful, accurate, and thorough in your responses."""
+Format with emojis, bullet points and clear section headers."""
     
     def chat(self, user_message: str) -> str:
         """Chat with Gemini API for intelligent responses"""
         
-        # Add user message to history
-        self.conversation_history.append({
-            "role": "user",
-            "parts": [user_message]
-        })
+        # Only standalone questions can reuse an answer; later turns depend on context
+        standalone = not self.conversation_history
+        if standalone:
+            similar = semantic_cache.lookup(user_message, self.model_name)
+            if similar is not None:
+                get_tracker().record("cli.advanced", self.model_name, cache="hit", session_id=self.session_id)
+                self.conversation_history.add("user", user_message)
+                self.conversation_history.add("model", similar[0])
+                return similar[0]
         
         try:
-            # Create full conversation with system prompt
-            full_history = [{
-                "role": "user",
-                "parts": [self.system_prompt]
-            }]
-            full_history.extend(self.conversation_history)
+            # Grounded system prompt, summary of older turns, recent turns and the
+            # new message, kept under the prompt budget
+            full_history = self.conversation_history.build_contents(
+                grounded_prompt(self.system_prompt, user_message), user_message
+            )
             
             print("🤖 Thinking...", end="", flush=True)
             
-            response = self.model.generate_content(
-                full_history,
-                generation_config={
-                    "temperature": 0.7,
-                    "top_p": 0.95,
-                    "top_k": 40,
-                    "max_output_tokens": 2048,
-                }
+            generation_config = {
+                "temperature": 0.7,
+                "top_p": 0.95,
+                "top_k": 40,
+                "max_output_tokens": 2048,
+            }
+            # Wait for RPM/TPM budget instead of running into a 429
+            started = time.perf_counter()
+            response = get_scheduler().call(
+                lambda: self.model.generate_content(full_history, generation_config=generation_config),
+                tokens=estimate_request_tokens(full_history, generation_config["max_output_tokens"]),
+                priority=PRIORITY_INTERACTIVE,
+                deadline_seconds=float(os.getenv('LLM_DEADLINE_SECONDS', 30))
             )
+            get_tracker().record_response(response, "cli.advanced", self.model_name,
+                                          (time.perf_counter() - started) * 1000,
+                                          contents=full_history, session_id=self.session_id)
             
             print("\r" + " " * 20 + "\r", end="", flush=True)  # Clear "Thinking..."
             
             response_text = response.text
+            if standalone:
+                semantic_cache.add(user_message, response_text, self.model_name)
             
-            # Add response to history
-            self.conversation_history.append({
-                "role": "assistant",
-                "parts": [response_text]
-            })
+            # Add the exchange to history
+            self.conversation_history.add("user", user_message)
+            self.conversation_history.add("model", response_text)
             
             return response_text
+        
+        except QuotaExceededError as e:
+            print("\r" + " " * 20 + "\r", end="", flush=True)
+            return f"⏳ Gemini is busy right now - please try again in about {e.retry_after:.0f} seconds."
             
         except Exception as e:
             error_msg = str(e)
@@ -0,0 +1,368 @@
+"""Deterministic local stand-in for the Gemini models we call
+
+Implements the part of google.generativeai the apps use - generate_content
+and generate_content_async, streamed or not, function calls for tool-using
+models, usage metadata and 429 errors - without network access or quota.
+Set SCHOOLOO_FAKE_LLM=1 and every model created through generative_model()
+is a FakeGenerativeModel, so the chat endpoints and agents can be load- and
+latency-tested offline. Behaviour is configured with FAKE_LLM_* variables:
+
+    FAKE_LLM_LATENCY_MS         time to first token: "fixed:80", "uniform:50,250",
+                                "normal:120,30" or "lognormal:100,0.5" (median, sigma)
+    FAKE_LLM_TOKENS_PER_SECOND  output pace once generation has started
+    FAKE_LLM_OUTPUT_TOKENS      length of each text reply
+    FAKE_LLM_CHUNK_TOKENS       tokens per streamed chunk
+    FAKE_LLM_ERROR_RATE         share of calls that fail with a 429
+    FAKE_LLM_RETRY_AFTER        retry delay (s) named in the 429 message
+    FAKE_LLM_TOOL_ROUNDS        tool-call turns before a tool-using model answers
+    FAKE_LLM_SEED               same seed, same sequence of latencies and errors
+
+The scheduler still applies GEMINI_RPM/GEMINI_TPM; raise them for load tests.
+"""
+import asyncio
+import hashlib
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional
+
+from history import estimate_tokens
+
+
+class _ResourceExhausted(Exception):
+    """429 raised by the Gemini client, for installs without google-api-core"""
+    code = 429
+
+
+def quota_error(message: str) -> Exception:
+    """The client's ResourceExhausted (imported here, since google.api_core is slow to import)"""
+    try:
+        from google.api_core.exceptions import ResourceExhausted
+    except ImportError:
+        ResourceExhausted = _ResourceExhausted
+    return ResourceExhausted(message)
+
+# Tools the fake may call on its own: lookups only, never writes
+READ_ONLY_PREFIXES = ("get_", "search_", "compare_")
+
+DEFAULT_ARGS = {
+    "school_id": "school_001",
+    "school_ids": ["school_001", "school_002"],
+    "location": "Delhi",
+    "latitude": 28.61,
+    "longitude": 77.21,
+}
+
+
+def fake_llm_enabled() -> bool:
+    """True when SCHOOLOO_FAKE_LLM asks for the local stand-in"""
+    return os.getenv('SCHOOLOO_FAKE_LLM', '').lower() in ('1', 'true', 'yes')
+
+
+def generative_model(model_name: str, **kwargs) -> Any:
+    """FakeGenerativeModel when SCHOOLOO_FAKE_LLM is set, else genai.GenerativeModel"""
+    if fake_llm_enabled():
+        return FakeGenerativeModel(model_name, **kwargs)
+    import google.generativeai as genai
+    return genai.GenerativeModel(model_name, **kwargs)
+
+
+def sample_latency_ms(spec: str, rng: random.Random) -> float:
+    """Draw one latency from a "kind:params" distribution spec"""
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",") if v.strip()] if params else []
+    if kind == "fixed":
+        return values[0]
+    if kind == "uniform":
+        return rng.uniform(values[0], values[1])
+    if kind == "normal":
+        return max(0.0, rng.gauss(values[0], values[1]))
+    if kind == "lognormal":
+        return values[0] * rng.lognormvariate(0.0, values[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+@dataclass
+class FakeLLMConfig:
+    """Latency, pacing and error settings of the fake"""
+    latency_ms: str = "fixed:50"
+    tokens_per_second: float = 200.0
+    output_tokens: int = 120
+    chunk_tokens: int = 8
+    error_rate: float = 0.0
+    retry_after: float = 1.0
+    tool_rounds: int = 1
+    seed: int = 0
+
+    @classmethod
+    def from_env(cls) -> "FakeLLMConfig":
+        """Settings from FAKE_LLM_* environment variables"""
+        return cls(
+            latency_ms=os.getenv('FAKE_LLM_LATENCY_MS', cls.latency_ms),
+            tokens_per_second=float(os.getenv('FAKE_LLM_TOKENS_PER_SECOND', cls.tokens_per_second)),
+            output_tokens=int(os.getenv('FAKE_LLM_OUTPUT_TOKENS', cls.output_tokens)),
+            chunk_tokens=int(os.getenv('FAKE_LLM_CHUNK_TOKENS', cls.chunk_tokens)),
+            error_rate=float(os.getenv('FAKE_LLM_ERROR_RATE', cls.error_rate)),
+            retry_after=float(os.getenv('FAKE_LLM_RETRY_AFTER', cls.retry_after)),
+            tool_rounds=int(os.getenv('FAKE_LLM_TOOL_ROUNDS', cls.tool_rounds)),
+            seed=int(os.getenv('FAKE_LLM_SEED', cls.seed)),
+        )
+
+
+# Response objects shaped like the google.generativeai ones we read
+
+
+class FakeFunctionCall:
+    """A tool call the model asks for"""
+
+    def __init__(self, name: str, args: Dict[str, Any]):
+        self.name = name
+        self.args = args
+
+
+class FakePart:
+    """Text or a function call"""
+
+    def __init__(self, text: str = "", function_call: Optional[FakeFunctionCall] = None):
+        self.text = text
+        self.function_call = function_call
+
+
+class FakeContent:
+    """One turn of the conversation"""
+
+    def __init__(self, parts: List[FakePart], role: str = "model"):
+        self.role = role
+        self.parts = parts
+
+
+class FakeCandidate:
+    """The single candidate of a reply"""
+
+    def __init__(self, content: FakeContent):
+        self.content = content
+        self.finish_reason = 1
+
+
+class FakeUsage:
+    """usage_metadata token counts"""
+
+    def __init__(self, prompt_tokens: int, output_tokens: int):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = output_tokens
+        self.total_token_count = prompt_tokens + output_tokens
+
+
+class FakeResponse:
+    """A complete reply (or one streamed chunk of it)"""
+
+    def __init__(self, parts: List[FakePart], usage: Optional[FakeUsage] = None):
+        self.candidates = [FakeCandidate(FakeContent(parts))]
+        self.usage_metadata = usage
+
+    @property
+    def text(self) -> str:
+        texts = [p.text for p in self.candidates[0].content.parts if p.text]
+        if not texts:
+            raise ValueError("The response has no text part (it is a function call)")
+        return "".join(texts)
+
+
+class FakeStreamResponse:
+    """Iterable of chunks; usage is known once the stream has been read"""
+
+    def __init__(self, chunks: Iterator[FakeResponse], usage: FakeUsage):
+        self._iterator = self._run(chunks)
+        self._usage = usage
+        self._parts: List[str] = []
+        self.usage_metadata = None
+
+    def _run(self, chunks):
+        for chunk in chunks:
+            self._parts.extend(p.text for p in chunk.candidates[0].content.parts if p.text)
+            yield chunk
+        self.usage_metadata = self._usage
+
+    def __iter__(self):
+        return self._iterator
+
+    @property
+    def text(self) -> str:
+        return "".join(self._parts)
+
+
+class FakeAsyncStreamResponse:
+    """Async counterpart of FakeStreamResponse"""
+
+    def __init__(self, chunks: List[FakeResponse], delay: float, usage: FakeUsage):
+        self._chunks = chunks
+        self._delay = delay
+        self._usage = usage
+        self.usage_metadata = None
+
+    async def __aiter__(self):
+        for chunk in self._chunks:
+            await asyncio.sleep(self._delay)
+            yield chunk
+        self.usage_metadata = self._usage
+
+
+def _parts_of(item: Any) -> List[Any]:
+    """Parts of one contents entry (a string, a dict or a Content)"""
+    if isinstance(item, str):
+        return [item]
+    if isinstance(item, dict):
+        return list(item.get("parts", []))
+    return list(getattr(item, "parts", []) or [])
+
+
+class FakeGenerativeModel:
+    """Drop-in for genai.GenerativeModel with deterministic, configurable behaviour"""
+
+    _calls = 0
+    _calls_lock = threading.Lock()
+
+    def __init__(self, model_name: str = "gemini-2.0-flash", tools: Optional[List[Dict[str, Any]]] = None,
+                 system_instruction: Optional[str] = None, config: Optional[FakeLLMConfig] = None, **kwargs):
+        self.model_name = model_name
+        self.tools = list(tools or [])
+        self.system_instruction = system_instruction
+        self.config = config or FakeLLMConfig.from_env()
+
+    # Planning
+
+    def _next_rng(self) -> random.Random:
+        """Per-call random source: the n-th call of a process draws the same values every run"""
+        with FakeGenerativeModel._calls_lock:
+            FakeGenerativeModel._calls += 1
+            index = FakeGenerativeModel._calls
+        return random.Random(self.config.seed * 1_000_003 + index)
+
+    @staticmethod
+    def _last_user_text(contents: Any) -> str:
+        """Text of the latest message with any"""
+        items = [contents] if isinstance(contents, str) else list(contents)
+        for item in reversed(items):
+            texts = [p if isinstance(p, str) else getattr(p, "text", "") for p in _parts_of(item)]
+            texts = [t for t in texts if isinstance(t, str) and t]
+            if texts:
+                return texts[-1]
+        return ""
+
+    @staticmethod
+    def _tool_rounds_done(contents: Any) -> int:
+        """Function-response turns already in the conversation"""
+        items = [] if isinstance(contents, str) else list(contents)
+        done = 0
+        for item in items:
+            for part in _parts_of(item):
+                response = getattr(part, "function_response", None)
+                if response is not None and getattr(response, "name", ""):
+                    done += 1
+                    break
+        return done
+
+    def _pick_tool(self, message: str) -> Optional[FakeFunctionCall]:
+        """The read-only tool whose name best matches the message, with plausible args"""
+        words = {w.strip("?,.!").rstrip("s") for w in message.lower().split()}
+        best, best_score = None, -1
+        for tool in self.tools:
+            declarations = tool.get("function_declarations", [tool]) if isinstance(tool, dict) else []
+            for declaration in declarations:
+                name = declaration.get("name", "")
+                if not name.startswith(READ_ONLY_PREFIXES):
+                    continue
+                score = sum(1 for w in name.split("_") if w.rstrip("s") in words)
+                if score > best_score:
+                    best, best_score = declaration, score
+        if best is None:
+            return None
+        required = best.get("parameters", {}).get("required", [])
+        return FakeFunctionCall(best["name"], {k: DEFAULT_ARGS.get(k, "") for k in required})
+
+    def _reply_text(self, message: str) -> str:
+        """Deterministic reply of about output_tokens tokens"""
+        digest = hashlib.sha1(message.encode("utf-8")).hexdigest()[:8]
+        lines = [f"🏫 Schooloo test reply {digest} for: {message[:80]}"]
+        i = 1
+        while estimate_tokens("\n".join(lines)) < self.config.output_tokens:
+            lines.append(f"• School {i} - CBSE, ₹{1 + i % 4}.{i % 10}L/year, {digest}")
+            i += 1
+        return "\n".join(lines)
+
+    def _plan(self, contents: Any, tool_config: Any = None):
+        """(latency seconds, parts, usage) for a call, raising the injected 429s"""
+        rng = self._next_rng()
+        if rng.random() < self.config.error_rate:
+            raise quota_error(
+                f"429 Resource has been exhausted (fake). Please retry in {self.config.retry_after}s."
+            )
+        latency = sample_latency_ms(self.config.latency_ms, rng) / 1000
+        prompt_tokens = sum(estimate_tokens(str(p if isinstance(p, str) else getattr(p, "text", "")))
+                            for item in ([contents] if isinstance(contents, str) else contents)
+                            for p in _parts_of(item))
+        message = self._last_user_text(contents)
+
+        mode = (tool_config or {}).get("function_calling_config", {}).get("mode") \
+            if isinstance(tool_config, dict) else None
+        if self.tools and mode != "NONE" and self._tool_rounds_done(contents) < self.config.tool_rounds:
+            call = self._pick_tool(message)
+            if call is not None:
+                return latency, [FakePart(function_call=call)], FakeUsage(prompt_tokens, 10)
+
+        text = self._reply_text(message)
+        return latency, [FakePart(text=text)], FakeUsage(prompt_tokens, estimate_tokens(text))
+
+    def _chunks(self, parts: List[FakePart]) -> List[FakeResponse]:
+        """The reply split into chunk_tokens-sized stream chunks"""
+        if not parts[0].text:
+            return [FakeResponse(parts)]
+        text, size = parts[0].text, self.config.chunk_tokens * 4
+        return [FakeResponse([FakePart(text=text[i:i + size])]) for i in range(0, len(text), size)]
+
+    def _chunk_delay(self) -> float:
+        """Seconds between stream chunks at the configured pace"""
+        return self.config.chunk_tokens / self.config.tokens_per_second if self.config.tokens_per_second > 0 else 0.0
+
+    def _generation_time(self, usage: FakeUsage) -> float:
+        """Seconds to produce the whole output at the configured pace"""
+        return usage.candidates_token_count / self.config.tokens_per_second if self.config.tokens_per_second > 0 else 0.0
+
+    # google.generativeai surface
+
+    def generate_content(self, contents, generation_config=None, stream: bool = False,
+                         tools=None, tool_config=None, request_options=None, **kwargs):
+        """Blocking call; with stream=True returns an iterable paced at tokens_per_second"""
+        latency, parts, usage = self._plan(contents, tool_config)
+        time.sleep(latency)
+        if not stream:
+            time.sleep(self._generation_time(usage))
+            return FakeResponse(parts, usage)
+
+        chunks, delay = self._chunks(parts), self._chunk_delay()
+
+        def paced():
+            for chunk in chunks:
+                time.sleep(delay)
+                yield chunk
+        return FakeStreamResponse(paced(), usage)
+
+    async def generate_content_async(self, contents, generation_config=None, stream: bool = False,
+                                     tools=None, tool_config=None, request_options=None, **kwargs):
+        """Async counterpart of generate_content"""
+        latency, parts, usage = self._plan(contents, tool_config)
+        await asyncio.sleep(latency)
+        if not stream:
+            await asyncio.sleep(self._generation_time(usage))
+            return FakeResponse(parts, usage)
+        return FakeAsyncStreamResponse(self._chunks(parts), self._chunk_delay(), usage)
+
+
+def list_models() -> List[Any]:
+    """Models the fake serves, shaped like genai.list_models() entries"""
+    return [
+        type("Model", (), {"name": f"models/{name}", "supported_generation_methods": ["generateContent"]})()
+        for name in ("gemini-2.0-flash", "gemini-2.5-flash", "gemini-1.5-pro")
+    ]
@@ -0,0 +1,147 @@
+"""Token-budgeted conversation history with rolling summarization
+
+Keeps the last few exchanges verbatim and folds older ones into a compact
+summary, so the prompt sent on every turn stays under a hard budget no
+matter how long the session runs.
+"""
+import json
+from typing import Any, Callable, Dict, List, Optional
+
+# Rough Gemini ratio for English/Hinglish text; good enough for budgeting
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the token count of a piece of text"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN if text else 0
+
+
+def _clip(text: str, limit: int) -> str:
+    """First line of text, cut to limit characters"""
+    line = " ".join(text.strip().splitlines()[0].split()) if text.strip() else ""
+    return line if len(line) <= limit else line[:limit - 1].rstrip() + "…"
+
+
+def summarize_exchange(user_text: str, model_text: str) -> str:
+    """Default extractive summary of one folded exchange"""
+    return f"- User asked: {_clip(user_text, 140)} | Answer began: {_clip(model_text, 160)}"
+
+
+class ConversationHistory:
+    """Recent turns verbatim plus a rolling summary of everything older"""
+
+    def __init__(self, max_recent_turns: int = 6, max_prompt_tokens: int = 6000,
+                 max_summary_tokens: int = 600,
+                 summarizer: Optional[Callable[[str, str], str]] = None):
+        self.max_recent_turns = max_recent_turns
+        self.max_prompt_tokens = max_prompt_tokens
+        self.max_summary_tokens = max_summary_tokens
+        self.summarizer = summarizer or summarize_exchange
+        self.messages: List[Dict[str, str]] = []  # {"role": "user"|"model", "text": ...}
+        self.summary_lines: List[str] = []
+        self.folded_turns = 0
+
+    def __len__(self) -> int:
+        """Number of messages seen, including folded ones"""
+        return len(self.messages) + 2 * self.folded_turns
+
+    def add(self, role: str, text: str):
+        """Append a message and fold anything beyond the recent window"""
+        self.messages.append({"role": "model" if role in ("model", "assistant") else "user", "text": text})
+        while len(self.messages) > 2 * self.max_recent_turns:
+            self._fold_oldest()
+
+    @property
+    def summary(self) -> str:
+        """Summary of the folded turns"""
+        return "\n".join(self.summary_lines)
+
+    def _fold_oldest(self):
+        """Move the oldest exchange into the summary"""
+        first = self.messages.pop(0)
+        if first["role"] == "model":
+            user_text, model_text = "", first["text"]
+        else:
+            user_text, model_text = first["text"], ""
+            if self.messages and self.messages[0]["role"] == "model":
+                model_text = self.messages.pop(0)["text"]
+        self.summary_lines.append(self.summarizer(user_text, model_text))
+        self.folded_turns += 1
+        self._trim_summary(self.max_summary_tokens)
+
+    def _trim_summary(self, budget: int):
+        """Drop the oldest summary lines until the summary fits the budget"""
+        while self.summary_lines and estimate_tokens(self.summary) > budget:
+            self.summary_lines.pop(0)
+
+    def _preamble(self, system_prompt: str) -> str:
+        """System prompt plus the summary of earlier turns"""
+        if not self.summary_lines:
+            return system_prompt
+        return f"{system_prompt}\n\nSummary of the earlier conversation:\n{self.summary}"
+
+    def prompt_tokens(self, system_prompt: str, user_message: str = "") -> int:
+        """Estimated tokens of the prompt build_contents would produce"""
+        return (estimate_tokens(self._preamble(system_prompt))
+                + sum(estimate_tokens(m["text"]) for m in self.messages)
+                + estimate_tokens(user_message))
+
+    def build_contents(self, system_prompt: str, user_message: str) -> List[Dict[str, Any]]:
+        """Gemini contents for the next call, enforcing the prompt budget
+
+        Folds recent turns first, then shrinks the summary, and only as a
+        last resort cuts the new message.
+        """
+        while self.messages and self.prompt_tokens(system_prompt, user_message) > self.max_prompt_tokens:
+            self._fold_oldest()
+
+        overflow = self.prompt_tokens(system_prompt, user_message) - self.max_prompt_tokens
+        if overflow > 0 and self.summary_lines:
+            self._trim_summary(max(0, estimate_tokens(self.summary) - overflow))
+
+        overflow = self.prompt_tokens(system_prompt, user_message) - self.max_prompt_tokens
+        if overflow > 0:
+            user_message = user_message[:max(0, len(user_message) - overflow * CHARS_PER_TOKEN)]
+
+        contents = [{"role": "user", "parts": [self._preamble(system_prompt)]}]
+        contents.extend({"role": m["role"], "parts": [m["text"]]} for m in self.messages)
+        contents.append({"role": "user", "parts": [user_message]})
+        return contents
+
+    def size_bytes(self) -> int:
+        """Serialized size of the history"""
+        return len(json.dumps(self.to_dict(), ensure_ascii=False).encode("utf-8"))
+
+    def compact(self, max_bytes: int) -> int:
+        """Fold and drop the oldest context until the history fits max_bytes
+
+        Returns the resulting size.
+        """
+        size = self.size_bytes()
+        while size > max_bytes and (self.messages or self.summary_lines):
+            if len(self.messages) > 2:
+                self._fold_oldest()
+            elif self.summary_lines:
+                self.summary_lines.pop(0)
+            else:
+                self.messages.pop(0)
+                self.folded_turns += 1
+            size = self.size_bytes()
+        return size
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializable state"""
+        return {
+            "messages": self.messages,
+            "summary_lines": self.summary_lines,
+            "folded_turns": self.folded_turns,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], **kwargs) -> "ConversationHistory":
+        """Restore a history saved with to_dict"""
+        history = cls(**kwargs)
+        history.messages = list(data.get("messages", []))
+        history.summary_lines = list(data.get("summary_lines", []))
+        history.folded_turns = data.get("folded_turns", 0)
+        return history
@@ -0,0 +1,144 @@
+"""Compiled keyword matcher for query intents
+
+An intent table declares which keywords signal which intent; the matcher
+compiles every keyword of the table into one regular expression (the
+keywords factored into a trie, so the alternation branches on one
+character at a time) and finds all intents in a single pass over the
+lower-cased text.
+
+Keywords match at the start of a word and may run on into it: "fee"
+matches "fees" and "fee-paying" but not "coffee", and "how" no longer
+matches "show". An intent can also require a second keyword ("school" +
+"details"), and intents sharing a group are exclusive, the first one in
+table order winning:
+
+    matcher = IntentMatcher([
+        Intent("capture_lead", ("lead",), requires=("new", "capture"), group="lead"),
+        Intent("get_all_leads", ("lead",), requires=("all", "view"), group="lead"),
+    ])
+    matcher.match("view all new leads")            # ['capture_lead']
+    matcher.count(open("queries.txt"))             # Counter of intents over a log
+"""
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class Intent:
+    """An intent signalled by any of its keywords (and, if given, one of requires)"""
+    name: str
+    keywords: Tuple[str, ...]
+    requires: Tuple[str, ...] = ()
+    group: Optional[str] = None
+
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    """Regex alternation of words, factored by common prefix, longest match first"""
+    root: Dict[str, dict] = {}
+    for word in words:
+        node = root
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[''] = {}
+
+    def emit(node: Dict[str, dict]) -> str:
+        branches = [re.escape(ch) + emit(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return f'(?:{body})?' if '' in node else body
+
+    return emit(root)
+
+
+def _word_starts(text: str) -> List[int]:
+    """Offsets in text where a word begins"""
+    return [i for i, ch in enumerate(text) if (ch.isalnum() or ch == '_')
+            and (i == 0 or not (text[i - 1].isalnum() or text[i - 1] == '_'))]
+
+
+class IntentMatcher:
+    """All intents of a table found in one regex pass"""
+
+    def __init__(self, intents: Iterable[Intent]):
+        self.intents = tuple(intents)
+        keywords = sorted({k.lower() for i in self.intents for k in i.keywords + i.requires})
+        bit = {keyword: 1 << n for n, keyword in enumerate(keywords)}
+        # A matched keyword also stands for every keyword starting at a word inside it
+        # ("best schools" for "schools"), which the match has consumed
+        self._masks: Dict[str, int] = {}
+        overlapping = False
+        for keyword in keywords:
+            mask = 0
+            for start in _word_starts(keyword):
+                tail = keyword[start:]
+                for other in keywords:
+                    if tail.startswith(other):
+                        mask |= bit[other]
+                    elif start and other.startswith(tail):
+                        overlapping = True  # a keyword beginning inside this one runs past its end
+            self._masks[keyword] = mask
+        trie = _trie_pattern(keywords)
+        # Consuming matches are faster; a zero-width lookahead also finds keywords that overlap
+        pattern = rf'\b(?=({trie}))' if overlapping else rf'\b({trie})'
+        self._findall = re.compile(pattern).findall
+        self._rules = [
+            (intent.name, sum(bit[k.lower()] for k in intent.keywords),
+             sum(bit[k.lower()] for k in intent.requires), intent.group)
+            for intent in self.intents
+        ]
+        self._results: Dict[int, Tuple[str, ...]] = {}
+
+    def _resolve(self, found: int) -> Tuple[str, ...]:
+        """Intents for a set of found keywords, in table order"""
+        names, groups = [], set()
+        for name, keywords, requires, group in self._rules:
+            if found & keywords and (not requires or found & requires) and group not in groups:
+                names.append(name)
+                if group is not None:
+                    groups.add(group)
+        return tuple(names)
+
+    def match_keywords(self, text: str) -> int:
+        """Bitmask of the table's keywords present in text"""
+        found = 0
+        masks = self._masks
+        for keyword in self._findall(text.lower()):
+            found |= masks[keyword]
+        return found
+
+    def match(self, text: str) -> List[str]:
+        """Intents found in text, in table order"""
+        found = self.match_keywords(text)
+        result = self._results.get(found)
+        if result is None:
+            result = self._results[found] = self._resolve(found)
+        return list(result)
+
+    def matches(self, text: str) -> FrozenSet[str]:
+        """Intents found in text, as a set"""
+        return frozenset(self.match(text))
+
+    def match_many(self, texts: Iterable[str]) -> Iterator[Tuple[str, ...]]:
+        """Intents of each text, lazily, for classifying large logs"""
+        findall, masks, results, resolve = self._findall, self._masks, self._results, self._resolve
+        for text in texts:
+            found = 0
+            for keyword in findall(text.lower()):
+                found |= masks[keyword]
+            result = results.get(found)
+            if result is None:
+                result = results[found] = resolve(found)
+            yield result
+
+    def count(self, texts: Iterable[str]) -> Counter:
+        """How many texts show each intent; texts with none are counted under ''"""
+        counts: Counter = Counter()
+        for result in self.match_many(texts):
+            if result:
+                counts.update(result)
+            else:
+                counts[''] += 1
+        return counts
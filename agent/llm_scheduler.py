@@ -0,0 +1,303 @@
+"""Quota-aware scheduler for outbound Gemini calls
+
+Every call reserves one request from a requests/minute bucket and its
+estimated tokens from a tokens/minute bucket before it is sent. Callers
+that cannot be admitted yet wait in a priority queue (live chat ahead of
+batch work); a caller whose projected wait exceeds its deadline is rejected
+up front with a retry-after hint instead of timing out later. A 429 from
+the API pauses every caller for the server's retry delay (or an exponential
+backoff) and the call is retried while its deadline allows.
+"""
+import asyncio
+import heapq
+import itertools
+import os
+import re
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+from history import estimate_tokens
+from resilience import backoff_delay
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+_RETRY_PATTERNS = [
+    re.compile(r"retry in ([\d.]+)\s*s", re.IGNORECASE),
+    re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+)", re.IGNORECASE),
+    re.compile(r"retry-after:?\s*([\d.]+)", re.IGNORECASE),
+]
+
+
+class QuotaExceededError(Exception):
+    """Raised when a call cannot be sent within its deadline under the quota"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def is_rate_limited(error: BaseException) -> bool:
+    """True for 429 / resource-exhausted errors from the API"""
+    if getattr(error, "code", None) == 429 or type(error).__name__ == "ResourceExhausted":
+        return True
+    text = str(error).lower()
+    return "429" in text or "resource exhausted" in text or "rate limit" in text
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """Retry delay the API asked for, if the error carries one"""
+    text = str(error)
+    for pattern in _RETRY_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            return float(match.group(1))
+    return None
+
+
+def estimate_request_tokens(contents: Iterable[Any], max_output_tokens: int = 0) -> int:
+    """Prompt tokens of Gemini contents plus the output allowance"""
+    total = max_output_tokens
+    for item in contents:
+        if isinstance(item, dict):
+            total += sum(estimate_tokens(str(part)) for part in item.get("parts", []))
+        else:
+            total += estimate_tokens(str(item))
+    return total
+
+
+def usage_tokens(response: Any) -> Optional[int]:
+    """Actual total tokens reported on a response, if any"""
+    usage = getattr(response, "usage_metadata", None)
+    total = getattr(usage, "total_token_count", None)
+    return total if isinstance(total, int) and total > 0 else None
+
+
+class TokenBucket:
+    """Per-minute budget refilled continuously"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        """Add the budget earned since the last update"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_until(self, amount: float, now: float) -> float:
+        """Seconds until amount is available (amount may exceed what is left this minute)"""
+        self.refill(now)
+        missing = amount - self.tokens
+        return max(0.0, missing / self.rate) if self.rate > 0 else float("inf")
+
+
+class LLMScheduler:
+    """Admission control for Gemini calls under RPM and TPM budgets"""
+
+    def __init__(self, requests_per_minute: float = 15, tokens_per_minute: float = 1_000_000,
+                 max_attempts: int = 3, base_delay: float = 1.0, max_delay: float = 30.0,
+                 name: str = "gemini"):
+        self.name = name
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+        self._cond = threading.Condition()
+        self._queue = []  # heap of [priority, seq, tokens]
+        self._seq = itertools.count()
+        self._paused_until = 0.0
+        self._admitted = 0
+        self._rejected = 0
+        self._rate_limited = 0
+        self._retries = 0
+        self._queue_wait_total = 0.0
+
+    # Admission (lock held for every helper below)
+
+    def _wait_for(self, ticket: list, now: float) -> float:
+        """Projected seconds until ticket can be admitted, counting everyone ahead of it"""
+        ahead = [t for t in self._queue if t < ticket]
+        return max(
+            self._paused_until - now,
+            self._requests.time_until(len(ahead) + 1, now),
+            self._tokens.time_until(sum(t[2] for t in ahead) + ticket[2], now),
+        )
+
+    def _try_admit(self, ticket: list, now: float) -> float:
+        """Admit ticket if it is at the head and the budget allows; else return its wait"""
+        wait = self._wait_for(ticket, now)
+        if wait > 0 or self._queue[0] is not ticket:
+            return max(wait, 0.001)
+        heapq.heappop(self._queue)
+        self._requests.tokens -= 1
+        self._tokens.tokens -= ticket[2]
+        self._admitted += 1
+        self._cond.notify_all()
+        return 0.0
+
+    def _reject(self, ticket: list, wait: float, remaining: float):
+        """Leave the queue and raise a quota error with a retry hint"""
+        self._remove(ticket)
+        self._rejected += 1
+        raise QuotaExceededError(
+            f"LLM quota busy: estimated wait {wait:.1f}s exceeds the {max(remaining, 0):.1f}s deadline",
+            retry_after=round(wait, 1),
+        )
+
+    def _remove(self, ticket: list):
+        """Drop a ticket that gave up"""
+        if ticket in self._queue:
+            self._queue.remove(ticket)
+            heapq.heapify(self._queue)
+            self._cond.notify_all()
+
+    def acquire(self, tokens: int, priority: int = PRIORITY_INTERACTIVE, deadline: Optional[float] = None):
+        """Block until the call may be sent, or raise QuotaExceededError early"""
+        deadline = deadline if deadline is not None else time.monotonic() + 60
+        started = time.monotonic()
+        with self._cond:
+            ticket = [priority, next(self._seq), min(tokens, self._tokens.capacity)]
+            heapq.heappush(self._queue, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = self._try_admit(ticket, now)
+                    if wait == 0.0:
+                        self._queue_wait_total += now - started
+                        return
+                    if wait > deadline - now:
+                        self._reject(ticket, wait, deadline - now)
+                    self._cond.wait(timeout=wait)
+            except BaseException:
+                self._remove(ticket)
+                raise
+
+    async def acquire_async(self, tokens: int, priority: int = PRIORITY_INTERACTIVE,
+                            deadline: Optional[float] = None):
+        """acquire for coroutines; waits on the event loop instead of a thread"""
+        deadline = deadline if deadline is not None else time.monotonic() + 60
+        started = time.monotonic()
+        with self._cond:
+            ticket = [priority, next(self._seq), min(tokens, self._tokens.capacity)]
+            heapq.heappush(self._queue, ticket)
+        try:
+            while True:
+                with self._cond:
+                    now = time.monotonic()
+                    wait = self._try_admit(ticket, now)
+                    if wait == 0.0:
+                        self._queue_wait_total += now - started
+                        return
+                    if wait > deadline - now:
+                        self._reject(ticket, wait, deadline - now)
+                # Poll briefly so a ticket that moves to the head is noticed quickly
+                await asyncio.sleep(min(wait, 0.05))
+        except BaseException:
+            with self._cond:
+                self._remove(ticket)
+            raise
+
+    # Calls
+
+    def _after_success(self, estimated: int, response: Any):
+        """Correct the token budget with the usage the API reported"""
+        actual = usage_tokens(response)
+        if actual is not None:
+            with self._cond:
+                self._tokens.tokens += estimated - actual
+
+    def _after_rate_limit(self, error: BaseException, attempt: int, deadline: float) -> float:
+        """Pause every caller after a 429; returns the delay or raises if out of time"""
+        delay = retry_after_seconds(error)
+        if delay is None:
+            delay = backoff_delay(attempt - 1, self.base_delay, self.max_delay)
+        with self._cond:
+            self._rate_limited += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+            self._cond.notify_all()
+        if attempt >= self.max_attempts or time.monotonic() + delay > deadline:
+            with self._cond:
+                self._rejected += 1
+            raise QuotaExceededError(
+                f"LLM quota exceeded (429); retry after {delay:.1f}s", retry_after=round(delay, 1)
+            ) from error
+        with self._cond:
+            self._retries += 1
+        return delay
+
+    def call(self, fn: Callable[[], Any], tokens: int, priority: int = PRIORITY_INTERACTIVE,
+             deadline_seconds: float = 30.0) -> Any:
+        """Run fn once admitted, retrying 429s while the deadline allows"""
+        deadline = time.monotonic() + deadline_seconds
+        for attempt in range(1, self.max_attempts + 1):
+            self.acquire(tokens, priority, deadline)
+            try:
+                response = fn()
+            except Exception as e:
+                if not is_rate_limited(e):
+                    raise
+                self._after_rate_limit(e, attempt, deadline)
+                continue
+            self._after_success(tokens, response)
+            return response
+
+    async def call_async(self, fn: Callable[[], Awaitable[Any]], tokens: int,
+                         priority: int = PRIORITY_INTERACTIVE, deadline_seconds: float = 30.0) -> Any:
+        """Async counterpart of call"""
+        deadline = time.monotonic() + deadline_seconds
+        for attempt in range(1, self.max_attempts + 1):
+            await self.acquire_async(tokens, priority, deadline)
+            try:
+                response = await fn()
+            except Exception as e:
+                if not is_rate_limited(e):
+                    raise
+                self._after_rate_limit(e, attempt, deadline)
+                continue
+            self._after_success(tokens, response)
+            return response
+
+    def stats(self) -> Dict[str, Any]:
+        """Budget, queue and throttling counters"""
+        with self._cond:
+            now = time.monotonic()
+            self._requests.refill(now)
+            self._tokens.refill(now)
+            return {
+                "name": self.name,
+                "requests_per_minute": self._requests.capacity,
+                "tokens_per_minute": self._tokens.capacity,
+                "requests_available": round(self._requests.tokens, 2),
+                "tokens_available": round(self._tokens.tokens),
+                "queued": len(self._queue),
+                "queued_batch": sum(1 for t in self._queue if t[0] >= PRIORITY_BATCH),
+                "paused_for_seconds": round(max(0.0, self._paused_until - now), 2),
+                "admitted": self._admitted,
+                "rejected": self._rejected,
+                "rate_limited": self._rate_limited,
+                "retries": self._retries,
+                "mean_queue_wait_ms": round(self._queue_wait_total / self._admitted * 1000, 2)
+                if self._admitted else 0.0,
+            }
+
+
+_shared: Optional[LLMScheduler] = None
+_shared_lock = threading.Lock()
+
+
+def get_scheduler() -> LLMScheduler:
+    """The process-wide scheduler, sized from GEMINI_RPM and GEMINI_TPM"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = LLMScheduler(
+                requests_per_minute=float(os.getenv('GEMINI_RPM', 15)),
+                tokens_per_minute=float(os.getenv('GEMINI_TPM', 1_000_000)),
+                max_attempts=int(os.getenv('GEMINI_MAX_ATTEMPTS', 3)),
+            )
+        return _shared
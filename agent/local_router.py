@@ -0,0 +1,194 @@
+"""Local-first answer path in front of the LLM
+
+Structured questions about a known school ("fees at DPS", "documents for
+Greenfield", "is there an entrance exam at DPS") are answered straight from
+the database: QueryProcessor picks the intent, the school is resolved from
+its name, acronym or distinctive word, the backend operation runs
+in-process and ResponseFormatter writes the reply. Anything ambiguous -
+no school, several schools, several intents, long free-form questions, a
+city or area the school is not in ("DPS Mumbai"), a negation ("I do not
+want the fees") - returns None and falls through to Gemini.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# Appended, not inserted: backend/app.py must not shadow the chat app
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+import operations
+from database import DatabaseManager, db as shared_db
+from query_processor import QueryProcessor, ResponseFormatter
+from response_cache import normalize_message
+from semantic_cache import KNOWN_AREAS, KNOWN_CITIES, negated
+
+# Tools the router may answer on its own, and the formatter for each
+LOCAL_TOOLS = {
+    "get_fee_structure": ResponseFormatter.format_parent_response,
+    "get_required_documents": ResponseFormatter.format_student_response,
+    "get_exam_pattern": ResponseFormatter.format_student_response,
+    "get_eligibility_criteria": ResponseFormatter.format_student_response,
+}
+
+# Words too common in school names to identify one on their own
+GENERIC_NAME_WORDS = frozenset({
+    "public", "school", "schools", "international", "academy", "college", "convent",
+    "high", "senior", "secondary", "model", "vidyalaya", "the", "of", "and",
+})
+
+FAST_ANSWER_MS = 10.0
+
+
+def school_aliases(name: str) -> List[str]:
+    """Normalized ways a user may refer to a school"""
+    words = normalize_message(name).split()
+    aliases = {" ".join(words)}
+    initials = "".join(w[0] for w in words if w not in ("the", "of", "and"))
+    if len(initials) >= 2:
+        aliases.add(initials)
+    distinctive = [w for w in words if w not in GENERIC_NAME_WORDS and w not in KNOWN_CITIES]
+    if distinctive:
+        aliases.add(" ".join(distinctive))
+    return sorted(aliases)
+
+
+class LocalRouter:
+    """Answer confidently-resolved structured questions without calling the LLM"""
+
+    def __init__(self, db: Optional[DatabaseManager] = None, max_words: int = 16, window: int = 1000):
+        self.db = db if db is not None else shared_db
+        self.max_words = max_words
+        self._lock = threading.Lock()
+        self._index_lock = threading.Lock()
+        self._alias_index: Dict[str, str] = {}
+        self._longest_alias = 0
+        self._indexed_schools = -1
+        self._latencies = deque(maxlen=window)
+        self._requests = 0
+        self._local = 0
+        self._fast = 0
+        self._by_tool: Dict[str, int] = {}
+
+    def _aliases(self) -> Tuple[Dict[str, str], int]:
+        """(alias -> school id, words in the longest alias), rebuilt when the school list changes"""
+        if self._indexed_schools != len(self.db.schools):
+            # One request rebuilds; the others keep using the previous index meanwhile
+            if self._index_lock.acquire(blocking=not self._alias_index):
+                try:
+                    if self._indexed_schools != len(self.db.schools):
+                        self._rebuild()
+                finally:
+                    self._index_lock.release()
+        return self._alias_index, self._longest_alias
+
+    def _rebuild(self) -> None:
+        """Index every school's aliases, dropping those shared by several schools"""
+        schools = len(self.db.schools)
+        index: Dict[str, str] = {}
+        ambiguous = set()
+        for school in self.db.get_all_schools():
+            for alias in school_aliases(school.name):
+                if alias in index and index[alias] != school.id:
+                    ambiguous.add(alias)
+                index[alias] = school.id
+        index = {a: s for a, s in index.items() if a not in ambiguous}
+        self._alias_index, self._longest_alias = index, max((a.count(" ") + 1 for a in index), default=0)
+        self._indexed_schools = schools
+
+    def warm(self) -> None:
+        """Build the alias index now rather than on the first routed request"""
+        self._aliases()
+
+    def resolve_schools(self, message: str) -> List[str]:
+        """Ids of every school the message names"""
+        index, longest = self._aliases()
+        words = normalize_message(message).split()
+        found = []
+        # Each word n-gram up to the longest alias is one dict lookup, whatever the catalog size
+        for start in range(len(words)):
+            for end in range(start + 1, min(start + longest, len(words)) + 1):
+                school_id = index.get(" ".join(words[start:end]))
+                if school_id is not None and school_id not in found:
+                    found.append(school_id)
+        return found
+
+    @staticmethod
+    def places_match(message: str, school) -> bool:
+        """Whether the cities and areas the message names (beyond the school's own name) are where it is"""
+        places = KNOWN_CITIES | KNOWN_AREAS
+        named = {t for t in normalize_message(message).split() if t in places}
+        named -= set(normalize_message(school.name).split())
+        return named <= set(normalize_message(school.location).split())
+
+    @staticmethod
+    def resolve_intent(message: str) -> Optional[str]:
+        """The single locally answerable tool the message asks for, if any"""
+        tools = set(QueryProcessor.process_parent_query(message)["suggested_tools"])
+        tools |= set(QueryProcessor.process_student_query(message)["suggested_tools"])
+        tools.discard("get_faqs")  # the processors' fallback, not a detected intent
+        if tools & {"get_required_documents", "get_exam_pattern", "get_eligibility_criteria"}:
+            tools.discard("get_admission_info")  # "documents for admission" is about documents
+        if len(tools) == 1 and next(iter(tools)) in LOCAL_TOOLS:
+            return next(iter(tools))
+        return None
+
+    def answer(self, message: str) -> Optional[Dict[str, Any]]:
+        """{"text", "tool", "school_id", "elapsed_ms"} or None to fall through to the LLM"""
+        started = time.perf_counter()
+        result = self._answer(message)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._requests += 1
+            if result is not None:
+                self._local += 1
+                self._fast += elapsed_ms < FAST_ANSWER_MS
+                self._latencies.append(elapsed_ms)
+                self._by_tool[result["tool"]] = self._by_tool.get(result["tool"], 0) + 1
+        if result is not None:
+            result["elapsed_ms"] = round(elapsed_ms, 3)
+        return result
+
+    def _answer(self, message: str) -> Optional[Dict[str, Any]]:
+        """Routing without the bookkeeping"""
+        if len(message.split()) > self.max_words or negated(message):
+            return None
+        tool = self.resolve_intent(message)
+        if tool is None:
+            return None
+        schools = self.resolve_schools(message)
+        if len(schools) != 1 or not self.places_match(message, self.db.get_school_by_id(schools[0])):
+            return None
+
+        payload, status = operations.run_operation(self.db, tool, {"school_id": schools[0]})
+        if status != 200 or not payload.get("success"):
+            return None
+        school = self.db.get_school_by_id(schools[0])
+        text = LOCAL_TOOLS[tool](json.dumps(payload), tool)
+        return {"text": f"🏫 {school.name}\n\n{text.strip()}", "tool": tool, "school_id": school.id}
+
+    def stats(self) -> Dict[str, Any]:
+        """Share of traffic answered locally and how fast"""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            requests = self._requests
+
+            def pct(p):
+                return round(latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))], 3) \
+                    if latencies else 0.0
+
+            return {
+                "requests": requests,
+                "local_answers": self._local,
+                "llm_fallthrough": requests - self._local,
+                "local_rate": round(self._local / requests, 4) if requests else 0.0,
+                "llm_call_rate": round((requests - self._local) / requests, 4) if requests else 0.0,
+                "under_10ms_rate": round(self._fast / requests, 4) if requests else 0.0,
+                "latency_ms": {"p50": pct(50), "p95": pct(95), "p99": pct(99)},
+                "by_tool": dict(self._by_tool),
+            }
+
@@ -4,7 +4,34 @@ import json
 import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-from tools import ToolHandler
+from intent_matcher import Intent, IntentMatcher
+
+# Intent tables: the tool each intent suggests, in the order tools are suggested
+PARENT_INTENTS = IntentMatcher([
+    Intent("search_schools", ("best schools", "top schools")),
+    Intent("get_fee_structure", ("fee", "cost")),
+    Intent("get_admission_info", ("admission",)),
+    Intent("compare_schools", ("compare",)),
+    Intent("get_nearby_schools", ("nearby", "near me")),
+    Intent("get_school_details", ("facilities", "hostel", "transport")),
+])
+
+STUDENT_INTENTS = IntentMatcher([
+    Intent("get_required_documents", ("document", "requirement")),
+    Intent("get_exam_pattern", ("exam", "entrance")),
+    Intent("get_eligibility_criteria", ("eligible", "eligibility")),
+    Intent("get_faqs", ("dress", "transport", "hostel", "location")),
+    Intent("get_school_details", ("school",), requires=("details",)),
+])
+
+# One tool per subject; the first matching action wins
+ADMIN_INTENTS = IntentMatcher([
+    Intent("capture_lead", ("lead",), requires=("new", "capture"), group="lead"),
+    Intent("get_all_leads", ("lead",), requires=("all", "view", "get"), group="lead"),
+    Intent("update_lead_status", ("lead",), requires=("update", "status"), group="lead"),
+    Intent("add_faq", ("faq",), requires=("add", "new"), group="faq"),
+    Intent("get_faqs", ("faq",), requires=("view", "get"), group="faq"),
+])
 
 class QueryProcessor:
     """Process and route queries based on user type"""
@@ -20,25 +47,7 @@ class QueryProcessor:
         }
         
         # Detect query intent
-        query_lower = query.lower()
-        
-        if "best schools" in query_lower or "top schools" in query_lower:
-            response["suggested_tools"].append("search_schools")
-        
-        if "fee" in query_lower or "cost" in query_lower:
-            response["suggested_tools"].append("get_fee_structure")
-        
-        if "admission" in query_lower:
-            response["suggested_tools"].append("get_admission_info")
-        
-        if "compare" in query_lower:
-            response["suggested_tools"].append("compare_schools")
-        
-        if "nearby" in query_lower or "near me" in query_lower:
-            response["suggested_tools"].append("get_nearby_schools")
-        
-        if "facilities" in query_lower or "hostel" in query_lower or "transport" in query_lower:
-            response["suggested_tools"].append("get_school_details")
+        response["suggested_tools"].extend(PARENT_INTENTS.match(query))
         
         if not response["suggested_tools"]:
             response["suggested_tools"].append("get_faqs")
@@ -55,22 +64,7 @@ class QueryProcessor:
             "response": ""
         }
         
-        query_lower = query.lower()
-        
-        if "document" in query_lower or "requirement" in query_lower:
-            response["suggested_tools"].append("get_required_documents")
-        
-        if "exam" in query_lower or "entrance" in query_lower:
-            response["suggested_tools"].append("get_exam_pattern")
-        
-        if "eligible" in query_lower or "eligibility" in query_lower:
-            response["suggested_tools"].append("get_eligibility_criteria")
-        
-        if "dress" in query_lower or "transport" in query_lower or "hostel" in query_lower or "location" in query_lower:
-            response["suggested_tools"].append("get_faqs")
-        
-        if "school" in query_lower and "details" in query_lower:
-            response["suggested_tools"].append("get_school_details")
+        response["suggested_tools"].extend(STUDENT_INTENTS.match(query))
         
         if not response["suggested_tools"]:
             response["suggested_tools"].append("get_faqs")
@@ -88,21 +82,7 @@ class QueryProcessor:
             "response": ""
         }
         
-        query_lower = query.lower()
-        
-        if "lead" in query_lower:
-            if "new" in query_lower or "capture" in query_lower:
-                response["suggested_tools"].append("capture_lead")
-            elif "all" in query_lower or "view" in query_lower or "get" in query_lower:
-                response["suggested_tools"].append("get_all_leads")
-            elif "update" in query_lower or "status" in query_lower:
-                response["suggested_tools"].append("update_lead_status")
-        
-        if "faq" in query_lower:
-            if "add" in query_lower or "new" in query_lower:
-                response["suggested_tools"].append("add_faq")
-            elif "view" in query_lower or "get" in query_lower:
-                response["suggested_tools"].append("get_faqs")
+        response["suggested_tools"].extend(ADMIN_INTENTS.match(query))
         
         if not response["suggested_tools"]:
             response["suggested_tools"].append("get_all_leads")
@@ -0,0 +1,179 @@
+"""Timeouts, retries, circuit breakers and bulkheads for backend calls"""
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Tuple, Type
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because its circuit breaker is open"""
+
+
+class BulkheadFullError(Exception):
+    """Raised when no concurrency slot frees up in time"""
+
+
+class DeadlineExceededError(Exception):
+    """Raised when the overall deadline runs out before a call can be attempted"""
+
+
+class CircuitBreaker:
+    """Fail fast on a route after repeated failures, probing again after a cool-down"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._rejected = 0
+        self._opened_count = 0
+
+    def allow(self) -> bool:
+        """Return True if a call may proceed right now"""
+        with self._lock:
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    self._rejected += 1
+                    return False
+                self._state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self._state == self.HALF_OPEN:
+                if self._probe_in_flight:
+                    self._rejected += 1
+                    return False
+                self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        """Close the breaker after a successful call"""
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        """Count a failure, opening the breaker at the threshold or on a failed probe"""
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self._opened_count += 1
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        """Current breaker state"""
+        with self._lock:
+            return self._state
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current state and counters for metrics"""
+        with self._lock:
+            return {
+                "state": self._state,
+                "consecutive_failures": self._failures,
+                "times_opened": self._opened_count,
+                "rejected": self._rejected,
+            }
+
+
+class Bulkhead:
+    """Cap concurrent calls for one class of work"""
+
+    def __init__(self, name: str, max_concurrent: int, acquire_timeout: float = 1.0):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.acquire_timeout = acquire_timeout
+        self._semaphore = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._active = 0
+        self._rejected = 0
+
+    def __enter__(self):
+        if not self._semaphore.acquire(timeout=self.acquire_timeout):
+            with self._lock:
+                self._rejected += 1
+            raise BulkheadFullError(f"Too many concurrent {self.name} calls")
+        with self._lock:
+            self._active += 1
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        with self._lock:
+            self._active -= 1
+        self._semaphore.release()
+        return False
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current occupancy for metrics"""
+        with self._lock:
+            return {
+                "active": self._active,
+                "limit": self.max_concurrent,
+                "rejected": self._rejected,
+            }
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    """Full-jitter exponential backoff for the given retry attempt (0-based)"""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+def retry_call(fn: Callable[[float], Any], attempts: int, deadline: float,
+               retry_on: Tuple[Type[BaseException], ...],
+               base_delay: float = 0.1, max_delay: float = 2.0) -> Any:
+    """Call fn(remaining_seconds) up to attempts times before the monotonic deadline
+
+    Only exceptions in retry_on are retried; a retry is skipped when its
+    backoff would not leave any time before the deadline.
+    """
+    attempt = 0
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceededError("Deadline exceeded before the call could be made")
+        try:
+            return fn(remaining)
+        except retry_on:
+            attempt += 1
+            if attempt >= attempts:
+                raise
+            delay = backoff_delay(attempt - 1, base_delay, max_delay)
+            if time.monotonic() + delay >= deadline:
+                raise
+            time.sleep(delay)
+
+
+class BreakerRegistry:
+    """Lazily created circuit breakers keyed by route"""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, route: str) -> CircuitBreaker:
+        """Get or create the breaker for a route"""
+        with self._lock:
+            breaker = self._breakers.get(route)
+            if breaker is None:
+                breaker = CircuitBreaker(route, self.failure_threshold, self.reset_timeout)
+                self._breakers[route] = breaker
+            return breaker
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """State of every breaker, keyed by route"""
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {route: breaker.snapshot() for route, breaker in breakers.items()}
@@ -0,0 +1,141 @@
+"""Normalized-prompt response cache for chat answers
+
+"Best schools in Delhi", "best schools in delhi?" and "top schools in
+Delhi" all normalize to the same key, so only the first one costs a
+Gemini generation until the entry expires or is evicted.
+"""
+import json
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+# Old and alternate city names mapped to the name we answer with
+CITY_ALIASES = {
+    "allahabad": "prayagraj",
+    "bombay": "mumbai",
+    "bengaluru": "bangalore",
+    "calcutta": "kolkata",
+    "madras": "chennai",
+    "gurugram": "gurgaon",
+    "new delhi": "delhi",
+    "poona": "pune",
+    "cochin": "kochi",
+    "trivandrum": "thiruvananthapuram",
+    "benares": "varanasi",
+    "banaras": "varanasi",
+    "baroda": "vadodara",
+    "mysuru": "mysore",
+    "vizag": "visakhapatnam",
+    "pondicherry": "puducherry",
+    "cawnpore": "kanpur",
+    "simla": "shimla",
+}
+
+# Words that do not change what a school question is asking
+WORD_SYNONYMS = {
+    "top": "best",
+    "finest": "best",
+    "fee": "fees",
+}
+
+_PUNCTUATION = re.compile(r"[^\w\s₹]")
+_ALIAS_PATTERN = re.compile(
+    r"\b(" + "|".join(re.escape(alias) for alias in sorted(CITY_ALIASES, key=len, reverse=True)) + r")\b"
+)
+
+
+def normalize_message(text: str) -> str:
+    """Canonicalize case, punctuation, whitespace, city aliases and simple synonyms"""
+    text = unicodedata.normalize("NFKC", text).lower()
+    text = _PUNCTUATION.sub(" ", text)
+    text = " ".join(text.split())
+    text = _ALIAS_PATTERN.sub(lambda m: CITY_ALIASES[m.group(1)], text)
+    return " ".join(WORD_SYNONYMS.get(word, word) for word in text.split())
+
+
+def make_cache_key(model_name: str, generation_config: Dict[str, Any], message: str) -> str:
+    """Cache key for a single-turn generation"""
+    config = json.dumps(generation_config, sort_keys=True)
+    return f"{model_name}|{config}|{normalize_message(message)}"
+
+
+class ResponseCache:
+    """Size-bounded LRU cache with a per-entry TTL and hit-rate counters"""
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: float = 6 * 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value, or None on a miss or an expired entry"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self._expirations += 1
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def set(self, key: str, value: Any):
+        """Store a value, evicting the least recently used entries past the size limit"""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+
+    def export_state(self) -> List[Tuple[str, float, Any]]:
+        """Live (key, seconds left to live, value) entries, least recently used first"""
+        now = time.monotonic()
+        with self._lock:
+            return [(key, expires_at - now, value)
+                    for key, (expires_at, value) in self._entries.items() if expires_at > now]
+
+    def load_state(self, entries: List[Tuple[str, float, Any]], age_seconds: float = 0.0):
+        """Restore export_state() output taken age_seconds ago, keeping what is still fresh"""
+        now = time.monotonic()
+        with self._lock:
+            for key, ttl, value in entries:
+                if ttl - age_seconds > 0 and key not in self._entries:
+                    self._entries[key] = (now + ttl - age_seconds, value)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        """Size and hit-rate counters"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+            }
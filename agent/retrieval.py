@@ -0,0 +1,190 @@
+"""Retrieval of catalog records for grounding chat prompts
+
+Schools, admission rules and FAQs from DatabaseManager are flattened into
+short records and indexed locally with an inverted index (BM25 scoring).
+For each message the top-k records are packed into a compact context block
+that never exceeds a token budget, so prompts carry our real data instead
+of a long static description.
+"""
+import math
+import os
+import sys
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# Appended, not inserted: backend/app.py must not shadow the chat app
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+from database import DatabaseManager, db as shared_db
+from history import CHARS_PER_TOKEN, estimate_tokens
+from local_router import GENERIC_NAME_WORDS, school_aliases
+from response_cache import normalize_message
+from semantic_cache import STOPWORDS
+
+CONTEXT_HEADER = "Catalog records (authoritative; cite these for any school named here):"
+
+# Room for a school record and its admissions row together (~150 tokens) plus FAQs
+DEFAULT_CONTEXT_TOKENS = 400
+# A record cut shorter than this says too little to be worth sending
+MIN_CLIPPED_TOKENS = 16
+
+
+def tokenize(text: str) -> List[str]:
+    """Normalized content words with a light plural stem"""
+    tokens = []
+    for token in normalize_message(text).split():
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class CatalogIndex:
+    """BM25 inverted index over compact catalog records"""
+
+    def __init__(self, db: Optional[DatabaseManager] = None, k1: float = 1.2, b: float = 0.3,
+                 min_relative_score: float = 0.35):
+        self.db = db if db is not None else shared_db
+        self.min_relative_score = min_relative_score
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._version = None
+        self.records: List[Tuple[str, str]] = []  # (school_id or "", record text)
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._lengths: List[int] = []
+        self._aliases: Dict[str, str] = {}
+
+    def _records(self) -> List[Tuple[str, str, str]]:
+        """(school_id, searchable text, record text) for every catalog entry"""
+        rows = []
+        names = {s.id: s.name for s in self.db.get_all_schools()}
+        # Every record of a school is findable by its acronym and short name
+        aliases = {s.id: " ".join(school_aliases(s.name)) for s in self.db.get_all_schools()}
+        for school in self.db.get_all_schools():
+            fees = "; ".join(f"{k} {v}" for k, v in school.fee_structure.items())
+            record = (f"{school.name} | {school.location} | classes {', '.join(school.classes_offered)} | "
+                      f"fees {fees} | facilities {', '.join(school.facilities)} | "
+                      f"est. {school.established_year} | {school.contact_phone}")
+            rows.append((school.id, f"{record} {aliases[school.id]} fee facility", record))
+        for admission in self.db.admissions.values():
+            name = names.get(admission.school_id, admission.school_id)
+            exam = f"entrance exam {admission.exam_name}: {admission.exam_pattern}" \
+                if admission.entrance_exam_required else "no entrance exam"
+            eligibility = "; ".join(f"{k.replace('_', ' ')} {v}" for k, v in admission.eligibility_criteria.items())
+            record = (f"{name} admission | deadline {admission.admission_deadline} | {exam} | "
+                      f"documents {', '.join(admission.required_documents)} | {eligibility}")
+            rows.append((admission.school_id, f"{record} {aliases.get(admission.school_id, '')} eligibility exam", record))
+        for faq in self.db.faqs.values():
+            name = names.get(faq.school_id, "")
+            record = f"{name + ' ' if name else ''}FAQ | {faq.question} {faq.answer}"
+            rows.append((faq.school_id or "", f"{record} {aliases.get(faq.school_id, '')}", record))
+        return rows
+
+    def _ensure_index(self):
+        """Rebuild the index when the catalog changes size"""
+        version = (len(self.db.schools), len(self.db.admissions), len(self.db.faqs))
+        if version == self._version:
+            return
+        with self._lock:
+            if version == self._version:
+                return
+            records, postings, lengths = [], {}, []
+            for doc_id, (school_id, text, record) in enumerate(self._records()):
+                counts = Counter(tokenize(text))
+                for token, tf in counts.items():
+                    postings.setdefault(token, {})[doc_id] = tf
+                lengths.append(sum(counts.values()))
+                records.append((school_id, record))
+            aliases = {}
+            for school in self.db.get_all_schools():
+                for alias in school_aliases(school.name):
+                    aliases[alias] = school.id
+            self.records, self._postings, self._lengths, self._aliases = records, postings, lengths, aliases
+            self._version = version
+
+    def search(self, query: str, k: int = 4) -> List[Tuple[float, int]]:
+        """Top-k (score, record index) for the query; records of a named school are boosted"""
+        self._ensure_index()
+        if not self.records:
+            return []
+        n = len(self.records)
+        avg_length = sum(self._lengths) / n
+        scores: Dict[int, float] = {}
+        # Words shared by nearly every school name ("public school") match everything
+        for token in set(tokenize(query)) - GENERIC_NAME_WORDS:
+            postings = self._postings.get(token)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings.items():
+                norm = tf + self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+
+        padded = f" {normalize_message(query)} "
+        named = {sid for alias, sid in self._aliases.items() if f" {alias} " in padded}
+        for doc_id, (school_id, _) in enumerate(self.records):
+            if school_id in named:
+                scores[doc_id] = scores.get(doc_id, 0.0) + 5.0
+
+        ranked = sorted(((score, doc_id) for doc_id, score in scores.items() if score > 0), reverse=True)
+        if not ranked:
+            return []
+        # Weak partial matches well below the best record are noise, not context
+        cutoff = ranked[0][0] * self.min_relative_score
+        return [item for item in ranked[:k] if item[0] >= cutoff]
+
+    def context_block(self, query: str, max_tokens: int = DEFAULT_CONTEXT_TOKENS, k: int = 4) -> str:
+        """Best records for the query, packed under max_tokens ('' when nothing matches)"""
+        # Interleave schools so a comparison gets the best record of each first
+        seen: Dict[str, int] = {}
+        ranked = []
+        for position, (_, doc_id) in enumerate(self.search(query, k)):
+            school_id = self.records[doc_id][0]
+            seen[school_id] = seen.get(school_id, -1) + 1
+            ranked.append((seen[school_id], position, doc_id))
+
+        lines = [CONTEXT_HEADER]
+        used = estimate_tokens(CONTEXT_HEADER)
+        for _, _, doc_id in sorted(ranked):
+            line = f"- {self.records[doc_id][1]}"
+            cost = estimate_tokens(line) + 1
+            if used + cost > max_tokens:
+                # Stop rather than skip ahead: a lower-ranked record must not take this one's place
+                clipped = _truncate(line, max_tokens - used - 1)
+                if clipped:
+                    lines.append(clipped)
+                break
+            lines.append(line)
+            used += cost
+        return "\n".join(lines) if len(lines) > 1 else ""
+
+
+def _truncate(line: str, max_tokens: int) -> str:
+    """line cut at a word boundary to fit max_tokens, marked with '…'; '' if too little would remain"""
+    if max_tokens < MIN_CLIPPED_TOKENS:
+        return ""
+    cut = line[:max_tokens * CHARS_PER_TOKEN - 1].rsplit(" ", 1)[0].rstrip(" |;,")
+    return f"{cut}…" if estimate_tokens(cut) >= MIN_CLIPPED_TOKENS else ""
+
+
+_shared: Optional[CatalogIndex] = None
+
+
+def get_index() -> CatalogIndex:
+    """The process-wide index over the shared catalog"""
+    global _shared
+    if _shared is None:
+        _shared = CatalogIndex()
+    return _shared
+
+
+def grounded_prompt(system_prompt: str, message: str, max_tokens: Optional[int] = None) -> str:
+    """System prompt followed by the catalog records relevant to message"""
+    budget = max_tokens if max_tokens is not None else int(os.getenv('RETRIEVAL_CONTEXT_TOKENS', DEFAULT_CONTEXT_TOKENS))
+    context = get_index().context_block(message, budget) if budget > 0 else ""
+    return f"{system_prompt}\n\n{context}" if context else system_prompt
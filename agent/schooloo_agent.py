@@ -1,9 +1,20 @@
 """Schooloo AI Agent using Google Agent Development Kit"""
 import os
+import sys
 import json
-import requests
-from typing import Any, Optional
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from tools import ToolHandler
+from tool_registry import TOOL_SCHEMAS, TOOLS_BY_NAME
+from usage import get_tracker
+from fake_genai import generative_model
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+from tracing import propagate, span
 
 # Try to import Google Agent Development Kit components
 try:
@@ -15,177 +26,55 @@ except ImportError:
 # Backend API base URL
 BACKEND_URL = os.getenv('BACKEND_URL', 'http://localhost:5000/api')
 
-class SchoolooAgentTools:
-    """Tool definitions for Schooloo AI Agent"""
-    
-    @staticmethod
-    def search_schools(location: str, radius_km: float = 5.0) -> dict:
-        """Search schools by location"""
-        try:
-            response = requests.post(
-                f"{BACKEND_URL}/schools/search",
-                json={"location": location}
-            )
-            return response.json()
-        except Exception as e:
-            return {"error": f"Failed to search schools: {str(e)}"}
-    
-    @staticmethod
-    def get_nearby_schools(latitude: float, longitude: float, radius_km: float = 5.0) -> dict:
-        """Get schools nearby based on GPS coordinates"""
-        try:
-            response = requests.post(
-                f"{BACKEND_URL}/schools/nearby",
-                json={
-                    "latitude": latitude,
-                    "longitude": longitude,
-                    "radius_km": radius_km
-                }
-            )
-            return response.json()
-        except Exception as e:
-            return {"error": f"Failed to get nearby schools: {str(e)}"}
-    
-    @staticmethod
-    def get_school_details(school_id: str) -> dict:
-        """Get detailed information about a school"""
-        try:
-            response = requests.get(f"{BACKEND_URL}/schools/{school_id}")
-            return response.json()
-        except Exception as e:
-            return {"error": f"Failed to get school details: {str(e)}"}
-    
-    @staticmethod
-    def get_fee_structure(school_id: str) -> dict:
-        """Get fee structure of a school"""
-        try:
-            response = requests.get(f"{BACKEND_URL}/schools/{school_id}")
-            if response.status_code == 200:
-                school = response.json()
-                return {
-                    "success": True,
-                    "school_name": school['data']['name'],
-                    "fees": school['data']['fee_structure']
-                }
-            return {"error": "School not found"}
-        except Exception as e:
-            return {"error": f"Failed to get fee structure: {str(e)}"}
-    
-    @staticmethod
-    def compare_schools(school_ids: list) -> dict:
-        """Compare multiple schools"""
-        try:
-            response = requests.post(
-                f"{BACKEND_URL}/schools/compare",
-                json={"school_ids": school_ids}
-            )
-            return response.json()
-        except Exception as e:
-            return {"error": f"Failed to compare schools: {str(e)}"}
-    
-    @staticmethod
-    def get_admission_info(school_id: str) -> dict:
-        """Get admission information for a school"""
-        try:
-            response = requests.get(f"{BACKEND_URL}/admissions/{school_id}")
-            return response.json()
-        except Exception as e:
-            return {"error": f"Failed to get admission info: {str(e)}"}
-    
-    @staticmethod
-    def get_required_documents(school_id: str) -> dict:
-        """Get required documents for admission"""
-        try:
-            response = requests.get(f"{BACKEND_URL}/admissions/documents/{school_id}")
-            return response.json()
-        except Exception as e:
-            return {"error": f"Failed to get required documents: {str(e)}"}
-    
-    @staticmethod
-    def get_exam_pattern(school_id: str) -> dict:
-        """Get entrance exam pattern"""
-        try:
-            response = requests.get(f"{BACKEND_URL}/admissions/exam-pattern/{school_id}")
-            return response.json()
-        except Exception as e:
-            return {"error": f"Failed to get exam pattern: {str(e)}"}
-    
-    @staticmethod
-    def get_eligibility_criteria(school_id: str) -> dict:
-        """Get eligibility criteria for a school"""
-        try:
-            response = requests.get(f"{BACKEND_URL}/admissions/eligibility/{school_id}")
-            return response.json()
-        except Exception as e:
-            return {"error": f"Failed to get eligibility criteria: {str(e)}"}
-    
-    @staticmethod
-    def get_faqs(category: Optional[str] = None) -> dict:
-        """Get FAQs, optionally filtered by category"""
-        try:
-            params = {"category": category} if category else {}
-            response = requests.get(f"{BACKEND_URL}/faqs", params=params)
-            return response.json()
-        except Exception as e:
-            return {"error": f"Failed to get FAQs: {str(e)}"}
-    
-    @staticmethod
-    def add_faq(question: str, answer: str, category: str, school_id: Optional[str] = None) -> dict:
-        """Add a new FAQ"""
-        try:
-            response = requests.post(
-                f"{BACKEND_URL}/faqs",
-                json={
-                    "question": question,
-                    "answer": answer,
-                    "category": category,
-                    "school_id": school_id
-                }
-            )
-            return response.json()
-        except Exception as e:
-            return {"error": f"Failed to add FAQ: {str(e)}"}
-    
-    @staticmethod
-    def capture_lead(name: str, email: str, phone: str, school_interested: str, 
-                     query_type: str, query_text: str) -> dict:
-        """Capture a new lead"""
-        try:
-            response = requests.post(
-                f"{BACKEND_URL}/leads",
-                json={
-                    "name": name,
-                    "email": email,
-                    "phone": phone,
-                    "school_interested": school_interested,
-                    "query_type": query_type,
-                    "query_text": query_text
-                }
-            )
-            return response.json()
-        except Exception as e:
-            return {"error": f"Failed to capture lead: {str(e)}"}
-    
-    @staticmethod
-    def get_all_leads() -> dict:
-        """Get all leads (admin endpoint)"""
-        try:
-            response = requests.get(f"{BACKEND_URL}/leads")
-            return response.json()
-        except Exception as e:
-            return {"error": f"Failed to get leads: {str(e)}"}
-    
-    @staticmethod
-    def update_lead_status(lead_id: str, status: str) -> dict:
-        """Update lead status"""
-        try:
-            response = requests.patch(
-                f"{BACKEND_URL}/leads/{lead_id}",
-                json={"status": status}
-            )
-            return response.json()
-        except Exception as e:
-            return {"error": f"Failed to update lead: {str(e)}"}
+# Function-calling loop limits
+MAX_TOOL_STEPS = int(os.getenv('AGENT_MAX_TOOL_STEPS', 5))
+CHAT_DEADLINE_SECONDS = float(os.getenv('AGENT_CHAT_DEADLINE_SECONDS', 30))
+
+# Short on purpose: facts come from tool results, not from the prompt
+SYSTEM_INSTRUCTION = """You are Schooloo AI Assistant, a school discovery assistant for India.
+Use the provided tools to look up schools, fees, admissions, documents, exams and FAQs.
+Answer only from tool results; if the tools return nothing, say so instead of guessing.
+Format answers as short, clean bullet points."""
+
+TIMEOUT_REPLY = "Sorry, looking that up took too long. Please try a more specific question."
+
+
+def _to_plain(value: Any) -> Any:
+    """Convert proto map/list values from a function call into plain Python"""
+    if hasattr(value, "items"):
+        return {key: _to_plain(item) for key, item in value.items()}
+    if not isinstance(value, (str, bytes)) and hasattr(value, "__iter__"):
+        return [_to_plain(item) for item in value]
+    return value
+
+
+class SchoolooAgentTools(ToolHandler):
+    """Tool definitions for Schooloo AI Agent
+
+    Kept as a name for existing callers; every tool now lives in ToolHandler
+    and is declared once in tool_registry.
+    """
+
+
+_model_cache: Dict[Tuple[str, str], Any] = {}
+_model_cache_lock = threading.Lock()
+
+
+def get_model(model_name: str, system_instruction: str = SYSTEM_INSTRUCTION):
+    """Get the shared tool-enabled model for a configuration, creating it once"""
+    key = (model_name, system_instruction)
+    model = _model_cache.get(key)
+    if model is None:
+        with _model_cache_lock:
+            model = _model_cache.get(key)
+            if model is None:
+                model = generative_model(
+                    model_name=model_name,
+                    tools=TOOL_SCHEMAS,
+                    system_instruction=system_instruction
+                )
+                _model_cache[key] = model
+    return model
 
 
 class SchoolooAgent:
@@ -196,6 +85,8 @@ class SchoolooAgent:
         self.tools = SchoolooAgentTools()
         self.api_key = api_key or os.getenv('API_KEY') or os.getenv('GOOGLE_API_KEY')
         self.model_name = os.getenv('AGENT_MODEL', 'gemini-1.5-pro')
+        # Usage of every model step is accounted to this agent's conversation
+        self.session_id = f"agent-{id(self):x}"
         
         if self.api_key:
             genai.configure(api_key=self.api_key)
@@ -204,216 +95,106 @@ class SchoolooAgent:
             print("⚠️ Warning: No API key found. Set API_KEY or GOOGLE_API_KEY environment variable")
     
     def get_tools_schema(self) -> list:
-        """Get the schema of available tools"""
-        return [
-            {
-                "name": "search_schools",
-                "description": "Search schools by location",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "location": {
-                            "type": "string",
-                            "description": "Location to search schools in"
-                        },
-                        "radius_km": {
-                            "type": "number",
-                            "description": "Radius in kilometers (optional)"
-                        }
-                    },
-                    "required": ["location"]
-                }
-            },
-            {
-                "name": "get_nearby_schools",
-                "description": "Find schools near a GPS location",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "latitude": {"type": "number"},
-                        "longitude": {"type": "number"},
-                        "radius_km": {"type": "number"}
-                    },
-                    "required": ["latitude", "longitude"]
-                }
-            },
-            {
-                "name": "get_school_details",
-                "description": "Get detailed information about a specific school",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "school_id": {"type": "string"}
-                    },
-                    "required": ["school_id"]
-                }
-            },
-            {
-                "name": "get_fee_structure",
-                "description": "Get fee structure of a school",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "school_id": {"type": "string"}
-                    },
-                    "required": ["school_id"]
-                }
-            },
-            {
-                "name": "compare_schools",
-                "description": "Compare multiple schools",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "school_ids": {
-                            "type": "array",
-                            "items": {"type": "string"},
-                            "description": "List of school IDs to compare"
-                        }
-                    },
-                    "required": ["school_ids"]
-                }
-            },
-            {
-                "name": "get_admission_info",
-                "description": "Get admission information for a school",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "school_id": {"type": "string"}
-                    },
-                    "required": ["school_id"]
-                }
-            },
-            {
-                "name": "get_required_documents",
-                "description": "Get required documents for admission to a school",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "school_id": {"type": "string"}
-                    },
-                    "required": ["school_id"]
-                }
-            },
-            {
-                "name": "get_exam_pattern",
-                "description": "Get entrance exam pattern for a school",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "school_id": {"type": "string"}
-                    },
-                    "required": ["school_id"]
-                }
-            },
-            {
-                "name": "get_eligibility_criteria",
-                "description": "Get eligibility criteria for admission",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "school_id": {"type": "string"}
-                    },
-                    "required": ["school_id"]
-                }
-            },
-            {
-                "name": "get_faqs",
-                "description": "Get frequently asked questions",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "category": {
-                            "type": "string",
-                            "description": "Category: parent, student, or general"
-                        }
-                    }
-                }
-            },
-            {
-                "name": "add_faq",
-                "description": "Add a new FAQ",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "question": {"type": "string"},
-                        "answer": {"type": "string"},
-                        "category": {"type": "string"},
-                        "school_id": {"type": "string"}
-                    },
-                    "required": ["question", "answer", "category"]
-                }
-            },
-            {
-                "name": "capture_lead",
-                "description": "Capture a new lead/inquiry",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "name": {"type": "string"},
-                        "email": {"type": "string"},
-                        "phone": {"type": "string"},
-                        "school_interested": {"type": "string"},
-                        "query_type": {"type": "string"},
-                        "query_text": {"type": "string"}
-                    },
-                    "required": ["name", "email", "phone", "school_interested", "query_type", "query_text"]
-                }
-            },
-            {
-                "name": "get_all_leads",
-                "description": "Get all captured leads (admin)",
-                "parameters": {
-                    "type": "object",
-                    "properties": {}
-                }
-            },
-            {
-                "name": "update_lead_status",
-                "description": "Update lead status",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "lead_id": {"type": "string"},
-                        "status": {"type": "string"}
-                    },
-                    "required": ["lead_id", "status"]
-                }
-            }
-        ]
+        """Get the schema of available tools (shared, do not mutate)"""
+        return TOOL_SCHEMAS
     
     def process_tool_call(self, tool_name: str, tool_input: dict) -> str:
         """Process a tool call and return the result"""
-        tool_method = getattr(self.tools, tool_name, None)
-        
-        if not tool_method:
+        if tool_name not in TOOLS_BY_NAME:
             return json.dumps({"error": f"Tool {tool_name} not found"})
         
-        try:
-            result = tool_method(**tool_input)
-            return json.dumps(result)
-        except Exception as e:
-            return json.dumps({"error": f"Error executing {tool_name}: {str(e)}"})
+        return ToolHandler.execute_tool(tool_name, tool_input)
+    
+    def process_tool_calls(self, calls: List[Tuple[str, Dict[str, Any]]]) -> List[str]:
+        """Process the tool calls of one model turn, batched into one backend request"""
+        known = [call for call in calls if call[0] in TOOLS_BY_NAME]
+        results = iter(ToolHandler.execute_tools(known))
+        return [next(results) if name in TOOLS_BY_NAME else self.process_tool_call(name, args)
+                for name, args in calls]
+    
+    def _function_calls(self, response) -> List[Tuple[str, Dict[str, Any]]]:
+        """Extract (tool name, arguments) pairs from a model response"""
+        calls = []
+        for candidate in getattr(response, "candidates", None) or []:
+            for part in candidate.content.parts:
+                function_call = getattr(part, "function_call", None)
+                if function_call and function_call.name:
+                    calls.append((function_call.name, _to_plain(function_call.args)))
+            break
+        return calls
+    
+    def _run_tool_calls(self, calls: List[Tuple[str, Dict[str, Any]]], deadline: float) -> List[Any]:
+        """Run the tool calls from one model turn as one batch, bounded by the deadline"""
+        executor = ThreadPoolExecutor(max_workers=1)
+        # Pool threads start with an empty context; carry the turn's trace into them
+        future = executor.submit(propagate(self.process_tool_calls), calls)
+        wait([future], timeout=max(0.0, deadline - time.monotonic()))
+        executor.shutdown(wait=False, cancel_futures=True)
+        
+        if future.done() and not future.cancelled():
+            return [json.loads(result) for result in future.result()]
+        return [{"error": f"Tool {name} timed out"} for name, _ in calls]
+    
+    def _function_responses(self, calls: List[Tuple[str, Dict[str, Any]]], results: List[Any]) -> dict:
+        """Build the user turn that feeds tool results back to the model"""
+        return {
+            "role": "user",
+            "parts": [
+                genai.protos.Part(function_response=genai.protos.FunctionResponse(
+                    name=name, response={"result": result}
+                ))
+                for (name, _), result in zip(calls, results)
+            ]
+        }
     
     def chat(self, user_message: str) -> str:
-        """Chat with the agent"""
+        """Chat with the agent, running the tools the model asks for until it answers"""
+        with span("agent.chat", session_id=self.session_id):
+            return self._chat(user_message)
+    
+    def _chat(self, user_message: str) -> str:
         try:
-            model = genai.GenerativeModel(
-                model_name=self.model_name,
-                tools=self.get_tools_schema()
-            )
+            model = get_model(self.model_name)
+            generation_config = {
+                "temperature": 0.7,
+                "top_p": 0.95,
+                "max_output_tokens": 2048,
+            }
+            deadline = time.monotonic() + CHAT_DEADLINE_SECONDS
+            contents = [{"role": "user", "parts": [user_message]}]
             
-            response = model.generate_content(
-                user_message,
-                generation_config={
-                    "temperature": 0.7,
-                    "top_p": 0.95,
-                    "max_output_tokens": 2048,
-                }
-            )
+            for step in range(MAX_TOOL_STEPS + 1):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return TIMEOUT_REPLY
+                
+                # Out of tool steps: ask for a final answer from what we have
+                extra = {}
+                if step == MAX_TOOL_STEPS:
+                    extra["tool_config"] = {"function_calling_config": {"mode": "NONE"}}
+                
+                started = time.perf_counter()
+                with span("gemini.generate_content", model=self.model_name, step=step):
+                    response = model.generate_content(
+                        contents,
+                        generation_config=generation_config,
+                        request_options={"timeout": remaining},
+                        **extra
+                    )
+                get_tracker().record_response(response, "agent.chat", self.model_name,
+                                              (time.perf_counter() - started) * 1000,
+                                              contents=contents, session_id=self.session_id)
+                
+                calls = self._function_calls(response)
+                if not calls:
+                    return response.text
+                
+                contents.append(response.candidates[0].content)
+                with span("agent.tools", calls=len(calls)):
+                    results = self._run_tool_calls(calls, deadline)
+                contents.append(self._function_responses(calls, results))
             
-            return response.text
+            return TIMEOUT_REPLY
         except Exception as e:
             return f"Error: {str(e)}"
 
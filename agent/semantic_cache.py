@@ -0,0 +1,280 @@
+"""Semantic similarity cache for chat answers
+
+Queries are embedded locally (no network) as hashed character n-gram
+vectors over the normalized message, indexed with random-hyperplane LSH,
+and served from cache when the cosine similarity of the best candidate is
+above a tunable threshold. Numbers, cities, boards, school gender, school
+and area names, negations ("without hostel") and rankings ("best" vs
+"worst", "cheap" vs "expensive") must match exactly, so "CBSE schools in
+Delhi under 2 lakh" never answers "... under 5 lakh".
+"""
+import math
+import random
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+from response_cache import CITY_ALIASES, normalize_message
+
+# Filler words that carry no meaning for a school search
+STOPWORDS = frozenset("""
+a an the in at of for to on me my i we our you your is are was be can could would should
+please which what whats where who how do does tell show list find give some any good nice
+with near around about there that this it and or""".split())
+
+# Tokens that change the answer completely when they differ
+KNOWN_CITIES = frozenset({
+    "delhi", "mumbai", "bangalore", "hyderabad", "kolkata", "chennai", "pune", "ahmedabad",
+    "jaipur", "lucknow", "indore", "surat", "nagpur", "chandigarh", "kochi", "bhopal",
+    "gurgaon", "noida", "prayagraj", "varanasi", "kanpur", "patna", "dehradun", "agra",
+    "vadodara", "mysore", "visakhapatnam", "coimbatore", "thiruvananthapuram", "bhubaneswar",
+    "ranchi", "raipur", "guwahati", "shimla", "puducherry", "ludhiana", "amritsar", "meerut",
+}) | frozenset(CITY_ALIASES.values())
+BOARDS = frozenset({"cbse", "icse", "isc", "ib", "igcse", "state", "cambridge"})
+GENDERS = frozenset({"girls", "boys", "coed", "co"})
+KNOWN_SCHOOLS = frozenset({
+    "dps", "greenfield", "kendriya", "kv", "navodaya", "jnv", "dav", "ryan", "amity", "podar",
+    "vibgyor", "doon", "mayo", "sanskriti", "pathways", "bosco", "martiniere", "xavier", "xaviers",
+})
+KNOWN_AREAS = frozenset({
+    "rohini", "dwarka", "saket", "vasant", "janakpuri", "pitampura", "mayur", "lajpat", "karol",
+    "koramangala", "whitefield", "indiranagar", "jayanagar", "hsr", "hebbal", "yelahanka",
+    "andheri", "bandra", "powai", "juhu", "borivali", "thane", "kothrud", "hinjewadi", "baner",
+    "gachibowli", "banjara", "kondapur", "adyar", "velachery", "gomti", "aliganj", "civil", "cantt",
+})
+EXACT_TOKENS = KNOWN_CITIES | BOARDS | GENDERS | KNOWN_SCHOOLS | KNOWN_AREAS
+
+# Words that flip or rank the answer, folded to one token per meaning
+NEGATIONS = frozenset({"not", "no", "without", "never", "nor", "except", "excluding"})
+POLARITY = {
+    **{word: "not" for word in NEGATIONS}, "best": "best", "worst": "worst", "bad": "worst", "poor": "worst",
+    "cheap": "cheap", "cheapest": "cheap", "affordable": "cheap", "budget": "cheap", "low": "cheap",
+    "lowest": "cheap", "expensive": "expensive", "costly": "expensive", "costliest": "expensive",
+    "premium": "expensive", "luxury": "expensive",
+}
+
+# Capitalized words that are already covered (as a city) or are just filler
+_NOT_PROPER = STOPWORDS | KNOWN_CITIES | frozenset(w for alias in CITY_ALIASES for w in alias.split())
+_CONTRACTED_NOT = re.compile(r"n['’]t\b", re.IGNORECASE)
+
+Vector = Dict[int, float]
+
+
+def _content_tokens(text: str) -> List[str]:
+    """Normalized tokens without filler words"""
+    return [t for t in normalize_message(text).split() if t not in STOPWORDS]
+
+
+def _proper_nouns(text: str) -> List[str]:
+    """Capitalized words that do not start a sentence (school and area names), normalized"""
+    nouns, sentence_start = [], True
+    for word in text.split():
+        if not sentence_start and word[:1].isupper():
+            nouns.extend(t for t in normalize_message(word).split() if t not in _NOT_PROPER)
+        sentence_start = word.endswith((".", "!", "?"))
+    return nouns
+
+
+def negated(text: str) -> bool:
+    """Whether the message negates what it asks about ("not", "without", "don't")"""
+    return any(t in NEGATIONS for t in normalize_message(_CONTRACTED_NOT.sub(" not", text)).split())
+
+
+def entity_signature(text: str) -> FrozenSet[str]:
+    """Numbers, places, boards, genders, school names and polarity words that must match
+    for a cached answer to apply"""
+    text = _CONTRACTED_NOT.sub(" not", text)
+    signature = {
+        POLARITY.get(t, t) for t in normalize_message(text).split()
+        if t in EXACT_TOKENS or t in POLARITY or any(ch.isdigit() for ch in t)
+    }
+    signature.update(_proper_nouns(text))
+    return frozenset(signature)
+
+
+def embed(text: str, dim: int = 512, ngram_range: Tuple[int, int] = (3, 4)) -> Vector:
+    """Hashed character n-gram embedding, L2-normalized, as a sparse vector"""
+    vector: Vector = {}
+    for token in _content_tokens(text):
+        padded = f"<{token}>"
+        features = [f"w:{token}"]
+        for n in range(ngram_range[0], ngram_range[1] + 1):
+            features.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+        for feature in features:
+            h = zlib.crc32(feature.encode("utf-8"))
+            index = h % dim
+            sign = 1.0 if (h >> 31) & 1 else -1.0
+            vector[index] = vector.get(index, 0.0) + sign
+    norm = math.sqrt(sum(v * v for v in vector.values()))
+    if not norm:
+        return {}
+    return {i: v / norm for i, v in vector.items() if v}
+
+
+def cosine(a: Vector, b: Vector) -> float:
+    """Cosine similarity of two L2-normalized sparse vectors"""
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(i, 0.0) for i, v in a.items())
+
+
+class SemanticCache:
+    """Approximate-nearest-neighbour answer cache using random-hyperplane LSH"""
+
+    def __init__(self, threshold: float = 0.8, max_entries: int = 5000, ttl_seconds: float = 6 * 3600,
+                 dim: int = 512, tables: int = 12, bits: int = 6, seed: int = 7):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.dim = dim
+        self.tables = tables
+        self.bits = bits
+        self.seed = seed
+        # Hyperplanes are drawn on first use: ~40k gaussians would dominate a cold start
+        self._planes: Optional[List[List[List[float]]]] = None
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._buckets: List[Dict[Tuple[str, int], set]] = [{} for _ in range(tables)]
+        self._next_id = 0
+        self._hits = 0
+        self._misses = 0
+        self._hit_similarity = 0.0
+
+    def _hyperplanes(self) -> List[List[List[float]]]:
+        """The LSH hyperplanes, drawn from the seed on first use"""
+        if self._planes is None:
+            rng = random.Random(self.seed)
+            planes = [
+                [[rng.gauss(0, 1) for _ in range(self.dim)] for _ in range(self.bits)]
+                for _ in range(self.tables)
+            ]
+            with self._lock:
+                if self._planes is None:
+                    self._planes = planes
+        return self._planes
+
+    def _signatures(self, vector: Vector) -> List[int]:
+        """One LSH bucket signature per table"""
+        signatures = []
+        for planes in self._hyperplanes():
+            signature = 0
+            for bit, plane in enumerate(planes):
+                if sum(v * plane[i] for i, v in vector.items()) >= 0:
+                    signature |= 1 << bit
+            signatures.append(signature)
+        return signatures
+
+    def _remove(self, entry_id: int):
+        """Drop an entry and its bucket memberships (lock held)"""
+        _, namespace, _, _, signatures, _ = self._entries.pop(entry_id)
+        for table, signature in enumerate(signatures):
+            bucket = self._buckets[table].get((namespace, signature))
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self._buckets[table][(namespace, signature)]
+
+    def lookup(self, text: str, namespace: str = "") -> Optional[Tuple[Any, float]]:
+        """Return (value, similarity) for the closest cached query above the threshold"""
+        vector = embed(text, self.dim)
+        if not vector:
+            return None
+        entities = entity_signature(text)
+        signatures = self._signatures(vector)
+        now = time.monotonic()
+
+        with self._lock:
+            candidates = set()
+            for table, signature in enumerate(signatures):
+                candidates |= self._buckets[table].get((namespace, signature), set())
+
+            best_id, best_similarity = None, -1.0
+            for entry_id in candidates:
+                expires_at, _, entry_vector, entry_entities, _, _ = self._entries[entry_id]
+                if expires_at <= now:
+                    self._remove(entry_id)
+                    continue
+                if entry_entities != entities:
+                    continue
+                similarity = cosine(vector, entry_vector)
+                if similarity > best_similarity:
+                    best_id, best_similarity = entry_id, similarity
+
+            if best_id is None or best_similarity < self.threshold:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(best_id)
+            self._hits += 1
+            self._hit_similarity += best_similarity
+            return self._entries[best_id][5], best_similarity
+
+    def add(self, text: str, value: Any, namespace: str = ""):
+        """Cache an answer for a query"""
+        vector = embed(text, self.dim)
+        if not vector or self.max_entries <= 0:
+            return
+        entry = (
+            time.monotonic() + self.ttl_seconds, namespace, vector,
+            entity_signature(text), self._signatures(vector), value
+        )
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = entry
+            for table, signature in enumerate(entry[4]):
+                self._buckets[table].setdefault((namespace, signature), set()).add(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+            self._buckets = [{} for _ in range(self.tables)]
+
+    def export_state(self) -> Dict[str, Any]:
+        """Live entries (with seconds left to live) and the hyperplanes, for a warm snapshot"""
+        now = time.monotonic()
+        with self._lock:
+            entries = [(expires_at - now, *rest) for expires_at, *rest in self._entries.values()
+                       if expires_at > now]
+            return {
+                "params": (self.dim, self.tables, self.bits, self.seed),
+                "planes": self._planes,
+                "entries": entries,
+            }
+
+    def load_state(self, state: Dict[str, Any], age_seconds: float = 0.0):
+        """Restore export_state() output taken age_seconds ago; ignored if the LSH parameters differ"""
+        if state.get("params") != (self.dim, self.tables, self.bits, self.seed):
+            return
+        now = time.monotonic()
+        with self._lock:
+            if self._planes is None and state.get("planes") is not None:
+                self._planes = state["planes"]
+            for ttl, namespace, vector, entities, signatures, value in state.get("entries", []):
+                if ttl - age_seconds <= 0:
+                    continue
+                entry_id = self._next_id
+                self._next_id += 1
+                self._entries[entry_id] = (now + ttl - age_seconds, namespace, vector, entities, signatures, value)
+                for table, signature in enumerate(signatures):
+                    self._buckets[table].setdefault((namespace, signature), set()).add(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def stats(self) -> Dict[str, Any]:
+        """Size and hit-rate counters"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "threshold": self.threshold,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "mean_hit_similarity": round(self._hit_similarity / self._hits, 4) if self._hits else 0.0,
+            }
@@ -0,0 +1,290 @@
+"""Per-session conversation store with memory caps and eviction
+
+Each chat session id maps to its own ConversationHistory. Sessions are
+kept in LRU order and expire after a period of inactivity; every session is
+compacted to a per-session byte cap and the store as a whole to a global
+one. Sessions pushed out by the caps can be spilled to disk and are
+restored transparently on their next request.
+
+Spill files are named by a hash of the session id and stamped with the
+session's last use, so a restarted process picks up (or expires) the files
+an earlier one left. File IO never runs under the store-wide lock; updates
+to one session are serialized by a lock stripe picked by its id, and a
+failed spill write is counted rather than failing the request.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from history import ConversationHistory
+
+LOCK_STRIPES = 64
+
+
+def _digest(session_id: str) -> str:
+    """Spill file stem of a session"""
+    return hashlib.sha256(session_id.encode("utf-8")).hexdigest()
+
+
+class SessionStore:
+    """LRU/TTL store of conversation histories bounded in bytes"""
+
+    def __init__(self, max_sessions: int = 10000, ttl_seconds: float = 1800,
+                 max_session_bytes: int = 64 * 1024, max_total_bytes: int = 64 * 1024 * 1024,
+                 spill_dir: Optional[str] = None,
+                 history_factory: Callable[[], ConversationHistory] = ConversationHistory):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_session_bytes = max_session_bytes
+        self.max_total_bytes = max_total_bytes
+        self.spill_dir = spill_dir
+        self.history_factory = history_factory
+        self._lock = threading.Lock()
+        self._stripes = [threading.RLock() for _ in range(LOCK_STRIPES)]
+        # session id -> (last_used, size_bytes, history)
+        self._sessions: "OrderedDict[str, tuple]" = OrderedDict()
+        self._total_bytes = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._spills = 0
+        self._spill_failures = 0
+        self._restores = 0
+        # spill file digest -> last_used, oldest first
+        self._spilled: "OrderedDict[str, float]" = OrderedDict()
+        # evicted sessions waiting for their file to be written: digest -> (session_id, last_used, history)
+        self._spilling: Dict[str, tuple] = {}
+        # IO decided under the lock, done after it is released
+        self._to_spill: List[str] = []
+        self._to_delete: List[str] = []
+        if spill_dir:
+            self._index_spill_dir()
+
+    def _index_spill_dir(self):
+        """Index spill files left by an earlier process, deleting expired ones"""
+        try:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            names = os.listdir(self.spill_dir)
+        except OSError:
+            return  # every spill will fail and be counted
+        now = time.time()
+        found = []
+        for name in names:
+            path = os.path.join(self.spill_dir, name)
+            try:
+                if name.endswith(".tmp"):
+                    os.remove(path)  # a write cut short
+                elif name.endswith(".json"):
+                    last_used = os.path.getmtime(path)
+                    if now - last_used >= self.ttl_seconds:
+                        os.remove(path)
+                        self._expirations += 1
+                    else:
+                        found.append((last_used, name[:-len(".json")]))
+            except OSError:
+                pass
+        for last_used, digest in sorted(found):
+            self._spilled[digest] = last_used
+
+    def _spill_path(self, digest: str) -> str:
+        """File a spilled session lives in"""
+        return os.path.join(self.spill_dir, f"{digest}.json")
+
+    @contextmanager
+    def _session_lock(self, session_id: str):
+        """Serialize updates to one session"""
+        stripe = self._stripes[int(_digest(session_id)[:8], 16) % LOCK_STRIPES]
+        with stripe:
+            yield
+
+    def _insert(self, session_id: str, history: ConversationHistory, size: int, now: float):
+        """Put a session at the most recent end and enforce the caps (lock held)"""
+        if session_id in self._sessions:
+            self._total_bytes -= self._sessions.pop(session_id)[1]
+        self._sessions[session_id] = (now, size, history)
+        self._total_bytes += size
+        self._expire(now)
+        while len(self._sessions) > 1 and (
+            len(self._sessions) > self.max_sessions or self._total_bytes > self.max_total_bytes
+        ):
+            self._drop(next(iter(self._sessions)), spill=True)
+            self._evictions += 1
+
+    def _drop(self, session_id: str, spill: bool):
+        """Remove a session from memory, queueing it to be spilled if enabled (lock held)"""
+        last_used, size, history = self._sessions.pop(session_id)
+        self._total_bytes -= size
+        if spill and self.spill_dir:
+            self._spilling[_digest(session_id)] = (session_id, last_used, history)
+            self._to_spill.append(session_id)
+
+    def _forget_spill(self, digest: str):
+        """Unindex a spilled session and queue its file for deletion (lock held)"""
+        self._spilled.pop(digest, None)
+        self._to_delete.append(self._spill_path(digest))
+
+    def _expire(self, now: float):
+        """Drop sessions idle for longer than the TTL, in memory and on disk (lock held)"""
+        while self._sessions:
+            session_id, (last_used, _, _) = next(iter(self._sessions.items()))
+            if now - last_used < self.ttl_seconds:
+                break
+            self._drop(session_id, spill=False)
+            self._expirations += 1
+        while self._spilled:
+            digest, last_used = next(iter(self._spilled.items()))
+            if now - last_used < self.ttl_seconds:
+                break
+            self._forget_spill(digest)
+            self._expirations += 1
+
+    def _take_io(self) -> Tuple[List[str], List[str]]:
+        """Sessions to spill and files to delete, decided so far (lock held)"""
+        to_spill, to_delete = self._to_spill, self._to_delete
+        self._to_spill, self._to_delete = [], []
+        return to_spill, to_delete
+
+    def _do_io(self, io: Tuple[List[str], List[str]]):
+        """Write and delete spill files, outside the store lock"""
+        to_spill, to_delete = io
+        for path in to_delete:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        for session_id in to_spill:
+            self._write_spill(session_id)
+
+    def _write_spill(self, session_id: str):
+        """Write one evicted session to disk, unless it was requested again meanwhile"""
+        digest = _digest(session_id)
+        with self._session_lock(session_id):
+            with self._lock:
+                pending = self._spilling.get(digest)
+            if pending is None:
+                return
+            _, last_used, history = pending
+            path = self._spill_path(digest)
+            try:
+                with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+                    json.dump(history.to_dict(), f, ensure_ascii=False)
+                os.replace(f"{path}.tmp", path)
+                os.utime(path, (last_used, last_used))
+                written = True
+            except OSError:
+                written = False
+            with self._lock:
+                self._spilling.pop(digest, None)
+                if written:
+                    self._spilled[digest] = last_used
+                    self._spilled.move_to_end(digest)
+                    self._spills += 1
+                else:
+                    self._spill_failures += 1
+
+    def _read_spill(self, digest: str) -> Optional[ConversationHistory]:
+        """Load and delete a spilled session's file"""
+        path = self._spill_path(digest)
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = None
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        if data is None:
+            return None
+        history = self.history_factory()
+        history.messages = list(data.get("messages", []))
+        history.summary_lines = list(data.get("summary_lines", []))
+        history.folded_turns = data.get("folded_turns", 0)
+        return history
+
+    def get(self, session_id: str) -> ConversationHistory:
+        """History for a session, restored from disk or newly created"""
+        digest = _digest(session_id)
+        history = None
+        with self._session_lock(session_id):
+            now = time.time()
+            with self._lock:
+                self._expire(now)
+                entry = self._sessions.get(session_id)
+                pending = self._spilling.pop(digest, None)
+                if entry is not None:
+                    self._sessions.move_to_end(session_id)
+                    history = entry[2]
+                elif pending is not None:
+                    # Evicted but not yet written: take it straight back
+                    history = pending[2]
+                    self._insert(session_id, history, history.size_bytes(), now)
+                spilled = history is None and self._spilled.pop(digest, None) is not None
+                io = self._take_io()
+            restored_io = ([], [])
+            if spilled:
+                history = self._read_spill(digest)
+                if history is not None:
+                    with self._lock:
+                        self._insert(session_id, history, history.size_bytes(), time.time())
+                        self._restores += 1
+                        restored_io = self._take_io()
+        self._do_io(io)
+        self._do_io(restored_io)
+        return history if history is not None else self.history_factory()
+
+    def append(self, session_id: str, history: ConversationHistory, *messages: Tuple[str, str]):
+        """Add (role, text) messages to a session's history and store it, one update per session at a time"""
+        with self._session_lock(session_id):
+            for role, text in messages:
+                history.add(role, text)
+            size = history.compact(self.max_session_bytes)
+            with self._lock:
+                self._insert(session_id, history, size, time.time())
+                io = self._take_io()
+        self._do_io(io)
+
+    def save(self, session_id: str, history: ConversationHistory):
+        """Store a session's history, enforcing the per-session and global caps"""
+        self.append(session_id, history)
+
+    def delete(self, session_id: str) -> bool:
+        """Forget a session in memory and on disk"""
+        digest = _digest(session_id)
+        with self._session_lock(session_id):
+            with self._lock:
+                removed = session_id in self._sessions or digest in self._spilled or digest in self._spilling
+                if session_id in self._sessions:
+                    self._drop(session_id, spill=False)
+                self._spilling.pop(digest, None)
+                if digest in self._spilled:
+                    self._forget_spill(digest)
+                io = self._take_io()
+        self._do_io(io)
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """Memory usage and eviction counters"""
+        with self._lock:
+            self._expire(time.time())
+            io = self._take_io()
+            stats = {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "bytes": self._total_bytes,
+                "max_total_bytes": self.max_total_bytes,
+                "max_session_bytes": self.max_session_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "spills": self._spills,
+                "spill_failures": self._spill_failures,
+                "restores": self._restores,
+                "spilled_sessions": len(self._spilled) + len(self._spilling),
+            }
+        self._do_io(io)
+        return stats
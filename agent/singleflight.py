@@ -0,0 +1,153 @@
+"""Single-flight coalescing of identical in-flight calls
+
+Concurrent callers that ask for the same key share one execution and all
+receive its result (or its exception). Nothing is cached once the call
+finishes - that is the job of the response caches.
+"""
+import asyncio
+import json
+import threading
+from typing import Any, Awaitable, Callable, Dict, Iterable
+
+
+def make_key(name: str, payload: Any = None, text_fields: Iterable[str] = ()) -> str:
+    """Build a coalescing key from a call name and its arguments
+
+    Values of text_fields (free text the callee matches case-insensitively,
+    such as a location) are case-folded and whitespace-collapsed, at any
+    depth; every other value, IDs included, is kept exactly as given.
+    """
+    text_fields = frozenset(text_fields)
+
+    def normalize(value, fold=False):
+        if isinstance(value, str):
+            return " ".join(value.split()).lower() if fold else value
+        if isinstance(value, dict):
+            return {str(k): normalize(v, fold or k in text_fields) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [normalize(v, fold) for v in value]
+        return value
+
+    return f"{name}:{json.dumps(normalize(payload), sort_keys=True, default=str)}"
+
+
+class _Call:
+    """A single in-flight execution shared by every waiter"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Collapse concurrent calls with the same key into one execution"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self._requests = 0
+        self._executions = 0
+        self._collapsed = 0
+
+    def do(self, key: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run fn once for all concurrent callers of key and return its result"""
+        with self._lock:
+            self._requests += 1
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self._collapsed += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self._executions += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result
+
+    def in_flight(self) -> int:
+        """Number of keys currently executing"""
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters describing how many calls were collapsed"""
+        with self._lock:
+            requests = self._requests
+            return {
+                "name": self.name,
+                "requests": requests,
+                "executions": self._executions,
+                "collapsed": self._collapsed,
+                "collapse_ratio": round(self._collapsed / requests, 4) if requests else 0.0,
+                "in_flight": len(self._calls),
+            }
+
+
+class _AsyncCall:
+    """A shared in-flight task and how many callers still wait for it"""
+
+    def __init__(self, task: "asyncio.Task"):
+        self.task = task
+        self.waiters = 1
+
+
+class AsyncSingleFlight(SingleFlight):
+    """SingleFlight for coroutines running on one event loop
+
+    The shared call runs as its own task and every caller, the first one
+    included, awaits it through a shield: a caller that is cancelled (its
+    client disconnected) only stops waiting. The task itself is cancelled
+    once no caller is left waiting for it.
+    """
+
+    def _finished(self, key: str, call: _AsyncCall, task: "asyncio.Task"):
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # waiters re-raise it; don't warn when there are none
+
+    async def do(self, key: str, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """Await fn once for all concurrent callers of key and return its result"""
+        with self._lock:
+            self._requests += 1
+            call = self._calls.get(key)
+            if call is None:
+                call = _AsyncCall(asyncio.ensure_future(fn(*args, **kwargs)))
+                self._calls[key] = call
+                self._executions += 1
+                call.task.add_done_callback(lambda task: self._finished(key, call, task))
+            else:
+                call.waiters += 1
+                self._collapsed += 1
+
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            with self._lock:
+                call.waiters -= 1
+                abandoned = call.waiters == 0 and not call.task.done()
+                if abandoned and self._calls.get(key) is call:
+                    del self._calls[key]  # later callers start afresh instead of joining a cancelled call
+            if abandoned:
+                call.task.cancel()
@@ -0,0 +1,211 @@
+"""Server-sent events streaming for chat replies
+
+Turns an upstream iterator of text chunks into well-formed SSE frames:
+multi-line chunks become multiple data: lines, tiny chunks are coalesced
+into fewer writes, comment heartbeats keep idle connections open, and a
+final "end" event carries timing metadata. The upstream is read on a
+producer thread so heartbeats still go out while the model is thinking, and
+it is cancelled as soon as the client goes away. astream_events does the
+same for async upstreams without a thread.
+"""
+import asyncio
+import json
+import queue
+import threading
+import time
+from typing import AsyncIterable, AsyncIterator, Callable, Iterable, Iterator, List, Optional
+
+_DONE = object()
+
+
+def format_event(data: str, event: Optional[str] = None, event_id: Optional[str] = None) -> str:
+    """Encode one SSE event; every line of data gets its own data: field"""
+    lines = []
+    if event:
+        lines.append(f"event: {event}")
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    text = data.replace("\r\n", "\n").replace("\r", "\n")
+    lines.extend(f"data: {line}" for line in text.split("\n"))
+    return "\n".join(lines) + "\n\n"
+
+
+def format_comment(text: str) -> str:
+    """Encode an SSE comment, ignored by clients"""
+    return "".join(f": {line}\n" for line in text.split("\n")) + "\n"
+
+
+def _produce(upstream: Iterable[str], out: "queue.Queue", cancelled: threading.Event):
+    """Read the upstream on a worker thread until it ends or is cancelled"""
+    iterator = iter(upstream)
+    try:
+        for chunk in iterator:
+            if cancelled.is_set():
+                break
+            if chunk:
+                out.put(chunk)
+    except Exception as e:
+        out.put(e)
+    finally:
+        close = getattr(iterator, "close", None)
+        if cancelled.is_set() and callable(close):
+            close()
+        out.put(_DONE)
+
+
+class _StreamState:
+    """Coalescing buffer and counters shared by the sync and async streamers"""
+
+    def __init__(self, heartbeat_seconds: float, flush_chars: int, flush_seconds: float):
+        self.heartbeat_seconds = heartbeat_seconds
+        self.flush_chars = flush_chars
+        self.flush_seconds = flush_seconds
+        self.started = time.monotonic()
+        self.last_write = self.started
+        self.first_chunk_at = None
+        self.buffer = []
+        self.buffered_chars = 0
+        self.buffered_since = None
+        self.chunks = self.events = self.chars = self.heartbeats = 0
+        self.error = None
+
+    def timeout(self) -> float:
+        """Seconds until the next heartbeat or forced flush is due"""
+        now = time.monotonic()
+        wait = self.last_write + self.heartbeat_seconds - now
+        if self.buffered_since is not None:
+            wait = min(wait, self.buffered_since + self.flush_seconds - now)
+        return max(0.0, wait)
+
+    def add(self, chunk: str) -> Optional[str]:
+        """Buffer a chunk, returning a frame when the buffer is full enough"""
+        now = time.monotonic()
+        self.chunks += 1
+        self.chars += len(chunk)
+        if self.first_chunk_at is None:
+            self.first_chunk_at = now
+        if self.buffered_since is None:
+            self.buffered_since = now
+        self.buffer.append(chunk)
+        self.buffered_chars += len(chunk)
+        return self.flush() if self.buffered_chars >= self.flush_chars else None
+
+    def flush(self) -> Optional[str]:
+        """Frame whatever is buffered"""
+        if not self.buffer:
+            return None
+        frame = format_event("".join(self.buffer))
+        self.buffer, self.buffered_chars, self.buffered_since = [], 0, None
+        self.events += 1
+        self.last_write = time.monotonic()
+        return frame
+
+    def idle(self) -> str:
+        """Frame to send when the timeout passes with nothing new"""
+        frame = self.flush()
+        if frame is None:
+            self.heartbeats += 1
+            self.last_write = time.monotonic()
+            frame = format_comment("keep-alive")
+        return frame
+
+    def finish(self) -> List[str]:
+        """Remaining text, any error, and the end event with timing metadata"""
+        frames = [frame for frame in [self.flush()] if frame]
+        if self.error is not None:
+            frames.append(format_event(json.dumps({"message": str(self.error)}), event="error"))
+        frames.append(format_event(json.dumps({
+            "chunks": self.chunks,
+            "events": self.events,
+            "chars": self.chars,
+            "heartbeats": self.heartbeats,
+            "first_chunk_ms": round((self.first_chunk_at - self.started) * 1000, 1) if self.first_chunk_at else None,
+            "duration_ms": round((time.monotonic() - self.started) * 1000, 1),
+            "error": self.error is not None,
+        }), event="end"))
+        return frames
+
+
+def stream_events(upstream: Iterable[str], cancel: Optional[Callable[[], None]] = None,
+                  heartbeat_seconds: float = 15.0, flush_chars: int = 48,
+                  flush_seconds: float = 0.05) -> Iterator[str]:
+    """Yield SSE frames for an upstream text stream
+
+    Text is flushed once flush_chars characters are buffered or the oldest
+    buffered chunk is flush_seconds old. cancel is called if the consumer
+    closes the generator (client disconnect) before the upstream finishes.
+    """
+    state = _StreamState(heartbeat_seconds, flush_chars, flush_seconds)
+    out: "queue.Queue" = queue.Queue()
+    cancelled = threading.Event()
+    producer = threading.Thread(target=_produce, args=(upstream, out, cancelled), daemon=True)
+    producer.start()
+    finished = False
+
+    try:
+        while True:
+            try:
+                item = out.get(timeout=state.timeout())
+            except queue.Empty:
+                yield state.idle()
+                continue
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                state.error = item
+                continue
+            frame = state.add(item)
+            if frame:
+                yield frame
+
+        finished = True
+        yield from state.finish()
+    finally:
+        if not finished:
+            cancelled.set()
+            if cancel is not None:
+                cancel()
+
+
+async def astream_events(upstream: AsyncIterable[str], heartbeat_seconds: float = 15.0,
+                         flush_chars: int = 48, flush_seconds: float = 0.05) -> AsyncIterator[str]:
+    """Async counterpart of stream_events for async upstreams
+
+    The upstream is consumed by a task; if the consumer stops early the task
+    is cancelled, which cancels the upstream call with it.
+    """
+    state = _StreamState(heartbeat_seconds, flush_chars, flush_seconds)
+    out: "asyncio.Queue" = asyncio.Queue()
+
+    async def produce():
+        try:
+            async for chunk in upstream:
+                if chunk:
+                    out.put_nowait(chunk)
+        except Exception as e:
+            out.put_nowait(e)
+        finally:
+            out.put_nowait(_DONE)
+
+    producer = asyncio.ensure_future(produce())
+    try:
+        while True:
+            try:
+                item = await asyncio.wait_for(out.get(), timeout=state.timeout())
+            except asyncio.TimeoutError:
+                yield state.idle()
+                continue
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                state.error = item
+                continue
+            frame = state.add(item)
+            if frame:
+                yield frame
+
+        for frame in state.finish():
+            yield frame
+    finally:
+        if not producer.done():
+            producer.cancel()
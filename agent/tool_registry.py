@@ -0,0 +1,197 @@
+"""Single registry of Schooloo agent tools
+
+ToolHandler, SchoolooAgentTools and the Gemini function declarations are
+all derived from TOOL_SPECS, so adding a tool means adding one entry here
+and one handler in tools.py.
+"""
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Tuple
+
+
+def _gemini_schema(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert JSON-schema type names ("object") to Gemini's enum names ("OBJECT")"""
+    converted = {}
+    for key, value in schema.items():
+        if key == "type":
+            converted[key] = value.upper()
+        elif key == "properties":
+            converted[key] = {name: _gemini_schema(prop) for name, prop in value.items()}
+        elif key == "items":
+            converted[key] = _gemini_schema(value)
+        else:
+            converted[key] = value
+    return converted
+
+
+SCHOOL_ID = {"type": "object", "properties": {"school_id": {"type": "string"}}, "required": ["school_id"]}
+
+
+@dataclass(frozen=True)
+class ToolSpec:
+    """Declaration of a single tool"""
+    name: str
+    description: str
+    parameters: Dict[str, Any] = field(default_factory=lambda: {"type": "object", "properties": {}})
+    tool_class: str = "lookup"  # lookup, admin
+    writes: bool = False
+
+    def schema(self) -> Dict[str, Any]:
+        """Function declaration in the format Gemini expects"""
+        return {
+            "name": self.name,
+            "description": self.description,
+            "parameters": _gemini_schema(self.parameters)
+        }
+
+
+TOOL_SPECS: Tuple[ToolSpec, ...] = (
+    ToolSpec(
+        name="search_schools",
+        description="Search schools by location",
+        parameters={
+            "type": "object",
+            "properties": {
+                "location": {
+                    "type": "string",
+                    "description": "Location to search schools in"
+                },
+                "radius_km": {
+                    "type": "number",
+                    "description": "Radius in kilometers (optional)"
+                }
+            },
+            "required": ["location"]
+        }
+    ),
+    ToolSpec(
+        name="get_nearby_schools",
+        description="Find schools near a GPS location",
+        parameters={
+            "type": "object",
+            "properties": {
+                "latitude": {"type": "number"},
+                "longitude": {"type": "number"},
+                "radius_km": {"type": "number"}
+            },
+            "required": ["latitude", "longitude"]
+        }
+    ),
+    ToolSpec(
+        name="get_school_details",
+        description="Get detailed information about a specific school",
+        parameters=SCHOOL_ID
+    ),
+    ToolSpec(
+        name="get_fee_structure",
+        description="Get fee structure of a school",
+        parameters=SCHOOL_ID
+    ),
+    ToolSpec(
+        name="compare_schools",
+        description="Compare multiple schools",
+        parameters={
+            "type": "object",
+            "properties": {
+                "school_ids": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "List of school IDs to compare"
+                }
+            },
+            "required": ["school_ids"]
+        }
+    ),
+    ToolSpec(
+        name="get_admission_info",
+        description="Get admission information for a school",
+        parameters=SCHOOL_ID
+    ),
+    ToolSpec(
+        name="get_required_documents",
+        description="Get required documents for admission to a school",
+        parameters=SCHOOL_ID
+    ),
+    ToolSpec(
+        name="get_exam_pattern",
+        description="Get entrance exam pattern for a school",
+        parameters=SCHOOL_ID
+    ),
+    ToolSpec(
+        name="get_eligibility_criteria",
+        description="Get eligibility criteria for admission",
+        parameters=SCHOOL_ID
+    ),
+    ToolSpec(
+        name="get_faqs",
+        description="Get frequently asked questions",
+        parameters={
+            "type": "object",
+            "properties": {
+                "category": {
+                    "type": "string",
+                    "description": "Category: parent, student, or general"
+                }
+            }
+        }
+    ),
+    ToolSpec(
+        name="add_faq",
+        description="Add a new FAQ",
+        parameters={
+            "type": "object",
+            "properties": {
+                "question": {"type": "string"},
+                "answer": {"type": "string"},
+                "category": {"type": "string"},
+                "school_id": {"type": "string"}
+            },
+            "required": ["question", "answer", "category"]
+        },
+        tool_class="admin",
+        writes=True
+    ),
+    ToolSpec(
+        name="capture_lead",
+        description="Capture a new lead/inquiry",
+        parameters={
+            "type": "object",
+            "properties": {
+                "name": {"type": "string"},
+                "email": {"type": "string"},
+                "phone": {"type": "string"},
+                "school_interested": {"type": "string"},
+                "query_type": {"type": "string"},
+                "query_text": {"type": "string"}
+            },
+            "required": ["name", "email", "phone", "school_interested", "query_type", "query_text"]
+        },
+        writes=True
+    ),
+    ToolSpec(
+        name="get_all_leads",
+        description="Get all captured leads (admin)",
+        tool_class="admin"
+    ),
+    ToolSpec(
+        name="update_lead_status",
+        description="Update lead status",
+        parameters={
+            "type": "object",
+            "properties": {
+                "lead_id": {"type": "string"},
+                "status": {"type": "string"}
+            },
+            "required": ["lead_id", "status"]
+        },
+        tool_class="admin",
+        writes=True
+    ),
+)
+
+TOOLS_BY_NAME: Dict[str, ToolSpec] = {spec.name: spec for spec in TOOL_SPECS}
+
+# Built once at import and shared by every model instance
+TOOL_SCHEMAS: List[Dict[str, Any]] = [spec.schema() for spec in TOOL_SPECS]
+
+WRITE_TOOLS = frozenset(spec.name for spec in TOOL_SPECS if spec.writes)
+ADMIN_TOOLS = frozenset(spec.name for spec in TOOL_SPECS if spec.tool_class == "admin")
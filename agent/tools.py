@@ -2,60 +2,289 @@
 import json
 import requests
 import os
-from typing import Dict, Any, List, Optional
+import sys
+import time
+from typing import Dict, Any, List, Optional, Tuple
+from requests.exceptions import ConnectionError as RequestsConnectionError
+from urllib3.exceptions import ConnectTimeoutError
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from singleflight import SingleFlight, make_key
+from resilience import (
+    BreakerRegistry, Bulkhead, BulkheadFullError, CircuitOpenError, retry_call
+)
+# Tools that change backend state must never share an execution or be retried.
+# Admin tools get their own concurrency pool so they cannot starve parent lookups.
+from tool_registry import ADMIN_TOOLS, TOOL_SPECS, WRITE_TOOLS
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+from metrics import REGISTRY
+from tracing import inject, span
 
 BACKEND_URL = os.getenv('BACKEND_URL', 'http://localhost:5000/api')
 
+# Per-attempt timeouts in seconds; slow list endpoints get a little more room
+TOOL_TIMEOUT_SECONDS = float(os.getenv('TOOL_TIMEOUT_SECONDS', 5))
+TOOL_TIMEOUTS = {
+    "search_schools": 8.0,
+    "compare_schools": 8.0,
+    "get_all_leads": 10.0,
+}
+TOOL_DEADLINE_SECONDS = float(os.getenv('TOOL_DEADLINE_SECONDS', 12))
+TOOL_RETRY_ATTEMPTS = int(os.getenv('TOOL_RETRY_ATTEMPTS', 3))
+
+RETRYABLE_STATUSES = {502, 503, 504}
+
+
+class BackendUnavailableError(Exception):
+    """Raised for backend responses that are worth retrying"""
+
+
+RETRYABLE_ERRORS = (requests.Timeout, requests.ConnectionError, BackendUnavailableError)
+
+# Batch responses meaning the backend has no /batch route (an older backend)
+BATCH_UNSUPPORTED_STATUSES = {404, 405}
+
+
+class BatchUnsupportedError(Exception):
+    """Raised when the backend rejected /batch without running any operation"""
+
+
+def _never_sent(error: Exception) -> bool:
+    """Whether a failed request certainly did not reach the backend"""
+    if isinstance(error, (BatchUnsupportedError, CircuitOpenError, BulkheadFullError)):
+        return True
+    # Connection refused or connect timeout: urllib3 gave up before sending anything
+    if not isinstance(error, RequestsConnectionError) or not error.args:
+        return False
+    return isinstance(getattr(error.args[0], "reason", None), ConnectTimeoutError)
+
+# Concurrent identical read-only tool calls share one backend request
+tool_flight = SingleFlight("tools")
+
+# Arguments the backend matches case-insensitively; IDs and categories are exact
+CASE_INSENSITIVE_ARGS = ("location",)
+
+# Wall time of each tool call as the agent sees it (retries included); 'batch' for batched calls
+TOOL_LATENCY = REGISTRY.histogram('schooloo_tool_call_seconds', 'Agent tool call latency by tool and outcome',
+                                  ['tool', 'outcome'])
+
+breakers = BreakerRegistry(
+    failure_threshold=int(os.getenv('TOOL_BREAKER_FAILURES', 5)),
+    reset_timeout=float(os.getenv('TOOL_BREAKER_RESET_SECONDS', 30))
+)
+bulkheads = {
+    "lookup": Bulkhead("lookup", int(os.getenv('TOOL_LOOKUP_CONCURRENCY', 16))),
+    "admin": Bulkhead("admin", int(os.getenv('TOOL_ADMIN_CONCURRENCY', 4))),
+}
+
+BREAKER_STATES = ("closed", "open", "half_open")
+
+
+def tool_metrics():
+    """Breaker, bulkhead and coalescing state for /metrics, read at scrape time"""
+    routes = breakers.snapshot()
+    pools = {name: b.snapshot() for name, b in bulkheads.items()}
+    flight = tool_flight.stats()
+    yield ('schooloo_tool_breaker_state', 'gauge', 'Circuit breaker state by backend route (1 for the current state)', [
+        ({'route': route, 'state': state}, int(b['state'] == state))
+        for route, b in routes.items() for state in BREAKER_STATES
+    ])
+    yield ('schooloo_tool_breaker_opened_total', 'counter', 'Times each route breaker opened', [
+        ({'route': route}, b['times_opened']) for route, b in routes.items()
+    ])
+    yield ('schooloo_tool_breaker_rejected_total', 'counter', 'Calls failed fast by an open breaker', [
+        ({'route': route}, b['rejected']) for route, b in routes.items()
+    ])
+    yield ('schooloo_tool_bulkhead_active', 'gauge', 'Tool calls holding a bulkhead slot', [
+        ({'pool': name}, b['active']) for name, b in pools.items()
+    ])
+    yield ('schooloo_tool_bulkhead_limit', 'gauge', 'Bulkhead size', [
+        ({'pool': name}, b['limit']) for name, b in pools.items()
+    ])
+    yield ('schooloo_tool_bulkhead_rejected_total', 'counter', 'Tool calls rejected by a full bulkhead', [
+        ({'pool': name}, b['rejected']) for name, b in pools.items()
+    ])
+    yield ('schooloo_tool_coalesced_total', 'counter', 'Read-only tool calls by whether they shared an execution', [
+        ({'result': 'executed'}, flight['executions']),
+        ({'result': 'collapsed'}, flight['collapsed']),
+    ])
+
+
+REGISTRY.register_collector('tools', tool_metrics)
+
 class ToolHandler:
     """Handle all tool executions for the agent"""
     
+    _handler_map: Dict[str, Any] = {}
+    
+    @staticmethod
+    def _handlers() -> Dict[str, Any]:
+        """Map registered tool names to their handlers, built on first use"""
+        if not ToolHandler._handler_map:
+            ToolHandler._handler_map = {
+                spec.name: getattr(ToolHandler, spec.name) for spec in TOOL_SPECS
+            }
+        return ToolHandler._handler_map
+    
     @staticmethod
     def execute_tool(tool_name: str, tool_input: Dict[str, Any]) -> str:
         """Execute a tool and return JSON result"""
-        handlers = {
-            "search_schools": ToolHandler.search_schools,
-            "get_school_details": ToolHandler.get_school_details,
-            "get_fee_structure": ToolHandler.get_fee_structure,
-            "compare_schools": ToolHandler.compare_schools,
-            "get_admission_info": ToolHandler.get_admission_info,
-            "get_required_documents": ToolHandler.get_required_documents,
-            "get_exam_pattern": ToolHandler.get_exam_pattern,
-            "get_eligibility_criteria": ToolHandler.get_eligibility_criteria,
-            "get_faqs": ToolHandler.get_faqs,
-            "capture_lead": ToolHandler.capture_lead,
-            "get_all_leads": ToolHandler.get_all_leads,
-            "update_lead_status": ToolHandler.update_lead_status,
-        }
-        
-        handler = handlers.get(tool_name)
+        handler = ToolHandler._handlers().get(tool_name)
         if not handler:
             return json.dumps({"error": f"Unknown tool: {tool_name}"})
         
+        started = time.perf_counter()
+        outcome = "ok"
+        with span(f"tool.{tool_name}") as tool_span:
+            try:
+                if tool_name in WRITE_TOOLS:
+                    result = handler(**tool_input)
+                else:
+                    key = make_key(tool_name, tool_input, CASE_INSENSITIVE_ARGS)
+                    result = tool_flight.do(key, handler, **tool_input)
+                return json.dumps(result)
+            except Exception as e:
+                outcome = tool_span.status = "error"
+                return json.dumps({"error": str(e)})
+            finally:
+                TOOL_LATENCY.observe(time.perf_counter() - started, tool_name, outcome)
+    
+    @staticmethod
+    def execute_tools(calls: List[Tuple[str, Dict[str, Any]]]) -> List[str]:
+        """Execute several pending tools in one backend round trip, in order"""
+        handlers = ToolHandler._handlers()
+        if len(calls) < 2 or any(name not in handlers for name, _ in calls):
+            return [ToolHandler.execute_tool(name, tool_input) for name, tool_input in calls]
+        
+        operations = [
+            {"id": str(i), "operation": name, "params": tool_input}
+            for i, (name, tool_input) in enumerate(calls)
+        ]
+        names = {name for name, _ in calls}
+        started = time.perf_counter()
         try:
-            result = handler(**tool_input)
-            return json.dumps(result)
+            with span("tool.batch", tools=len(calls)):
+                response = ToolHandler._send(
+                    "POST", "/batch", "/batch",
+                    timeout=max(TOOL_TIMEOUTS.get(name, TOOL_TIMEOUT_SECONDS) for name in names),
+                    idempotent=not names & WRITE_TOOLS,
+                    tool_class="admin" if names & ADMIN_TOOLS else "lookup",
+                    json={"operations": operations, "parallel": True}
+                )
+            if response.status_code in BATCH_UNSUPPORTED_STATUSES:
+                raise BatchUnsupportedError(f"Backend has no batch endpoint ({response.status_code})")
+            if response.status_code != 200:
+                raise ValueError(f"Batch request failed with status {response.status_code}")
+            results = {r["id"]: r["body"] for r in response.json()["results"]}
         except Exception as e:
-            return json.dumps({"error": str(e)})
+            TOOL_LATENCY.observe(time.perf_counter() - started, "batch", "error")
+            if _never_sent(e):
+                # Nothing ran (older backend without /batch, or no connection): one request per tool
+                return [ToolHandler.execute_tool(name, tool_input) for name, tool_input in calls]
+            # The backend may have applied part of the batch: report it, never resend a write
+            return [json.dumps({"error": f"Batch request failed: {e}" + (
+                "; it may have been applied and was not retried" if name in WRITE_TOOLS else "")})
+                    for name, _ in calls]
+        TOOL_LATENCY.observe(time.perf_counter() - started, "batch", "ok")
+        
+        return [json.dumps(results.get(str(i), {"error": "Missing batch result"})) for i in range(len(calls))]
+    
+    @staticmethod
+    def stats() -> Dict[str, Any]:
+        """Get tool coalescing, circuit breaker and bulkhead state"""
+        return {
+            "coalescing": tool_flight.stats(),
+            "breakers": breakers.snapshot(),
+            "bulkheads": {name: b.snapshot() for name, b in bulkheads.items()},
+        }
+    
+    @staticmethod
+    def _send(method: str, route: str, path: str, timeout: float, idempotent: bool,
+              tool_class: str, **kwargs) -> requests.Response:
+        """Send a backend request inside a bulkhead, guarded by the route's circuit breaker"""
+        deadline = time.monotonic() + TOOL_DEADLINE_SECONDS
+        breaker = breakers.get(f"{method} {route}")
+        
+        def attempt(remaining: float):
+            # One span per attempt; its traceparent lets the backend continue the trace
+            with span(f"http {method} {route}") as http_span:
+                response = requests.request(
+                    method, f"{BACKEND_URL}{path}",
+                    timeout=min(timeout, remaining),
+                    headers=inject(),
+                    **kwargs
+                )
+                http_span.set(status_code=response.status_code)
+            if response.status_code in RETRYABLE_STATUSES:
+                raise BackendUnavailableError(
+                    f"Backend returned {response.status_code} for {method} {route}"
+                )
+            return response
+        
+        with bulkheads[tool_class]:
+            if not breaker.allow():
+                raise CircuitOpenError(f"Backend route {method} {route} is unavailable, failing fast")
+            try:
+                response = retry_call(
+                    attempt,
+                    attempts=TOOL_RETRY_ATTEMPTS if idempotent else 1,
+                    deadline=deadline,
+                    retry_on=RETRYABLE_ERRORS
+                )
+            except Exception:
+                breaker.record_failure()
+                raise
+            # Other server errors are not retried but still count against the route
+            if response.status_code >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            return response
+    
+    @staticmethod
+    def _request(tool_name: str, method: str, route: str, path: str, **kwargs) -> requests.Response:
+        """Send the backend request for a tool using its timeout, retry and concurrency policy"""
+        return ToolHandler._send(
+            method, route, path,
+            timeout=TOOL_TIMEOUTS.get(tool_name, TOOL_TIMEOUT_SECONDS),
+            idempotent=tool_name not in WRITE_TOOLS,
+            tool_class="admin" if tool_name in ADMIN_TOOLS else "lookup",
+            **kwargs
+        )
     
     @staticmethod
     def search_schools(location: str, **kwargs) -> Dict[str, Any]:
         """Search schools by location"""
-        response = requests.post(
-            f"{BACKEND_URL}/schools/search",
+        response = ToolHandler._request(
+            "search_schools", "POST", "/schools/search", "/schools/search",
             json={"location": location}
         )
         return response.json()
     
+    @staticmethod
+    def get_nearby_schools(latitude: float, longitude: float, radius_km: float = 5.0,
+                           **kwargs) -> Dict[str, Any]:
+        """Get schools near GPS coordinates"""
+        response = ToolHandler._request(
+            "get_nearby_schools", "POST", "/schools/nearby", "/schools/nearby",
+            json={"latitude": latitude, "longitude": longitude, "radius_km": radius_km}
+        )
+        return response.json()
+    
     @staticmethod
     def get_school_details(school_id: str, **kwargs) -> Dict[str, Any]:
         """Get school details"""
-        response = requests.get(f"{BACKEND_URL}/schools/{school_id}")
+        response = ToolHandler._request(
+            "get_school_details", "GET", "/schools/<school_id>", f"/schools/{school_id}"
+        )
         return response.json()
     
     @staticmethod
     def get_fee_structure(school_id: str, **kwargs) -> Dict[str, Any]:
         """Get fee structure"""
-        response = requests.get(f"{BACKEND_URL}/schools/{school_id}")
+        response = ToolHandler._request(
+            "get_fee_structure", "GET", "/schools/<school_id>", f"/schools/{school_id}"
+        )
         if response.status_code == 200:
             school = response.json()['data']
             return {
@@ -68,8 +297,8 @@ class ToolHandler:
     @staticmethod
     def compare_schools(school_ids: List[str], **kwargs) -> Dict[str, Any]:
         """Compare schools"""
-        response = requests.post(
-            f"{BACKEND_URL}/schools/compare",
+        response = ToolHandler._request(
+            "compare_schools", "POST", "/schools/compare", "/schools/compare",
             json={"school_ids": school_ids}
         )
         return response.json()
@@ -77,40 +306,66 @@ class ToolHandler:
     @staticmethod
     def get_admission_info(school_id: str, **kwargs) -> Dict[str, Any]:
         """Get admission info"""
-        response = requests.get(f"{BACKEND_URL}/admissions/{school_id}")
+        response = ToolHandler._request(
+            "get_admission_info", "GET", "/admissions/<school_id>", f"/admissions/{school_id}"
+        )
         return response.json()
     
     @staticmethod
     def get_required_documents(school_id: str, **kwargs) -> Dict[str, Any]:
         """Get required documents"""
-        response = requests.get(f"{BACKEND_URL}/admissions/documents/{school_id}")
+        response = ToolHandler._request(
+            "get_required_documents", "GET", "/admissions/documents/<school_id>",
+            f"/admissions/documents/{school_id}"
+        )
         return response.json()
     
     @staticmethod
     def get_exam_pattern(school_id: str, **kwargs) -> Dict[str, Any]:
         """Get exam pattern"""
-        response = requests.get(f"{BACKEND_URL}/admissions/exam-pattern/{school_id}")
+        response = ToolHandler._request(
+            "get_exam_pattern", "GET", "/admissions/exam-pattern/<school_id>",
+            f"/admissions/exam-pattern/{school_id}"
+        )
         return response.json()
     
     @staticmethod
     def get_eligibility_criteria(school_id: str, **kwargs) -> Dict[str, Any]:
         """Get eligibility criteria"""
-        response = requests.get(f"{BACKEND_URL}/admissions/eligibility/{school_id}")
+        response = ToolHandler._request(
+            "get_eligibility_criteria", "GET", "/admissions/eligibility/<school_id>",
+            f"/admissions/eligibility/{school_id}"
+        )
         return response.json()
     
     @staticmethod
     def get_faqs(category: Optional[str] = None, **kwargs) -> Dict[str, Any]:
         """Get FAQs"""
         params = {"category": category} if category else {}
-        response = requests.get(f"{BACKEND_URL}/faqs", params=params)
+        response = ToolHandler._request("get_faqs", "GET", "/faqs", "/faqs", params=params)
+        return response.json()
+    
+    @staticmethod
+    def add_faq(question: str, answer: str, category: str, school_id: Optional[str] = None,
+                **kwargs) -> Dict[str, Any]:
+        """Add a new FAQ"""
+        response = ToolHandler._request(
+            "add_faq", "POST", "/faqs", "/faqs",
+            json={
+                "question": question,
+                "answer": answer,
+                "category": category,
+                "school_id": school_id
+            }
+        )
         return response.json()
     
     @staticmethod
     def capture_lead(name: str, email: str, phone: str, school_interested: str,
                      query_type: str, query_text: str, **kwargs) -> Dict[str, Any]:
         """Capture a lead"""
-        response = requests.post(
-            f"{BACKEND_URL}/leads",
+        response = ToolHandler._request(
+            "capture_lead", "POST", "/leads", "/leads",
             json={
                 "name": name,
                 "email": email,
@@ -125,14 +380,14 @@ class ToolHandler:
     @staticmethod
     def get_all_leads(**kwargs) -> Dict[str, Any]:
         """Get all leads"""
-        response = requests.get(f"{BACKEND_URL}/leads")
+        response = ToolHandler._request("get_all_leads", "GET", "/leads", "/leads")
         return response.json()
     
     @staticmethod
     def update_lead_status(lead_id: str, status: str, **kwargs) -> Dict[str, Any]:
         """Update lead status"""
-        response = requests.patch(
-            f"{BACKEND_URL}/leads/{lead_id}",
+        response = ToolHandler._request(
+            "update_lead_status", "PATCH", "/leads/<lead_id>", f"/leads/{lead_id}",
             json={"status": status}
         )
         return response.json()
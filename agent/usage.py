@@ -0,0 +1,254 @@
+"""Token and cost accounting for Gemini calls
+
+Every chat reply is recorded with its input/output tokens, latency, model,
+endpoint, session and cache status (miss, hit, coalesced). Totals are kept
+per endpoint, model, session and UTC day for the admin usage report, and
+each record is appended as one JSON line to a size-rotated log so budgets
+and runaway conversations can be analysed offline.
+
+The log is opt-in: set USAGE_LOG_PATH (e.g. logs/llm_usage.jsonl) to write
+it. Without it, or when the path cannot be written, totals stay in memory.
+"""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from history import estimate_tokens
+from llm_scheduler import estimate_request_tokens
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+from metrics import REGISTRY
+
+LLM_LATENCY = REGISTRY.histogram('schooloo_llm_call_seconds', 'Gemini call latency by endpoint and model',
+                                 ['endpoint', 'model'])
+
+# USD per million (input, output) tokens, by model name prefix
+MODEL_PRICES = {
+    "gemini-2.5-pro": (1.25, 10.00),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.0-flash-lite": (0.075, 0.30),
+    "gemini-2.0-flash": (0.10, 0.40),
+    "gemini-1.5-pro": (1.25, 5.00),
+    "gemini-1.5-flash": (0.075, 0.30),
+}
+
+CACHE_STATUSES = ("miss", "hit", "coalesced")
+
+
+def model_price(model: str) -> Tuple[float, float]:
+    """(input, output) USD per million tokens; GEMINI_PRICE_*_PER_M override the table"""
+    name = model.split("/")[-1]
+    price = next((p for prefix, p in MODEL_PRICES.items() if name.startswith(prefix)), (0.0, 0.0))
+    return (
+        float(os.getenv('GEMINI_PRICE_INPUT_PER_M', price[0])),
+        float(os.getenv('GEMINI_PRICE_OUTPUT_PER_M', price[1])),
+    )
+
+
+def response_usage(response: Any) -> Tuple[Optional[int], Optional[int]]:
+    """(prompt, output) token counts reported on a Gemini response, if any"""
+    usage = getattr(response, "usage_metadata", None)
+    prompt = getattr(usage, "prompt_token_count", None)
+    output = getattr(usage, "candidates_token_count", None)
+    return (prompt if isinstance(prompt, int) else None,
+            output if isinstance(output, int) else None)
+
+
+def _totals() -> Dict[str, Any]:
+    """Empty aggregate"""
+    return {"requests": 0, "llm_calls": 0, "cache_hits": 0, "input_tokens": 0,
+            "output_tokens": 0, "cost_usd": 0.0, "latency_ms_total": 0.0}
+
+
+def _add(totals: Dict[str, Any], entry: Dict[str, Any]):
+    """Fold one record into an aggregate"""
+    totals["requests"] += 1
+    totals["llm_calls"] += entry["cache"] == "miss"
+    totals["cache_hits"] += entry["cache"] != "miss"
+    totals["input_tokens"] += entry["input_tokens"]
+    totals["output_tokens"] += entry["output_tokens"]
+    totals["cost_usd"] += entry["cost_usd"]
+    totals["latency_ms_total"] += entry["latency_ms"]
+
+
+def _view(totals: Dict[str, Any]) -> Dict[str, Any]:
+    """Aggregate as reported: rounded, with derived totals"""
+    view = {k: v for k, v in totals.items() if k != "latency_ms_total"}
+    view["total_tokens"] = totals["input_tokens"] + totals["output_tokens"]
+    view["cost_usd"] = round(totals["cost_usd"], 6)
+    view["mean_latency_ms"] = round(totals["latency_ms_total"] / totals["requests"], 1) \
+        if totals["requests"] else 0.0
+    return view
+
+
+class UsageTracker:
+    """Aggregates per-request LLM usage and writes it to a rotating JSONL log"""
+
+    def __init__(self, log_path: Optional[str] = None, max_log_bytes: int = 10 * 1024 * 1024,
+                 backup_count: int = 5, max_sessions: int = 10000, max_days: int = 31,
+                 session_token_budget: int = 0, daily_token_budget: int = 0):
+        self.max_sessions = max_sessions
+        self.max_days = max_days
+        self.session_token_budget = session_token_budget
+        self.daily_token_budget = daily_token_budget
+        self.log_path = log_path
+        self._handler = None
+        if log_path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(log_path)), exist_ok=True)
+                self._handler = RotatingFileHandler(log_path, maxBytes=max_log_bytes,
+                                                    backupCount=backup_count, encoding="utf-8")
+            except OSError as e:
+                # Read-only deploys (e.g. serverless) keep the totals in memory only
+                print(f"⚠️ Usage log disabled, cannot write {log_path}: {e}", file=sys.stderr)
+                self.log_path = None
+        self._lock = threading.Lock()
+        self._total = _totals()
+        self._by_endpoint: Dict[str, Dict[str, Any]] = {}
+        self._by_model: Dict[str, Dict[str, Any]] = {}
+        self._by_day: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def record(self, endpoint: str, model: str, input_tokens: int = 0, output_tokens: int = 0,
+               latency_ms: float = 0.0, cache: str = "miss", session_id: str = "",
+               estimated: bool = False) -> Dict[str, Any]:
+        """Account one reply; cache is 'miss' for a real Gemini call, else 'hit' or 'coalesced'"""
+        input_price, output_price = model_price(model)
+        now = time.time()
+        entry = {
+            "ts": round(now, 3),
+            "endpoint": endpoint,
+            "session_id": session_id or None,
+            "model": model,
+            "cache": cache,
+            "input_tokens": int(input_tokens),
+            "output_tokens": int(output_tokens),
+            "estimated": estimated,
+            "latency_ms": round(latency_ms, 1),
+            "cost_usd": round((input_tokens * input_price + output_tokens * output_price) / 1_000_000, 8),
+        }
+        day = datetime.fromtimestamp(now, timezone.utc).strftime("%Y-%m-%d")
+        if cache == "miss":
+            LLM_LATENCY.observe(latency_ms / 1000, endpoint, model)
+        with self._lock:
+            _add(self._total, entry)
+            _add(self._by_endpoint.setdefault(endpoint, _totals()), entry)
+            _add(self._by_model.setdefault(model, _totals()), entry)
+            if day not in self._by_day:
+                self._by_day[day] = _totals()
+                while len(self._by_day) > self.max_days:
+                    self._by_day.popitem(last=False)
+            _add(self._by_day[day], entry)
+            if session_id:
+                session = self._sessions.pop(session_id, None) or {**_totals(), "first_seen": now}
+                _add(session, entry)
+                session["last_seen"] = now
+                self._sessions[session_id] = session
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+        if self._handler is not None:
+            self._handler.handle(logging.makeLogRecord({"msg": json.dumps(entry)}))
+        return entry
+
+    def record_response(self, response: Any, endpoint: str, model: str, latency_ms: float,
+                        contents: Iterable[Any] = (), text: Optional[str] = None,
+                        session_id: str = "") -> Dict[str, Any]:
+        """Account a Gemini call from its usage metadata, estimating what it lacks"""
+        input_tokens, output_tokens = response_usage(response)
+        estimated = input_tokens is None or output_tokens is None
+        if input_tokens is None:
+            input_tokens = estimate_request_tokens(contents)
+        if output_tokens is None:
+            if text is None:
+                try:
+                    text = response.text
+                except (AttributeError, ValueError):
+                    text = ""
+            output_tokens = estimate_tokens(text or "")
+        return self.record(endpoint, model, input_tokens, output_tokens, latency_ms,
+                           cache="miss", session_id=session_id, estimated=estimated)
+
+    def session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Usage of one session, or None if it is not tracked"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            return {**_view(session), "session_id": session_id} if session else None
+
+    def report(self, top_sessions: int = 20) -> Dict[str, Any]:
+        """Totals by endpoint, model and day, plus the heaviest sessions"""
+        with self._lock:
+            heaviest = sorted(self._sessions.items(),
+                              key=lambda item: item[1]["input_tokens"] + item[1]["output_tokens"],
+                              reverse=True)
+            today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+            today_tokens = _view(self._by_day.get(today, _totals()))["total_tokens"]
+            over_budget = [
+                sid for sid, s in heaviest
+                if self.session_token_budget and s["input_tokens"] + s["output_tokens"] > self.session_token_budget
+            ]
+            return {
+                "total": _view(self._total),
+                "by_endpoint": {k: _view(v) for k, v in self._by_endpoint.items()},
+                "by_model": {k: _view(v) for k, v in self._by_model.items()},
+                "by_day": {k: _view(v) for k, v in self._by_day.items()},
+                "top_sessions": [{**_view(s), "session_id": sid} for sid, s in heaviest[:top_sessions]],
+                "tracked_sessions": len(self._sessions),
+                "budgets": {
+                    "session_tokens": self.session_token_budget or None,
+                    "sessions_over_budget": over_budget,
+                    "daily_tokens": self.daily_token_budget or None,
+                    "daily_tokens_used": today_tokens,
+                    "daily_budget_exceeded": bool(self.daily_token_budget) and today_tokens > self.daily_token_budget,
+                },
+                "log_path": self.log_path,
+            }
+
+    def stats(self) -> Dict[str, Any]:
+        """Overall totals"""
+        with self._lock:
+            return _view(self._total)
+
+    def metric_families(self):
+        """Token, reply and cost counters by endpoint for the /metrics endpoint"""
+        with self._lock:
+            endpoints = {name: dict(totals) for name, totals in self._by_endpoint.items()}
+        return [
+            ("schooloo_llm_tokens_total", "counter", "Gemini tokens by endpoint and direction", [
+                ({"endpoint": name, "direction": direction}, totals[f"{direction}_tokens"])
+                for name, totals in endpoints.items() for direction in ("input", "output")
+            ]),
+            ("schooloo_llm_replies_total", "counter", "Chat replies by endpoint, from Gemini or a cache", [
+                ({"endpoint": name, "source": source}, totals[key])
+                for name, totals in endpoints.items() for source, key in (("llm", "llm_calls"), ("cache", "cache_hits"))
+            ]),
+            ("schooloo_llm_cost_usd_total", "counter", "Estimated Gemini spend in USD by endpoint", [
+                ({"endpoint": name}, round(totals["cost_usd"], 6)) for name, totals in endpoints.items()
+            ]),
+        ]
+
+
+_shared: Optional[UsageTracker] = None
+_shared_lock = threading.Lock()
+
+
+def get_tracker() -> UsageTracker:
+    """The process-wide tracker, configured from USAGE_* environment variables"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = UsageTracker(
+                log_path=os.getenv('USAGE_LOG_PATH') or None,
+                max_log_bytes=int(os.getenv('USAGE_LOG_MAX_BYTES', 10 * 1024 * 1024)),
+                backup_count=int(os.getenv('USAGE_LOG_BACKUPS', 5)),
+                max_sessions=int(os.getenv('USAGE_MAX_SESSIONS', 10000)),
+                session_token_budget=int(os.getenv('USAGE_SESSION_TOKEN_BUDGET', 0)),
+                daily_token_budget=int(os.getenv('USAGE_DAILY_TOKEN_BUDGET', 0)),
+            )
+        return _shared
@@ -0,0 +1,137 @@
+"""Warm-start snapshot of in-memory chat state
+
+A serverless instance keeps /tmp between invocations, but every new process
+starts with empty caches and has to rebuild the semantic cache's LSH
+hyperplanes. With WARM_SNAPSHOT_PATH set (e.g. /tmp/schooloo-warm.pickle)
+the caches are saved there and the next process on the instance restores
+them on first use, so its first answers can still come from cache.
+
+Requests only call changed(); a background thread started on the first
+change writes the snapshot at most every WARM_SNAPSHOT_INTERVAL_SECONDS,
+and close() (registered atexit) writes the last changes, so pickling never
+runs on the request path.
+
+Components are objects with export_state() and load_state(state, age_seconds).
+The file is only trusted if this user owns it and nobody else can write it.
+"""
+import os
+import pickle
+import threading
+import time
+from typing import Any, Dict, Optional
+
+SNAPSHOT_VERSION = 1
+
+
+class WarmSnapshot:
+    """Saves and restores named components to one local file"""
+
+    def __init__(self, path: Optional[str], components: Dict[str, Any],
+                 max_age_seconds: float = 6 * 3600, save_interval_seconds: float = 30.0):
+        self.path = path
+        self.components = components
+        self.max_age_seconds = max_age_seconds
+        self.save_interval_seconds = save_interval_seconds
+        self._lock = threading.Lock()
+        self._restored = path is None
+        self._last_saved = 0.0
+        self._saves = 0
+        self._restored_from: Optional[float] = None
+        self._dirty = False
+        self._stop = threading.Event()
+        self._saver: Optional[threading.Thread] = None
+
+    def _trusted(self) -> bool:
+        """The file exists, belongs to us and is not writable by others"""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return False
+        return st.st_uid == os.getuid() and not st.st_mode & 0o022
+
+    def restore(self) -> bool:
+        """Load the snapshot into the components, once per process; True if one was loaded"""
+        if self._restored:
+            return False
+        with self._lock:
+            if self._restored:
+                return False
+            self._restored = True
+            if not self._trusted():
+                return False
+            try:
+                with open(self.path, 'rb') as f:
+                    snapshot = pickle.load(f)
+            except Exception:
+                return False  # torn or foreign file: start cold
+            age = time.time() - snapshot.get('saved_at', 0)
+            if snapshot.get('version') != SNAPSHOT_VERSION or not 0 <= age <= self.max_age_seconds:
+                return False
+            for name, component in self.components.items():
+                if name in snapshot['state']:
+                    component.load_state(snapshot['state'][name], age_seconds=age)
+            self._restored_from = snapshot['saved_at']
+            return True
+
+    def save(self, force: bool = False) -> bool:
+        """Write the components' state, at most once per save interval unless forced"""
+        if self.path is None:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last_saved < self.save_interval_seconds:
+                return False
+            self._last_saved = now
+        snapshot = {
+            'version': SNAPSHOT_VERSION,
+            'saved_at': time.time(),
+            'state': {name: component.export_state() for name, component in self.components.items()},
+        }
+        tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self.path)
+        except OSError:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return False
+        self._saves += 1
+        return True
+
+    def changed(self):
+        """Note that the components changed; they are saved in the background"""
+        if self.path is None:
+            return
+        self._dirty = True
+        if self._saver is None:
+            with self._lock:
+                if self._saver is None and not self._stop.is_set():
+                    self._saver = threading.Thread(target=self._save_periodically, name='warm-snapshot',
+                                                   daemon=True)
+                    self._saver.start()
+
+    def _save_periodically(self):
+        """Background loop: write the snapshot every save interval while there are changes"""
+        while not self._stop.wait(self.save_interval_seconds):
+            if self._dirty:
+                self._dirty = False
+                self.save(force=True)
+
+    def close(self):
+        """Stop the background saver and write any changes it has not saved yet"""
+        self._stop.set()
+        if self._dirty:
+            self._dirty = False
+            self.save(force=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Where the snapshot lives and what this process did with it"""
+        return {
+            'path': self.path,
+            'restored_from': self._restored_from,
+            'saves': self._saves,
+        }
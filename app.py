@@ -3,12 +3,38 @@
 Flask Backend for Schooloo AI Frontend
 Connects the HTML/CSS/JS frontend with the Python Gemini AI agent
 """
+import atexit
 import os
 import sys
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify
 from flask_cors import CORS
 from dotenv import load_dotenv
+import hmac
+import importlib.util
 import logging
+import threading
+import time
+
+# Add agent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'agent'))
+from singleflight import SingleFlight
+from response_cache import ResponseCache, make_cache_key
+from semantic_cache import SemanticCache
+from history import ConversationHistory
+from session_store import SessionStore
+from sse import stream_events
+from local_router import LocalRouter
+from retrieval import grounded_prompt
+from usage import get_tracker
+from fake_genai import fake_llm_enabled, generative_model
+from warm_snapshot import WarmSnapshot
+from llm_scheduler import PRIORITY_INTERACTIVE, QuotaExceededError, estimate_request_tokens, get_scheduler
+
+# Backend helpers; appended so backend/app.py cannot shadow this module
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+from request_timing import init_app as init_request_timing, phase
+from static_assets import StaticAsset
+import metrics
 
 # Load environment variables
 load_dotenv()
@@ -21,56 +47,290 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
-# Import Gemini
-try:
-    import google.generativeai as genai
-except ImportError:
+# Server-Timing header and a log line per request: parse, router, cache,
+# retrieval, llm, serialize; PROFILE_SAMPLE_RATE adds sampled cProfile dumps
+init_request_timing(app)
+
+# Prometheus /metrics: request counts, latency histograms and in-flight here,
+# plus the LLM, quota and cache figures reported by chat_metrics below
+metrics.init_app(app)
+
+# Gemini is configured and its client built on first use (get_model), not at
+# import: the google.generativeai import alone is most of a cold start, and
+# /api/health and cached or locally routed answers never need it.
+# (SCHOOLOO_FAKE_LLM=1 swaps in the local stand-in, which needs no key)
+if not fake_llm_enabled() and importlib.util.find_spec('google.generativeai') is None:
     logger.error("google-generativeai not installed")
     sys.exit(1)
 
-# Configure Gemini API
 api_key = os.getenv('API_KEY')
-if not api_key:
+if not api_key and not fake_llm_enabled():
     logger.error("API_KEY not found in .env file")
     sys.exit(1)
 
-genai.configure(api_key=api_key)
 model_name = os.getenv('AGENT_MODEL', 'gemini-2.0-flash')
-model = genai.GenerativeModel(model_name)
-
-# System prompt for the agent
-system_prompt = """You are Schooloo AI Assistant - an expert school discovery assistant for India.
+model = None
+_model_lock = threading.Lock()
 
-You have comprehensive knowledge about schools across ALL Indian cities.
 
-CRITICAL RULES:
-1. When asked about a SPECIFIC city (e.g., Prayagraj, Delhi, Mumbai), ALWAYS provide schools from THAT EXACT city
-2. Provide REAL school names, fees (in ₹), boards (CBSE/ICSE/ISC), and facilities
-3. Include follow-up questions to help refine recommendations
-4. Be helpful, accurate, and personalized
-5. Format responses with clear sections and bullet points
-6. Include emojis for better visual appeal
-7. the response should be in point wise clean and professional and proper space should be in different pints. 
+def get_model():
+    """The shared Gemini model, configured and built on the first call"""
+    global model
+    if model is None:
+        with _model_lock:
+            if model is None:
+                if not fake_llm_enabled():
+                    import google.generativeai as genai
+                    genai.configure(api_key=api_key)
+                model = generative_model(model_name)
+    return model
 
-Example Prayagraj schools:
-- St. Mary's Convent School (CBSE, ₹1.5L-2.5L/year, Girls School)
-- St. Joseph's College (ICSE, ₹1.2L-2.0L/year, Boys School)
-- Colvin College (ICSE/ISC, ₹1.3L-2.2L/year, Co-educational)
 
-Always provide real school information with details."""
+# System prompt for the agent; the catalog records relevant to each message
+# are appended by retrieval.grounded_prompt, so this stays short and static
+system_prompt = """You are Schooloo AI Assistant - an expert school discovery assistant for India.
 
-# Store conversation history (in-memory)
-conversation_history = []
+RULES:
+1. Answer for the exact city the user asks about
+2. Take fees (₹), boards, facilities, deadlines and contacts from the catalog records below; never invent them
+3. Otherwise give general guidance and advise verifying with the school
+4. Reply point-wise with emojis and end with a follow-up question"""
+
+# Per-session conversation history, bounded in memory; sessions pushed out
+# by the caps spill to SESSION_SPILL_DIR when it is set
+session_store = SessionStore(
+    max_sessions=int(os.getenv('SESSION_MAX_SESSIONS', 10000)),
+    ttl_seconds=float(os.getenv('SESSION_TTL_SECONDS', 1800)),
+    max_session_bytes=int(os.getenv('SESSION_MAX_BYTES', 64 * 1024)),
+    max_total_bytes=int(os.getenv('SESSION_STORE_MAX_BYTES', 64 * 1024 * 1024)),
+    spill_dir=os.getenv('SESSION_SPILL_DIR') or None,
+    history_factory=lambda: ConversationHistory(
+        max_recent_turns=int(os.getenv('HISTORY_RECENT_TURNS', 6)),
+        max_prompt_tokens=int(os.getenv('HISTORY_MAX_PROMPT_TOKENS', 6000))
+    )
+)
+
+# Generation settings shared by the chat endpoints
+generation_settings = {
+    'temperature': 0.7,
+    'top_p': 0.95,
+    'max_output_tokens': 2048,
+}
+
+# Identical prompts in flight at the same time share one Gemini call
+llm_flight = SingleFlight("llm")
+
+# Structured questions about a known school ("fees at DPS") are answered
+# from the database without calling Gemini
+local_router = LocalRouter() if os.getenv('LOCAL_ROUTER_ENABLED', 'true').lower() == 'true' else None
+
+# Every Gemini call waits its turn under the RPM/TPM budget; chat requests
+# that could not be sent within this many seconds are rejected up front
+llm_scheduler = get_scheduler()
+LLM_DEADLINE_SECONDS = float(os.getenv('LLM_DEADLINE_SECONDS', 30))
+
+# Tokens, latency and cost of every reply, per endpoint, session and day;
+# also appended to the rotating USAGE_LOG_PATH log when that is set
+usage_tracker = get_tracker()
+
+# Answers keyed by model, generation config and the normalized message
+response_cache = ResponseCache(
+    max_entries=int(os.getenv('RESPONSE_CACHE_SIZE', 1000)),
+    ttl_seconds=float(os.getenv('RESPONSE_CACHE_TTL_SECONDS', 6 * 3600))
+)
+
+# Paraphrases of cached questions ("good CBSE schools in Allahabad") are
+# answered from the closest cached question above the threshold
+semantic_cache = SemanticCache(
+    threshold=float(os.getenv('SEMANTIC_CACHE_THRESHOLD', 0.8)),
+    max_entries=int(os.getenv('SEMANTIC_CACHE_SIZE', 5000)),
+    ttl_seconds=float(os.getenv('RESPONSE_CACHE_TTL_SECONDS', 6 * 3600))
+)
+
+# Serverless instances keep /tmp between invocations: with WARM_SNAPSHOT_PATH
+# set, both caches (and the LSH hyperplanes) are saved there from a background
+# thread and at exit, and a new process on the same instance starts from them
+warm_snapshot = WarmSnapshot(
+    os.getenv('WARM_SNAPSHOT_PATH') or None,
+    {'response_cache': response_cache, 'semantic_cache': semantic_cache},
+    max_age_seconds=float(os.getenv('RESPONSE_CACHE_TTL_SECONDS', 6 * 3600)),
+    save_interval_seconds=float(os.getenv('WARM_SNAPSHOT_INTERVAL_SECONDS', 30))
+)
+atexit.register(warm_snapshot.close)
+
+# The landing page is the busiest route: held in memory and pre-gzipped,
+# revalidated with ETag/Last-Modified, re-read only when the file changes
+frontend = StaticAsset(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'index.html'),
+    'text/html; charset=utf-8',
+    max_age=int(os.getenv('FRONTEND_MAX_AGE', 60)),
+    reload_seconds=float(os.getenv('FRONTEND_RELOAD_SECONDS', 2))
+)
+
+
+def chat_metrics():
+    """Quota, cache and token figures for /metrics, read from the components at scrape time"""
+    scheduler = llm_scheduler.stats()
+    yield ('schooloo_llm_quota_errors_total', 'counter', 'Gemini calls refused by our scheduler or by a 429', [
+        ({'reason': 'scheduler_rejected'}, scheduler['rejected']),
+        ({'reason': 'upstream_429'}, scheduler['rate_limited']),
+    ])
+    yield ('schooloo_llm_queue_depth', 'gauge', 'Gemini calls waiting for quota', [({}, scheduler['queued'])])
+    yield from metrics.cache_family({'response': response_cache.stats(), 'semantic': semantic_cache.stats()})
+    yield from usage_tracker.metric_families()
+
+
+metrics.REGISTRY.register_collector('chat', chat_metrics)
+
+
+def send_to_model(contents, endpoint: str = 'chat', session_id: str = '', **kwargs):
+    """Call Gemini through the shared quota scheduler
+
+    Non-streaming calls are accounted here; streaming callers account the
+    reply once it has been read (see record_stream_usage).
+    """
+    tokens = estimate_request_tokens(contents, generation_settings['max_output_tokens'])
+    started = time.perf_counter()
+    with phase('llm'):
+        response = llm_scheduler.call(
+            lambda: get_model().generate_content(
+                contents,
+                generation_config=generation_settings,
+                **kwargs
+            ),
+            tokens=tokens,
+            priority=PRIORITY_INTERACTIVE,
+            deadline_seconds=LLM_DEADLINE_SECONDS
+        )
+    if not kwargs.get('stream'):
+        usage_tracker.record_response(response, endpoint, model_name,
+                                      (time.perf_counter() - started) * 1000,
+                                      contents=contents, session_id=session_id)
+    return response
+
+
+def record_stream_usage(response, endpoint: str, session_id: str, started: float, contents, text: str):
+    """Account a streamed reply, including one cut short by a disconnect"""
+    if response is not None:
+        usage_tracker.record_response(response, endpoint, model_name,
+                                      (time.perf_counter() - started) * 1000,
+                                      contents=contents, text=text, session_id=session_id)
+
+
+def lookup_cached_reply(user_message: str):
+    """Check the exact and semantic caches for a first-turn message
+
+    Returns (key, namespace, text); text is None on a miss.
+    """
+    with phase('cache'):
+        warm_snapshot.restore()
+        key = make_cache_key(model_name, generation_settings, user_message)
+        namespace = make_cache_key(model_name, generation_settings, '')
+        cached = response_cache.get(key)
+        if cached is None:
+            similar = semantic_cache.lookup(user_message, namespace)
+            cached = similar[0] if similar is not None else None
+    return key, namespace, cached
+
+
+def remember_reply(key: str, namespace: str, user_message: str, text: str):
+    """Store a freshly generated first-turn reply in both caches"""
+    if text:
+        response_cache.set(key, text)
+        semantic_cache.add(user_message, text, namespace)
+        warm_snapshot.changed()
+
+
+def prompt_contents(user_message: str, history: ConversationHistory = None):
+    """Gemini contents: grounded system prompt, earlier turns if any, the message"""
+    with phase('retrieval'):
+        prompt = grounded_prompt(system_prompt, user_message)
+    if history is not None:
+        return history.build_contents(prompt, user_message)
+    return [prompt, user_message]
+
+
+def generate_reply(user_message: str, history: ConversationHistory = None,
+                   endpoint: str = 'chat', session_id: str = ''):
+    """Generate a reply for a message, in the context of history if given
+
+    Returns (text, cached). Cached answers skip Gemini entirely; identical
+    concurrent misses share one call. Only the first message of a session
+    can use the caches, since later answers depend on earlier turns.
+    """
+    if history is not None and len(history):
+        response = send_to_model(prompt_contents(user_message, history), endpoint, session_id)
+        return response.text, False
+
+    started = time.perf_counter()
+    key, namespace, cached = lookup_cached_reply(user_message)
+    if cached is not None:
+        usage_tracker.record(endpoint, model_name, latency_ms=(time.perf_counter() - started) * 1000,
+                             cache='hit', session_id=session_id)
+        return cached, True
+
+    leader = []
+
+    def call_model():
+        leader.append(True)
+        response = send_to_model(prompt_contents(user_message), endpoint, session_id)
+        remember_reply(key, namespace, user_message, response.text)
+        return response.text
+
+    text = llm_flight.do(key, call_model)
+    if not leader:
+        # Shared another request's in-flight call: no tokens of its own
+        usage_tracker.record(endpoint, model_name, latency_ms=(time.perf_counter() - started) * 1000,
+                             cache='coalesced', session_id=session_id)
+    return text, False
+
+
+def session_id_for(data, headers) -> str:
+    """Session id from the request body or the X-Session-Id header ('' if none)"""
+    return str(data.get('session_id') or headers.get('X-Session-Id') or '').strip()
+
+
+def record_turn(session_id: str, history: ConversationHistory, user_message: str, reply: str):
+    """Add a completed exchange to its session"""
+    if history is not None:
+        session_store.append(session_id, history, ('user', user_message), ('model', reply))
+
+
+def model_error(error: Exception):
+    """JSON payload and status for a failed Gemini call"""
+    error_msg = str(error)
+    logger.error(f"Gemini API error: {error_msg}")
+    
+    # Our own scheduler turned the call away before it reached Gemini
+    if isinstance(error, QuotaExceededError):
+        return {
+            'error': 'Too Many Requests',
+            'message': f'The assistant is busy right now. Please try again in {error.retry_after:.0f} seconds.',
+            'retry_after': error.retry_after
+        }, 429
+    
+    # Check for quota exceeded
+    if "429" in error_msg or "quota" in error_msg.lower():
+        return {
+            'error': 'API Quota Exceeded',
+            'message': 'Daily API quota exceeded. Please try again tomorrow or upgrade your plan.',
+            'details': error_msg
+        }, 429
+    
+    return {
+        'error': 'API Error',
+        'message': f'Error from AI model: {error_msg}'
+    }, 500
 
 
 @app.route('/', methods=['GET'])
 def index():
-    """Serve the frontend HTML file"""
-    frontend_path = os.path.join(os.path.dirname(__file__), 'index.html')
-    if os.path.exists(frontend_path):
-        with open(frontend_path, 'r', encoding='utf-8') as f:
-            return f.read()
-    return jsonify({'error': 'Frontend not found'}), 404
+    """Serve the frontend HTML file from memory, gzipped when the client accepts it"""
+    served = frontend.respond(request.headers)
+    if served is None:
+        return jsonify({'error': 'Frontend not found'}), 404
+    status, headers, body = served
+    return app.response_class(body, status=status, headers=headers)
 
 
 @app.route('/api/health', methods=['GET'])
@@ -105,49 +365,43 @@ def chat():
         
         logger.info(f"Received message: {user_message}")
         
+        # Multi-turn when the client sends a session id, stateless otherwise
+        session_id = session_id_for(data, request.headers)
+        history = session_store.get(session_id) if session_id else None
+        
         try:
-            # Call Gemini API
-            response = model.generate_content(
-                [system_prompt, user_message],
-                generation_config=genai.types.GenerationConfig(
-                    temperature=0.7,
-                    top_p=0.95,
-                    max_output_tokens=2048,
-                )
-            )
+            with phase('router'):
+                local = local_router.answer(user_message) if local_router else None
+            if local is not None:
+                response_text, cached = local['text'], False
+            else:
+                # Call Gemini API
+                response_text, cached = generate_reply(user_message, history, 'chat', session_id)
             
-            if not response.text:
+            if not response_text:
                 return jsonify({
                     'error': 'No response from AI',
                     'message': 'The AI model did not return a response'
                 }), 500
             
-            agent_response = response.text.strip()
+            agent_response = response_text.strip()
             logger.info(f"Generated response: {agent_response[:100]}...")
             
+            record_turn(session_id, history, user_message, agent_response)
+            
             return jsonify({
                 'success': True,
                 'message': agent_response,
                 'response': agent_response,
-                'model': model_name
+                'model': model_name,
+                'cached': cached,
+                'local': local is not None,
+                'session_id': session_id or None
             }), 200
         
         except Exception as e:
-            error_msg = str(e)
-            logger.error(f"Gemini API error: {error_msg}")
-            
-            # Check for quota exceeded
-            if "429" in error_msg or "quota" in error_msg.lower():
-                return jsonify({
-                    'error': 'API Quota Exceeded',
-                    'message': 'Daily API quota exceeded. Please try again tomorrow or upgrade your plan.',
-                    'details': error_msg
-                }), 429
-            
-            return jsonify({
-                'error': 'API Error',
-                'message': f'Error from AI model: {error_msg}'
-            }), 500
+            payload, status = model_error(e)
+            return jsonify(payload), status
     
     except ValueError as e:
         return jsonify({
@@ -163,6 +417,16 @@ def chat():
         }), 500
 
 
+def cancel_upstream(response):
+    """Stop a Gemini stream so it no longer generates (and bills) tokens"""
+    iterator = getattr(response, '_iterator', None)
+    for name in ('cancel', 'close'):
+        stop = getattr(iterator, name, None)
+        if callable(stop):
+            stop()
+            return
+
+
 @app.route('/api/chat/stream', methods=['POST'])
 def chat_stream():
     """Streaming chat endpoint for real-time responses"""
@@ -173,46 +437,105 @@ def chat_stream():
         if not user_message:
             return jsonify({'error': 'Empty message'}), 400
         
-        def generate():
+        session_id = session_id_for(data, request.headers)
+        history = session_store.get(session_id) if session_id else None
+        contents = prompt_contents(user_message, history)
+        
+        upstream = {}
+        with phase('router'):
+            local = local_router.answer(user_message) if local_router else None
+        
+        def chunks():
+            if local is not None:
+                record_turn(session_id, history, user_message, local['text'])
+                yield local['text']
+                return
+            # Runs on the SSE producer thread, so heartbeats flow while Gemini starts up
+            started = time.perf_counter()
+            upstream['response'] = response = send_to_model(contents, stream=True)
+            parts = []
             try:
-                response = model.generate_content(
-                    [system_prompt, user_message],
-                    stream=True,
-                    generation_config=genai.types.GenerationConfig(
-                        temperature=0.7,
-                        top_p=0.95,
-                        max_output_tokens=2048,
-                    )
-                )
-                
                 for chunk in response:
                     if chunk.text:
-                        yield f"data: {chunk.text}\n\n"
-            
-            except Exception as e:
-                yield f"data: ERROR: {str(e)}\n\n"
+                        parts.append(chunk.text)
+                        yield chunk.text
+            finally:
+                record_stream_usage(response, 'chat_stream', session_id, started, contents, ''.join(parts))
+            # Only a completed reply becomes part of the session
+            if parts:
+                record_turn(session_id, history, user_message, ''.join(parts).strip())
         
         return app.response_class(
-            generate(),
-            mimetype='text/event-stream'
+            stream_events(
+                chunks(),
+                cancel=lambda: cancel_upstream(upstream.get('response')),
+                heartbeat_seconds=float(os.getenv('SSE_HEARTBEAT_SECONDS', 15)),
+                flush_chars=int(os.getenv('SSE_FLUSH_CHARS', 48)),
+                flush_seconds=float(os.getenv('SSE_FLUSH_SECONDS', 0.05))
+            ),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
         )
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/', methods=['GET'])
-def serve_frontend():
-    """Serve the frontend HTML file"""
-    try:
-        frontend_path = os.path.join(os.path.dirname(__file__), 'index.html')
-        if os.path.exists(frontend_path):
-            with open(frontend_path, 'r', encoding='utf-8') as f:
-                return f.read()
-        return jsonify({'error': 'Frontend not found'}), 404
-    except Exception as e:
-        logger.error(f"Error serving frontend: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+@app.route('/api/session/<session_id>', methods=['DELETE'])
+def delete_session(session_id):
+    """Forget a chat session's history"""
+    return jsonify({
+        'success': True,
+        'deleted': session_store.delete(session_id)
+    }), 200
+
+
+@app.route('/api/stats', methods=['GET'])
+def get_stats():
+    """Get runtime statistics for the chat pipeline"""
+    return jsonify({
+        'llm': {
+            'coalescing': llm_flight.stats(),
+            'response_cache': response_cache.stats(),
+            'semantic_cache': semantic_cache.stats(),
+            'scheduler': llm_scheduler.stats(),
+            'usage': usage_tracker.stats()
+        },
+        'sessions': session_store.stats(),
+        'warm_snapshot': warm_snapshot.stats(),
+        'local_router': local_router.stats() if local_router else None
+    }), 200
+
+
+def admin_error(headers):
+    """(payload, status) when the request may not read admin data, else None"""
+    token = os.getenv('ADMIN_TOKEN')
+    if not token:
+        return {'error': 'Forbidden', 'message': 'Admin endpoints are disabled; set ADMIN_TOKEN to enable them'}, 403
+    given = headers.get('X-Admin-Token') or headers.get('Authorization', '').removeprefix('Bearer ').strip()
+    if not hmac.compare_digest(given, token):
+        return {'error': 'Unauthorized', 'message': 'A valid X-Admin-Token header is required'}, 401
+    return None
+
+
+def usage_report(args):
+    """Usage report for the admin endpoint; ?session=<id> narrows it to one session"""
+    session_id = args.get('session')
+    if session_id:
+        session = usage_tracker.session(session_id)
+        if session is None:
+            return {'error': 'Not found', 'message': f'No usage recorded for session {session_id}'}, 404
+        return session, 200
+    top = str(args.get('top', 20))
+    return usage_tracker.report(top_sessions=int(top) if top.isdigit() else 20), 200
+
+
+@app.route('/api/admin/usage', methods=['GET'])
+def get_usage():
+    """Token, latency and cost accounting by endpoint, model, session and day"""
+    error = admin_error(request.headers)
+    payload, status = error if error is not None else usage_report(request.args)
+    return jsonify(payload), status
 
 
 @app.route('/api/models', methods=['GET'])
@@ -251,7 +574,9 @@ def get_info():
             '/api/health': 'Health check',
             '/api/chat': 'Send message and get response',
             '/api/models': 'Get available models',
-            '/api/info': 'Get API information'
+            '/api/info': 'Get API information',
+            '/api/session/<session_id>': 'Forget a chat session (DELETE)',
+            '/api/stats': 'Get runtime statistics'
         }
     }), 200
 
@@ -285,6 +610,9 @@ if __name__ == '__main__':
     port = int(os.getenv('FLASK_PORT', 5000))
     debug = os.getenv('FLASK_DEBUG', 'true').lower() == 'true'
     
+    if local_router:
+        local_router.warm()
+    
     logger.info(f"🚀 Starting Schooloo AI Backend on port {port}")
     logger.info(f"📊 Using model: {model_name}")
     logger.info(f"🌐 API endpoints available at: http://localhost:{port}/api/")
@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+Async (aiohttp) serving mode for the Schooloo AI chat app
+Serves the same routes and JSON shapes as app.py, but drives Gemini with
+its async client so an open chat stream holds a coroutine, not a thread.
+Run: python async_app.py
+"""
+import asyncio
+import importlib.util
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web
+
+# Add agent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'agent'))
+from singleflight import AsyncSingleFlight
+from sse import astream_events
+from llm_scheduler import PRIORITY_INTERACTIVE, estimate_request_tokens
+from retrieval import get_index
+
+logger = logging.getLogger(__name__)
+
+
+def load_chat_app():
+    """Import app.py under its own name so it cannot clash with backend/app.py"""
+    if 'chat_app' in sys.modules:
+        return sys.modules['chat_app']
+    spec = importlib.util.spec_from_file_location(
+        'chat_app', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules['chat_app'] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+# Model, prompt, caches and session store are shared with the Flask app
+chat_app = load_chat_app()
+
+# On the path once app.py has added backend/
+import metrics
+import tracing
+from request_timing import init_aiohttp as init_request_timing, phase
+
+# Identical prompts awaiting Gemini at the same time share one call
+llm_flight = AsyncSingleFlight("llm-async")
+
+STREAM_SETTINGS = {
+    'heartbeat_seconds': float(os.getenv('SSE_HEARTBEAT_SECONDS', 15)),
+    'flush_chars': int(os.getenv('SSE_FLUSH_CHARS', 48)),
+    'flush_seconds': float(os.getenv('SSE_FLUSH_SECONDS', 0.05)),
+}
+
+open_streams = 0
+
+# Session, cache, retrieval and router calls are synchronous (locks, disk
+# spill, index lookups); handlers run them on this many threads so the event
+# loop only ever waits on sockets
+WORKER_THREADS = int(os.getenv('ASYNC_WORKER_THREADS', 32))
+
+# How late the loop wakes a 50 ms sleep: anything run on the loop itself
+# (rather than on a worker) shows up here
+LOOP_LAG_INTERVAL = 0.05
+loop_lag_ms = deque(maxlen=600)
+
+
+async def watch_loop_lag():
+    """Sample event-loop lag until cancelled"""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        loop_lag_ms.append((loop.time() - started - LOOP_LAG_INTERVAL) * 1000)
+
+
+async def send_to_model(contents, endpoint: str = 'chat', session_id: str = '', **kwargs):
+    """Async counterpart of app.send_to_model, under the same quota scheduler"""
+    tokens = estimate_request_tokens(contents, chat_app.generation_settings['max_output_tokens'])
+    started = time.perf_counter()
+    with phase('llm'):
+        response = await chat_app.llm_scheduler.call_async(
+            lambda: chat_app.get_model().generate_content_async(
+                contents,
+                generation_config=chat_app.generation_settings,
+                **kwargs
+            ),
+            tokens=tokens,
+            priority=PRIORITY_INTERACTIVE,
+            deadline_seconds=chat_app.LLM_DEADLINE_SECONDS
+        )
+    if not kwargs.get('stream'):
+        chat_app.usage_tracker.record_response(response, endpoint, chat_app.model_name,
+                                               (time.perf_counter() - started) * 1000,
+                                               contents=contents, session_id=session_id)
+    return response
+
+
+async def generate_reply(user_message: str, history=None, endpoint: str = 'chat', session_id: str = ''):
+    """Async counterpart of app.generate_reply; returns (text, cached)"""
+    if history is not None and len(history):
+        contents = await asyncio.to_thread(chat_app.prompt_contents, user_message, history)
+        response = await send_to_model(contents, endpoint, session_id)
+        return response.text, False
+
+    started = time.perf_counter()
+    key, namespace, cached = await asyncio.to_thread(chat_app.lookup_cached_reply, user_message)
+    if cached is not None:
+        chat_app.usage_tracker.record(endpoint, chat_app.model_name,
+                                      latency_ms=(time.perf_counter() - started) * 1000,
+                                      cache='hit', session_id=session_id)
+        return cached, True
+
+    leader = []
+
+    async def call_model():
+        leader.append(True)
+        contents = await asyncio.to_thread(chat_app.prompt_contents, user_message)
+        response = await send_to_model(contents, endpoint, session_id)
+        await asyncio.to_thread(chat_app.remember_reply, key, namespace, user_message, response.text)
+        return response.text
+
+    text = await llm_flight.do(key, call_model)
+    if not leader:
+        chat_app.usage_tracker.record(endpoint, chat_app.model_name,
+                                      latency_ms=(time.perf_counter() - started) * 1000,
+                                      cache='coalesced', session_id=session_id)
+    return text, False
+
+
+def start_turn(session_id: str, user_message: str):
+    """(session history, local answer) - store and router work, run off the event loop"""
+    history = chat_app.session_store.get(session_id) if session_id else None
+    local = chat_app.local_router.answer(user_message) if chat_app.local_router else None
+    return history, local
+
+
+async def read_message(request):
+    """Parsed body and message, or an error response"""
+    try:
+        data = await request.json()
+    except ValueError as e:
+        return None, None, web.json_response({'error': 'Invalid JSON', 'message': str(e)}, status=400)
+
+    if not isinstance(data, dict) or 'message' not in data:
+        return None, None, web.json_response({
+            'error': 'Invalid request',
+            'message': 'Please provide a message'
+        }, status=400)
+
+    user_message = str(data.get('message', '')).strip()
+    if not user_message:
+        return None, None, web.json_response({
+            'error': 'Empty message',
+            'message': 'Please provide a non-empty message'
+        }, status=400)
+    return data, user_message, None
+
+
+async def chat(request):
+    """Chat endpoint - receives user message and returns AI response"""
+    data, user_message, error = await read_message(request)
+    if error is not None:
+        return error
+
+    session_id = chat_app.session_id_for(data, request.headers)
+
+    try:
+        history, local = await asyncio.to_thread(start_turn, session_id, user_message)
+        if local is not None:
+            response_text, cached = local['text'], False
+        else:
+            response_text, cached = await generate_reply(user_message, history, 'chat', session_id)
+    except Exception as e:
+        payload, status = chat_app.model_error(e)
+        return web.json_response(payload, status=status)
+
+    if not response_text:
+        return web.json_response({
+            'error': 'No response from AI',
+            'message': 'The AI model did not return a response'
+        }, status=500)
+
+    agent_response = response_text.strip()
+    await asyncio.to_thread(chat_app.record_turn, session_id, history, user_message, agent_response)
+
+    return web.json_response({
+        'success': True,
+        'message': agent_response,
+        'response': agent_response,
+        'model': chat_app.model_name,
+        'cached': cached,
+        'local': local is not None,
+        'session_id': session_id or None
+    })
+
+
+async def chat_stream(request):
+    """Streaming chat endpoint for real-time responses"""
+    global open_streams
+
+    data, user_message, error = await read_message(request)
+    if error is not None:
+        return error
+
+    session_id = chat_app.session_id_for(data, request.headers)
+    history, local = await asyncio.to_thread(start_turn, session_id, user_message)
+
+    async def chunks():
+        if local is not None:
+            await asyncio.to_thread(chat_app.record_turn, session_id, history, user_message, local['text'])
+            yield local['text']
+            return
+        contents = await asyncio.to_thread(chat_app.prompt_contents, user_message, history)
+        started = time.perf_counter()
+        response = await send_to_model(contents, stream=True)
+        parts = []
+        try:
+            async for chunk in response:
+                if chunk.text:
+                    parts.append(chunk.text)
+                    yield chunk.text
+        finally:
+            chat_app.record_stream_usage(response, 'chat_stream', session_id, started, contents, ''.join(parts))
+        # Only a completed reply becomes part of the session
+        if parts:
+            reply = ''.join(parts).strip()
+            await asyncio.to_thread(chat_app.record_turn, session_id, history, user_message, reply)
+
+    stream = web.StreamResponse(headers={
+        'Content-Type': 'text/event-stream',
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+    await stream.prepare(request)
+
+    events = astream_events(chunks(), **STREAM_SETTINGS)
+    open_streams += 1
+    try:
+        async for frame in events:
+            await stream.write(frame.encode('utf-8'))
+    except ConnectionResetError:
+        logger.info("Client disconnected, cancelling the Gemini stream")
+    finally:
+        # Closing the generator cancels the upstream call if it is still running
+        await events.aclose()
+        open_streams -= 1
+    return stream
+
+
+async def delete_session(request):
+    """Forget a chat session's history"""
+    return web.json_response({
+        'success': True,
+        'deleted': await asyncio.to_thread(chat_app.session_store.delete, request.match_info['session_id'])
+    })
+
+
+async def get_stats(request):
+    """Get runtime statistics for the chat pipeline"""
+    return web.json_response({
+        'llm': {
+            'coalescing': llm_flight.stats(),
+            'response_cache': chat_app.response_cache.stats(),
+            'semantic_cache': chat_app.semantic_cache.stats(),
+            'scheduler': chat_app.llm_scheduler.stats(),
+            'usage': chat_app.usage_tracker.stats()
+        },
+        'sessions': chat_app.session_store.stats(),
+        'local_router': chat_app.local_router.stats() if chat_app.local_router else None,
+        'server': {
+            'mode': 'async',
+            'open_streams': open_streams,
+            'threads': threading.active_count(),
+            'loop_lag_ms': {
+                'p99': round(sorted(loop_lag_ms)[int(0.99 * (len(loop_lag_ms) - 1))], 3) if loop_lag_ms else 0.0,
+                'max': round(max(loop_lag_ms), 3) if loop_lag_ms else 0.0,
+            }
+        }
+    })
+
+
+async def get_usage(request):
+    """Token, latency and cost accounting by endpoint, model, session and day"""
+    error = chat_app.admin_error(request.headers)
+    payload, status = error if error is not None else chat_app.usage_report(request.query)
+    return web.json_response(payload, status=status)
+
+
+def flask_view(view):
+    """Serve a static-content Flask view unchanged, so both modes return identical bodies"""
+    async def handler(request):
+        with chat_app.app.test_request_context(request.path):
+            response = chat_app.app.make_response(view())
+        return web.Response(
+            body=response.get_data(),
+            status=response.status_code,
+            content_type=response.mimetype,
+            charset=response.mimetype_params.get('charset')
+        )
+    return handler
+
+
+async def index(request):
+    """The frontend page, served from the Flask app's in-memory asset"""
+    served = chat_app.frontend.respond(request.headers)
+    if served is None:
+        return web.json_response({'error': 'Frontend not found'}, status=404)
+    status, headers, body = served
+    return web.Response(body=body, status=status, headers=headers)
+
+
+@web.middleware
+async def cors(request, handler):
+    """Allow every origin, like CORS(app) on the Flask app"""
+    if request.method == 'OPTIONS':
+        response = web.Response()
+        response.headers['Access-Control-Allow-Methods'] = 'GET, POST, DELETE, OPTIONS'
+        response.headers['Access-Control-Allow-Headers'] = request.headers.get(
+            'Access-Control-Request-Headers', 'Content-Type')
+    else:
+        response = await handler(request)
+    response.headers['Access-Control-Allow-Origin'] = '*'
+    return response
+
+
+def warm_up():
+    """Everything a first request would otherwise build: model, cache snapshot, search indexes"""
+    chat_app.get_model()
+    chat_app.warm_snapshot.restore()
+    get_index().context_block("warm up")
+    if chat_app.local_router:
+        chat_app.local_router.warm()
+
+
+async def on_startup(app):
+    """Size the worker pool the handlers hand blocking work to, then warm up in it"""
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=WORKER_THREADS, thread_name_prefix='async-worker'))
+    await asyncio.to_thread(warm_up)
+    app['loop_lag_watcher'] = asyncio.ensure_future(watch_loop_lag())
+
+
+async def on_cleanup(app):
+    """Stop the lag watcher"""
+    app['loop_lag_watcher'].cancel()
+
+
+def create_app() -> web.Application:
+    """Build the aiohttp application"""
+    app = web.Application(middlewares=[cors])
+    # Same server spans, request metrics and Server-Timing as the Flask app
+    tracing.init_aiohttp(app, service='chat')
+    metrics.init_aiohttp(app)
+    init_request_timing(app)
+    app.router.add_get('/', index)
+    app.router.add_get('/api/health', flask_view(chat_app.health))
+    app.router.add_get('/api/models', flask_view(chat_app.get_models))
+    app.router.add_get('/api/info', flask_view(chat_app.get_info))
+    app.router.add_post('/api/chat', chat)
+    app.router.add_post('/api/chat/stream', chat_stream)
+    app.router.add_delete('/api/session/{session_id}', delete_session)
+    app.router.add_get('/api/stats', get_stats)
+    app.router.add_get('/api/admin/usage', get_usage)
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    return app
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    port = int(os.getenv('ASYNC_PORT', os.getenv('FLASK_PORT', 5000)))
+
+    logger.info(f"🚀 Starting Schooloo AI async backend on port {port}")
+    logger.info(f"📊 Using model: {chat_app.model_name}")
+
+    web.run_app(create_app(), host='0.0.0.0', port=port, backlog=4096)
@@ -1,19 +1,42 @@
 """Flask backend for Schooloo"""
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-from datetime import datetime
-import uuid
-import math
+from concurrent.futures import ThreadPoolExecutor
 import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-from database import db, School, Lead
+from database import db
 from config import Config
+import operations
+import request_timing
+import metrics
+import tracing
 
 app = Flask(__name__)
 app.config.from_object(Config)
 CORS(app)
 
+# Server-Timing header and a log line per request: parse, db, serialize, tools
+request_timing.init_app(app)
+request_timing.instrument(db, [
+    'get_schools_by_location', 'get_school_by_id', 'get_admission_info',
+    'get_faqs_by_category', 'create_lead', 'get_all_schools', 'get_all_leads'
+], 'db')
+
+# Continue the agent's traces (traceparent header): a server span per request, db lookups inside it
+tracing.init_app(app, service='backend')
+tracing.instrument(db, [
+    'get_schools_by_location', 'get_school_by_id', 'get_admission_info',
+    'get_faqs_by_category', 'create_lead', 'get_all_schools', 'get_all_leads'
+], 'db')
+
+# Prometheus /metrics: request counts, latency histograms, in-flight, table sizes
+metrics.init_app(app)
+metrics.REGISTRY.register_collector('database', lambda: [(
+    'schooloo_db_records', 'gauge', 'Records held by the in-memory database',
+    [({'collection': name}, len(getattr(db, name))) for name in ('schools', 'admissions', 'faqs', 'leads')]
+)])
+
 # ============ HEALTH CHECK ============
 
 @app.route('/health', methods=['GET'])
@@ -26,163 +49,80 @@ def health():
 @app.route('/api/schools', methods=['GET'])
 def get_schools():
     """Get all schools"""
-    schools = db.get_all_schools()
-    return jsonify({
-        "success": True,
-        "data": [s.to_dict() for s in schools],
-        "count": len(schools)
-    })
+    payload, status = operations.get_all_schools(db)
+    return jsonify(payload), status
 
 @app.route('/api/schools/<school_id>', methods=['GET'])
 def get_school(school_id):
     """Get school by ID"""
-    school = db.get_school_by_id(school_id)
-    if not school:
-        return jsonify({"success": False, "error": "School not found"}), 404
-    return jsonify({"success": True, "data": school.to_dict()})
+    payload, status = operations.get_school_details(db, school_id)
+    return jsonify(payload), status
 
 @app.route('/api/schools/search', methods=['POST'])
 def search_schools():
     """Search schools by location and criteria"""
     data = request.get_json()
-    location = data.get('location', '')
-    
-    schools = db.get_schools_by_location(location) if location else db.get_all_schools()
-    
-    return jsonify({
-        "success": True,
-        "data": [s.to_dict() for s in schools],
-        "count": len(schools)
-    })
+    payload, status = operations.search_schools(db, data.get('location', ''))
+    return jsonify(payload), status
 
 @app.route('/api/schools/nearby', methods=['POST'])
 def get_nearby_schools():
     """Get schools nearby based on latitude and longitude"""
     data = request.get_json()
-    lat = data.get('latitude')
-    lon = data.get('longitude')
-    radius_km = data.get('radius_km', 5)
-    
-    if not lat or not lon:
-        return jsonify({"success": False, "error": "Latitude and longitude required"}), 400
-    
-    def haversine(lat1, lon1, lat2, lon2):
-        """Calculate distance between two points"""
-        R = 6371
-        dlat = math.radians(lat2 - lat1)
-        dlon = math.radians(lon2 - lon1)
-        a = math.sin(dlat/2)**2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon/2)**2
-        c = 2 * math.asin(math.sqrt(a))
-        return R * c
-    
-    nearby = []
-    for school in db.get_all_schools():
-        distance = haversine(lat, lon, school.latitude, school.longitude)
-        if distance <= radius_km:
-            school_dict = school.to_dict()
-            school_dict['distance_km'] = round(distance, 2)
-            nearby.append(school_dict)
-    
-    nearby.sort(key=lambda x: x['distance_km'])
-    
-    return jsonify({
-        "success": True,
-        "data": nearby,
-        "count": len(nearby)
-    })
+    payload, status = operations.get_nearby_schools(
+        db,
+        latitude=data.get('latitude'),
+        longitude=data.get('longitude'),
+        radius_km=data.get('radius_km', 5)
+    )
+    return jsonify(payload), status
 
 # ============ ADMISSION ENDPOINTS ============
 
 @app.route('/api/admissions/<school_id>', methods=['GET'])
 def get_admission_info(school_id):
     """Get admission info for a school"""
-    admission = db.get_admission_info(school_id)
-    if not admission:
-        return jsonify({"success": False, "error": "Admission info not found"}), 404
-    return jsonify({"success": True, "data": admission.to_dict()})
+    payload, status = operations.get_admission_info(db, school_id)
+    return jsonify(payload), status
 
 @app.route('/api/admissions/documents/<school_id>', methods=['GET'])
 def get_required_documents(school_id):
     """Get required documents for admission"""
-    admission = db.get_admission_info(school_id)
-    if not admission:
-        return jsonify({"success": False, "error": "School not found"}), 404
-    return jsonify({
-        "success": True,
-        "school_id": school_id,
-        "documents": admission.required_documents
-    })
+    payload, status = operations.get_required_documents(db, school_id)
+    return jsonify(payload), status
 
 @app.route('/api/admissions/exam-pattern/<school_id>', methods=['GET'])
 def get_exam_pattern(school_id):
     """Get entrance exam pattern"""
-    admission = db.get_admission_info(school_id)
-    if not admission:
-        return jsonify({"success": False, "error": "School not found"}), 404
-    
-    if not admission.entrance_exam_required:
-        return jsonify({
-            "success": True,
-            "exam_required": False,
-            "message": "No entrance exam required"
-        })
-    
-    return jsonify({
-        "success": True,
-        "exam_required": True,
-        "exam_name": admission.exam_name,
-        "exam_pattern": admission.exam_pattern,
-        "syllabus": "Available on school website"
-    })
+    payload, status = operations.get_exam_pattern(db, school_id)
+    return jsonify(payload), status
 
 @app.route('/api/admissions/eligibility/<school_id>', methods=['GET'])
 def get_eligibility(school_id):
     """Get eligibility criteria"""
-    admission = db.get_admission_info(school_id)
-    if not admission:
-        return jsonify({"success": False, "error": "School not found"}), 404
-    return jsonify({
-        "success": True,
-        "school_id": school_id,
-        "eligibility": admission.eligibility_criteria
-    })
+    payload, status = operations.get_eligibility_criteria(db, school_id)
+    return jsonify(payload), status
 
 # ============ FAQ ENDPOINTS ============
 
 @app.route('/api/faqs', methods=['GET'])
 def get_faqs():
     """Get all FAQs"""
-    category = request.args.get('category', None)
-    
-    if category:
-        faqs = db.get_faqs_by_category(category)
-    else:
-        faqs = list(db.faqs.values())
-    
-    return jsonify({
-        "success": True,
-        "data": [f.to_dict() for f in faqs],
-        "count": len(faqs)
-    })
+    payload, status = operations.get_faqs(db, request.args.get('category', None))
+    return jsonify(payload), status
 
 @app.route('/api/faqs', methods=['POST'])
 def create_faq():
     """Create a new FAQ"""
     data = request.get_json()
-    faq_id = str(uuid.uuid4())
-    
-    from database import FAQ
-    faq = FAQ(
-        id=faq_id,
+    payload, status = operations.add_faq(
+        db,
         question=data.get('question'),
         answer=data.get('answer'),
         category=data.get('category', 'general'),
-        school_id=data.get('school_id'),
-        updated_at=datetime.now().isoformat()
+        school_id=data.get('school_id')
     )
-    
-    db.faqs[faq.id] = faq
-    return jsonify({"success": True, "data": faq.to_dict()}), 201
+    return jsonify(payload), status
 
 # ============ LEAD ENDPOINTS ============
 
@@ -190,46 +130,29 @@ def create_faq():
 def create_lead():
     """Create a new lead"""
     data = request.get_json()
-    lead_id = str(uuid.uuid4())
-    
-    lead = Lead(
-        id=lead_id,
+    payload, status = operations.capture_lead(
+        db,
         name=data.get('name'),
         email=data.get('email'),
         phone=data.get('phone'),
         school_interested=data.get('school_interested'),
         query_type=data.get('query_type', 'general'),  # parent, student, admin
-        query_text=data.get('query_text'),
-        status="new",
-        created_at=datetime.now().isoformat()
+        query_text=data.get('query_text')
     )
-    
-    db.create_lead(lead)
-    return jsonify({"success": True, "data": lead.to_dict()}), 201
+    return jsonify(payload), status
 
 @app.route('/api/leads', methods=['GET'])
 def get_leads():
     """Get all leads (admin endpoint)"""
-    leads = db.get_all_leads()
-    return jsonify({
-        "success": True,
-        "data": [l.to_dict() for l in leads],
-        "count": len(leads)
-    })
+    payload, status = operations.get_all_leads(db)
+    return jsonify(payload), status
 
 @app.route('/api/leads/<lead_id>', methods=['PATCH'])
 def update_lead(lead_id):
     """Update lead status"""
     data = request.get_json()
-    lead = db.leads.get(lead_id)
-    
-    if not lead:
-        return jsonify({"success": False, "error": "Lead not found"}), 404
-    
-    if 'status' in data:
-        lead.status = data['status']
-    
-    return jsonify({"success": True, "data": lead.to_dict()})
+    payload, status = operations.update_lead_status(db, lead_id, data.get('status'))
+    return jsonify(payload), status
 
 # ============ COMPARISON ENDPOINT ============
 
@@ -237,24 +160,68 @@ def update_lead(lead_id):
 def compare_schools():
     """Compare multiple schools"""
     data = request.get_json()
-    school_ids = data.get('school_ids', [])
-    
-    schools_data = []
-    for school_id in school_ids:
-        school = db.get_school_by_id(school_id)
-        if school:
-            schools_data.append(school.to_dict())
-    
-    if not schools_data:
-        return jsonify({"success": False, "error": "No schools found"}), 404
-    
+    payload, status = operations.compare_schools(db, data.get('school_ids', []))
+    return jsonify(payload), status
+
+# ============ BATCH ENDPOINT ============
+
+MAX_BATCH_OPERATIONS = int(os.getenv('MAX_BATCH_OPERATIONS', 20))
+BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', 8))
+
+@app.route('/api/batch', methods=['POST'])
+def batch():
+    """Run several operations in one round trip
+
+    Body: {"operations": [{"id": "1", "operation": "get_school_details",
+    "params": {"school_id": "school_001"}}, ...], "parallel": false}
+    """
+    data = request.get_json() or {}
+    ops = data.get('operations')
+
+    if not isinstance(ops, list) or not ops:
+        return jsonify({"success": False, "error": "operations must be a non-empty list"}), 400
+    if len(ops) > MAX_BATCH_OPERATIONS:
+        return jsonify({
+            "success": False,
+            "error": f"At most {MAX_BATCH_OPERATIONS} operations per batch"
+        }), 400
+
+    def run(index, op):
+        op_id = op.get('id', str(index)) if isinstance(op, dict) else str(index)
+        if not isinstance(op, dict) or not isinstance(op.get('params', {}), dict):
+            payload, status = {"success": False, "error": "Malformed operation"}, 400
+        else:
+            payload, status = operations.run_operation(db, op.get('operation'), op.get('params'))
+        return {"id": op_id, "status": status, "body": payload}
+
+    # Batch operations are the agent's tools
+    with request_timing.phase('tools'):
+        if data.get('parallel') and len(ops) > 1:
+            with ThreadPoolExecutor(max_workers=min(BATCH_WORKERS, len(ops))) as pool:
+                results = list(pool.map(tracing.propagate(run), range(len(ops)), ops))
+        else:
+            results = [run(i, op) for i, op in enumerate(ops)]
+
+    return jsonify({
+        "success": True,
+        "results": results,
+        "count": len(results)
+    })
+
+# ============ TRACES ============
+
+@app.route('/api/traces', methods=['GET'])
+def get_traces():
+    """Recent traces held by this process; ?view=slowest ranks them with a stage breakdown"""
+    limit = request.args.get('limit', 10, type=int)
+    if request.args.get('view', 'slowest') == 'recent':
+        traces = tracing.TRACER.recent(limit)
+    else:
+        traces = tracing.TRACER.slowest(limit)
     return jsonify({
         "success": True,
-        "data": schools_data,
-        "comparison": {
-            "count": len(schools_data),
-            "schools": [s['name'] for s in schools_data]
-        }
+        "traces": traces,
+        "count": len(traces)
     })
 
 # ============ ERROR HANDLERS ============
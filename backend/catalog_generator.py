@@ -0,0 +1,317 @@
+"""Seeded synthetic catalog of Indian schools for scale and performance tests
+
+Produces schools spread around real city coordinates, with fee structures
+in rupees (Indian digit grouping or lakh notation), class and facility
+mixes, an admissions row per school, FAQs and leads. The same seed always
+yields the same catalog. Load it straight into a DatabaseManager or write
+it as JSONL and load that later:
+
+    python backend/catalog_generator.py --schools 200000 --jsonl catalog.jsonl
+"""
+import argparse
+import itertools
+import json
+import random
+import sys
+import os
+from dataclasses import asdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from database import DatabaseManager, FAQ, Lead, School, SchoolAdmission
+
+# (city, state, latitude, longitude, STD code, weight by school count)
+CITIES: List[Tuple[str, str, float, float, str, int]] = [
+    ("New Delhi", "Delhi", 28.6139, 77.2090, "11", 12),
+    ("Mumbai", "Maharashtra", 19.0760, 72.8777, "22", 12),
+    ("Bangalore", "Karnataka", 12.9716, 77.5946, "80", 10),
+    ("Hyderabad", "Telangana", 17.3850, 78.4867, "40", 8),
+    ("Chennai", "Tamil Nadu", 13.0827, 80.2707, "44", 8),
+    ("Kolkata", "West Bengal", 22.5726, 88.3639, "33", 8),
+    ("Pune", "Maharashtra", 18.5204, 73.8567, "20", 6),
+    ("Ahmedabad", "Gujarat", 23.0225, 72.5714, "79", 6),
+    ("Jaipur", "Rajasthan", 26.9124, 75.7873, "141", 5),
+    ("Lucknow", "Uttar Pradesh", 26.8467, 80.9462, "522", 5),
+    ("Kanpur", "Uttar Pradesh", 26.4499, 80.3319, "512", 3),
+    ("Nagpur", "Maharashtra", 21.1458, 79.0882, "712", 3),
+    ("Indore", "Madhya Pradesh", 22.7196, 75.8577, "731", 3),
+    ("Bhopal", "Madhya Pradesh", 23.2599, 77.4126, "755", 3),
+    ("Patna", "Bihar", 25.5941, 85.1376, "612", 3),
+    ("Surat", "Gujarat", 21.1702, 72.8311, "261", 3),
+    ("Chandigarh", "Chandigarh", 30.7333, 76.7794, "172", 2),
+    ("Gurgaon", "Haryana", 28.4595, 77.0266, "124", 3),
+    ("Noida", "Uttar Pradesh", 28.5355, 77.3910, "120", 3),
+    ("Kochi", "Kerala", 9.9312, 76.2673, "484", 2),
+    ("Thiruvananthapuram", "Kerala", 8.5241, 76.9366, "471", 2),
+    ("Coimbatore", "Tamil Nadu", 11.0168, 76.9558, "422", 2),
+    ("Visakhapatnam", "Andhra Pradesh", 17.6868, 83.2185, "891", 2),
+    ("Bhubaneswar", "Odisha", 20.2961, 85.8245, "674", 2),
+    ("Guwahati", "Assam", 26.1445, 91.7362, "361", 2),
+    ("Dehradun", "Uttarakhand", 30.3165, 78.0322, "135", 2),
+    ("Varanasi", "Uttar Pradesh", 25.3176, 82.9739, "542", 2),
+    ("Prayagraj", "Uttar Pradesh", 25.4358, 81.8463, "532", 2),
+    ("Ranchi", "Jharkhand", 23.3441, 85.3096, "651", 2),
+    ("Mysore", "Karnataka", 12.2958, 76.6394, "821", 1),
+]
+
+NAME_PREFIXES = [
+    "Delhi Public", "Kendriya Vidyalaya", "St. Mary's", "St. Joseph's", "Ryan International",
+    "DAV Public", "Saraswati Vidya Mandir", "Bal Bharati", "Modern", "National Public",
+    "Sunbeam", "Little Flower", "Holy Cross", "Don Bosco", "Army Public", "Podar International",
+    "Amity International", "The Heritage", "Greenwood High", "Vidya Niketan", "Sanskriti",
+    "Springdales", "Mount Carmel", "Loreto Convent", "Sacred Heart", "Jain International",
+]
+NAME_SUFFIXES = ["School", "Public School", "High School", "Senior Secondary School",
+                 "Convent School", "International School", "Academy", "Vidyalaya"]
+AREAS = ["Sector", "Nagar", "Vihar", "Colony", "Enclave", "Layout", "Park", "Road", "Cantt", "Puram"]
+
+CLASS_MIXES = [
+    ["KG", "1-5"],
+    ["Nursery", "KG", "1-5", "6-8"],
+    ["KG", "1-5", "6-10"],
+    ["KG", "1-5", "6-10", "11-12"],
+    ["Nursery", "KG", "1-5", "6-10", "11-12"],
+    ["6-10", "11-12"],
+]
+FACILITIES = [
+    "Library", "Computer Lab", "Science Lab", "Sports Ground", "Swimming Pool", "Auditorium",
+    "STEM Lab", "Robotics Lab", "Music Room", "Art Studio", "Cafeteria", "Hostel", "Transport",
+    "Smart Classrooms", "Medical Room", "Indoor Games", "Skating Rink", "Horse Riding",
+]
+FEE_BANDS = {"kindergarten": 1.0, "primary": 1.3, "secondary": 1.7, "senior_secondary": 2.1}
+DOCUMENTS = ["Birth Certificate", "Address Proof", "Aadhaar Card", "Passport Photos", "Transfer Certificate",
+             "Previous School Report", "Medical Fitness Certificate", "Caste Certificate", "Marks Sheet"]
+EXAMS = ["Written Test", "Written + Interview", "Aptitude Test", "Multiple Choice + Verbal + Math",
+         "Interaction with parents"]
+FAQ_TEMPLATES = [
+    ("parent", "Do you provide transportation?", "Yes, school buses cover most routes in {city}."),
+    ("parent", "What is the admission fee?", "A one-time admission fee of {fee} is charged."),
+    ("parent", "Is there a sibling discount?", "Yes, {pct}% off tuition for the second child."),
+    ("student", "Which sports are offered?", "Cricket, football, basketball and athletics."),
+    ("student", "Are there clubs after school?", "Robotics, debate, music and art clubs meet weekly."),
+    ("general", "What is the dress code?", "Uniform is compulsory from Nursery onwards."),
+    ("general", "What are the school timings?", "Classes run from 8:00 AM to 2:30 PM."),
+]
+FIRST_NAMES = ["Aarav", "Vivaan", "Aditya", "Ananya", "Diya", "Ishaan", "Kavya", "Meera", "Rohan",
+               "Saanvi", "Arjun", "Priya", "Rahul", "Neha", "Karthik", "Lakshmi", "Farhan", "Zoya"]
+LAST_NAMES = ["Sharma", "Verma", "Iyer", "Reddy", "Nair", "Gupta", "Patel", "Singh", "Das", "Khan",
+              "Mukherjee", "Joshi", "Menon", "Agarwal"]
+LEAD_QUERIES = ["Admission for KG next year", "Fee details for class 6", "Is transport available?",
+                "Entrance exam dates", "Hostel availability", "Scholarship options"]
+
+
+def format_inr(amount: int) -> str:
+    """Rupees with Indian digit grouping: 250000 -> ₹2,50,000"""
+    digits = str(amount)
+    if len(digits) <= 3:
+        return f"₹{digits}"
+    head, tail = digits[:-3], digits[-3:]
+    groups = []
+    while len(head) > 2:
+        groups.insert(0, head[-2:])
+        head = head[:-2]
+    if head:
+        groups.insert(0, head)
+    return f"₹{','.join(groups)},{tail}"
+
+
+def format_lakh(amount: int) -> str:
+    """Rupees in lakh notation: 250000 -> ₹2.5 lakh"""
+    return f"₹{amount / 100000:.2f}".rstrip("0").rstrip(".") + " lakh"
+
+
+class CatalogGenerator:
+    """Reproducible stream of synthetic schools, admissions, FAQs and leads"""
+
+    def __init__(self, seed: int = 42, id_prefix: str = "gen"):
+        self.seed = seed
+        self.id_prefix = id_prefix
+        self._cities = list(CITIES)
+        self._cum_weights = list(itertools.accumulate(c[5] for c in CITIES))
+        self._slugs: Dict[Tuple[str, str], str] = {}
+
+    def school_id(self, index: int) -> str:
+        """Id of the index-th generated school"""
+        return f"{self.id_prefix}_{index:07d}"
+
+    def _rng(self, kind: int, index: int) -> random.Random:
+        """Independent random stream per record, so any slice is reproducible on its own"""
+        return random.Random((self.seed * 1_000_000_007 + index) * 4 + kind)
+
+    def _slug(self, prefix: str, city: str) -> str:
+        """Domain-name stem for a school chain in a city"""
+        key = (prefix, city)
+        if key not in self._slugs:
+            self._slugs[key] = "".join(ch for ch in f"{prefix}{city}".lower() if ch.isalnum())[:24]
+        return self._slugs[key]
+
+    def school(self, index: int) -> School:
+        """The index-th school"""
+        rng = self._rng(0, index)
+        city, state, lat, lon, std, _ = rng.choices(self._cities, cum_weights=self._cum_weights)[0]
+        prefix, suffix = rng.choice(NAME_PREFIXES), rng.choice(NAME_SUFFIXES)
+        area = f"{rng.choice(AREAS)} {rng.randint(1, 60)}"
+        classes = rng.choice(CLASS_MIXES)
+
+        # Annual tuition from ₹25,000 to about ₹8 lakh, skewed towards the low end
+        base = int(min(800000, 25000 * rng.lognormvariate(1.2, 0.7)) // 1000 * 1000)
+        lakh = rng.random() < 0.3
+        bands = ["kindergarten", "primary", "secondary"] + (["senior_secondary"] if "11-12" in classes else [])
+        fee_structure = {}
+        for band in bands:
+            amount = int(base * FEE_BANDS[band] // 1000 * 1000)
+            fee_structure[band] = f"{format_lakh(amount) if lakh else format_inr(amount)}/year"
+
+        slug = self._slug(prefix, city)
+        return School(
+            id=self.school_id(index),
+            name=f"{prefix} {suffix}, {area}",
+            location=f"{area}, {city}, {state}, India",
+            latitude=round(lat + rng.gauss(0, 0.06), 6),
+            longitude=round(lon + rng.gauss(0, 0.06), 6),
+            fee_structure=fee_structure,
+            classes_offered=list(classes),
+            facilities=rng.sample(FACILITIES, rng.randint(3, 8)),
+            contact_email=f"admissions{index}@{slug}.edu.in",
+            contact_phone=f"+91-{std}-{rng.randint(2000, 9999)}-{rng.randint(1000, 9999)}",
+            website=f"https://www.{slug}{index}.edu.in",
+            established_year=rng.randint(1900, 2022),
+        )
+
+    def admission(self, index: int) -> SchoolAdmission:
+        """Admission rules of the index-th school"""
+        rng = self._rng(1, index)
+        exam = rng.random() < 0.45
+        deadline = datetime(2025, 1, 15) + timedelta(days=rng.randint(0, 120))
+        return SchoolAdmission(
+            school_id=self.school_id(index),
+            entrance_exam_required=exam,
+            exam_name=f"{rng.choice(['Admission', 'Entrance', 'Scholastic'])} Test" if exam else None,
+            exam_pattern=rng.choice(EXAMS) if exam else None,
+            admission_deadline=deadline.strftime("%B %d, %Y"),
+            required_documents=rng.sample(DOCUMENTS, rng.randint(3, 6)),
+            eligibility_criteria={
+                "age_limit": f"{rng.choice([3, 4])}+ years for KG",
+                "academic_requirement": rng.choice(["None for KG", "Previous class passed", "Minimum 60% marks"]),
+                "nationality": rng.choice(["Indian or International", "Open for all"]),
+            },
+        )
+
+    def faqs(self, index: int, school: Optional[School] = None) -> List[FAQ]:
+        """Zero to three FAQs of the index-th school (pass the school if already generated)"""
+        rng = self._rng(2, index)
+        school = school or self.school(index)
+        city = school.location.split(", ")[-3]
+        chosen = rng.sample(FAQ_TEMPLATES, rng.randint(0, 3))
+        return [
+            FAQ(
+                id=f"{self.school_id(index)}_faq{n}",
+                question=question,
+                answer=answer.format(city=city, fee=format_inr(rng.randint(10, 75) * 1000), pct=rng.choice([10, 15, 25])),
+                category=category,
+                school_id=school.id,
+                updated_at="2025-01-01T00:00:00",
+            )
+            for n, (category, question, answer) in enumerate(chosen)
+        ]
+
+    def lead(self, index: int, schools: int) -> Lead:
+        """The index-th lead, interested in one of the first schools generated"""
+        rng = self._rng(3, index)
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        created = datetime(2025, 1, 1) + timedelta(minutes=rng.randint(0, 365 * 24 * 60))
+        return Lead(
+            id=f"{self.id_prefix}_lead_{index:07d}",
+            name=f"{first} {last}",
+            email=f"{first.lower()}.{last.lower()}{index}@example.com",
+            phone=f"+91-{rng.randint(7000000000, 9999999999)}",
+            school_interested=self.school_id(rng.randrange(max(1, schools))),
+            query_type=rng.choice(["parent", "parent", "student", "admin"]),
+            query_text=rng.choice(LEAD_QUERIES),
+            status=rng.choice(["new", "new", "contacted", "converted"]),
+            created_at=created.isoformat(),
+        )
+
+    def records(self, schools: int, leads: int = 0) -> Iterator[Tuple[str, Any]]:
+        """("school" | "admission" | "faq" | "lead", record) for the whole catalog"""
+        for i in range(schools):
+            school = self.school(i)
+            yield "school", school
+            yield "admission", self.admission(i)
+            for faq in self.faqs(i, school):
+                yield "faq", faq
+        for i in range(leads):
+            yield "lead", self.lead(i, schools)
+
+
+def load_into(db: DatabaseManager, schools: int, leads: int = 0, seed: int = 42,
+              id_prefix: str = "gen") -> Dict[str, int]:
+    """Add a generated catalog to db; returns the number of records of each kind"""
+    return add_records(db, CatalogGenerator(seed, id_prefix).records(schools, leads))
+
+
+def add_records(db: DatabaseManager, records) -> Dict[str, int]:
+    """Insert (kind, record) pairs into db"""
+    counts = {"school": 0, "admission": 0, "faq": 0, "lead": 0}
+    for kind, record in records:
+        if kind == "school":
+            db.schools[record.id] = record
+        elif kind == "admission":
+            db.admissions[record.school_id] = record
+        elif kind == "faq":
+            db.faqs[record.id] = record
+        else:
+            db.leads[record.id] = record
+        counts[kind] += 1
+    return counts
+
+
+def write_jsonl(path: str, schools: int, leads: int = 0, seed: int = 42, id_prefix: str = "gen") -> Dict[str, int]:
+    """Write a generated catalog as one {"type", "data"} object per line"""
+    counts = {"school": 0, "admission": 0, "faq": 0, "lead": 0}
+    with open(path, "w", encoding="utf-8") as f:
+        for kind, record in CatalogGenerator(seed, id_prefix).records(schools, leads):
+            f.write(json.dumps({"type": kind, "data": asdict(record)}, ensure_ascii=False) + "\n")
+            counts[kind] += 1
+    return counts
+
+
+def load_jsonl(db: DatabaseManager, path: str) -> Dict[str, int]:
+    """Load a catalog written by write_jsonl into db"""
+    models = {"school": School, "admission": SchoolAdmission, "faq": FAQ, "lead": Lead}
+
+    def read():
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    item = json.loads(line)
+                    yield item["type"], models[item["type"]](**item["data"])
+
+    return add_records(db, read())
+
+
+def empty_db() -> DatabaseManager:
+    """A DatabaseManager without the two sample schools"""
+    db = DatabaseManager()
+    db.schools.clear()
+    db.admissions.clear()
+    db.faqs.clear()
+    db.leads.clear()
+    return db
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic Indian school catalog")
+    parser.add_argument("--schools", type=int, default=100000)
+    parser.add_argument("--leads", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--jsonl", required=True, help="Output path")
+    args = parser.parse_args()
+
+    counts = write_jsonl(args.jsonl, args.schools, args.leads, args.seed)
+    print(f"✅ Wrote {sum(counts.values())} records to {args.jsonl}: {counts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+"""Prometheus metrics for the Flask and aiohttp apps
+
+Counters, gauges and histograms are cheap to update from any thread:
+values live in a few lock stripes picked by thread id, so concurrent
+requests almost never wait on each other, and the stripes are only summed
+when /metrics is scraped. Numbers other components already keep (cache
+hit counts, quota rejections, token totals, table sizes) are read by
+collector functions at scrape time and cost nothing per request.
+
+    curl http://localhost:5000/metrics
+
+init_app instruments a Flask app and init_aiohttp an aiohttp one.
+
+Processes without a web app of their own (the agent in main.py) serve the
+registry from a background thread with start_server(port).
+"""
+import bisect
+import math
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Seconds; covers in-memory lookups through slow Gemini replies
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+STRIPES = 8
+
+# A collector yields (name, type, help, [(labels, value), ...]) at scrape time
+Sample = Tuple[Dict[str, str], float]
+Family = Tuple[str, str, str, List[Sample]]
+
+
+def _escape(value: str) -> str:
+    """Label value escaped for the text exposition format"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value: float) -> str:
+    """Sample value in exposition format"""
+    if value == math.inf:
+        return '+Inf'
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    """{name="value",...} or '' without labels"""
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + '}'
+
+
+class _Metric:
+    """Values by label tuple, spread over lock stripes"""
+
+    kind = ''
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._stripes = [(threading.Lock(), {}) for _ in range(STRIPES)]
+
+    def _stripe(self):
+        """The calling thread's stripe"""
+        return self._stripes[threading.get_native_id() % STRIPES]
+
+    def _add(self, labels: tuple, amount: float):
+        lock, values = self._stripe()
+        with lock:
+            values[labels] = values.get(labels, 0.0) + amount
+
+    def _totals(self) -> Dict[tuple, float]:
+        """Values summed over the stripes"""
+        totals: Dict[tuple, float] = {}
+        for lock, values in self._stripes:
+            with lock:
+                for labels, value in values.items():
+                    totals[labels] = totals.get(labels, 0.0) + value
+        return totals
+
+    def value(self, *labels) -> float:
+        """Current value for one label combination"""
+        return self._totals().get(tuple(labels), 0.0)
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        """(sample name, labels, value) for the exposition"""
+        return [(self.name, dict(zip(self.labelnames, labels)), value)
+                for labels, value in sorted(self._totals().items())]
+
+
+class Counter(_Metric):
+    """Monotonic count, e.g. requests served"""
+
+    kind = 'counter'
+
+    def inc(self, *labels, amount: float = 1.0):
+        """Add amount for the given label values"""
+        self._add(labels, amount)
+
+
+class Gauge(_Metric):
+    """Value that goes up and down, e.g. requests in flight"""
+
+    kind = 'gauge'
+
+    def inc(self, *labels, amount: float = 1.0):
+        """Raise the gauge"""
+        self._add(labels, amount)
+
+    def dec(self, *labels, amount: float = 1.0):
+        """Lower the gauge"""
+        self._add(labels, -amount)
+
+
+class Histogram(_Metric):
+    """Distribution of observations in fixed buckets, e.g. latency in seconds"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels):
+        """Record one observation for the given label values"""
+        slot = bisect.bisect_left(self.buckets, value)
+        lock, values = self._stripe()
+        with lock:
+            counts = values.get(labels)
+            if counts is None:
+                # One count per bucket plus +Inf, then the sum
+                counts = values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[slot] += 1
+            counts[-1] += value
+
+    def _totals(self) -> Dict[tuple, list]:
+        totals: Dict[tuple, list] = {}
+        for lock, values in self._stripes:
+            with lock:
+                for labels, counts in values.items():
+                    total = totals.setdefault(labels, [0] * len(counts))
+                    for i, count in enumerate(counts):
+                        total[i] += count
+        return totals
+
+    def count(self, *labels) -> int:
+        """Observations for one label combination"""
+        counts = self._totals().get(tuple(labels))
+        return sum(counts[:-1]) if counts else 0
+
+    def samples(self):
+        samples = []
+        for labels, counts in sorted(self._totals().items()):
+            named = dict(zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts[:-1]):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", {**named, 'le': _format_value(bound)}, cumulative))
+            samples.append((f"{self.name}_sum", named, counts[-1]))
+            samples.append((f"{self.name}_count", named, cumulative))
+        return samples
+
+
+class Registry:
+    """Metrics and scrape-time collectors rendered together"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: Dict[str, Callable[[], Iterable[Family]]] = {}
+
+    def _get_or_create(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        """The counter called name, created on first use"""
+        return self._get_or_create(Counter, name, help, labelnames)
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        """The gauge called name, created on first use"""
+        return self._get_or_create(Gauge, name, help, labelnames)
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """The histogram called name, created on first use"""
+        return self._get_or_create(Histogram, name, help, labelnames, buckets)
+
+    def register_collector(self, key: str, collect: Callable[[], Iterable[Family]]):
+        """Add (or replace) a function that reports metric families at scrape time"""
+        with self._lock:
+            self._collectors[key] = collect
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (0.0.4)"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for collect in collectors:
+            for name, kind, help, samples in collect():
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry shared by the apps, the agent tools and the LLM accounting
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.counter(
+    'schooloo_http_requests_total', 'HTTP requests by method, route and status', ['method', 'route', 'status'])
+HTTP_LATENCY = REGISTRY.histogram(
+    'schooloo_http_request_duration_seconds', 'HTTP request latency by route and status',
+    ['method', 'route', 'status'])
+HTTP_IN_FLIGHT = REGISTRY.gauge('schooloo_http_requests_in_flight', 'HTTP requests being handled')
+
+
+def cache_family(caches: Dict[str, Optional[Dict]]) -> Iterable[Family]:
+    """Hit, miss and hit-ratio families from cache stats() dicts keyed by cache name"""
+    present = {name: stats for name, stats in caches.items() if stats}
+    yield ('schooloo_cache_hits_total', 'counter', 'Cache hits',
+           [({'cache': name}, stats['hits']) for name, stats in present.items()])
+    yield ('schooloo_cache_misses_total', 'counter', 'Cache misses',
+           [({'cache': name}, stats['misses']) for name, stats in present.items()])
+    yield ('schooloo_cache_hit_ratio', 'gauge', 'Cache hits over lookups since start',
+           [({'cache': name}, stats['hit_rate']) for name, stats in present.items()])
+
+
+def init_app(app, registry: Registry = REGISTRY, path: str = '/metrics'):
+    """Count and time every request of a Flask app and serve the registry at path"""
+    from flask import Response, g, request
+
+    @app.before_request
+    def start_request_metrics():
+        g.metrics_started = time.perf_counter()
+        g.metrics_in_flight = True
+        HTTP_IN_FLIGHT.inc()
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            # Route templates, not raw paths, so ids do not explode the label space
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            labels = (request.method, route, str(response.status_code))
+            HTTP_REQUESTS.inc(*labels)
+            HTTP_LATENCY.observe(time.perf_counter() - started, *labels)
+        return response
+
+    @app.teardown_request
+    def end_request_metrics(error=None):
+        if g.pop('metrics_in_flight', False):
+            HTTP_IN_FLIGHT.dec()
+
+    def metrics():
+        """Prometheus scrape endpoint"""
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+    app.add_url_rule(path, 'metrics', metrics, methods=['GET'])
+    return app
+
+
+def init_aiohttp(app, registry: Registry = REGISTRY, path: str = '/metrics'):
+    """init_app for an aiohttp application, with the same metrics and labels"""
+    from aiohttp import web
+
+    @web.middleware
+    async def request_metrics(request, handler):
+        request['metrics_started'] = time.perf_counter()
+        HTTP_IN_FLIGHT.inc()
+        try:
+            return await handler(request)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+
+    async def record_request_metrics(request, response):
+        # Runs as the headers go out, so a stream is timed to its first byte like Flask's
+        started = request.pop('metrics_started', None)
+        if started is not None:
+            resource = request.match_info.route.resource
+            labels = (request.method, resource.canonical if resource else 'unmatched', str(response.status))
+            HTTP_REQUESTS.inc(*labels)
+            HTTP_LATENCY.observe(time.perf_counter() - started, *labels)
+
+    async def metrics(request):
+        """Prometheus scrape endpoint"""
+        return web.Response(body=registry.render().encode('utf-8'),
+                            headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'})
+
+    app.middlewares.append(request_metrics)
+    app.on_response_prepare.append(record_request_metrics)
+    app.router.add_get(path, metrics)
+    return app
+
+
+def start_server(port: int, host: str = '0.0.0.0', registry: Registry = REGISTRY):
+    """Serve the registry at /metrics from a daemon thread; returns the server (call shutdown() to stop)"""
+    from flask import Flask
+    from werkzeug.serving import make_server
+
+    server = make_server(host, port, init_app(Flask('metrics'), registry), threaded=True)
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    return server
@@ -0,0 +1,266 @@
+"""Backend operations shared by the REST routes and the batch endpoint
+
+Every operation takes the database plus keyword parameters and returns a
+(payload, status) pair. Operation names match the agent tool names so a
+tool call can be forwarded to the backend unchanged.
+"""
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+import math
+import uuid
+from database import DatabaseManager, FAQ, Lead
+from request_timing import phase
+
+Result = Tuple[Dict[str, Any], int]
+
+# ============ SCHOOL OPERATIONS ============
+
+def get_all_schools(db: DatabaseManager, **kwargs) -> Result:
+    """Get all schools"""
+    schools = db.get_all_schools()
+    with phase('serialize'):
+        data = [s.to_dict() for s in schools]
+    return {
+        "success": True,
+        "data": data,
+        "count": len(schools)
+    }, 200
+
+def get_school_details(db: DatabaseManager, school_id: str, **kwargs) -> Result:
+    """Get school by ID"""
+    school = db.get_school_by_id(school_id)
+    if not school:
+        return {"success": False, "error": "School not found"}, 404
+    return {"success": True, "data": school.to_dict()}, 200
+
+def get_fee_structure(db: DatabaseManager, school_id: str, **kwargs) -> Result:
+    """Get the fee structure of a school"""
+    school = db.get_school_by_id(school_id)
+    if not school:
+        return {"success": False, "error": "School not found"}, 404
+    return {
+        "success": True,
+        "school_name": school.name,
+        "fees": school.fee_structure
+    }, 200
+
+def search_schools(db: DatabaseManager, location: str = '', **kwargs) -> Result:
+    """Search schools by location"""
+    schools = db.get_schools_by_location(location) if location else db.get_all_schools()
+    with phase('serialize'):
+        data = [s.to_dict() for s in schools]
+    return {
+        "success": True,
+        "data": data,
+        "count": len(schools)
+    }, 200
+
+def haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Calculate distance between two points"""
+    R = 6371
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = math.sin(dlat/2)**2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon/2)**2
+    c = 2 * math.asin(math.sqrt(a))
+    return R * c
+
+def get_nearby_schools(db: DatabaseManager, latitude: Optional[float] = None,
+                       longitude: Optional[float] = None, radius_km: float = 5, **kwargs) -> Result:
+    """Get schools nearby based on latitude and longitude"""
+    if not latitude or not longitude:
+        return {"success": False, "error": "Latitude and longitude required"}, 400
+
+    nearby = []
+    for school in db.get_all_schools():
+        distance = haversine(latitude, longitude, school.latitude, school.longitude)
+        if distance <= radius_km:
+            school_dict = school.to_dict()
+            school_dict['distance_km'] = round(distance, 2)
+            nearby.append(school_dict)
+
+    nearby.sort(key=lambda x: x['distance_km'])
+
+    return {
+        "success": True,
+        "data": nearby,
+        "count": len(nearby)
+    }, 200
+
+def compare_schools(db: DatabaseManager, school_ids: Optional[list] = None, **kwargs) -> Result:
+    """Compare multiple schools"""
+    schools_data = []
+    for school_id in school_ids or []:
+        school = db.get_school_by_id(school_id)
+        if school:
+            schools_data.append(school.to_dict())
+
+    if not schools_data:
+        return {"success": False, "error": "No schools found"}, 404
+
+    return {
+        "success": True,
+        "data": schools_data,
+        "comparison": {
+            "count": len(schools_data),
+            "schools": [s['name'] for s in schools_data]
+        }
+    }, 200
+
+# ============ ADMISSION OPERATIONS ============
+
+def get_admission_info(db: DatabaseManager, school_id: str, **kwargs) -> Result:
+    """Get admission info for a school"""
+    admission = db.get_admission_info(school_id)
+    if not admission:
+        return {"success": False, "error": "Admission info not found"}, 404
+    return {"success": True, "data": admission.to_dict()}, 200
+
+def get_required_documents(db: DatabaseManager, school_id: str, **kwargs) -> Result:
+    """Get required documents for admission"""
+    admission = db.get_admission_info(school_id)
+    if not admission:
+        return {"success": False, "error": "School not found"}, 404
+    return {
+        "success": True,
+        "school_id": school_id,
+        "documents": admission.required_documents
+    }, 200
+
+def get_exam_pattern(db: DatabaseManager, school_id: str, **kwargs) -> Result:
+    """Get entrance exam pattern"""
+    admission = db.get_admission_info(school_id)
+    if not admission:
+        return {"success": False, "error": "School not found"}, 404
+
+    if not admission.entrance_exam_required:
+        return {
+            "success": True,
+            "exam_required": False,
+            "message": "No entrance exam required"
+        }, 200
+
+    return {
+        "success": True,
+        "exam_required": True,
+        "exam_name": admission.exam_name,
+        "exam_pattern": admission.exam_pattern,
+        "syllabus": "Available on school website"
+    }, 200
+
+def get_eligibility_criteria(db: DatabaseManager, school_id: str, **kwargs) -> Result:
+    """Get eligibility criteria"""
+    admission = db.get_admission_info(school_id)
+    if not admission:
+        return {"success": False, "error": "School not found"}, 404
+    return {
+        "success": True,
+        "school_id": school_id,
+        "eligibility": admission.eligibility_criteria
+    }, 200
+
+# ============ FAQ OPERATIONS ============
+
+def get_faqs(db: DatabaseManager, category: Optional[str] = None, **kwargs) -> Result:
+    """Get all FAQs, optionally filtered by category"""
+    if category:
+        faqs = db.get_faqs_by_category(category)
+    else:
+        faqs = list(db.faqs.values())
+
+    with phase('serialize'):
+        data = [f.to_dict() for f in faqs]
+    return {
+        "success": True,
+        "data": data,
+        "count": len(faqs)
+    }, 200
+
+def add_faq(db: DatabaseManager, question: Optional[str] = None, answer: Optional[str] = None,
+            category: str = 'general', school_id: Optional[str] = None, **kwargs) -> Result:
+    """Create a new FAQ"""
+    faq = FAQ(
+        id=str(uuid.uuid4()),
+        question=question,
+        answer=answer,
+        category=category,
+        school_id=school_id,
+        updated_at=datetime.now().isoformat()
+    )
+
+    db.faqs[faq.id] = faq
+    return {"success": True, "data": faq.to_dict()}, 201
+
+# ============ LEAD OPERATIONS ============
+
+def capture_lead(db: DatabaseManager, name: Optional[str] = None, email: Optional[str] = None,
+                 phone: Optional[str] = None, school_interested: Optional[str] = None,
+                 query_type: str = 'general', query_text: Optional[str] = None, **kwargs) -> Result:
+    """Create a new lead"""
+    lead = Lead(
+        id=str(uuid.uuid4()),
+        name=name,
+        email=email,
+        phone=phone,
+        school_interested=school_interested,
+        query_type=query_type,  # parent, student, admin
+        query_text=query_text,
+        status="new",
+        created_at=datetime.now().isoformat()
+    )
+
+    db.create_lead(lead)
+    return {"success": True, "data": lead.to_dict()}, 201
+
+def get_all_leads(db: DatabaseManager, **kwargs) -> Result:
+    """Get all leads (admin)"""
+    leads = db.get_all_leads()
+    with phase('serialize'):
+        data = [l.to_dict() for l in leads]
+    return {
+        "success": True,
+        "data": data,
+        "count": len(leads)
+    }, 200
+
+def update_lead_status(db: DatabaseManager, lead_id: str, status: Optional[str] = None, **kwargs) -> Result:
+    """Update lead status"""
+    lead = db.leads.get(lead_id)
+
+    if not lead:
+        return {"success": False, "error": "Lead not found"}, 404
+
+    if status is not None:
+        lead.status = status
+
+    return {"success": True, "data": lead.to_dict()}, 200
+
+# ============ DISPATCH ============
+
+OPERATIONS: Dict[str, Callable[..., Result]] = {
+    "get_all_schools": get_all_schools,
+    "search_schools": search_schools,
+    "get_nearby_schools": get_nearby_schools,
+    "get_school_details": get_school_details,
+    "get_fee_structure": get_fee_structure,
+    "compare_schools": compare_schools,
+    "get_admission_info": get_admission_info,
+    "get_required_documents": get_required_documents,
+    "get_exam_pattern": get_exam_pattern,
+    "get_eligibility_criteria": get_eligibility_criteria,
+    "get_faqs": get_faqs,
+    "add_faq": add_faq,
+    "capture_lead": capture_lead,
+    "get_all_leads": get_all_leads,
+    "update_lead_status": update_lead_status,
+}
+
+def run_operation(db: DatabaseManager, name: str, params: Optional[Dict[str, Any]] = None) -> Result:
+    """Run a named operation, mapping bad input to an error payload"""
+    operation = OPERATIONS.get(name)
+    if not operation:
+        return {"success": False, "error": f"Unknown operation: {name}"}, 400
+
+    try:
+        return operation(db, **(params or {}))
+    except TypeError as e:
+        return {"success": False, "error": f"Invalid parameters for {name}: {e}"}, 400
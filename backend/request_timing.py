@@ -0,0 +1,265 @@
+"""Per-request phase timing for the Flask and aiohttp apps
+
+Code running inside a request wraps its work in `phase(name)`; JSON
+parsing and response serialization are timed automatically. When the
+request finishes, its phases are sent back as a Server-Timing header
+(browser devtools show it under Network > Timing) and logged as one JSON
+line. A sampled fraction of requests can also run under cProfile, with one
+.prof file per request saved by route:
+
+    PROFILE_SAMPLE_RATE=0.05 PROFILE_ROUTES=chat python app.py
+    python -m pstats logs/profiles/chat-20250101-120000-123456.prof
+"""
+import contextvars
+import cProfile
+import json
+import logging
+import os
+import random
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from typing import Dict, Iterable, List, Optional
+
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+
+logger = logging.getLogger('request_timing')
+
+DEFAULT_PROFILE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'logs', 'profiles')
+
+# Timer of the request running in this context; None outside requests, and in
+# worker threads a request hands work to, so phase() there costs next to nothing
+_current: contextvars.ContextVar = contextvars.ContextVar('request_timer', default=None)
+
+
+class RequestTimer:
+    """Phase durations of one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: Dict[str, List[float]] = {}  # name -> [total ms, calls]
+        self.profiler: Optional[cProfile.Profile] = None
+        self._depth = 0
+        self._top_level_ms = 0.0
+
+    def add(self, name: str, ms: float, top_level: bool = True):
+        """Count ms against a phase"""
+        totals = self.phases.setdefault(name, [0.0, 0])
+        totals[0] += ms
+        totals[1] += 1
+        if top_level:
+            self._top_level_ms += ms
+
+    def elapsed_ms(self) -> float:
+        """Milliseconds since the request started"""
+        return (time.perf_counter() - self.started) * 1000
+
+    def summary(self) -> Dict[str, float]:
+        """Phase totals in ms, plus 'app' for time outside any phase and 'total'"""
+        total = self.elapsed_ms()
+        summary = {name: round(ms, 3) for name, (ms, _) in self.phases.items()}
+        summary['app'] = round(max(0.0, total - self._top_level_ms), 3)
+        summary['total'] = round(total, 3)
+        return summary
+
+    def server_timing(self) -> str:
+        """Server-Timing header value"""
+        entries = []
+        for name, ms in self.summary().items():
+            calls = self.phases.get(name, (0, 1))[1]
+            desc = f';desc="{calls} calls"' if calls > 1 else ''
+            entries.append(f"{name};dur={ms}{desc}")
+        return ", ".join(entries)
+
+
+@contextmanager
+def phase(name: str):
+    """Time the enclosed block as part of the current request (no-op outside one)"""
+    timer = _current.get()
+    if timer is None:
+        yield
+        return
+    timer._depth += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer._depth -= 1
+        timer.add(name, (time.perf_counter() - started) * 1000, top_level=timer._depth == 0)
+
+
+def timed(name: str):
+    """Decorator form of phase()"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def instrument(obj, methods: Iterable[str], name: str):
+    """Time the given methods of one object as phase name"""
+    for method in methods:
+        setattr(obj, method, timed(name)(getattr(obj, method)))
+    return obj
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider, timing request parsing and response serialization"""
+
+    def loads(self, s, **kwargs):
+        with phase('parse'):
+            return super().loads(s, **kwargs)
+
+    def dumps(self, obj, **kwargs):
+        with phase('serialize'):
+            return super().dumps(obj, **kwargs)
+
+
+class RouteProfiler:
+    """Runs a sampled fraction of requests under cProfile and saves their stats per route"""
+
+    def __init__(self, sample_rate: float = 0.0, routes: Iterable[str] = (),
+                 directory: str = DEFAULT_PROFILE_DIR, keep: int = 20):
+        self.sample_rate = sample_rate
+        self.routes = set(routes)
+        self.directory = directory
+        self.keep = keep
+
+    def wanted(self, endpoint: Optional[str]) -> bool:
+        """Whether to profile this request"""
+        if self.sample_rate <= 0 or not endpoint:
+            return False
+        if self.routes and endpoint not in self.routes:
+            return False
+        return random.random() < self.sample_rate
+
+    def save(self, profiler: cProfile.Profile, endpoint: str) -> str:
+        """Write the stats for one request, keeping the newest `keep` files of the route"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{endpoint}-{datetime.now():%Y%m%d-%H%M%S-%f}.prof")
+        profiler.dump_stats(path)
+        mine = sorted(f for f in os.listdir(self.directory)
+                      if f.startswith(f"{endpoint}-") and f.endswith('.prof'))
+        for old in mine[:-self.keep] if self.keep else []:
+            try:
+                os.remove(os.path.join(self.directory, old))
+            except OSError:
+                pass
+        return path
+
+
+def init_app(app, server_timing: Optional[bool] = None, log_timings: Optional[bool] = None,
+             profiler: Optional[RouteProfiler] = None):
+    """Time every request of a Flask app; settings default to the environment
+
+    SERVER_TIMING_ENABLED and REQUEST_TIMING_LOG switch the header and the log
+    line; PROFILE_SAMPLE_RATE, PROFILE_ROUTES (endpoint names, all if empty),
+    PROFILE_DIR and PROFILE_KEEP configure cProfile sampling.
+    """
+    if server_timing is None:
+        server_timing = os.getenv('SERVER_TIMING_ENABLED', 'true').lower() == 'true'
+    if log_timings is None:
+        log_timings = os.getenv('REQUEST_TIMING_LOG', 'true').lower() == 'true'
+    if profiler is None:
+        profiler = RouteProfiler(
+            sample_rate=float(os.getenv('PROFILE_SAMPLE_RATE', 0)),
+            routes=[r.strip() for r in os.getenv('PROFILE_ROUTES', '').split(',') if r.strip()],
+            directory=os.getenv('PROFILE_DIR', DEFAULT_PROFILE_DIR),
+            keep=int(os.getenv('PROFILE_KEEP', 20)),
+        )
+    app.json = TimedJSONProvider(app)
+    app.extensions['request_timing'] = profiler
+
+    @app.before_request
+    def start_timer():
+        timer = RequestTimer()
+        _current.set(timer)
+        if profiler.wanted(request.endpoint):
+            timer.profiler = cProfile.Profile()
+            try:
+                timer.profiler.enable()
+            except ValueError:  # another profiler is already active on this thread
+                timer.profiler = None
+
+    @app.after_request
+    def report_timings(response):
+        timer = _current.get()
+        if timer is None:
+            return response
+        profile_path = None
+        if timer.profiler is not None:
+            timer.profiler.disable()
+            profile_path = profiler.save(timer.profiler, request.endpoint)
+            timer.profiler = None
+        if server_timing:
+            value = timer.server_timing()
+            if profile_path:
+                value += f', profile;desc="{os.path.basename(profile_path)}"'
+            response.headers.add('Server-Timing', value)
+        if log_timings:
+            logger.info(json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'endpoint': request.endpoint,
+                'status': response.status_code,
+                'ms': timer.summary(),
+                'profile': profile_path,
+            }))
+        return response
+
+    @app.teardown_request
+    def clear_timer(error=None):
+        timer = _current.get()
+        if timer is not None and timer.profiler is not None:
+            timer.profiler.disable()
+        _current.set(None)
+
+    return app
+
+
+def init_aiohttp(app, server_timing: Optional[bool] = None, log_timings: Optional[bool] = None):
+    """init_app for an aiohttp application: Server-Timing and the log line, without profiling
+
+    A stream gets the phases up to its first byte, as under Flask.
+    """
+    from aiohttp import web
+
+    if server_timing is None:
+        server_timing = os.getenv('SERVER_TIMING_ENABLED', 'true').lower() == 'true'
+    if log_timings is None:
+        log_timings = os.getenv('REQUEST_TIMING_LOG', 'true').lower() == 'true'
+
+    @web.middleware
+    async def start_timer(request, handler):
+        request['request_timer'] = RequestTimer()
+        token = _current.set(request['request_timer'])
+        try:
+            return await handler(request)
+        finally:
+            _current.reset(token)
+
+    async def report_timings(request, response):
+        timer = request.pop('request_timer', None)
+        if timer is None:
+            return
+        if server_timing:
+            response.headers.add('Server-Timing', timer.server_timing())
+        if log_timings:
+            resource = request.match_info.route.resource
+            logger.info(json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'endpoint': resource.canonical if resource else None,
+                'status': response.status,
+                'ms': timer.summary(),
+                'profile': None,
+            }))
+
+    app.middlewares.append(start_timer)
+    app.on_response_prepare.append(report_timings)
+    return app
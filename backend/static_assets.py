@@ -0,0 +1,137 @@
+"""Static files served from memory, precompressed, with HTTP revalidation
+
+A StaticAsset reads its file once, gzips it once, and keeps the response
+headers ready, so serving it is a dictionary lookup and a few header
+comparisons. The file is re-read only when its mtime changes, checked at
+most every reload_seconds. Clients get ETag, Last-Modified and
+Cache-Control; a matching If-None-Match (or, without one, an
+If-Modified-Since no older than the file) gets a bodyless 304.
+
+respond() takes any mapping of request headers and returns
+(status, headers, body), so the Flask and aiohttp apps share one asset:
+
+    frontend = StaticAsset('index.html', 'text/html; charset=utf-8')
+    status, headers, body = frontend.respond(request.headers)
+"""
+import gzip
+import hashlib
+import os
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, List, Optional, Tuple
+
+Headers = List[Tuple[str, str]]
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """Whether an Accept-Encoding value allows gzip (explicitly, or through * without gzip;q=0)"""
+    if 'gzip' not in accept_encoding and '*' not in accept_encoding:
+        return False
+    qualities: Dict[str, float] = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        qualities[name.strip().lower()] = q
+    return qualities.get('gzip', qualities.get('*', 0.0)) > 0
+
+
+class StaticAsset:
+    """One file kept in memory, plain and gzipped, reloaded when it changes on disk"""
+
+    def __init__(self, path: str, mimetype: str, max_age: int = 60, reload_seconds: float = 2.0,
+                 compress_level: int = 9):
+        self.path = path
+        self.mimetype = mimetype
+        self.max_age = max_age
+        self.reload_seconds = reload_seconds
+        self.compress_level = compress_level
+        self._lock = threading.Lock()
+        self._checked = 0.0
+        self._loads = 0
+        # (mtime, etags, {encoding: (headers, body)}, {encoding: 304 headers}), swapped whole on reload
+        self._state: Optional[tuple] = None
+
+    def _load(self, mtime: float) -> tuple:
+        """Read and compress the file as of mtime and prepare its headers"""
+        with open(self.path, 'rb') as f:
+            body = f.read()
+        digest = hashlib.blake2b(body, digest_size=8).hexdigest()
+        variants = {'identity': (body, [], f'"{digest}"')}
+        compressed = gzip.compress(body, compresslevel=self.compress_level, mtime=0)
+        if len(compressed) < len(body):
+            variants['gzip'] = (compressed, [('Content-Encoding', 'gzip')], f'"{digest}-gz"')
+        validators = [
+            ('Cache-Control', f'public, max-age={self.max_age}'),
+            ('Last-Modified', formatdate(mtime, usegmt=True)),
+            ('Vary', 'Accept-Encoding'),
+        ]
+        full, not_modified = {}, {}
+        for encoding, (data, extra, etag) in variants.items():
+            not_modified[encoding] = [('ETag', etag)] + validators
+            full[encoding] = ([('Content-Type', self.mimetype)] + extra + not_modified[encoding], data)
+        self._loads += 1
+        return mtime, tuple(etag for _, _, etag in variants.values()), full, not_modified
+
+    def _current(self) -> Optional[tuple]:
+        """The cached copy, reloaded if the file changed; None if the file does not exist"""
+        state = self._state
+        now = time.monotonic()
+        if state is not None and now - self._checked < self.reload_seconds:
+            return state
+        with self._lock:
+            self._checked = now
+            try:
+                mtime = os.stat(self.path).st_mtime
+                if self._state is None or self._state[0] != mtime:
+                    self._state = self._load(mtime)
+            except OSError:
+                self._state = None
+            return self._state
+
+    @staticmethod
+    def _not_modified_since(headers, mtime: float, etags: Tuple[str, ...]) -> bool:
+        """Whether the request's validators match what we hold"""
+        if_none_match = headers.get('If-None-Match')
+        if if_none_match:
+            if if_none_match.strip() == '*':
+                return True
+            tags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+            return any(etag in tags for etag in etags)
+        if_modified_since = headers.get('If-Modified-Since')
+        if if_modified_since:
+            try:
+                return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def respond(self, headers) -> Optional[Tuple[int, Headers, bytes]]:
+        """(status, headers, body) for a GET with these request headers, or None if the file is missing"""
+        state = self._current()
+        if state is None:
+            return None
+        mtime, etags, full, not_modified = state
+        encoding = 'gzip' if 'gzip' in full and accepts_gzip(headers.get('Accept-Encoding', '')) else 'identity'
+        if self._not_modified_since(headers, mtime, etags):
+            return 304, not_modified[encoding], b''
+        response_headers, body = full[encoding]
+        return 200, response_headers, body
+
+    def stats(self) -> Dict[str, object]:
+        """Sizes and reload count"""
+        state = self._state
+        full = state[2] if state else {}
+        return {
+            'path': self.path,
+            'bytes': len(full['identity'][1]) if 'identity' in full else None,
+            'gzip_bytes': len(full['gzip'][1]) if 'gzip' in full else None,
+            'loads': self._loads,
+        }
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""Lightweight tracing across the agent pipeline and the backend
+
+A span times one stage of a user turn (query processing, a Gemini step, a
+tool call, the HTTP request to the backend, a DatabaseManager lookup) and
+records its parent, so the turn becomes a tree. Trace context crosses into
+the backend in a W3C traceparent header and the backend continues the
+trace there.
+
+Each process keeps its most recent traces in a ring buffer
+(TRACE_BUFFER_SIZE) and, when TRACE_EXPORT_DIR is set, writes every trace
+as one JSON file per process. The slowest view merges the files of each
+trace and breaks its time down by stage (self time per span name):
+
+    TRACE_EXPORT_DIR=logs/traces python main.py --mode api
+    python backend/tracing.py logs/traces --slowest 5
+"""
+import argparse
+import contextvars
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+TRACEPARENT = 'traceparent'
+
+# Innermost open span of the running context
+_current: contextvars.ContextVar = contextvars.ContextVar('trace_span', default=None)
+
+
+class SpanContext(NamedTuple):
+    """A parent span from another process, as carried by traceparent"""
+    trace_id: str
+    span_id: str
+    sampled: bool
+
+
+class Span:
+    """One timed stage of a trace"""
+
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_id', 'service', 'sampled', 'attributes',
+                 'status', 'start', 'duration_ms', '_started', 'local_root', 'finished')
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], service: str,
+                 sampled: bool, attributes: Dict[str, Any], local_root: Optional['Span'] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.service = service
+        self.sampled = sampled
+        self.attributes = attributes
+        self.status = 'ok'
+        self.start = time.time()
+        self.duration_ms: Optional[float] = None
+        self._started = time.perf_counter()
+        # Spans of this process are collected on the first span of the trace here
+        self.local_root = local_root or self
+        self.finished: Optional[List['Span']] = [] if local_root is None else None
+
+    def set(self, **attributes):
+        """Add attributes to the span"""
+        self.attributes.update(attributes)
+
+    def traceparent(self) -> str:
+        """traceparent header value naming this span as the parent"""
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'service': self.service,
+            'start': round(self.start, 6),
+            'duration_ms': self.duration_ms,
+            'status': self.status,
+            'attributes': self.attributes,
+        }
+
+
+def extract(headers) -> Optional[SpanContext]:
+    """Parent span from a traceparent header, or None if absent or malformed"""
+    parts = (headers.get(TRACEPARENT) or '').strip().split('-')
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16), int(parts[3], 16)
+    except ValueError:
+        return None
+    return SpanContext(parts[1], parts[2], bool(int(parts[3], 16) & 1))
+
+
+def breakdown(spans: Iterable[Dict[str, Any]]) -> Dict[str, float]:
+    """Self time (own duration minus direct children) summed by span name, largest first"""
+    spans = list(spans)
+    child_ms: Dict[str, float] = {}
+    for s in spans:
+        if s['parent_id']:
+            child_ms[s['parent_id']] = child_ms.get(s['parent_id'], 0.0) + (s['duration_ms'] or 0.0)
+    stages: Dict[str, float] = {}
+    for s in spans:
+        own = max(0.0, (s['duration_ms'] or 0.0) - child_ms.get(s['span_id'], 0.0))
+        stages[s['name']] = stages.get(s['name'], 0.0) + own
+    return {name: round(ms, 3) for name, ms in sorted(stages.items(), key=lambda item: -item[1])}
+
+
+def slowest(traces: Iterable[Dict[str, Any]], n: int = 10) -> List[Dict[str, Any]]:
+    """The n longest traces, each with its stage breakdown instead of raw spans"""
+    ranked = sorted(traces, key=lambda t: t['duration_ms'], reverse=True)[:n]
+    return [{
+        'trace_id': t['trace_id'],
+        'root': t['root'],
+        'duration_ms': t['duration_ms'],
+        'start': t['start'],
+        'spans': len(t['spans']),
+        'stages': breakdown(t['spans']),
+    } for t in ranked]
+
+
+class Tracer:
+    """Creates spans and keeps the traces of this process"""
+
+    def __init__(self, service: str = 'schooloo', buffer_size: int = 200,
+                 export_dir: Optional[str] = None, sample_rate: float = 1.0):
+        self.service = service
+        self.export_dir = export_dir
+        self.sample_rate = sample_rate
+        self._traces: deque = deque(maxlen=buffer_size)
+        self._lock = threading.Lock()
+
+    def start_span(self, name: str, parent=None, service: Optional[str] = None, **attributes) -> Span:
+        """A new span under parent: a local Span, a remote SpanContext, or None for a new trace"""
+        if isinstance(parent, Span):
+            return Span(name, parent.trace_id, parent.span_id, service or parent.service,
+                        parent.sampled, attributes, parent.local_root)
+        if isinstance(parent, SpanContext):
+            return Span(name, parent.trace_id, parent.span_id, service or self.service, parent.sampled, attributes)
+        return Span(name, f"{random.getrandbits(128):032x}", None, service or self.service,
+                    random.random() < self.sample_rate, attributes)
+
+    def end_span(self, span: Span):
+        """Finish a span; finishing the first span of a trace in this process completes it"""
+        span.duration_ms = round((time.perf_counter() - span._started) * 1000, 3)
+        if not span.sampled:
+            return
+        root = span.local_root
+        if span is not root:
+            with self._lock:
+                if root.finished is not None:
+                    root.finished.append(span)
+            return
+        with self._lock:
+            spans, root.finished = root.finished + [span], None
+        trace = {
+            'trace_id': root.trace_id,
+            'service': root.service,
+            'root': root.name,
+            'start': round(root.start, 6),
+            'duration_ms': root.duration_ms,
+            'spans': [s.to_dict() for s in spans],
+        }
+        self._traces.append(trace)
+        if self.export_dir:
+            self._export(trace, root)
+
+    def _export(self, trace: Dict[str, Any], root: Span):
+        """Write a trace as {trace_id}-{service}-{span_id}.json"""
+        try:
+            os.makedirs(self.export_dir, exist_ok=True)
+            path = os.path.join(self.export_dir, f"{trace['trace_id']}-{root.service}-{root.span_id}.json")
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(trace, f)
+        except OSError:
+            pass  # tracing must never fail a request
+
+    def recent(self, n: int = 20) -> List[Dict[str, Any]]:
+        """The n most recent traces of this process, newest first"""
+        return list(self._traces)[::-1][:n]
+
+    def slowest(self, n: int = 10) -> List[Dict[str, Any]]:
+        """The n slowest traces in the ring buffer, with stage breakdowns"""
+        return slowest(list(self._traces), n)
+
+
+TRACER = Tracer(
+    service=os.getenv('TRACE_SERVICE', 'schooloo'),
+    buffer_size=int(os.getenv('TRACE_BUFFER_SIZE', 200)),
+    export_dir=os.getenv('TRACE_EXPORT_DIR') or None,
+    sample_rate=float(os.getenv('TRACE_SAMPLE_RATE', 1.0)),
+)
+
+
+def current_span() -> Optional[Span]:
+    """Innermost open span, if any"""
+    return _current.get()
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Trace the enclosed block as a child of the current span (or as a new trace)"""
+    s = TRACER.start_span(name, _current.get(), **attributes)
+    token = _current.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.status = 'error'
+        s.attributes['error'] = repr(e)[:200]
+        raise
+    finally:
+        _current.reset(token)
+        TRACER.end_span(s)
+
+
+def traced(name: str):
+    """Decorator form of span()"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def instrument(obj, methods: Iterable[str], prefix: str):
+    """Trace the given methods of one object as spans named prefix.method"""
+    for method in methods:
+        setattr(obj, method, traced(f"{prefix}.{method}")(getattr(obj, method)))
+    return obj
+
+
+def inject(headers: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """headers plus the traceparent of the current span, for an outgoing request"""
+    headers = dict(headers or {})
+    current = _current.get()
+    if current is not None:
+        headers[TRACEPARENT] = current.traceparent()
+    return headers
+
+
+def propagate(func):
+    """func bound to the caller's current span, for running on pool threads
+
+    Only the span is carried over: other context (such as the request's
+    RequestTimer) is not thread-safe and stays with the calling thread.
+    """
+    parent = _current.get()
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        return contextvars.Context().run(_run_under, parent, func, args, kwargs)
+    return wrapper
+
+
+def _run_under(parent: Optional[Span], func, args, kwargs):
+    """Call func with parent as the current span (inside a fresh context)"""
+    _current.set(parent)
+    return func(*args, **kwargs)
+
+
+def init_app(app, service: str = 'backend'):
+    """Continue incoming traces in a Flask app: one server span per request"""
+    from flask import g, request
+
+    @app.before_request
+    def start_server_span():
+        route = request.url_rule.rule if request.url_rule else request.path
+        s = TRACER.start_span(f"{request.method} {route}", extract(request.headers), service)
+        g.trace_span, g.trace_token = s, _current.set(s)
+
+    @app.after_request
+    def tag_server_span(response):
+        s = g.get('trace_span')
+        if s is not None:
+            s.set(status_code=response.status_code)
+            if response.status_code >= 500:
+                s.status = 'error'
+        return response
+
+    @app.teardown_request
+    def end_server_span(error=None):
+        s = g.pop('trace_span', None)
+        if s is not None:
+            _current.reset(g.pop('trace_token'))
+            TRACER.end_span(s)
+
+    return app
+
+
+def init_aiohttp(app, service: str = 'chat'):
+    """init_app for an aiohttp application: one server span per request"""
+    from aiohttp import web
+
+    @web.middleware
+    async def server_span(request, handler):
+        resource = request.match_info.route.resource
+        route = resource.canonical if resource else request.path
+        s = TRACER.start_span(f"{request.method} {route}", extract(request.headers), service)
+        token = _current.set(s)
+        status = 500
+        try:
+            response = await handler(request)
+            status = response.status
+            return response
+        except web.HTTPException as e:
+            status = e.status
+            raise
+        finally:
+            s.set(status_code=status)
+            if status >= 500:
+                s.status = 'error'
+            _current.reset(token)
+            TRACER.end_span(s)
+
+    app.middlewares.append(server_span)
+    return app
+
+
+def load_exported(directory: str) -> List[Dict[str, Any]]:
+    """Traces from exported files, with the parts from each process merged by trace id"""
+    parts: Dict[str, List[Dict[str, Any]]] = {}
+    for name in os.listdir(directory):
+        if name.endswith('.json'):
+            try:
+                with open(os.path.join(directory, name), encoding='utf-8') as f:
+                    trace = json.load(f)
+            except (OSError, ValueError):
+                continue
+            parts.setdefault(trace['trace_id'], []).append(trace)
+    traces = []
+    for trace_id, pieces in parts.items():
+        spans = [s for piece in pieces for s in piece['spans']]
+        ids = {s['span_id'] for s in spans}
+        roots = sorted((s for s in spans if s['parent_id'] not in ids), key=lambda s: s['start'])
+        root = roots[0]
+        traces.append({
+            'trace_id': trace_id,
+            'service': root['service'],
+            'root': root['name'],
+            'start': root['start'],
+            'duration_ms': root['duration_ms'],
+            'spans': spans,
+        })
+    return traces
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the slowest exported traces and where their time went")
+    parser.add_argument("directory", help="TRACE_EXPORT_DIR of the traced processes")
+    parser.add_argument("--slowest", type=int, default=10, help="Number of traces to show")
+    args = parser.parse_args()
+    print(json.dumps(slowest(load_exported(args.directory), args.slowest), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Per-message overhead of SchoolooAgent.chat before and after model reuse
+
+Measures only the client-side setup that happens before a request is sent
+(no network calls):
+  - rebuilt: build the tool dict list and a new GenerativeModel every message
+  - cached:  fetch the shared model for the configuration
+  - grounding: the catalog records advanced_agent.py adds to its system
+    prompt per message, over the two sample schools plus --schools
+    synthetic ones from backend/catalog_generator.py
+
+Run: python benchmarks/bench_agent_overhead.py --messages 2000
+     python benchmarks/bench_agent_overhead.py --schools 20000
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'agent'))
+sys.path.append(os.path.join(ROOT, 'backend'))
+
+import google.generativeai as genai
+import schooloo_agent
+from catalog_generator import CatalogGenerator, load_into
+from database import db
+from retrieval import get_index, grounded_prompt
+from tool_registry import TOOL_SPECS
+
+QUESTIONS = ["fees at {}", "documents needed for admission at {}", "is there an entrance exam at {}",
+             "Which school has a swimming pool?", "Best schools in Delhi"]
+
+
+def rebuilt_per_message(model_name: str):
+    """The old path: fresh tool dicts and a fresh model for every message"""
+    tools = [spec.schema() for spec in TOOL_SPECS]
+    return genai.GenerativeModel(model_name=model_name, tools=tools,
+                                 system_instruction=schooloo_agent.SYSTEM_INSTRUCTION)
+
+
+def time_per_call(fn, messages: int) -> float:
+    """Average microseconds per call"""
+    started = time.perf_counter()
+    for _ in range(messages):
+        fn()
+    return (time.perf_counter() - started) / messages * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-message agent setup overhead")
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--model", default=os.getenv('AGENT_MODEL', 'gemini-1.5-pro'))
+    parser.add_argument("--schools", type=int, default=2000, help="Synthetic schools added to the catalog")
+    args = parser.parse_args()
+
+    genai.configure(api_key=os.getenv('API_KEY', 'benchmark-key'))
+
+    started = time.perf_counter()
+    schooloo_agent.get_model(args.model)
+    first_build_us = (time.perf_counter() - started) * 1e6
+
+    rebuilt_us = time_per_call(lambda: rebuilt_per_message(args.model), args.messages)
+    cached_us = time_per_call(lambda: schooloo_agent.get_model(args.model), args.messages)
+
+    load_into(db, args.schools)
+    generator = CatalogGenerator()
+    names = ["DPS"] + [generator.school(n).name for n in range(0, args.schools, max(1, args.schools // 50))]
+    messages = [q.format(name) for name in names for q in QUESTIONS]
+    get_index().context_block("warm up")
+    replay = itertools.cycle(messages)
+    grounding_us = time_per_call(lambda: grounded_prompt(schooloo_agent.SYSTEM_INSTRUCTION, next(replay)),
+                                 args.messages)
+
+    print(json.dumps({
+        "messages": args.messages,
+        "schools": len(db.schools),
+        "tools": len(TOOL_SPECS),
+        "first_build_us": round(first_build_us, 1),
+        "rebuilt_per_message_us": round(rebuilt_us, 1),
+        "cached_per_message_us": round(cached_us, 3),
+        "saved_per_message_us": round(rebuilt_us - cached_us, 1),
+        "grounding_per_message_us": round(grounding_us, 1),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Cold-start time of the serverless entry points
+
+Starts a fresh interpreter per run with `python -X importtime`, loads an
+entry point the way Vercel does (api/index.py, wsgi.py) and serves the
+first /api/health through the Flask test client. Reports per entry the
+median import and first-request times, the process wall time, and the
+modules that cost the most to import, and fails when import plus first
+request is over the budget (COLD_START_BUDGET_MS, default 400 ms).
+
+With --chat the first run also answers a message through the fake model
+and later runs show whether the warm snapshot (WARM_SNAPSHOT_PATH, a
+temporary file here) let them answer it from cache.
+
+Run: python benchmarks/bench_cold_start.py
+     python benchmarks/bench_cold_start.py --entries api/index.py --runs 10 --chat "CBSE schools in Pune"
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+DEFAULT_ENTRIES = ['api/index.py', 'wsgi.py']
+
+# Runs in the fresh interpreter: argv is the entry file and an optional chat message
+CHILD = r'''
+import importlib.util, json, sys, time
+started = time.perf_counter()
+spec = importlib.util.spec_from_file_location("entry", sys.argv[1])
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+imported = time.perf_counter()
+client = module.app.test_client()
+status = client.get("/api/health").status_code
+served = time.perf_counter()
+report = {"import_ms": (imported - started) * 1000, "health_ms": (served - imported) * 1000,
+          "health_status": status, "gemini_imported": "google.generativeai" in sys.modules}
+if len(sys.argv) > 2:
+    response = client.post("/api/chat", json={"message": sys.argv[2]})
+    report["chat_ms"] = (time.perf_counter() - served) * 1000
+    report["chat_cached"] = (response.get_json() or {}).get("cached")
+print(json.dumps(report))
+'''
+
+
+def parse_importtime(stderr: str):
+    """(self us, cumulative us, depth, module) for each line of -X importtime output"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(own), int(cumulative), (len(name) - len(name.lstrip()) - 1) // 2, name.strip()))
+    return rows
+
+
+def heaviest(rows, top: int):
+    """Top-level imports made after interpreter startup, and the modules with the most self time"""
+    site = [i for i, (_, _, depth, name) in enumerate(rows) if depth == 0 and name == 'site']
+    after_site = rows[site[-1] + 1:] if site else rows
+    top_level = sorted((r for r in after_site if r[2] == 0), key=lambda r: -r[1])[:top]
+    by_self = sorted(after_site, key=lambda r: -r[0])[:top]
+    return {
+        "top_level_ms": {name: round(cum / 1000, 1) for _, cum, _, name in top_level},
+        "self_ms": {name: round(own / 1000, 1) for own, _, _, name in by_self},
+    }
+
+
+def run_once(entry: str, env, chat=None):
+    """One fresh process: its own report, wall time and import timings"""
+    args = [sys.executable, "-X", "importtime", "-W", "ignore", "-c", CHILD, os.path.join(ROOT, entry)]
+    if chat:
+        args.append(chat)
+    started = time.perf_counter()
+    proc = subprocess.run(args, cwd=ROOT, env=env, capture_output=True, text=True, timeout=120)
+    wall_ms = (time.perf_counter() - started) * 1000
+    if proc.returncode != 0:
+        raise RuntimeError(f"{entry} failed to start:\n{proc.stderr[-2000:]}")
+    report = json.loads(proc.stdout.strip().splitlines()[-1])
+    report["wall_ms"] = wall_ms
+    return report, parse_importtime(proc.stderr)
+
+
+def bench_entry(entry: str, runs: int, top: int, chat=None):
+    """Median timings over fresh processes, warm snapshot shared between them"""
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ)
+        env.setdefault('API_KEY', 'cold-start-benchmark')
+        env['WARM_SNAPSHOT_PATH'] = os.path.join(tmp, 'warm.pickle')
+        env.setdefault('REQUEST_TIMING_LOG', 'false')
+        if chat:
+            env['SCHOOLOO_FAKE_LLM'] = '1'
+            env.setdefault('FAKE_LLM_LATENCY_MS', 'fixed:0')
+        reports, rows = [], None
+        for _ in range(runs):
+            report, rows = run_once(entry, env, chat)
+            reports.append(report)
+
+    def median(key):
+        return round(statistics.median(r[key] for r in reports), 1)
+
+    result = {
+        "runs": runs,
+        "import_ms": median("import_ms"),
+        "health_ms": median("health_ms"),
+        "cold_start_ms": round(statistics.median(r["import_ms"] + r["health_ms"] for r in reports), 1),
+        "process_wall_ms": median("wall_ms"),
+        "gemini_imported": any(r["gemini_imported"] for r in reports),
+        "imports": heaviest(rows, top),
+    }
+    if chat:
+        result["first_chat_ms"] = round(reports[0]["chat_ms"], 1)
+        result["warm_chat_ms"] = median("chat_ms") if runs == 1 else round(
+            statistics.median(r["chat_ms"] for r in reports[1:]), 1)
+        result["warm_runs_cached"] = sum(bool(r["chat_cached"]) for r in reports[1:])
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure serverless cold-start time")
+    parser.add_argument("--entries", default=",".join(DEFAULT_ENTRIES), help="Comma-separated entry files")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes per entry")
+    parser.add_argument("--top", type=int, default=10, help="Modules to list per report")
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv('COLD_START_BUDGET_MS', 400)),
+                        help="Median import + first request must stay under this")
+    parser.add_argument("--chat", help="Also send this message once per run (fake model) to exercise the warm snapshot")
+    args = parser.parse_args()
+
+    results = {entry: bench_entry(entry, args.runs, args.top, args.chat) for entry in args.entries.split(",")}
+    over = [f"{entry}: {r['cold_start_ms']} ms" for entry, r in results.items() if r["cold_start_ms"] > args.budget_ms]
+    report = {"budget_ms": args.budget_ms, "results": results, "over_budget": over}
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    with open(os.path.join(RESULTS_DIR, 'cold_start-latest.json'), 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+    if over:
+        print(f"❌ Over the {args.budget_ms:.0f} ms cold-start budget: {', '.join(over)}", file=sys.stderr)
+        sys.exit(1)
+    print(f"✅ Cold start within {args.budget_ms:.0f} ms", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
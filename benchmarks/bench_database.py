@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for DatabaseManager lookups and record serialization
+
+Grows one in-memory catalog from backend/catalog_generator.py through each
+size (schools, with as many leads and about 1.5 FAQs per school) and times
+every DatabaseManager call and to_dict at that size: ops/second (best of
+several timeit repeats, gc off) plus the bytes and blocks one call
+allocates, traced with tracemalloc.
+
+Runs are saved to benchmarks/results/database-latest.json and compared
+with the committed baseline in benchmarks/baselines/database.json; pass
+--save-baseline after an intentional change (a new index, a different
+storage layout) to record the new numbers. The same checks run under
+pytest with `python -m pytest test_performance.py --perf`.
+
+Run: python benchmarks/bench_database.py
+     python benchmarks/bench_database.py --sizes 1000,10000,100000,1000000   # 1M needs ~4 GB RAM
+     python benchmarks/bench_database.py --only get_school_by_id,create_lead --save-baseline
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import sys
+import time
+import timeit
+import tracemalloc
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines', 'database.json')
+sys.path.append(os.path.join(ROOT, 'backend'))
+
+from catalog_generator import CatalogGenerator, add_records, empty_db
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+POOL = 1000  # distinct arguments cycled through by the per-record operations
+
+
+def grow(db, generator, start: int, stop: int):
+    """Add schools, admissions, FAQs and leads start..stop-1 of the generated catalog"""
+    def records():
+        for i in range(start, stop):
+            school = generator.school(i)
+            yield "school", school
+            yield "admission", generator.admission(i)
+            for faq in generator.faqs(i, school):
+                yield "faq", faq
+            yield "lead", generator.lead(i, stop)
+    return add_records(db, records())
+
+
+def operations(db, generator, size: int):
+    """name -> zero-argument call exercising one DatabaseManager method at this size"""
+    step = max(1, size // POOL)
+    ids = itertools.cycle([generator.school_id(i) for i in range(0, size, step)])
+    schools = itertools.cycle([db.schools[generator.school_id(i)] for i in range(0, size, step)])
+    leads = itertools.cycle(list(itertools.islice(db.leads.values(), POOL)))
+    faqs = itertools.cycle(list(itertools.islice(db.faqs.values(), POOL)))
+    # Fresh ids beyond the catalog; after the first lap they overwrite, so the table size stays put
+    new_leads = itertools.cycle([generator.lead(size + i, size) for i in range(POOL)])
+    return {
+        "get_schools_by_location": lambda: db.get_schools_by_location("Pune"),
+        "get_school_by_id": lambda: db.get_school_by_id(next(ids)),
+        "get_faqs_by_category": lambda: db.get_faqs_by_category("parent"),
+        "get_all_leads": lambda: db.get_all_leads(),
+        "School.to_dict": lambda: next(schools).to_dict(),
+        "FAQ.to_dict": lambda: next(faqs).to_dict(),
+        "Lead.to_dict": lambda: next(leads).to_dict(),
+        # Last, so the leads it adds do not change get_all_leads
+        "create_lead": lambda: db.create_lead(next(new_leads)),
+    }
+
+
+def measure(call, repeat: int = 5, samples: int = 20):
+    """ops/second and allocations per call of a zero-argument callable"""
+    timer = timeit.Timer(call)
+    number, _ = timer.autorange()
+    best = min(timer.repeat(repeat, number)) / number
+
+    kept = [None] * samples
+    peaks = 0
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        for n in range(samples):
+            current = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            kept[n] = call()
+            peaks += tracemalloc.get_traced_memory()[1] - current
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    diff = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "filename")
+    return {
+        "ops_per_sec": round(1 / best, 1),
+        "us_per_op": round(best * 1e6, 3),
+        "alloc_bytes": round(peaks / samples),
+        "alloc_blocks": round(sum(stat.count_diff for stat in diff) / samples, 1),
+    }
+
+
+def run(sizes, only=None, seed: int = 42, log=None):
+    """Benchmark results by size and operation"""
+    generator = CatalogGenerator(seed)
+    db = empty_db()
+    results, built = {}, 0
+    for size in sorted(sizes):
+        started = time.perf_counter()
+        grow(db, generator, built, size)
+        built = size
+        if log:
+            log(f"  {size} schools generated in {time.perf_counter() - started:.1f}s")
+        results[str(size)] = {}
+        for name, call in operations(db, generator, size).items():
+            if only and name not in only:
+                continue
+            results[str(size)][name] = measure(call)
+            if log:
+                stats = results[str(size)][name]
+                log(f"  {size:>8} {name:<24} {stats['ops_per_sec']:>12,.0f} ops/s "
+                    f"{stats['alloc_bytes']:>10,} B {stats['alloc_blocks']:>8} blocks")
+        # New leads from this size would otherwise skew the next one
+        for i in range(POOL):
+            db.leads.pop(generator.lead(size + i, size).id, None)
+    return results
+
+
+def compare(baseline, current, threshold: float = 0.3, alloc_threshold: float = 0.1, min_alloc_bytes: int = 256):
+    """Operations slower or allocating more than the baseline, beyond the thresholds
+
+    An operation regressed when its ops/second fell by more than threshold,
+    or its bytes per call grew by more than alloc_threshold and by more
+    than min_alloc_bytes (so a few bytes of interpreter noise are ignored).
+    """
+    regressions = []
+    for size, ops in current.items():
+        for name, now in ops.items():
+            before = baseline.get(size, {}).get(name)
+            if before is None:
+                continue
+            if now["ops_per_sec"] < before["ops_per_sec"] * (1 - threshold):
+                regressions.append(f"{size} {name}: {now['ops_per_sec']:,.0f} ops/s, "
+                                   f"baseline {before['ops_per_sec']:,.0f}")
+            growth = now["alloc_bytes"] - before["alloc_bytes"]
+            if growth > min_alloc_bytes and growth > before["alloc_bytes"] * alloc_threshold:
+                regressions.append(f"{size} {name}: {now['alloc_bytes']:,} B/call, "
+                                   f"baseline {before['alloc_bytes']:,}")
+    return regressions
+
+
+def load_baseline(path: str = BASELINE_PATH):
+    """Results stored by --save-baseline, or {} if there are none"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)["results"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark DatabaseManager operations")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="Comma-separated catalog sizes")
+    parser.add_argument("--only", help="Comma-separated operation names")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--threshold", type=float, default=0.3, help="Relative ops/s drop counted as a regression")
+    parser.add_argument("--alloc-threshold", type=float, default=0.1,
+                        help="Relative growth in bytes per call counted as a regression")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Merge this run into the baseline")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    only = set(args.only.split(",")) if args.only else None
+    results = run(sizes, only, args.seed, log=lambda line: print(line, file=sys.stderr))
+    report = {
+        "meta": {
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "seed": args.seed,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+        },
+        "results": results,
+    }
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    with open(os.path.join(RESULTS_DIR, 'database-latest.json'), 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    baseline = load_baseline(args.baseline)
+    report["regressions"] = compare(baseline, results, args.threshold, args.alloc_threshold)
+    print(json.dumps(report, indent=2))
+
+    if args.save_baseline:
+        for size, ops in results.items():
+            baseline.setdefault(size, {}).update(ops)
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({"meta": report["meta"], "results": baseline}, f, indent=2)
+        print(f"✅ Baseline saved to {args.baseline}", file=sys.stderr)
+    elif report["regressions"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Prompt size and latency of long sessions with and without history management
+
+Replays scripted sessions (no network calls) and compares, per turn:
+  - naive:   system prompt plus every earlier message, as the agents used to send
+  - managed: ConversationHistory with recent turns verbatim and a rolling summary
+
+Latency is the client-side build time plus a modeled prefill time at a
+given input-token throughput, since prefill grows with prompt length.
+
+Run: python benchmarks/bench_history.py --turns 50 --sessions 20
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'agent'))
+
+from history import ConversationHistory, estimate_tokens
+
+SYSTEM_PROMPT = ("You are Schooloo AI Assistant - an expert school discovery assistant for India. "
+                 "Provide real school names, fees (in ₹), boards and facilities. ") * 8
+
+CITIES = ["Delhi", "Mumbai", "Prayagraj", "Pune", "Bangalore", "Lucknow"]
+QUESTIONS = [
+    "What are the best CBSE schools in {city}?",
+    "What is the fee structure for Delhi Public School in {city}?",
+    "Which schools in {city} have a swimming pool and hostel?",
+    "What documents do I need for admission in {city}?",
+    "Compare the top two ICSE schools in {city} for class 6",
+]
+
+
+def fake_answer(rng: random.Random, question: str) -> str:
+    """A reply of typical length for a school question"""
+    lines = [f"Here is what I found for: {question}"]
+    lines += [f"{i}. School {rng.randint(1, 999)} - CBSE, ₹{rng.randint(50, 300)}K/year, "
+              f"smart classes, labs, sports ground, transport" for i in range(1, rng.randint(6, 12))]
+    return "\n".join(lines)
+
+
+def run_session(turns: int, seed: int, recent: int, budget: int):
+    """Per-turn (naive_tokens, managed_tokens, naive_build_us, managed_build_us)"""
+    rng = random.Random(seed)
+    naive = []
+    managed = ConversationHistory(max_recent_turns=recent, max_prompt_tokens=budget)
+    rows = []
+    for _ in range(turns):
+        question = rng.choice(QUESTIONS).format(city=rng.choice(CITIES))
+
+        started = time.perf_counter()
+        naive_contents = [{"role": "user", "parts": [SYSTEM_PROMPT]}] + naive + \
+            [{"role": "user", "parts": [question]}]
+        naive_us = (time.perf_counter() - started) * 1e6
+
+        started = time.perf_counter()
+        managed_contents = managed.build_contents(SYSTEM_PROMPT, question)
+        managed_us = (time.perf_counter() - started) * 1e6
+
+        rows.append((
+            sum(estimate_tokens(c["parts"][0]) for c in naive_contents),
+            sum(estimate_tokens(c["parts"][0]) for c in managed_contents),
+            naive_us, managed_us,
+        ))
+
+        answer = fake_answer(rng, question)
+        naive += [{"role": "user", "parts": [question]}, {"role": "model", "parts": [answer]}]
+        managed.add("user", question)
+        managed.add("model", answer)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark managed vs naive conversation history")
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--recent-turns", type=int, default=6)
+    parser.add_argument("--budget", type=int, default=6000, help="Prompt token budget")
+    parser.add_argument("--prefill-tokens-per-sec", type=float, default=5000,
+                        help="Input-token throughput used to model prefill latency")
+    args = parser.parse_args()
+
+    rows = [row for seed in range(args.sessions)
+            for row in run_session(args.turns, seed, args.recent_turns, args.budget)]
+    last = rows[args.turns - 1::args.turns]
+
+    def summarize(index, build_index):
+        tokens = [r[index] for r in rows]
+        return {
+            "mean_prompt_tokens": round(statistics.mean(tokens)),
+            "max_prompt_tokens": max(tokens),
+            "final_turn_prompt_tokens": round(statistics.mean(r[index] for r in last)),
+            "total_prompt_tokens_per_session": round(sum(tokens) / args.sessions),
+            "mean_build_us": round(statistics.mean(r[build_index] for r in rows), 1),
+            "mean_modeled_prefill_ms": round(statistics.mean(tokens) / args.prefill_tokens_per_sec * 1000, 1),
+        }
+
+    naive, managed = summarize(0, 2), summarize(1, 3)
+    print(json.dumps({
+        "turns": args.turns,
+        "sessions": args.sessions,
+        "budget": args.budget,
+        "naive": naive,
+        "managed": managed,
+        "token_reduction": round(1 - managed["total_prompt_tokens_per_session"]
+                                 / naive["total_prompt_tokens_per_session"], 3),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
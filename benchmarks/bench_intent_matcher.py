@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Throughput of the compiled intent matcher against substring chains
+
+Classifies a query log with each QueryProcessor intent table, and with all
+of them merged into one table, three ways: the substring `in` chain the
+processors used to run (rebuilt from the same table), IntentMatcher.match
+per query, and the IntentMatcher.count batch API. Reports queries per
+second and how often the chain and the matcher agree (they differ where a
+keyword only occurs inside another word, e.g. "fee" in "coffee").
+
+The log is synthetic and seeded unless --log names a file with one query
+per line or JSONL with a "message" or "query" field.
+
+Run: python benchmarks/bench_intent_matcher.py
+     python benchmarks/bench_intent_matcher.py --queries 3000000 --log logs/queries.jsonl
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'agent'))
+
+from intent_matcher import Intent, IntentMatcher
+from query_processor import ADMIN_INTENTS, PARENT_INTENTS, STUDENT_INTENTS
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+TEMPLATES = [
+    "What are the best schools in {city}?",
+    "top schools near me in {city} with low fees",
+    "fee structure and transport cost at {school}",
+    "What documents are required for admission to {school}?",
+    "Is there an entrance exam for class {grade} at {school}",
+    "compare {school} and {other} on facilities and hostel",
+    "Am I eligible for class {grade}? what is the eligibility",
+    "Show school details for {school}",
+    "view all new leads from {city}",
+    "update lead status for {name}",
+    "add a new FAQ about the dress code",
+    "Which {board} school in {city} has a swimming pool?",
+    "my child likes coffee and chess, any school with a good library",
+    "how do I apply to {school} for {board}",
+]
+FILL = {
+    'city': ["Delhi", "Bangalore", "Pune", "Prayagraj", "Mumbai", "Chennai"],
+    'school': ["DPS", "Greenfield Public School", "Delhi Public School", "St. Mary's"],
+    'other': ["Greenfield", "DPS", "Kendriya Vidyalaya"],
+    'grade': [str(n) for n in range(1, 13)],
+    'board': ["CBSE", "ICSE", "IB", "State board"],
+    'name': ["Asha", "Rahul", "Meera", "Vikram"],
+}
+
+
+def synthetic_log(n: int, seed: int):
+    """n queries from the templates, reproducible per seed"""
+    rng = random.Random(seed)
+    return [rng.choice(TEMPLATES).format(**{k: rng.choice(v) for k, v in FILL.items()}) for _ in range(n)]
+
+
+def read_log(path: str, limit: int):
+    """Queries from a text or JSONL log, repeated up to limit"""
+    queries = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('{'):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                line = record.get('message') or record.get('query') or ''
+            if line:
+                queries.append(line)
+    if not queries:
+        raise SystemExit(f"No queries in {path}")
+    return (queries * (limit // len(queries) + 1))[:limit]
+
+
+def substring_chain(intents):
+    """The `in` checks a processor ran for this table, as one function"""
+    rules = [(i.name, tuple(k.lower() for k in i.keywords), tuple(k.lower() for k in i.requires), i.group)
+             for i in intents]
+
+    def classify(text: str):
+        lower = text.lower()
+        names, groups = [], set()
+        for name, keywords, requires, group in rules:
+            if group in groups:
+                continue
+            if any(k in lower for k in keywords) and (not requires or any(k in lower for k in requires)):
+                names.append(name)
+                if group is not None:
+                    groups.add(group)
+        return tuple(names)
+    return classify
+
+
+def rate(seconds: float, n: int) -> int:
+    return int(n / seconds) if seconds else 0
+
+
+def bench_table(intents, queries):
+    """Queries per second of each method and the chain/matcher agreement"""
+    chain = substring_chain(intents)
+    matcher = IntentMatcher(intents)
+
+    started = time.perf_counter()
+    expected = [chain(q) for q in queries]
+    chain_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    found = [matcher.match(q) for q in queries]
+    match_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    counts = matcher.count(queries)
+    count_s = time.perf_counter() - started
+
+    agree = sum(tuple(f) == e for f, e in zip(found, expected))
+    return {
+        "keywords": len({k for i in intents for k in i.keywords + i.requires}),
+        "substring_chain_qps": rate(chain_s, len(queries)),
+        "match_qps": rate(match_s, len(queries)),
+        "batch_count_qps": rate(count_s, len(queries)),
+        "agreement": round(agree / len(queries), 4),
+        "top_intents": dict(Counter(counts).most_common(5)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark intent matching over a query log")
+    parser.add_argument("--queries", type=int, default=1_000_000, help="Queries to classify per table")
+    parser.add_argument("--log", help="Query log to replay instead of synthetic queries")
+    parser.add_argument("--seed", type=int, default=7, help="Seed of the synthetic log")
+    args = parser.parse_args()
+
+    queries = read_log(args.log, args.queries) if args.log else synthetic_log(args.queries, args.seed)
+    tables = {
+        "parent": PARENT_INTENTS.intents,
+        "student": STUDENT_INTENTS.intents,
+        "admin": ADMIN_INTENTS.intents,
+    }
+    tables["all"] = tuple(Intent(f"{role}.{i.name}", i.keywords, i.requires, i.group and f"{role}.{i.group}")
+                          for role, intents in list(tables.items()) for i in intents)
+
+    results = {}
+    for name, intents in tables.items():
+        results[name] = bench_table(intents, queries)
+        print(f"✅ {name}: {results[name]['match_qps']:,} q/s matched, "
+              f"{results[name]['substring_chain_qps']:,} q/s substring chain", file=sys.stderr)
+
+    report = {"queries": len(queries), "source": args.log or f"synthetic seed {args.seed}", "tables": results}
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    with open(os.path.join(RESULTS_DIR, 'intent_matcher-latest.json'), 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Share of chat traffic the local router answers, and how fast
+
+Replays a mix of structured and open-ended questions through LocalRouter
+(no network) and prints its stats: local vs LLM share, the share answered
+in under 10 ms, and latency percentiles of local answers. The catalog is
+the two sample schools plus --schools synthetic ones from
+backend/catalog_generator.py, and the mix also asks about some of those.
+
+Run: python benchmarks/bench_local_router.py --repeat 200
+     python benchmarks/bench_local_router.py --schools 20000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'agent'))
+sys.path.append(os.path.join(ROOT, 'backend'))
+
+from catalog_generator import CatalogGenerator, load_into
+from database import db
+from local_router import LocalRouter
+
+TRAFFIC = [
+    "fees at DPS",
+    "What is the fee structure of Greenfield?",
+    "documents for Greenfield",
+    "documents needed for admission at Delhi Public School",
+    "is there an entrance exam at DPS",
+    "eligibility for greenfield",
+    "Best schools in Delhi",
+    "Is there an entrance exam?",
+    "compare DPS and Greenfield",
+    "Which school has a swimming pool in Bangalore?",
+    "CBSE schools in Prayagraj under 2 lakh",
+    "hostel at greenfield",
+]
+
+
+def generated_traffic(schools: int, count: int = 6, seed: int = 7):
+    """Questions about some of the synthetic schools"""
+    generator, rng = CatalogGenerator(), random.Random(seed)
+    names = [generator.school(rng.randrange(schools)).name for _ in range(count)] if schools else []
+    templates = ["fees at {}", "documents for {}", "eligibility for {}"]
+    return [templates[n % len(templates)].format(name) for n, name in enumerate(names)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the local answer path")
+    parser.add_argument("--repeat", type=int, default=200, help="Times to replay the traffic mix")
+    parser.add_argument("--schools", type=int, default=2000, help="Synthetic schools added to the catalog")
+    args = parser.parse_args()
+
+    load_into(db, args.schools)
+    traffic = TRAFFIC + generated_traffic(args.schools)
+    router = LocalRouter(db)
+    started = time.perf_counter()
+    router.warm()
+    build_ms = (time.perf_counter() - started) * 1000
+    for _ in range(args.repeat):
+        for message in traffic:
+            router.answer(message)
+
+    print(json.dumps({"schools": len(db.schools), "index_build_ms": round(build_ms, 1), **router.stats()}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
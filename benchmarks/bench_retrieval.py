@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Prompt tokens per request with retrieval-grounded prompts
+
+Builds the first-turn Gemini contents for a mix of chat questions the way
+app.py does now (short system prompt plus the relevant catalog records) and
+compares the prompt size with the old static prompts. Also reports how long
+retrieval takes per message. The catalog is the two sample schools plus
+--schools synthetic ones from backend/catalog_generator.py, and the mix
+also asks about some of those. No network.
+
+Run: python benchmarks/bench_retrieval.py --repeat 200
+     python benchmarks/bench_retrieval.py --schools 20000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'agent'))
+sys.path.append(os.path.join(ROOT, 'backend'))
+
+from catalog_generator import CatalogGenerator, load_into
+from database import db
+from history import estimate_tokens
+from retrieval import DEFAULT_CONTEXT_TOKENS, get_index, grounded_prompt
+
+# Sizes of the static system prompts before retrieval (characters)
+OLD_PROMPT_CHARS = {"app.py": 951, "advanced_agent.py": 1788}
+
+TRAFFIC = [
+    "fees at DPS",
+    "What is the fee structure of Greenfield?",
+    "documents needed for admission at Delhi Public School",
+    "is there an entrance exam at DPS",
+    "compare DPS and Greenfield",
+    "Which school has a swimming pool?",
+    "Are hostels available in Bangalore?",
+    "Do you provide transportation?",
+    "Best schools in Delhi",
+    "CBSE schools in Prayagraj under 2 lakh",
+    "How do I choose between CBSE and ICSE?",
+    "What should I ask on a school visit?",
+]
+
+
+def generated_traffic(schools: int, count: int = 6, seed: int = 7):
+    """Questions about some of the synthetic schools"""
+    generator, rng = CatalogGenerator(), random.Random(seed)
+    names = [generator.school(rng.randrange(schools)).name for _ in range(count)] if schools else []
+    templates = ["fees at {}", "documents needed for admission at {}", "does {} have a hostel?"]
+    return [templates[n % len(templates)].format(name) for n, name in enumerate(names)]
+
+
+def read_prompt(path, marker):
+    """The triple-quoted system prompt assigned after marker in a source file"""
+    with open(os.path.join(ROOT, path), encoding='utf-8') as f:
+        source = f.read()
+    start = source.index(marker) + len(marker)
+    return source[start:source.index('"""', start)]
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark retrieval-grounded prompt size")
+    parser.add_argument("--repeat", type=int, default=200, help="Times to replay the mix for latency")
+    parser.add_argument("--budget", type=int, default=DEFAULT_CONTEXT_TOKENS, help="Context token budget")
+    parser.add_argument("--schools", type=int, default=2000, help="Synthetic schools added to the catalog")
+    args = parser.parse_args()
+
+    load_into(db, args.schools)
+    traffic = TRAFFIC + generated_traffic(args.schools)
+
+    prompts = {
+        "app.py": read_prompt("app.py", 'system_prompt = """'),
+        "advanced_agent.py": read_prompt("advanced_agent.py", 'self.system_prompt = """'),
+    }
+    index = get_index()
+    started = time.perf_counter()
+    index.context_block("warm up")
+    build_ms = (time.perf_counter() - started) * 1000
+
+    report = {"schools": len(db.schools), "index_build_ms": round(build_ms, 1)}
+    for name, prompt in prompts.items():
+        sizes = [estimate_tokens(grounded_prompt(prompt, message, args.budget)) for message in traffic]
+        old = OLD_PROMPT_CHARS[name] // 4
+        report[name] = {
+            "old_static_tokens": old,
+            "grounded_tokens_mean": round(sum(sizes) / len(sizes), 1),
+            "grounded_tokens_max": max(sizes),
+            "reduction": round(1 - sum(sizes) / len(sizes) / old, 3),
+        }
+
+    latencies = []
+    for _ in range(args.repeat):
+        for message in traffic:
+            started = time.perf_counter()
+            index.context_block(message, args.budget)
+            latencies.append((time.perf_counter() - started) * 1000)
+    report["grounded_messages"] = sum(1 for m in traffic if index.context_block(m, args.budget))
+    report["messages"] = len(traffic)
+    report["retrieval_ms"] = {"p50": round(percentile(latencies, 50), 3), "p99": round(percentile(latencies, 99), 3)}
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Offline evaluation of the semantic answer cache
+
+Each labeled pair says whether the second query may be answered with the
+cached answer of the first. For every threshold the harness reports hit
+precision (cached answers that were right to serve) and recall (paraphrases
+that were served from cache), so the threshold can be tuned without
+spending quota.
+
+Run: python benchmarks/eval_semantic_cache.py [--pairs pairs.jsonl]
+A pairs file has one {"cached": "...", "query": "...", "same": true} per line.
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'agent'))
+
+from semantic_cache import SemanticCache, cosine, embed, entity_signature
+
+LABELED_PAIRS = [
+    ("good CBSE schools in Prayagraj", "which CBSE schools are good in Allahabad", True),
+    ("best schools in Delhi", "top schools in delhi?", True),
+    ("best schools in Delhi", "what are the best schools in New Delhi", True),
+    ("schools in Bangalore with swimming pool", "Bengaluru schools that have a swimming pool", True),
+    ("ICSE schools in Mumbai", "list ICSE schools in Bombay", True),
+    ("admission process for schools in Pune", "how does school admission work in Pune", True),
+    ("schools in Mumbai under 2 lakhs annual fee", "Mumbai schools with annual fees under 2 lakhs", True),
+    ("boarding schools in Dehradun", "residential boarding schools in Dehradun", True),
+    ("documents needed for school admission in Delhi", "documents required for admission to schools in Delhi", True),
+    ("good CBSE schools in Prayagraj", "good ICSE schools in Prayagraj", False),
+    ("best schools in Delhi", "best schools in Mumbai", False),
+    ("schools in Mumbai under 2 lakhs annual fee", "schools in Mumbai under 5 lakhs annual fee", False),
+    ("schools in Bangalore with swimming pool", "schools in Bangalore with hostel", False),
+    ("admission process for schools in Pune", "fee structure for schools in Pune", False),
+    ("girls schools in Lucknow", "boys schools in Lucknow", False),
+    ("entrance exam pattern for class 6", "entrance exam pattern for class 9", False),
+    ("best schools in Delhi", "hostel facilities in Delhi schools", False),
+    ("CBSE schools near Noida sector 62", "CBSE schools near Noida sector 18", False),
+    ("admission at DPS Dwarka", "admission at DPS Rohini", False),
+    ("fees at dps dwarka", "fees at dps rohini", False),
+    ("schools without hostel", "schools with hostel", False),
+    ("schools in Pune with no entrance exam", "schools in Pune with entrance exam", False),
+    ("worst CBSE schools in Delhi", "best CBSE schools in Delhi", False),
+    ("cheap ICSE schools in Mumbai", "expensive ICSE schools in Mumbai", False),
+    ("I want the fee details of DPS", "I do not want the fee details of DPS", False),
+    ("admission at Greenfield Public School", "admission at Sunrise Public School", False),
+]
+
+THRESHOLDS = [0.6, 0.65, 0.7, 0.75, 0.8, 0.85, 0.9, 0.95]
+
+
+def load_pairs(path):
+    """Read labeled pairs from a JSONL file"""
+    pairs = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                pairs.append((row["cached"], row["query"], bool(row["same"])))
+    return pairs
+
+
+def evaluate(pairs, thresholds):
+    """Precision and recall of cache hits at each threshold"""
+    rows = []
+    for threshold in thresholds:
+        cache = SemanticCache(threshold=threshold)
+        tp = fp = fn = 0
+        for i, (cached, query, same) in enumerate(pairs):
+            # One namespace per pair keeps pairs from answering each other
+            cache.add(cached, "answer", namespace=str(i))
+            hit = cache.lookup(query, namespace=str(i)) is not None
+            tp += hit and same
+            fp += hit and not same
+            fn += (not hit) and same
+        rows.append({
+            "threshold": threshold,
+            "precision": round(tp / (tp + fp), 3) if tp + fp else 1.0,
+            "recall": round(tp / (tp + fn), 3) if tp + fn else 0.0,
+            "false_hits": fp,
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate semantic cache thresholds")
+    parser.add_argument("--pairs", help="JSONL file of labeled pairs (defaults to the built-in set)")
+    parser.add_argument("--verbose", action="store_true", help="Print the similarity of every pair")
+    args = parser.parse_args()
+
+    pairs = load_pairs(args.pairs) if args.pairs else LABELED_PAIRS
+
+    if args.verbose:
+        for cached, query, same in pairs:
+            gate = entity_signature(cached) == entity_signature(query)
+            print(f"{cosine(embed(cached), embed(query)):.3f} entities={'=' if gate else '!'} "
+                  f"same={same}  {cached!r} ~ {query!r}")
+
+    print(json.dumps({"pairs": len(pairs), "results": evaluate(pairs, THRESHOLDS)}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+HTTP load test for every route of the backend API and the chat app
+
+Starts backend/app.py and app.py in child processes (the chat app on the
+local Gemini stand-in, so no quota is used), seeds the backend with the
+synthetic catalog from backend/catalog_generator.py, then drives each
+route in turn at the given concurrency.
+Per route it reports throughput, p50/p95/p99 latency and error rate as JSON.
+
+Each run is saved to benchmarks/results/loadtest-latest.json; the run
+before it is kept as loadtest-previous.json and compared against, so
+running the suite twice prints a regression report.
+
+Run: python benchmarks/loadtest.py --requests 200 --concurrency 16 --schools 2000
+     python benchmarks/loadtest.py --only backend --schools 20000
+     python benchmarks/loadtest.py --compare old.json new.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+import uuid
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+sys.path.append(os.path.join(ROOT, 'backend'))
+
+from catalog_generator import CITIES, CatalogGenerator, load_into
+
+# Child-process servers
+
+
+def serve(target: str, port: int, schools: int):
+    """Run one app on werkzeug's threaded server (child process mode)"""
+    import logging
+    from werkzeug.serving import make_server
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    if target == 'backend':
+        sys.path.insert(0, os.path.join(ROOT, 'backend'))
+        import app as backend_app
+        from database import db
+        load_into(db, schools, leads=schools // 10)
+        flask_app = backend_app.app
+    else:
+        sys.path.insert(0, os.path.join(ROOT, 'agent'))
+        sys.path.insert(0, ROOT)
+        import async_app  # loads app.py as chat_app without clashing with backend/app.py
+        logging.getLogger().setLevel(logging.WARNING)  # app.py logs every message at INFO
+        flask_app = async_app.chat_app.app
+    make_server('127.0.0.1', port, flask_app, threaded=True).serve_forever()
+
+
+def start_server(target: str, schools: int, fake_latency: str):
+    """Start a target as a child process; returns (process, base url)"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    env = dict(os.environ)
+    env.update({
+        'API_KEY': env.get('API_KEY', 'loadtest-key'),
+        'SCHOOLOO_FAKE_LLM': '1',
+        'FAKE_LLM_LATENCY_MS': fake_latency,
+        'GEMINI_RPM': '10000000',
+        'GEMINI_TPM': '10000000000',
+        'USAGE_LOG_PATH': '',
+        'ADMIN_TOKEN': 'loadtest-admin',
+    })
+    child = subprocess.Popen(
+        [sys.executable, '-W', 'ignore', os.path.abspath(__file__), '--serve', target,
+         '--port', str(port), '--schools', str(schools)],
+        env=env, stdout=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    health = '/health' if target == 'backend' else '/api/health'
+    for _ in range(600):
+        try:
+            urllib.request.urlopen(url + health, timeout=1)
+            return child, url
+        except OSError:
+            if child.poll() is not None:
+                break
+            time.sleep(0.1)
+    child.kill()
+    raise RuntimeError(f"{target} server did not start")
+
+
+# Scenarios: (name, method, path, json body factory or None)
+
+
+def backend_scenarios(lead_id: str, schools: int):
+    """Every backend route with a representative request"""
+    sid = lambda: CatalogGenerator().school_id(random.randrange(schools))
+    city = lambda: random.choice(CITIES)
+    return [
+        ("GET /health", "GET", "/health", None),
+        ("GET /metrics", "GET", "/metrics", None),
+        ("GET /api/schools", "GET", "/api/schools", None),
+        ("GET /api/schools/<id>", "GET", lambda: f"/api/schools/{sid()}", None),
+        ("POST /api/schools/search", "POST", "/api/schools/search", lambda: {"location": city()[0]}),
+        ("POST /api/schools/nearby", "POST", "/api/schools/nearby",
+         lambda: {"latitude": city()[2], "longitude": city()[3], "radius_km": 5}),
+        ("GET /api/admissions/<id>", "GET", lambda: f"/api/admissions/{sid()}", None),
+        ("GET /api/admissions/documents/<id>", "GET", lambda: f"/api/admissions/documents/{sid()}", None),
+        ("GET /api/admissions/exam-pattern/<id>", "GET", lambda: f"/api/admissions/exam-pattern/{sid()}", None),
+        ("GET /api/admissions/eligibility/<id>", "GET", lambda: f"/api/admissions/eligibility/{sid()}", None),
+        ("GET /api/faqs", "GET", "/api/faqs?category=parent", None),
+        ("POST /api/faqs", "POST", "/api/faqs",
+         lambda: {"question": "Is there a canteen?", "answer": "Yes.", "category": "parent"}),
+        ("POST /api/leads", "POST", "/api/leads", lambda: {
+            "name": "Load Test", "email": "lt@example.com", "phone": "+91-9000000000",
+            "school_interested": sid(), "query_type": "parent", "query_text": "Admission for KG"}),
+        ("GET /api/leads", "GET", "/api/leads", None),
+        ("PATCH /api/leads/<id>", "PATCH", f"/api/leads/{lead_id}", lambda: {"status": "contacted"}),
+        ("POST /api/schools/compare", "POST", "/api/schools/compare",
+         lambda: {"school_ids": [sid(), sid(), sid()]}),
+        ("POST /api/batch", "POST", "/api/batch", lambda: {"parallel": True, "operations": [
+            {"id": "1", "operation": "get_school_details", "params": {"school_id": sid()}},
+            {"id": "2", "operation": "get_fee_structure", "params": {"school_id": sid()}},
+            {"id": "3", "operation": "get_required_documents", "params": {"school_id": sid()}}]}),
+    ]
+
+
+def chat_scenarios():
+    """Every chat app route; chat messages mix cache hits, local answers and model calls"""
+    messages = ["Best schools in Delhi", "fees at DPS", "hostel in Bangalore"]
+    varied = lambda: f"CBSE schools in Pune under {random.randint(1, 10 ** 6)} rupees"
+    return [
+        ("GET /", "GET", "/", None),
+        ("GET /api/health", "GET", "/api/health", None),
+        ("GET /metrics", "GET", "/metrics", None),
+        ("GET /api/models", "GET", "/api/models", None),
+        ("GET /api/info", "GET", "/api/info", None),
+        ("GET /api/stats", "GET", "/api/stats", None),
+        ("POST /api/chat (repeat)", "POST", "/api/chat", lambda: {"message": random.choice(messages)}),
+        ("POST /api/chat (varied)", "POST", "/api/chat", lambda: {"message": varied()}),
+        ("POST /api/chat (session)", "POST", "/api/chat",
+         lambda: {"message": varied(), "session_id": f"lt-{random.randrange(50)}"}),
+        ("POST /api/chat/stream", "POST", "/api/chat/stream", lambda: {"message": varied()}),
+        ("DELETE /api/session/<id>", "DELETE", lambda: f"/api/session/lt-{uuid.uuid4().hex[:8]}", None),
+        ("GET /api/admin/usage", "GET", "/api/admin/usage", None),
+    ]
+
+
+# Driving
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def drive(session, url, scenario, requests, concurrency):
+    """Send requests for one scenario from concurrency workers; returns its summary"""
+    import aiohttp
+
+    name, method, path, body = scenario
+    latencies, errors, statuses = [], 0, {}
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            target = path() if callable(path) else path
+            started = time.perf_counter()
+            try:
+                async with session.request(method, url + target, json=body() if body else None,
+                                           headers={'X-Admin-Token': 'loadtest-admin'}) as response:
+                    await response.read()
+                    status = response.status
+            except (aiohttp.ClientError, asyncio.TimeoutError, OSError):
+                status = 0
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[status] = statuses.get(status, 0) + 1
+            if not 200 <= status < 300:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return name, {
+        "requests": requests,
+        "errors": errors,
+        "error_rate": round(errors / requests, 4) if requests else 0.0,
+        "throughput_rps": round(requests / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": {p: round(percentile(latencies, int(p[1:])), 2) for p in ("p50", "p95", "p99")},
+        "status_codes": {str(k): v for k, v in sorted(statuses.items())},
+    }
+
+
+async def run_target(target, url, args):
+    """Warm up and drive every scenario of one target"""
+    import aiohttp
+
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=60)) as session:
+        if target == 'backend':
+            async with session.post(url + '/api/leads', json={"name": "Seed", "query_text": "seed"}) as response:
+                lead_id = (await response.json())["data"]["id"]
+            scenarios = backend_scenarios(lead_id, max(1, args.schools))
+        else:
+            scenarios = chat_scenarios()
+        results = {}
+        for scenario in scenarios:
+            await drive(session, url, scenario, max(1, args.requests // 10), min(args.concurrency, 4))
+            name, summary = await drive(session, url, scenario, args.requests, args.concurrency)
+            results[f"{target} {name}"] = summary
+            print(f"  {target} {name}: {summary['throughput_rps']} req/s, "
+                  f"p99 {summary['latency_ms']['p99']} ms, errors {summary['errors']}", file=sys.stderr)
+        return results
+
+
+# Comparison
+
+
+def compare(previous, current, threshold, min_delta_ms=2.0):
+    """Per-endpoint change between two runs
+
+    A route regressed when its p50 or p95 grew by more than threshold (and
+    by more than min_delta_ms, so jitter on millisecond routes is ignored)
+    or its error rate went up.
+    """
+    rows, regressions = {}, []
+    for name, now in current["endpoints"].items():
+        before = previous.get("endpoints", {}).get(name)
+        if before is None:
+            continue
+
+        def change(old, new):
+            return round((new - old) / old, 4) if old else None
+
+        row = {
+            "p50_change": change(before["latency_ms"]["p50"], now["latency_ms"]["p50"]),
+            "p95_change": change(before["latency_ms"]["p95"], now["latency_ms"]["p95"]),
+            "p99_change": change(before["latency_ms"]["p99"], now["latency_ms"]["p99"]),
+            "throughput_change": change(before["throughput_rps"], now["throughput_rps"]),
+            "error_rate_change": round(now["error_rate"] - before["error_rate"], 4),
+        }
+        worse = [
+            f"{p}_change" for p in ("p50", "p95")
+            if (row[f"{p}_change"] or 0) > threshold
+            and now["latency_ms"][p] - before["latency_ms"][p] > min_delta_ms
+        ]
+        if row["error_rate_change"] > 0:
+            worse.append("error_rate_change")
+        row["regressed"] = worse
+        if worse:
+            regressions.append(name)
+        rows[name] = row
+    return {
+        "previous": previous.get("meta", {}).get("started_at"),
+        "current": current.get("meta", {}).get("started_at"),
+        "threshold": threshold,
+        "min_delta_ms": min_delta_ms,
+        "regressions": regressions,
+        "endpoints": rows,
+    }
+
+
+def save_run(run):
+    """Write the run as latest, keeping the one before it as previous"""
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    latest = os.path.join(RESULTS_DIR, 'loadtest-latest.json')
+    previous = os.path.join(RESULTS_DIR, 'loadtest-previous.json')
+    if os.path.exists(latest):
+        shutil.move(latest, previous)
+    with open(latest, 'w', encoding='utf-8') as f:
+        json.dump(run, f, indent=2)
+    return previous if os.path.exists(previous) else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test every backend and chat route")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per route")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--schools", type=int, default=2000, help="Synthetic schools seeded into the backend")
+    parser.add_argument("--only", choices=["backend", "chat"], help="Test a single app")
+    parser.add_argument("--fake-latency", default="fixed:20", help="Stand-in Gemini latency distribution")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative change counted as a regression")
+    parser.add_argument("--min-delta-ms", type=float, default=2.0,
+                        help="Smallest latency increase counted as a regression")
+    parser.add_argument("--output", help="Also write this run's JSON here")
+    parser.add_argument("--baseline", help="Compare against this run instead of the previous one")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Only compare two saved runs")
+    parser.add_argument("--serve", choices=["backend", "chat"], help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port, args.schools)
+        return
+    if args.compare:
+        with open(args.compare[0], encoding='utf-8') as f_old, open(args.compare[1], encoding='utf-8') as f_new:
+            print(json.dumps(compare(json.load(f_old), json.load(f_new), args.threshold, args.min_delta_ms), indent=2))
+        return
+
+    run = {
+        "meta": {
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "requests_per_route": args.requests,
+            "concurrency": args.concurrency,
+            "schools": args.schools,
+            "fake_latency": args.fake_latency,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+        },
+        "endpoints": {},
+    }
+    for target in ([args.only] if args.only else ["backend", "chat"]):
+        child, url = start_server(target, args.schools, args.fake_latency)
+        try:
+            run["endpoints"].update(asyncio.run(run_target(target, url, args)))
+        finally:
+            child.terminate()
+            child.wait()
+
+    previous_path = save_run(run)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(run, f, indent=2)
+
+    report = {"run": run}
+    baseline_path = args.baseline or previous_path
+    if baseline_path:
+        with open(baseline_path, encoding='utf-8') as f:
+            report["comparison"] = compare(json.load(f), run, args.threshold, args.min_delta_ms)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Concurrent open-stream load test for the async chat server
+
+Opens many /api/chat/stream connections at once and holds them open for
+the whole generation. By default it starts async_app in a child process
+with the paced local Gemini stand-in (no network, no quota), so the numbers
+measure the serving layer: how many streams one process keeps open
+concurrently, how many threads that takes, and time to first byte under
+that load.
+
+The report checks time to first byte: p50 may exceed the fake model's
+latency and first chunk by at most --ttfb-budget-ms, at every stream
+count. Work blocking the event loop shows up as TTFB growing with the
+number of streams, and as the server's loop lag. The run exits 1 when the
+check fails. The client needs CPU of its own for this to measure the
+server: on a single core, run it with --url from another machine.
+
+Run: python benchmarks/loadtest_streams.py
+     python benchmarks/loadtest_streams.py --streams 20 200 2000 --latency-ms 50
+     python benchmarks/loadtest_streams.py --url http://localhost:5000 --streams 500
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import statistics
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'agent'))
+os.environ.setdefault('API_KEY', 'loadtest-key')
+# The local stand-in has no quota, so the scheduler must not throttle it
+os.environ.setdefault('GEMINI_RPM', '10000000')
+os.environ.setdefault('GEMINI_TPM', '10000000000')
+
+import aiohttp
+from aiohttp import web
+
+
+def raise_fd_limit():
+    """Allow as many sockets as the hard limit permits"""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    return resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def open_stream(session, url, index, state):
+    """Hold one stream open until its end event; returns (ttfb_s, total_s, ok)"""
+    started = time.perf_counter()
+    ttfb = None
+    try:
+        async with session.post(f"{url}/api/chat/stream",
+                                json={"message": f"Best schools in Delhi #{index}"}) as response:
+            state["open"] += 1
+            state["peak"] = max(state["peak"], state["open"])
+            ended = False
+            try:
+                async for line in response.content:
+                    if ttfb is None:
+                        ttfb = time.perf_counter() - started
+                    if line.startswith(b"event: end"):
+                        ended = True
+            finally:
+                state["open"] -= 1
+            return ttfb, time.perf_counter() - started, response.status == 200 and ended
+    except (aiohttp.ClientError, OSError):
+        return ttfb, time.perf_counter() - started, False
+
+
+def serve(args):
+    """Run async_app with the paced fake model (child process mode)"""
+    import async_app
+    from fake_genai import FakeGenerativeModel, FakeLLMConfig
+    chunk_tokens = 8
+    async_app.chat_app.model = FakeGenerativeModel(config=FakeLLMConfig(
+        latency_ms=f"fixed:{args.latency_ms}",
+        tokens_per_second=chunk_tokens / args.interval,
+        output_tokens=args.chunks * chunk_tokens,
+        chunk_tokens=chunk_tokens,
+    ))
+    async_app.STREAM_SETTINGS['flush_chars'] = 1
+    web.run_app(async_app.create_app(), host='127.0.0.1', port=args.serve,
+                backlog=4096, access_log=None, print=None)
+
+
+def start_server(args):
+    """Start the async server as a child process and wait until it answers"""
+    import socket
+    import subprocess
+    import urllib.request
+
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    child = subprocess.Popen([
+        sys.executable, '-W', 'ignore', os.path.abspath(__file__), '--serve', str(port),
+        '--chunks', str(args.chunks), '--interval', str(args.interval), '--latency-ms', str(args.latency_ms),
+    ])
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(200):
+        try:
+            urllib.request.urlopen(f"{url}/api/health", timeout=1)
+            return child, url
+        except OSError:
+            time.sleep(0.1)
+    child.kill()
+    raise RuntimeError("async server did not start")
+
+
+async def run(args, url, streams):
+    """Drive the streams while sampling the server's own stats"""
+    state = {"open": 0, "peak": 0}
+    server = {"open_streams": 0, "threads": 0, "loop_lag_ms": 0.0}
+
+    async def sample(session):
+        while True:
+            try:
+                async with session.get(f"{url}/api/stats") as response:
+                    stats = (await response.json())["server"]
+                server["open_streams"] = max(server["open_streams"], stats["open_streams"])
+                server["threads"] = max(server["threads"], stats.get("threads", 0))
+                server["loop_lag_ms"] = max(server["loop_lag_ms"], stats.get("loop_lag_ms", {}).get("max", 0.0))
+            except (aiohttp.ClientError, OSError, KeyError):
+                pass
+            await asyncio.sleep(0.2)
+
+    connector = aiohttp.TCPConnector(limit=0)
+    timeout = aiohttp.ClientTimeout(total=None, sock_connect=60)
+    started = time.perf_counter()
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        sampler = asyncio.ensure_future(sample(session))
+        results = await asyncio.gather(*(open_stream(session, url, i, state) for i in range(streams)))
+        elapsed = time.perf_counter() - started
+        sampler.cancel()
+
+    ttfbs = [r[0] * 1000 for r in results if r[0] is not None]
+    totals = [r[1] * 1000 for r in results if r[2]]
+    return {
+        "streams": streams,
+        "completed": sum(1 for r in results if r[2]),
+        "failed": sum(1 for r in results if not r[2]),
+        "peak_client_open_streams": state["peak"],
+        "peak_server_open_streams": server["open_streams"],
+        "peak_server_threads": server["threads"],
+        "peak_server_loop_lag_ms": server["loop_lag_ms"],
+        "stream_duration_s": round(args.chunks * args.interval, 2),
+        "wall_time_s": round(elapsed, 2),
+        "ttfb_ms": {"p50": round(percentile(ttfbs, 50) or 0, 1), "p99": round(percentile(ttfbs, 99) or 0, 1)},
+        "stream_ms": {
+            "p50": round(percentile(totals, 50) or 0, 1),
+            "p99": round(percentile(totals, 99) or 0, 1),
+            "mean": round(statistics.mean(totals), 1) if totals else 0,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hold many chat streams open against the async server")
+    parser.add_argument("--streams", type=int, nargs='+', default=[20, 2000],
+                        help="Concurrent streams; one run per count")
+    parser.add_argument("--chunks", type=int, default=20, help="Chunks per fake reply")
+    parser.add_argument("--interval", type=float, default=0.25, help="Seconds between fake chunks")
+    parser.add_argument("--latency-ms", type=int, default=50, help="Fake model latency before its first chunk")
+    parser.add_argument("--ttfb-budget-ms", type=float, default=100,
+                        help="Allowed TTFB p50 above the model's first chunk at any stream count")
+    parser.add_argument("--url", help="Target an already running server instead of starting one")
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    fd_limit = raise_fd_limit()
+    if args.serve:
+        serve(args)
+        return
+    if fd_limit < max(args.streams) + 100:
+        print(f"⚠️  Open-file limit {fd_limit} is too low for {max(args.streams)} streams", file=sys.stderr)
+
+    child, url = (None, args.url) if args.url else start_server(args)
+    try:
+        runs = [asyncio.run(run(args, url, streams)) for streams in args.streams]
+    finally:
+        if child is not None:
+            child.terminate()
+            child.wait()
+
+    budget = args.latency_ms + args.interval * 1000 + args.ttfb_budget_ms
+    check = {
+        "ttfb_p50_budget_ms": budget,
+        "ttfb_p50_ms_by_streams": {r["streams"]: r["ttfb_ms"]["p50"] for r in runs},
+        "passed": all(r["ttfb_ms"]["p50"] <= budget and not r["failed"] for r in runs),
+    }
+    print(json.dumps({"runs": runs, "ttfb_check": check}, indent=2))
+    if not check["passed"]:
+        print(f"❌ TTFB p50 above {budget} ms (or failed streams)", file=sys.stderr)
+        sys.exit(1)
+    print(f"✅ TTFB p50 within {budget} ms at {', '.join(map(str, args.streams))} streams", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
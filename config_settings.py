@@ -130,5 +130,3 @@ CACHE_TTL = 3600  # seconds
 ANALYTICS_ENABLED = False
 ANALYTICS_PROVIDER = 'google'  # Options: 'google', 'mixpanel'
 GOOGLE_ANALYTICS_ID = 'UA-XXXXXXXXX-X'
-
-print("✅ Configuration loaded successfully")
@@ -0,0 +1,36 @@
+"""
+pytest options for the performance suite
+
+Tests marked `perf` are skipped unless --perf (or SCHOOLOO_PERF=1) is given.
+--perf-threshold and --perf-alloc-threshold set how far below the committed
+baseline ops/second may fall, and how far above it allocations may grow,
+before a perf test fails.
+"""
+import os
+
+import pytest
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("perf", "performance microbenchmarks")
+    group.addoption("--perf", action="store_true", default=os.getenv('SCHOOLOO_PERF') == '1',
+                    help="Run tests marked perf")
+    group.addoption("--perf-sizes", default=os.getenv('PERF_SIZES', '1000,10000'),
+                    help="Comma-separated catalog sizes for perf tests")
+    group.addoption("--perf-threshold", type=float, default=float(os.getenv('PERF_THRESHOLD', 0.5)),
+                    help="Relative ops/s drop below baseline that fails a perf test")
+    group.addoption("--perf-alloc-threshold", type=float, default=float(os.getenv('PERF_ALLOC_THRESHOLD', 0.25)),
+                    help="Relative growth in bytes per call over baseline that fails a perf test")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "perf: microbenchmark compared against a stored baseline (run with --perf)")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--perf"):
+        return
+    skip = pytest.mark.skip(reason="performance test; run with --perf")
+    for item in items:
+        if "perf" in item.keywords:
+            item.add_marker(skip)
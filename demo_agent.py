@@ -17,6 +17,22 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'agent'))
 from dotenv import load_dotenv
 load_dotenv()
 
+from intent_matcher import Intent, IntentMatcher
+
+# What a message is about; process_query answers the first topic found, in its own order
+DEMO_INTENTS = IntentMatcher([
+    Intent("search", ("school", "search", "find", "best school", "near")),
+    Intent("fees", ("fee", "cost", "price", "charge")),
+    Intent("compare", ("compare",)),
+    Intent("admission", ("admission", "document", "requirement", "eligibility")),
+    Intent("faq", ("faq", "question", "help", "how")),
+    Intent("lead", ("inquire", "contact", "interested", "apply", "admit")),
+    Intent("delhi", ("delhi",)),
+    Intent("bangalore", ("bangalore", "bengaluru")),
+    Intent("dps", ("dps",)),
+    Intent("greenfield", ("greenfield",)),
+])
+
 class DemoSchoolooAgent:
     """Demo Schooloo AI Agent with Offline Mode"""
     
@@ -157,11 +173,11 @@ class DemoSchoolooAgent:
     def process_query(self, user_input: str) -> str:
         """Process user query and return response"""
         self.conversation_count += 1
-        user_input_lower = user_input.lower()
+        intents = DEMO_INTENTS.matches(user_input)
         
         # Search schools
-        if any(keyword in user_input_lower for keyword in ['school', 'search', 'find', 'best school', 'near']):
-            if 'delhi' in user_input_lower:
+        if 'search' in intents:
+            if 'delhi' in intents:
                 result = self.search_schools("Delhi")
                 if result['schools']:
                     response = f"🎓 Found {result['total']} school(s) in Delhi:\n\n"
@@ -170,7 +186,7 @@ class DemoSchoolooAgent:
                         response += f"   Location: {school['location']}\n"
                         response += f"   Fees: {school['fee_structure']}\n\n"
                     return response
-            elif 'bangalore' in user_input_lower or 'bengaluru' in user_input_lower:
+            elif 'bangalore' in intents:
                 result = self.search_schools("Bangalore")
                 if result['schools']:
                     response = f"🎓 Found {result['total']} school(s) in Bangalore:\n\n"
@@ -190,7 +206,7 @@ class DemoSchoolooAgent:
                 return response
         
         # Fee structure
-        if any(keyword in user_input_lower for keyword in ['fee', 'cost', 'price', 'charge']):
+        if 'fees' in intents:
             comparison = self.compare_schools()
             response = "💰 Fee Structure:\n\n"
             for school in comparison['schools']:
@@ -198,7 +214,7 @@ class DemoSchoolooAgent:
             return response
         
         # Compare schools
-        if 'compare' in user_input_lower:
+        if 'compare' in intents:
             comparison = self.compare_schools()
             response = "📊 School Comparison:\n\n"
             for school in comparison['schools']:
@@ -209,8 +225,8 @@ class DemoSchoolooAgent:
             return response
         
         # Admission info
-        if any(keyword in user_input_lower for keyword in ['admission', 'document', 'requirement', 'eligibility']):
-            if 'dps' in user_input_lower or 'delhi' in user_input_lower:
+        if 'admission' in intents:
+            if 'dps' in intents or 'delhi' in intents:
                 info = self.get_admission_info("Delhi Public School")
                 if info['success']:
                     response = f"📋 Admission Info for {info['school']}:\n\n"
@@ -221,7 +237,7 @@ class DemoSchoolooAgent:
                     response += f"  • Eligibility: {info['eligibility']}\n"
                     response += f"  • Contact: {info['contact']}\n"
                     return response
-            elif 'greenfield' in user_input_lower or 'bangalore' in user_input_lower:
+            elif 'greenfield' in intents or 'bangalore' in intents:
                 info = self.get_admission_info("Greenfield Public School")
                 if info['success']:
                     response = f"📋 Admission Info for {info['school']}:\n\n"
@@ -237,7 +253,7 @@ class DemoSchoolooAgent:
                 return response
         
         # FAQs
-        if any(keyword in user_input_lower for keyword in ['faq', 'question', 'help', 'how']):
+        if 'faq' in intents:
             faqs = self.get_faqs()
             response = "❓ Frequently Asked Questions:\n\n"
             for faq in faqs['faqs']:
@@ -246,7 +262,7 @@ class DemoSchoolooAgent:
             return response
         
         # Lead capture
-        if any(keyword in user_input_lower for keyword in ['inquire', 'contact', 'interested', 'apply', 'admit']):
+        if 'lead' in intents:
             response = "Great! I'd like to capture your contact information.\n\n"
             response += "To help you better, could you please provide:\n"
             response += "1. Your full name\n"
@@ -5,6 +5,7 @@ Handles both piped input and interactive terminal input gracefully
 """
 import os
 import sys
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -15,15 +16,22 @@ except ImportError:
     print("❌ Error: google-generativeai not installed")
     sys.exit(1)
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'agent'))
+
+from history import ConversationHistory
+from llm_scheduler import PRIORITY_INTERACTIVE, QuotaExceededError, estimate_request_tokens, get_scheduler
+from usage import get_tracker
+from fake_genai import fake_llm_enabled, generative_model
+
 # Configure API
 api_key = os.getenv('API_KEY')
-if not api_key:
+if not api_key and not fake_llm_enabled():
     print("❌ Error: API_KEY not found in .env file")
     sys.exit(1)
 
 genai.configure(api_key=api_key)
 model_name = os.getenv('AGENT_MODEL', 'gemini-2.0-flash')
-model = genai.GenerativeModel(model_name)
+model = generative_model(model_name)
 
 system_prompt = """You are Schooloo AI Assistant - an expert school discovery assistant for India.
 
@@ -60,6 +68,10 @@ def main():
     print("Bangalore, or any other Indian city!\n")
     
     query_count = 0
+    history = ConversationHistory(
+        max_recent_turns=int(os.getenv('HISTORY_RECENT_TURNS', 6)),
+        max_prompt_tokens=int(os.getenv('HISTORY_MAX_PROMPT_TOKENS', 6000))
+    )
     
     while True:
         try:
@@ -75,23 +87,38 @@ def main():
             query_count += 1
             
             try:
-                # Get response from Gemini
-                response = model.generate_content(
-                    [system_prompt, user_input],
-                    generation_config=genai.types.GenerationConfig(
-                        temperature=0.7,
-                        top_p=0.95,
-                        max_output_tokens=2048,
-                    )
+                # Get response from Gemini, within the RPM/TPM budget
+                contents = history.build_contents(system_prompt, user_input)
+                started = time.perf_counter()
+                response = get_scheduler().call(
+                    lambda: model.generate_content(
+                        contents,
+                        generation_config=genai.types.GenerationConfig(
+                            temperature=0.7,
+                            top_p=0.95,
+                            max_output_tokens=2048,
+                        )
+                    ),
+                    tokens=estimate_request_tokens(contents, 2048),
+                    priority=PRIORITY_INTERACTIVE,
+                    deadline_seconds=float(os.getenv('LLM_DEADLINE_SECONDS', 30))
                 )
+                get_tracker().record_response(response, "cli.interactive", model_name,
+                                              (time.perf_counter() - started) * 1000,
+                                              contents=contents, session_id=f"interactive-{os.getpid()}")
                 
                 if response.text:
+                    history.add("user", user_input)
+                    history.add("model", response.text)
                     print(f"\n🤖 Agent:\n")
                     print(response.text.strip())
                     print()
                 else:
                     print("⚠️  No response from agent\n")
             
+            except QuotaExceededError as e:
+                print(f"\n⏳ Gemini is busy right now - try again in about {e.retry_after:.0f} seconds.\n")
+            
             except Exception as e:
                 error_msg = str(e)
                 
@@ -10,10 +10,15 @@ from typing import Optional, Dict, Any
 # Add agent directory to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'agent'))
 sys.path.insert(0, os.path.dirname(__file__))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
 
-from agent.schooloo_agent import SchoolooAgent
-from agent.query_processor import QueryProcessor, ResponseFormatter
-from agent.tools import ToolHandler
+# Agent modules are imported by their top-level names, as the agent imports them
+# itself, so tools' breakers, bulkheads and single-flight state exist once
+from schooloo_agent import SchoolooAgent
+from query_processor import QueryProcessor, ResponseFormatter
+from tools import ToolHandler
+import metrics
+from tracing import span
 
 class SchoolooAISystem:
     """Complete Schooloo AI System"""
@@ -45,14 +50,17 @@ class SchoolooAISystem:
         }
         
         # Process query based on user type
-        if user_type == "parent":
-            analysis = self.query_processor.process_parent_query(user_message)
-        elif user_type == "student":
-            analysis = self.query_processor.process_student_query(user_message)
-        elif user_type == "admin":
-            analysis = self.query_processor.process_admin_query(user_message)
-        else:
-            analysis = self.query_processor.process_parent_query(user_message)
+        with span("agent.handle_query", user_type=user_type) as turn:
+            with span("query_processor"):
+                if user_type == "parent":
+                    analysis = self.query_processor.process_parent_query(user_message)
+                elif user_type == "student":
+                    analysis = self.query_processor.process_student_query(user_message)
+                elif user_type == "admin":
+                    analysis = self.query_processor.process_admin_query(user_message)
+                else:
+                    analysis = self.query_processor.process_parent_query(user_message)
+            turn.set(suggested_tools=analysis.get("suggested_tools", []))
         
         result["tools_used"] = analysis.get("suggested_tools", [])
         
@@ -64,7 +72,8 @@ class SchoolooAISystem:
     
     def execute_tool(self, tool_name: str, tool_input: dict) -> str:
         """Execute a specific tool"""
-        return self.tool_handler.execute_tool(tool_name, tool_input)
+        with span("agent.execute_tool", tool=tool_name):
+            return self.tool_handler.execute_tool(tool_name, tool_input)
     
     def interactive_chat(self, user_type: str = "parent"):
         """Start interactive chat with the agent"""
@@ -233,9 +242,20 @@ if __name__ == "__main__":
         help="Mode to run the agent in"
     )
     parser.add_argument("--api-key", help="Google API key")
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=int(os.getenv('AGENT_METRICS_PORT', 0)),
+        help="Serve this process's /metrics (tool latency, breakers, bulkheads) on this port; 0 disables"
+    )
     
     args = parser.parse_args()
     
+    # Tool calls run in this process, so their metrics are scraped from here
+    if args.metrics_port:
+        metrics.start_server(args.metrics_port)
+        print(f"📈 Agent metrics on http://localhost:{args.metrics_port}/metrics")
+    
     if args.mode == "parent":
         parent_example()
     elif args.mode == "student":
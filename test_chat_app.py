@@ -0,0 +1,678 @@
+"""
+Tests for the chat app in app.py, run against a scripted Gemini model
+Run: python -m pytest test_chat_app.py -v
+"""
+import importlib.util
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'agent'))
+os.environ.setdefault('API_KEY', 'test_key_for_validation')
+# The fake model has no quota; keep the scheduler from pacing the tests
+os.environ.setdefault('GEMINI_RPM', '100000')
+# Keep the usage log out of the repository
+os.environ.setdefault('USAGE_LOG_PATH', os.path.join(tempfile.mkdtemp(), 'llm_usage.jsonl'))
+
+from response_cache import ResponseCache, normalize_message
+
+
+def load_chat_app():
+    """Import app.py under its own name so it cannot clash with backend/app.py"""
+    spec = importlib.util.spec_from_file_location(
+        "chat_app", os.path.join(os.path.dirname(__file__), 'app.py')
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["chat_app"] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+chat_app = load_chat_app()
+
+
+class FakeModel:
+    """Stands in for genai.GenerativeModel and counts calls"""
+
+    def __init__(self, text="🏫 Delhi Public School"):
+        self.text = text
+        self.calls = []
+
+    def generate_content(self, contents, **kwargs):
+        self.calls.append(contents)
+        if kwargs.get("stream"):
+            return iter(self.chunks())
+        return type("Response", (), {"text": self.text})()
+
+    async def generate_content_async(self, contents, **kwargs):
+        self.calls.append(contents)
+        if kwargs.get("stream"):
+            async def stream():
+                for chunk in self.chunks():
+                    yield chunk
+            return stream()
+        return type("Response", (), {"text": self.text})()
+
+    def chunks(self):
+        """The reply split into small streamed chunks"""
+        pieces = [self.text[i:i + 4] for i in range(0, len(self.text), 4)]
+        return [type("Chunk", (), {"text": piece})() for piece in pieces]
+
+
+def use_fake_model(model=None):
+    """Swap in a fresh fake model and empty caches"""
+    model = model or FakeModel()
+    chat_app.model = model
+    chat_app.response_cache.clear()
+    chat_app.semantic_cache.clear()
+    return model
+
+
+class TestResponseCache:
+    """Test the normalized-prompt response cache"""
+
+    @staticmethod
+    def test_normalization_merges_equivalent_questions():
+        """Test case, punctuation, aliases and synonyms normalize together"""
+        assert normalize_message("Best schools in Delhi") == normalize_message("best schools in delhi?")
+        assert normalize_message("top schools in Delhi") == normalize_message("Best  schools in Delhi!")
+        assert normalize_message("Schools in Allahabad") == normalize_message("schools in prayagraj")
+        assert normalize_message("Schools in Delhi") != normalize_message("Schools in Mumbai")
+        print("✅ Normalization test passed")
+
+    @staticmethod
+    def test_lru_eviction_and_ttl():
+        """Test size-bounded eviction and expiry"""
+        import time
+
+        cache = ResponseCache(max_entries=2, ttl_seconds=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        assert cache.get("b") is None, "Least recently used entry should be evicted"
+        assert cache.get("a") == 1 and cache.get("c") == 3
+
+        short = ResponseCache(max_entries=2, ttl_seconds=0.01)
+        short.set("a", 1)
+        time.sleep(0.02)
+        assert short.get("a") is None, "Expired entry should miss"
+        assert short.stats()["expirations"] == 1
+        print("✅ Cache eviction test passed")
+
+    @staticmethod
+    def test_chat_serves_repeat_questions_from_cache():
+        """Test /api/chat only calls Gemini once for equivalent questions"""
+        model = use_fake_model()
+        client = chat_app.app.test_client()
+
+        first = client.post('/api/chat', json={"message": "Best schools in Delhi"}).get_json()
+        second = client.post('/api/chat', json={"message": "top schools in delhi?"}).get_json()
+
+        assert first["cached"] is False and second["cached"] is True
+        assert second["message"] == first["message"]
+        assert len(model.calls) == 1, "Second question should not reach Gemini"
+        stats = client.get('/api/stats').get_json()["llm"]["response_cache"]
+        assert stats["hits"] == 1
+        print("✅ Chat cache test passed")
+
+
+class TestSemanticCache:
+    """Test the paraphrase-aware semantic cache"""
+
+    @staticmethod
+    def test_paraphrases_hit_and_entities_must_match():
+        """Test a paraphrase is served from cache but a different board is not"""
+        model = use_fake_model()
+        client = chat_app.app.test_client()
+
+        client.post('/api/chat', json={"message": "good CBSE schools in Prayagraj"})
+        paraphrase = client.post('/api/chat', json={"message": "which CBSE schools are good in Allahabad"})
+        other_board = client.post('/api/chat', json={"message": "good ICSE schools in Prayagraj"})
+
+        assert paraphrase.get_json()["cached"] is True
+        assert other_board.get_json()["cached"] is False
+        assert len(model.calls) == 2
+        stats = client.get('/api/stats').get_json()["llm"]["semantic_cache"]
+        assert stats["hits"] == 1 and stats["entries"] == 2
+        print("✅ Semantic cache test passed")
+
+    @staticmethod
+    def test_names_negations_and_rankings_must_match():
+        """Test near-identical questions about another area, the opposite wish or the other end do not hit"""
+        from semantic_cache import SemanticCache
+
+        cache = SemanticCache()
+        for cached, query in [("admission at DPS Dwarka", "admission at DPS Rohini"),
+                              ("schools without hostel", "schools with hostel"),
+                              ("worst CBSE schools in Delhi", "best CBSE schools in Delhi"),
+                              ("I want the fee details of DPS", "I don't want the fee details of DPS")]:
+            cache.add(cached, cached)
+            assert cache.lookup(query) is None, f"{query!r} must not get the answer to {cached!r}"
+        cache.add("best schools in Delhi", "delhi answer")
+        assert cache.lookup("top schools in delhi?")[0] == "delhi answer"
+        print("✅ Semantic cache entity test passed")
+
+
+class TestSessionStore:
+    """Test per-session conversation history"""
+
+    @staticmethod
+    def test_sessions_are_multi_turn_and_isolated():
+        """Test follow-ups see their own session's history and skip the caches"""
+        model = use_fake_model()
+        client = chat_app.app.test_client()
+
+        client.post('/api/chat', json={"message": "Best schools in Delhi", "session_id": "alice"})
+        follow_up = client.post('/api/chat', json={"message": "What are their fees?", "session_id": "alice"})
+        other = client.post('/api/chat', json={"message": "What are their fees?"},
+                            headers={"X-Session-Id": "bob"})
+
+        assert follow_up.get_json()["cached"] is False
+        assert follow_up.get_json()["session_id"] == "alice"
+        contents = model.calls[1]
+        assert [c["parts"][0] for c in contents[1:]] == \
+            ["Best schools in Delhi", "🏫 Delhi Public School", "What are their fees?"]
+        assert other.get_json()["session_id"] == "bob"
+        assert model.calls[2][0].startswith(chat_app.system_prompt)
+        assert model.calls[2][1:] == ["What are their fees?"], "Sessions must not mix"
+
+        assert client.delete('/api/session/alice').get_json()["deleted"] is True
+        assert len(chat_app.session_store.get("alice")) == 0
+        stats = client.get('/api/stats').get_json()["sessions"]
+        assert stats["sessions"] == 1 and stats["bytes"] > 0
+        print("✅ Session store test passed")
+
+    @staticmethod
+    def test_caps_evict_and_spill_to_disk():
+        """Test byte caps compact and evict sessions and spilled ones come back"""
+        import tempfile
+        from session_store import SessionStore
+
+        with tempfile.TemporaryDirectory() as spill_dir:
+            store = SessionStore(max_session_bytes=2000, max_total_bytes=3000, spill_dir=spill_dir)
+            for name in ("a", "b", "c"):
+                history = store.get(name)
+                for turn in range(20):
+                    history.add("user", f"{name} question {turn}")
+                    history.add("model", "Delhi Public School, CBSE, ₹1.2L/year. " * 3)
+                store.save(name, history)
+                assert history.size_bytes() <= 2000
+
+            stats = store.stats()
+            assert stats["bytes"] <= 3000 and stats["spills"] >= 1
+            assert stats["sessions"] + stats["spilled_sessions"] == 3
+
+            restored = store.get("a")
+            assert restored.messages[-2]["text"] == "a question 19"
+            assert store.stats()["restores"] == 1
+        print("✅ Session caps test passed")
+
+    @staticmethod
+    def test_spills_survive_restarts_and_failed_writes():
+        """Test spill files outlive the process, failed writes are counted and session updates do not interleave"""
+        import tempfile
+        import threading
+        from session_store import SessionStore
+
+        def fill(store, name, turns=20):
+            history = store.get(name)
+            store.append(name, history, *[(role, f"{name} {role} {turn} " * 8)
+                                          for turn in range(turns) for role in ("user", "model")])
+
+        with tempfile.TemporaryDirectory() as spill_dir:
+            store = SessionStore(max_total_bytes=3000, spill_dir=spill_dir)
+            for name in ("a", "b", "c"):
+                fill(store, name)
+            assert store.stats()["spills"] >= 2
+            stale = os.path.join(spill_dir, "0" * 64 + ".json")
+            with open(stale, "w") as f:
+                f.write("{}")
+            os.utime(stale, (1, 1))
+
+            restarted = SessionStore(max_total_bytes=3000, spill_dir=spill_dir)
+            assert restarted.stats()["spilled_sessions"] >= 2 and not os.path.exists(stale)
+            assert restarted.get("a").messages[-1]["text"].startswith("a model 19")
+            assert restarted.stats()["restores"] == 1
+
+            blocked = os.path.join(spill_dir, "not-a-dir")
+            open(blocked, "w").close()
+            broken = SessionStore(max_total_bytes=3000, spill_dir=os.path.join(blocked, "spill"))
+            for name in ("a", "b", "c"):
+                fill(broken, name)
+            stats = broken.stats()
+            assert stats["spill_failures"] >= 2 and stats["spills"] == 0 and stats["sessions"] == 1
+
+        store = SessionStore()
+        history = store.get("shared")
+
+        def talk(n):
+            for turn in range(25):
+                store.append("shared", history, ("user", f"q{n}-{turn}"), ("model", f"a{n}-{turn}"))
+
+        threads = [threading.Thread(target=talk, args=(n,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert len(store.get("shared")) == 400
+        texts = [m["text"] for m in history.messages]
+        assert all(q[1:] == a[1:] for q, a in zip(texts[::2], texts[1::2])), "Each exchange stays together"
+        print("✅ Session spill safety test passed")
+
+
+class TestSSEStreaming:
+    """Test the server-sent events pipeline against local fake streams"""
+
+    @staticmethod
+    def parse(frames):
+        """Split SSE frames into (event, data) pairs, skipping comments"""
+        events = []
+        for frame in "".join(frames).split("\n\n"):
+            lines = [line for line in frame.split("\n") if line and not line.startswith(":")]
+            if lines:
+                event = next((line[7:] for line in lines if line.startswith("event: ")), "message")
+                data = "\n".join(line[6:] for line in lines if line.startswith("data: "))
+                events.append((event, data))
+        return events
+
+    @staticmethod
+    def test_framing_coalescing_and_end_event():
+        """Test multi-line chunks stay framed and tiny chunks are merged"""
+        import json
+        from sse import format_event, stream_events
+
+        assert format_event("line one\nline two") == "data: line one\ndata: line two\n\n"
+        chunks = ["🏫 Delhi", " Public", "\n", "School\r\n- CBSE", "\n\n", "- ₹1.2L/year"]
+        frames = list(stream_events(iter(chunks), flush_chars=1000, flush_seconds=1.0))
+        events = TestSSEStreaming.parse(frames)
+
+        assert [e for e, _ in events] == ["message", "end"], "Tiny chunks should coalesce into one write"
+        assert events[0][1] == "🏫 Delhi Public\nSchool\n- CBSE\n\n- ₹1.2L/year"
+        end = json.loads(events[1][1])
+        assert end["chunks"] == len(chunks) and end["events"] == 1 and end["error"] is False
+        assert end["duration_ms"] >= 0 and end["first_chunk_ms"] is not None
+        print("✅ SSE framing test passed")
+
+    @staticmethod
+    def test_heartbeats_and_cancellation_on_disconnect():
+        """Test idle streams send heartbeats and a disconnect stops the upstream"""
+        import threading
+        import time
+        from sse import stream_events
+
+        produced = []
+        cancelled = threading.Event()
+
+        def slow_upstream():
+            for i in range(100):
+                if cancelled.is_set():
+                    return
+                produced.append(i)
+                time.sleep(0.03)
+                yield f"chunk {i} "
+
+        stream = stream_events(slow_upstream(), cancel=cancelled.set,
+                               heartbeat_seconds=0.01, flush_chars=1, flush_seconds=0.01)
+        frames = [next(stream) for _ in range(4)]
+        stream.close()
+        time.sleep(0.1)
+        seen = len(produced)
+        time.sleep(0.1)
+
+        assert any(frame.startswith(": keep-alive") for frame in frames)
+        assert cancelled.is_set(), "Closing the stream should cancel the upstream"
+        assert len(produced) == seen < 100, "Upstream should stop generating after disconnect"
+        print("✅ SSE cancellation test passed")
+
+    @staticmethod
+    def test_stream_endpoint_records_session():
+        """Test /api/chat/stream emits data and end events and keeps session history"""
+        model = use_fake_model(FakeModel("Line one\nLine two"))
+        client = chat_app.app.test_client()
+
+        response = client.post('/api/chat/stream', json={"message": "Best schools?", "session_id": "stream"})
+        events = TestSSEStreaming.parse([response.get_data(as_text=True)])
+
+        assert response.mimetype == "text/event-stream"
+        assert "".join(d for e, d in events if e == "message") == "Line one\nLine two"
+        assert events[-1][0] == "end"
+        assert chat_app.session_store.get("stream").messages[-1]["text"] == "Line one\nLine two"
+        assert len(model.calls) == 1
+        print("✅ SSE endpoint test passed")
+
+
+class TestAsyncApp:
+    """Test the aiohttp serving mode keeps the Flask routes and JSON shapes"""
+
+    @staticmethod
+    def test_chat_and_stream_match_flask():
+        """Test /api/chat and /api/chat/stream behave the same in async mode"""
+        import asyncio
+        from aiohttp.test_utils import TestClient, TestServer
+        import async_app
+
+        model = use_fake_model()
+        flask_body = chat_app.app.test_client().post(
+            '/api/chat', json={"message": "Schools in Pune"}).get_json()
+
+        async def scenario():
+            async with TestClient(TestServer(async_app.create_app())) as client:
+                chat = await (await client.post('/api/chat', json={"message": "Schools in Pune"})).json()
+                empty = await client.post('/api/chat', json={"message": " "})
+                stream = await client.post('/api/chat/stream', json={"message": "Hi", "session_id": "async"})
+                text = await stream.text()
+                health = await (await client.get('/api/health')).json()
+                stats = await (await client.get('/api/stats')).json()
+                page = await client.get('/')
+                revalidated = await client.get('/', headers={'If-None-Match': page.headers['ETag']})
+                pages = (page.headers.get('Content-Encoding'), await page.text(), revalidated.status)
+                return chat, empty.status, stream.headers["Content-Type"], text, health, stats, pages
+
+        chat, empty_status, content_type, text, health, stats, pages = asyncio.run(scenario())
+
+        assert set(chat) == set(flask_body) and chat["cached"] is True
+        assert empty_status == 400
+        assert content_type == "text/event-stream"
+        events = TestSSEStreaming.parse([text])
+        assert "".join(d for e, d in events if e == "message") == model.text and events[-1][0] == "end"
+        assert health["status"] == "online"
+        assert stats["server"]["mode"] == "async" and stats["server"]["open_streams"] == 0
+        assert pages[0] == "gzip" and pages[1] == chat_app.app.test_client().get('/').get_data(as_text=True)
+        assert pages[2] == 304
+        assert chat_app.session_store.get("async").messages[-1]["text"] == model.text
+        print("✅ Async app test passed")
+
+    @staticmethod
+    def test_requests_are_measured_and_traced():
+        """Test aiohttp requests update the HTTP metrics, carry Server-Timing and open server spans"""
+        import asyncio
+        from aiohttp.test_utils import TestClient, TestServer
+        import async_app
+        import tracing
+
+        use_fake_model()
+        trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+        traceparent = f"00-{trace_id}-00f067aa0ba902b7-01"
+
+        async def scenario():
+            async with TestClient(TestServer(async_app.create_app())) as client:
+                chat = await client.post('/api/chat', json={"message": "Schools in Nagpur"},
+                                         headers={'traceparent': traceparent})
+                stream = await client.post('/api/chat/stream', json={"message": "Hi"})
+                await stream.text()
+                await client.delete('/api/session/measured')
+                await client.get('/nowhere')
+                scrape = await client.get('/metrics')
+                return chat.headers, stream.headers, scrape.headers['Content-Type'], await scrape.text()
+
+        chat_headers, stream_headers, content_type, scrape = asyncio.run(scenario())
+
+        assert 'llm;dur=' in chat_headers['Server-Timing'] and 'total;dur=' in chat_headers['Server-Timing']
+        assert 'total;dur=' in stream_headers['Server-Timing']
+        assert content_type.startswith('text/plain; version=0.0.4')
+        assert 'schooloo_http_requests_total{method="POST",route="/api/chat",status="200"}' in scrape
+        assert 'route="/api/session/{session_id}",status="200"' in scrape
+        assert 'route="unmatched",status="404"' in scrape
+        assert 'schooloo_http_requests_in_flight 1' in scrape, "Only the scrape itself is in flight"
+        [trace] = [t for t in tracing.TRACER.recent(20) if t["trace_id"] == trace_id]
+        assert trace["root"] == "POST /api/chat"
+        print("✅ Async app metrics and tracing test passed")
+
+    @staticmethod
+    def test_blocking_work_runs_off_the_event_loop():
+        """Test session, cache and retrieval calls run on worker threads and startup builds the model"""
+        import asyncio
+        import threading
+        from aiohttp.test_utils import TestClient, TestServer
+        import async_app
+
+        chat_app.model = None
+        threads = {}
+        originals = {name: getattr(chat_app, name) for name in ('lookup_cached_reply', 'prompt_contents')}
+
+        def recording(name, fn):
+            def wrapper(*args, **kwargs):
+                threads[name] = threading.current_thread().name
+                return fn(*args, **kwargs)
+            return wrapper
+
+        async def scenario():
+            async with TestClient(TestServer(async_app.create_app())) as client:
+                built = chat_app.model is not None
+                use_fake_model()
+                await client.post('/api/chat', json={"message": "Schools near Indore airport"})
+                await client.post('/api/chat', json={"message": "And fees?", "session_id": "off-loop"})
+                stats = await (await client.get('/api/stats')).json()
+                return built, stats["server"]["loop_lag_ms"]
+
+        try:
+            for name, fn in originals.items():
+                setattr(chat_app, name, recording(name, fn))
+            built, lag = asyncio.run(scenario())
+        finally:
+            for name, fn in originals.items():
+                setattr(chat_app, name, fn)
+            use_fake_model()
+
+        assert built, "The model should be built at startup, not by the first request"
+        assert set(threads) == {'lookup_cached_reply', 'prompt_contents'}
+        assert all(name.startswith('async-worker') for name in threads.values()), threads
+        assert set(lag) == {'p99', 'max'}
+        print("✅ Async off-loop work test passed")
+
+
+class TestLocalRouter:
+    """Test structured questions are answered without Gemini"""
+
+    @staticmethod
+    def test_structured_questions_skip_the_model():
+        """Test fees/documents/exam questions about a known school are answered locally"""
+        model = use_fake_model()
+        client = chat_app.app.test_client()
+
+        fees = client.post('/api/chat', json={"message": "fees at DPS"}).get_json()
+        docs = client.post('/api/chat', json={"message": "documents for Greenfield"}).get_json()
+        exam = client.post('/api/chat', json={"message": "is there an entrance exam at DPS?"}).get_json()
+        open_ended = client.post('/api/chat', json={"message": "Is there an entrance exam?"}).get_json()
+
+        assert fees["local"] and "₹2,50,000/year" in fees["message"]
+        assert docs["local"] and "Medical Fitness Certificate" in docs["message"]
+        assert exam["local"] and "DPS Entrance Exam" in exam["message"]
+        assert open_ended["local"] is False, "No school named, so Gemini should answer"
+        assert len(model.calls) == 1
+        stats = client.get('/api/stats').get_json()["local_router"]
+        assert stats["local_answers"] >= 3 and stats["latency_ms"]["p50"] < 10
+        print("✅ Local router test passed")
+
+
+class TestGroundedPrompts:
+    """Test the catalog records relevant to a message reach Gemini"""
+
+    @staticmethod
+    def test_relevant_records_are_sent_with_the_prompt():
+        """Test a comparison carries both schools' records and an unknown city carries none"""
+        model = use_fake_model()
+        client = chat_app.app.test_client()
+
+        client.post('/api/chat', json={"message": "compare DPS and Greenfield"})
+        client.post('/api/chat', json={"message": "CBSE schools in Prayagraj under 2 lakh"})
+
+        grounded, plain = model.calls[0][0], model.calls[1][0]
+        assert grounded.startswith(chat_app.system_prompt)
+        assert "Delhi Public School" in grounded and "Greenfield Public School" in grounded
+        assert plain == chat_app.system_prompt, "Unrelated records must not be sent"
+        print("✅ Grounded prompt test passed")
+
+
+class TestUsageAccounting:
+    """Test every reply is accounted per endpoint and session"""
+
+    @staticmethod
+    def test_admin_usage_report():
+        """Test misses, cache hits and streams are recorded and the report needs the admin token"""
+        from usage import UsageTracker
+
+        use_fake_model()
+        chat_app.usage_tracker = UsageTracker()
+        client = chat_app.app.test_client()
+
+        client.post('/api/chat', json={"message": "Best schools in Pune", "session_id": "heavy"})
+        client.post('/api/chat', json={"message": "Best schools in Pune"})
+        stream = client.post('/api/chat/stream', json={"message": "Schools in Goa?", "session_id": "heavy"})
+        stream.get_data()
+
+        os.environ.pop('ADMIN_TOKEN', None)
+        assert client.get('/api/admin/usage').status_code == 403
+        os.environ['ADMIN_TOKEN'] = 'secret'
+        try:
+            assert client.get('/api/admin/usage', headers={'X-Admin-Token': 'wrong'}).status_code == 401
+            report = client.get('/api/admin/usage', headers={'X-Admin-Token': 'secret'}).get_json()
+            session = client.get('/api/admin/usage?session=heavy',
+                                 headers={'Authorization': 'Bearer secret'}).get_json()
+        finally:
+            os.environ.pop('ADMIN_TOKEN')
+
+        assert report["total"]["requests"] == 3 and report["total"]["llm_calls"] == 2
+        assert report["by_endpoint"]["chat"]["cache_hits"] == 1
+        assert report["by_endpoint"]["chat_stream"]["output_tokens"] > 0
+        assert report["top_sessions"][0]["session_id"] == "heavy"
+        assert session["llm_calls"] == 2 and session["input_tokens"] > 0
+        print("✅ Usage accounting test passed")
+
+
+class TestFakeGeminiServing:
+    """Test the chat endpoints run offline against the local Gemini stand-in"""
+
+    @staticmethod
+    def test_endpoints_with_fake_genai():
+        """Test chat and stream replies come from the stand-in with its reported usage"""
+        from fake_genai import FakeGenerativeModel, FakeLLMConfig
+        from usage import UsageTracker
+
+        use_fake_model(FakeGenerativeModel(config=FakeLLMConfig(latency_ms="fixed:1", tokens_per_second=0)))
+        chat_app.usage_tracker = UsageTracker()
+        client = chat_app.app.test_client()
+
+        reply = client.post('/api/chat', json={"message": "Schools in Jaipur"}).get_json()
+        stream = client.post('/api/chat/stream', json={"message": "Schools in Surat"}).get_data(as_text=True)
+
+        assert reply["message"].startswith("🏫 Schooloo test reply")
+        assert "event: end" in stream and "Surat" in stream
+        report = chat_app.usage_tracker.report()
+        assert report["total"]["llm_calls"] == 2
+        assert report["by_endpoint"]["chat_stream"]["output_tokens"] >= 120
+        print("✅ Fake Gemini serving test passed")
+
+
+class TestRequestTiming:
+    """Test chat replies say where their time went"""
+
+    @staticmethod
+    def test_server_timing_breaks_down_a_chat_reply():
+        """Test a Gemini reply reports its llm and retrieval phases and a cached one does not call Gemini"""
+        from fake_genai import FakeGenerativeModel, FakeLLMConfig
+
+        use_fake_model(FakeGenerativeModel(config=FakeLLMConfig(latency_ms="fixed:30", tokens_per_second=0)))
+        client = chat_app.app.test_client()
+
+        first = client.post('/api/chat', json={"message": "Schools with a hostel in Ranchi"})
+        again = client.post('/api/chat', json={"message": "Schools with a hostel in Ranchi"})
+
+        phases = dict(entry.split(';')[0:2] for entry in first.headers['Server-Timing'].split(', '))
+        assert {'parse', 'router', 'cache', 'retrieval', 'llm', 'serialize', 'app', 'total'} <= set(phases)
+        assert float(phases['llm'].removeprefix('dur=')) >= 30
+        assert 'llm;' not in again.headers['Server-Timing']
+        print("✅ Chat Server-Timing test passed")
+
+
+class TestMetricsEndpoint:
+    """Test /metrics covers the LLM, quota and cache figures"""
+
+    @staticmethod
+    def test_chat_metrics():
+        """Test a miss and a cache hit show up as Gemini latency, tokens and a cache hit ratio"""
+        from usage import UsageTracker
+
+        use_fake_model()
+        chat_app.usage_tracker = UsageTracker()
+        client = chat_app.app.test_client()
+        calls = chat_app.metrics.REGISTRY.histogram('schooloo_llm_call_seconds', '').count('chat', chat_app.model_name)
+
+        client.post('/api/chat', json={"message": "Schools with a planetarium in Agra"})
+        client.post('/api/chat', json={"message": "Schools with a planetarium in Agra"})
+        text = client.get('/metrics').get_data(as_text=True)
+
+        assert f'schooloo_llm_call_seconds_count{{endpoint="chat",model="{chat_app.model_name}"}} {calls + 1}' in text
+        assert 'schooloo_llm_tokens_total{endpoint="chat",direction="input"}' in text
+        assert 'schooloo_llm_replies_total{endpoint="chat",source="cache"} 1' in text
+        assert 'schooloo_llm_quota_errors_total{reason="upstream_429"}' in text
+        assert 'schooloo_cache_hit_ratio{cache="response"}' in text
+        assert 'schooloo_http_requests_total{method="POST",route="/api/chat",status="200"}' in text
+        print("✅ Chat metrics test passed")
+
+
+class TestColdStart:
+    """Test the serverless entry point starts without the Gemini client"""
+
+    @staticmethod
+    def test_entry_point_imports_gemini_lazily():
+        """Test api/index.py serves /api/health without importing google.generativeai, and warm state carries over"""
+        import json
+        import subprocess
+        child = (
+            "import importlib.util, json, sys\n"
+            "spec = importlib.util.spec_from_file_location('entry', 'api/index.py')\n"
+            "module = importlib.util.module_from_spec(spec)\n"
+            "spec.loader.exec_module(module)\n"
+            "client = module.app.test_client()\n"
+            "health = client.get('/api/health').status_code\n"
+            "lazy = 'google.generativeai' not in sys.modules\n"
+            "reply = client.post('/api/chat', json={'message': 'Schools with a zoo visit in Agra'}).get_json()\n"
+            "print(json.dumps([health, lazy, reply['cached']]))\n"
+        )
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, SCHOOLOO_FAKE_LLM='1', FAKE_LLM_LATENCY_MS='fixed:0',
+                       WARM_SNAPSHOT_PATH=os.path.join(tmp, 'warm.pickle'), REQUEST_TIMING_LOG='false')
+            runs = [subprocess.run([sys.executable, '-W', 'ignore', '-c', child], cwd=os.path.dirname(
+                os.path.abspath(__file__)), env=env, capture_output=True, text=True, timeout=60) for _ in range(2)]
+        cold, warm = [json.loads(run.stdout.strip().splitlines()[-1]) for run in runs]
+        assert cold == [200, True, False], runs[0].stderr[-500:]
+        assert warm == [200, True, True], "Second process answers from the /tmp snapshot"
+        print("✅ Cold start test passed")
+
+
+class TestFrontend:
+    """Test the landing page is served from memory with revalidation"""
+
+    @staticmethod
+    def test_gzip_negotiation_revalidation_and_reload():
+        """Test gzip is negotiated, validators give 304s and an edited file is picked up"""
+        import gzip
+        from static_assets import StaticAsset, accepts_gzip
+
+        client = chat_app.app.test_client()
+        page = client.get('/', headers={'Accept-Encoding': 'gzip, deflate, br'})
+        plain = client.get('/')
+        assert page.status_code == 200 and page.headers['Content-Encoding'] == 'gzip'
+        assert gzip.decompress(page.data) == plain.data and 'Content-Encoding' not in plain.headers
+        assert page.headers['Vary'] == 'Accept-Encoding' and 'max-age=' in page.headers['Cache-Control']
+        assert page.headers['ETag'] != plain.headers['ETag'], "Each encoding has its own ETag"
+        again = client.get('/', headers={'Accept-Encoding': 'gzip', 'If-None-Match': page.headers['ETag']})
+        assert again.status_code == 304 and again.data == b'' and again.headers['ETag'] == page.headers['ETag']
+        assert client.get('/', headers={'If-Modified-Since': plain.headers['Last-Modified']}).status_code == 304
+        assert not accepts_gzip('gzip;q=0, identity') and accepts_gzip('*') and not accepts_gzip('br')
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'page.html')
+            with open(path, 'w') as f:
+                f.write('<p>one</p>' * 50)
+            asset = StaticAsset(path, 'text/html; charset=utf-8', reload_seconds=0)
+            body = asset.respond({})[2]
+            with open(path, 'w') as f:
+                f.write('<p>two</p>' * 50)
+            os.utime(path, (1, 1))
+            assert asset.respond({})[2] != body and asset.stats()['loads'] == 2
+            os.remove(path)
+            assert asset.respond({}) is None
+        print("✅ Frontend serving test passed")
@@ -1,13 +1,21 @@
 #!/usr/bin/env python3
 """Test available Gemini models"""
 import os
+import sys
 from dotenv import load_dotenv
 import google.generativeai as genai
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'agent'))
+import fake_genai
+
 load_dotenv()
 
+# SCHOOLOO_FAKE_LLM=1 checks against the local stand-in, offline
+if fake_genai.fake_llm_enabled():
+    genai.list_models = fake_genai.list_models
+
 api_key = os.getenv('API_KEY')
-if not api_key:
+if not api_key and not fake_genai.fake_llm_enabled():
     print("❌ API_KEY not found in .env")
     exit(1)
 
@@ -33,7 +41,7 @@ try:
         model_name = available_models[0]
         print(f"🧪 Testing with model: {model_name}\n")
         
-        model = genai.GenerativeModel(model_name)
+        model = fake_genai.generative_model(model_name)
         response = model.generate_content("Hello! What's your name?")
         
         print(f"✅ Test successful!\n")
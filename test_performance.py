@@ -0,0 +1,45 @@
+"""
+Performance tests for DatabaseManager, compared with benchmarks/baselines/database.json
+Run: python -m pytest test_performance.py --perf [--perf-sizes 1000,10000,100000]
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'benchmarks'))
+
+import bench_database
+
+pytestmark = pytest.mark.perf
+
+
+@pytest.fixture(scope="module")
+def results(request):
+    """One benchmark run over the requested sizes"""
+    sizes = [int(s) for s in request.config.getoption("--perf-sizes").split(",")]
+    return bench_database.run(sizes)
+
+
+@pytest.fixture(scope="module")
+def baseline():
+    baseline = bench_database.load_baseline()
+    if not baseline:
+        pytest.skip("no baseline; run benchmarks/bench_database.py --save-baseline")
+    return baseline
+
+
+def test_database_operations_within_baseline(results, baseline, request):
+    """Every operation keeps its baseline throughput and allocations, within the thresholds"""
+    regressions = bench_database.compare(
+        baseline, results,
+        threshold=request.config.getoption("--perf-threshold"),
+        alloc_threshold=request.config.getoption("--perf-alloc-threshold"),
+    )
+    assert not regressions, "\n".join(regressions)
+
+
+def test_lookups_by_id_do_not_scale_with_catalog(results):
+    """get_school_by_id stays a hash lookup: no allocations at any size"""
+    for size, ops in results.items():
+        assert ops["get_school_by_id"]["alloc_bytes"] < 64, size
@@ -11,7 +11,9 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'backend'))
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'agent'))
 
 from database import DatabaseManager, School
+from app import app as backend_app
 from tools import ToolHandler
+from singleflight import SingleFlight, make_key
 
 class TestSchoolooBackend:
     """Test backend functionality"""
@@ -90,6 +92,919 @@ class TestToolHandler:
         print(f"✅ Tool execution test passed")
 
 
+class TestBatchEndpoint:
+    """Test the batch API and automatic tool batching"""
+    
+    @staticmethod
+    def test_batch_runs_operations_in_order():
+        """Test several operations run in one request"""
+        client = backend_app.test_client()
+        
+        response = client.post('/api/batch', json={
+            "parallel": True,
+            "operations": [
+                {"id": "details", "operation": "get_school_details", "params": {"school_id": "school_001"}},
+                {"id": "docs", "operation": "get_required_documents", "params": {"school_id": "school_001"}},
+                {"id": "missing", "operation": "get_exam_pattern", "params": {"school_id": "nope"}},
+                {"id": "bad", "operation": "drop_tables", "params": {}},
+            ]
+        })
+        results = response.get_json()["results"]
+        assert response.status_code == 200
+        assert [r["id"] for r in results] == ["details", "docs", "missing", "bad"]
+        assert results[0]["body"]["data"]["name"] == "Delhi Public School"
+        assert results[1]["body"]["documents"], "Should include documents"
+        assert [r["status"] for r in results[2:]] == [404, 400]
+        print("✅ Batch endpoint test passed")
+    
+    @staticmethod
+    def test_tool_handler_batches_pending_tools():
+        """Test ToolHandler sends pending tools as one batch"""
+        import tools
+        client = backend_app.test_client()
+        posted = []
+        
+        class ShimResponse:
+            def __init__(self, response):
+                self.status_code = response.status_code
+                self._data = response.get_json()
+            
+            def json(self):
+                return self._data
+        
+        class BackendShim:
+            @staticmethod
+            def request(method, url, json=None, **kwargs):
+                posted.append(url)
+                return ShimResponse(client.open(
+                    url.replace(tools.BACKEND_URL, '/api'), method=method, json=json
+                ))
+        
+        original = tools.requests
+        tools.requests = BackendShim
+        batches = tools.TOOL_LATENCY.count("batch", "ok")
+        try:
+            results = ToolHandler.execute_tools([
+                ("get_admission_info", {"school_id": "school_002"}),
+                ("get_fee_structure", {"school_id": "school_002"}),
+            ])
+        finally:
+            tools.requests = original
+        
+        assert posted == [f"{tools.BACKEND_URL}/batch"], "Should make exactly one request"
+        assert tools.TOOL_LATENCY.count("batch", "ok") == batches + 1
+        assert json.loads(results[1])["school_name"] == "Greenfield Public School"
+        print("✅ Tool batching test passed")
+    
+    @staticmethod
+    def test_failed_batch_never_replays_writes():
+        """Test an old backend gets one request per tool but an uncertain failure resends nothing"""
+        import requests
+        import tools
+        from urllib3.exceptions import MaxRetryError, NewConnectionError
+        sent = []
+        calls = [("get_faqs", {}), ("capture_lead", {"name": "A", "email": "a@x.in", "phone": "1",
+                                                      "school_interested": "school_001",
+                                                      "query_type": "admission", "query_text": "hi"})]
+        
+        class Response:
+            def __init__(self, status_code, data):
+                self.status_code, self._data = status_code, data
+            
+            def json(self):
+                return self._data
+        
+        def backend(batch_failure):
+            class Shim:
+                @staticmethod
+                def request(method, url, **kwargs):
+                    sent.append(url.replace(tools.BACKEND_URL, ''))
+                    if url.endswith('/batch'):
+                        if isinstance(batch_failure, int):
+                            return Response(batch_failure, {})
+                        raise batch_failure
+                    return Response(200, {"success": True})
+            return Shim
+        
+        original = tools.requests
+        try:
+            tools.requests = backend(404)
+            results = ToolHandler.execute_tools(calls)
+            assert sent == ['/batch', '/faqs', '/leads'], "An old backend gets one request per tool"
+            assert all(json.loads(r)["success"] for r in results)
+            
+            refused = requests.ConnectionError(MaxRetryError(None, '/batch', NewConnectionError(None, 'refused')))
+            sent.clear()
+            tools.requests = backend(refused)
+            ToolHandler.execute_tools(calls)
+            assert sent == ['/batch', '/faqs', '/leads'], "A refused connection never reached the backend"
+            
+            for failure in (requests.ReadTimeout("read timed out"), 500):
+                sent.clear()
+                tools.requests = backend(failure)
+                results = [json.loads(r) for r in ToolHandler.execute_tools(calls)]
+                assert sent == ['/batch'], f"Nothing is resent after {failure!r}"
+                assert "not retried" in results[1]["error"] and "error" in results[0]
+        finally:
+            tools.requests = original
+        print("✅ Batch fallback test passed")
+
+
+class TestResilience:
+    """Test circuit breakers, bulkheads and retries"""
+    
+    @staticmethod
+    def test_circuit_breaker_opens_and_recovers():
+        """Test breaker fails fast while open and closes after a good probe"""
+        import time
+        from resilience import CircuitBreaker
+        
+        breaker = CircuitBreaker("GET /schools/<school_id>", failure_threshold=2, reset_timeout=0.05)
+        breaker.record_failure()
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        assert not breaker.allow(), "Open breaker should reject calls"
+        
+        time.sleep(0.06)
+        assert breaker.allow(), "Should allow one probe after the cool-down"
+        assert not breaker.allow(), "Only one probe at a time"
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+        print("✅ Circuit breaker test passed")
+    
+    @staticmethod
+    def test_server_errors_open_the_route_breaker():
+        """Test a route answering 500 every time is failed fast after the threshold, without retries"""
+        import tools
+        from resilience import CircuitBreaker
+        sent = []
+        
+        class Failing:
+            status_code = 500
+            
+            @staticmethod
+            def json():
+                return {"error": "boom"}
+        
+        class Shim:
+            @staticmethod
+            def request(method, url, **kwargs):
+                sent.append(url)
+                return Failing()
+        
+        route = "GET /schools/<school_id>"
+        original = tools.requests
+        tools.requests = Shim
+        try:
+            for i in range(tools.breakers.failure_threshold + 2):
+                ToolHandler.execute_tool("get_school_details", {"school_id": f"school_{i}"})
+            state = tools.breakers.get(route).state
+        finally:
+            tools.requests = original
+            tools.breakers.get(route).record_success()
+        assert len(sent) == tools.breakers.failure_threshold, "Not retried, then failed fast"
+        assert state == CircuitBreaker.OPEN
+        print("✅ Server error breaker test passed")
+    
+    @staticmethod
+    def test_retry_stops_at_deadline():
+        """Test retries are bounded by attempts and deadline"""
+        import time
+        from resilience import retry_call
+        
+        calls = []
+        
+        def flaky(remaining):
+            calls.append(remaining)
+            if len(calls) < 3:
+                raise TimeoutError("slow backend")
+            return "ok"
+        
+        assert retry_call(flaky, attempts=3, deadline=time.monotonic() + 5,
+                          retry_on=(TimeoutError,), base_delay=0.001) == "ok"
+        
+        calls.clear()
+        try:
+            retry_call(flaky, attempts=2, deadline=time.monotonic() + 5,
+                       retry_on=(TimeoutError,), base_delay=0.001)
+            assert False, "Should give up after two attempts"
+        except TimeoutError:
+            assert len(calls) == 2
+        print("✅ Retry test passed")
+    
+    @staticmethod
+    def test_bulkhead_rejects_when_full():
+        """Test admin bulkhead does not wait forever for a slot"""
+        from resilience import Bulkhead, BulkheadFullError
+        
+        bulkhead = Bulkhead("admin", max_concurrent=1, acquire_timeout=0.01)
+        with bulkhead:
+            try:
+                with bulkhead:
+                    assert False, "Second call should not get a slot"
+            except BulkheadFullError:
+                pass
+        assert bulkhead.snapshot() == {"active": 0, "limit": 1, "rejected": 1}
+        print("✅ Bulkhead test passed")
+
+
+class TestFunctionCallingLoop:
+    """Test the SchoolooAgent tool loop with a scripted model"""
+    
+    @staticmethod
+    def test_tool_calls_are_batched_and_feed_back():
+        """Test tools from one model turn go out as one batch within the deadline and results reach the model"""
+        import time
+        import schooloo_agent
+        from google.generativeai import protos
+        
+        def function_call_response(*calls):
+            parts = [protos.Part(function_call=protos.FunctionCall(name=n, args=a)) for n, a in calls]
+            content = protos.Content(role="model", parts=parts)
+            return type("Response", (), {"candidates": [type("Candidate", (), {"content": content})()]})()
+        
+        seen_contents = []
+        
+        class ScriptedModel:
+            def __init__(self, **kwargs):
+                self.turn = 0
+            
+            def generate_content(self, contents, **kwargs):
+                seen_contents.append(list(contents))
+                self.turn += 1
+                if self.turn == 1:
+                    return function_call_response(
+                        ("get_required_documents", {"school_id": "school_001"}),
+                        ("get_exam_pattern", {"school_id": "school_001"}),
+                    )
+                return type("Response", (), {"candidates": [], "text": "Grounded answer"})()
+        
+        batches = []
+        
+        def execute_tools(calls):
+            batches.append([name for name, _ in calls])
+            time.sleep(0.2)
+            return [json.dumps({"success": True, "tool": name, "school_id": args["school_id"]})
+                    for name, args in calls]
+        
+        agent = schooloo_agent.SchoolooAgent()
+        original_model, original_execute = schooloo_agent.get_model, ToolHandler.execute_tools
+        original_deadline = schooloo_agent.CHAT_DEADLINE_SECONDS
+        schooloo_agent.get_model = lambda *args, **kwargs: ScriptedModel()
+        ToolHandler.execute_tools = staticmethod(execute_tools)
+        try:
+            reply = agent.chat("Documents and exam for DPS?")
+            feedback = seen_contents[1][-1]["parts"]
+            schooloo_agent.CHAT_DEADLINE_SECONDS = 0.1
+            started = time.monotonic()
+            late = agent.chat("Documents and exam for DPS?")
+            elapsed = time.monotonic() - started
+        finally:
+            schooloo_agent.get_model, ToolHandler.execute_tools = original_model, original_execute
+            schooloo_agent.CHAT_DEADLINE_SECONDS = original_deadline
+        
+        assert reply == "Grounded answer"
+        assert batches[0] == ["get_required_documents", "get_exam_pattern"], "One batch per model turn"
+        assert [p.function_response.name for p in feedback] == ["get_required_documents", "get_exam_pattern"]
+        assert late == schooloo_agent.TIMEOUT_REPLY and elapsed < 0.2, "The deadline bounds a slow batch"
+        print("✅ Function-calling loop test passed")
+
+
+class TestToolRegistry:
+    """Test the shared tool registry"""
+    
+    @staticmethod
+    def test_agent_and_handler_share_registry():
+        """Test every declared tool has a handler and schemas are built once"""
+        import schooloo_agent
+        from tool_registry import TOOL_SPECS
+        
+        handlers = ToolHandler._handlers()
+        assert [spec.name for spec in TOOL_SPECS] == list(handlers), "Every tool needs a handler"
+        agent = schooloo_agent.SchoolooAgent()
+        assert agent.get_tools_schema() is agent.get_tools_schema(), "Schemas should not be rebuilt"
+        assert json.loads(agent.process_tool_call("drop_tables", {}))["error"]
+        print("✅ Tool registry test passed")
+
+
+class TestSingleFlight:
+    """Test request coalescing"""
+    
+    @staticmethod
+    def test_concurrent_calls_share_one_execution():
+        """Test identical concurrent calls run once"""
+        import threading
+        import time
+        
+        flight = SingleFlight("test")
+        executions = []
+        results = []
+        
+        def slow_lookup():
+            executions.append(1)
+            time.sleep(0.1)
+            return {"success": True}
+        
+        key = make_key("get_school_details", {"school_id": "school_001"})
+        threads = [
+            threading.Thread(target=lambda: results.append(flight.do(key, slow_lookup)))
+            for _ in range(8)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        
+        assert len(executions) == 1, "Backend should be called once"
+        assert results == [{"success": True}] * 8, "Every caller should get the result"
+        stats = flight.stats()
+        assert stats["collapsed"] == 7 and stats["in_flight"] == 0
+        print("✅ Single-flight coalescing test passed")
+    
+    @staticmethod
+    def test_key_normalization():
+        """Test equivalent payloads map to the same key"""
+        assert make_key("llm", {"message": "Best  schools in Delhi"}, ["message"]) == \
+            make_key("llm", {"message": "best schools in delhi"}, ["message"])
+        assert make_key("llm", {"message": "Delhi"}, ["message"]) != make_key("llm", {"message": "Mumbai"}, ["message"])
+        assert make_key("get_school_details", {"school_id": "SCHOOL_001"}) != \
+            make_key("get_school_details", {"school_id": "school_001"}), "IDs are case-sensitive"
+        assert make_key("search_schools", {"location": " New  Delhi"}, ["location"]) == \
+            make_key("search_schools", {"location": "new delhi"}, ["location"])
+        print("✅ Key normalization test passed")
+    
+    @staticmethod
+    def test_async_leader_cancellation_spares_waiters():
+        """Test a cancelled first caller does not fail the others, and an abandoned call is cancelled"""
+        import asyncio
+        from singleflight import AsyncSingleFlight
+        
+        async def scenario():
+            flight = AsyncSingleFlight("test-async")
+            started, finished = [], []
+            
+            async def slow(value):
+                started.append(value)
+                await asyncio.sleep(0.05)
+                finished.append(value)
+                return value
+            
+            leader = asyncio.ensure_future(flight.do("k", slow, "answer"))
+            await asyncio.sleep(0)
+            waiter = asyncio.ensure_future(flight.do("k", slow, "answer"))
+            await asyncio.sleep(0)
+            leader.cancel()
+            assert await waiter == "answer", "The waiter still gets the shared result"
+            assert leader.cancelled() and started == ["answer"]
+            
+            lone = asyncio.ensure_future(flight.do("k2", slow, "x"))
+            await asyncio.sleep(0.01)
+            lone.cancel()
+            await asyncio.sleep(0)
+            assert flight.in_flight() == 0, "A call nobody waits for is dropped"
+            await asyncio.sleep(0.1)
+            assert started == ["answer", "x"] and finished == ["answer"], "The abandoned call was cancelled"
+        
+        asyncio.run(scenario())
+        print("✅ Async single-flight cancellation test passed")
+
+
+class TestConversationHistory:
+    """Test the token-budgeted conversation history"""
+    
+    @staticmethod
+    def test_budget_holds_over_long_session():
+        """Test 50 turns stay under budget with recent turns verbatim"""
+        from history import ConversationHistory
+        
+        history = ConversationHistory(max_recent_turns=4, max_prompt_tokens=1200)
+        system_prompt = "You are Schooloo AI Assistant. " * 20
+        for turn in range(50):
+            contents = history.build_contents(system_prompt, f"Question {turn} about schools in Delhi?")
+            assert history.prompt_tokens(system_prompt, f"Question {turn} about schools in Delhi?") <= 1200
+            history.add("user", f"Question {turn} about schools in Delhi?")
+            history.add("assistant", f"Answer {turn}: " + "Delhi Public School, CBSE, ₹1.2L/year. " * 15)
+        
+        assert len(history) == 100 and history.folded_turns >= 46
+        assert [m["role"] for m in history.messages[-2:]] == ["user", "model"]
+        assert history.messages[-2]["text"] == "Question 49 about schools in Delhi?"
+        assert contents[0]["parts"][0].startswith(system_prompt)
+        assert "Summary of the earlier conversation" in contents[0]["parts"][0]
+        assert contents[-1] == {"role": "user", "parts": ["Question 49 about schools in Delhi?"]}
+        
+        restored = ConversationHistory.from_dict(json.loads(json.dumps(history.to_dict())),
+                                                max_recent_turns=4, max_prompt_tokens=1200)
+        assert restored.build_contents(system_prompt, "Next?") == history.build_contents(system_prompt, "Next?")
+        print("✅ Conversation history budget test passed")
+
+
+class TestLocalRouter:
+    """Test intent and school resolution for the local answer path"""
+    
+    @staticmethod
+    def test_resolves_only_unambiguous_questions():
+        """Test one intent plus one school routes locally, anything else falls through"""
+        from local_router import LocalRouter, school_aliases
+        
+        assert "dps" in school_aliases("Delhi Public School")
+        assert "delhi" not in school_aliases("Delhi Public School"), "City names must not identify a school"
+        assert "greenfield" in school_aliases("Greenfield Public School")
+        
+        router = LocalRouter(DatabaseManager())
+        assert router.answer("eligibility for greenfield")["tool"] == "get_eligibility_criteria"
+        assert router.answer("documents needed for admission at Delhi Public School")["tool"] == \
+            "get_required_documents"
+        assert router.answer("best schools in Delhi") is None
+        assert router.answer("compare fees of DPS and Greenfield") is None
+        assert router.answer("hostel at greenfield") is None
+        stats = router.stats()
+        assert stats["local_answers"] == 2 and stats["llm_call_rate"] == 0.6
+        
+        assert router.answer("fees at DPS New Delhi")["tool"] == "get_fee_structure"
+        assert router.answer("fees at DPS Mumbai") is None, "Another city's DPS is not ours"
+        assert router.answer("fee of delhi public school bangalore") is None
+        assert router.answer("documents for DPS Rohini") is None
+        assert router.answer("I do not want the fee details of DPS") is None
+        assert router.answer("I don't need DPS documents") is None
+        print("✅ Local router resolution test passed")
+    
+    @staticmethod
+    def test_alias_lookup_does_not_scan_the_catalog():
+        """Test schools resolve by n-gram lookup on a large catalog and new schools are picked up"""
+        from catalog_generator import load_into
+        from local_router import FAST_ANSWER_MS, LocalRouter
+        
+        db = DatabaseManager()
+        dps = next(s.id for s in db.get_all_schools() if s.name == "Delhi Public School")
+        load_into(db, 2000, seed=5)
+        router = LocalRouter(db)
+        router.warm()
+        assert router.resolve_schools("fees at Delhi Public School") == [dps]
+        assert router.answer("fees at DPS")["elapsed_ms"] < FAST_ANSWER_MS
+        
+        school = next(iter(db.schools.values()))
+        db.schools["zz_new"] = school.__class__(**{**school.__dict__, "id": "zz_new", "name": "Quillbrook Academy"})
+        assert router.resolve_schools("documents for quillbrook") == ["zz_new"]
+        print("✅ Local router alias lookup test passed")
+
+
+class TestLLMScheduler:
+    """Test quota-aware scheduling of Gemini calls"""
+    
+    @staticmethod
+    def test_interactive_calls_jump_the_batch_queue():
+        """Test queued live chat is admitted before earlier batch work"""
+        import threading
+        import time
+        from llm_scheduler import LLMScheduler, PRIORITY_BATCH, PRIORITY_INTERACTIVE
+        
+        scheduler = LLMScheduler(requests_per_minute=600)  # one request every 0.1s
+        for _ in range(600):  # drain the burst allowance
+            scheduler.acquire(tokens=10)
+        
+        order = []
+        
+        def submit(name, priority, delay):
+            time.sleep(delay)
+            scheduler.call(lambda: order.append(name), tokens=10, priority=priority, deadline_seconds=5)
+        
+        threads = [threading.Thread(target=submit, args=(f"batch{i}", PRIORITY_BATCH, 0)) for i in range(3)]
+        threads.append(threading.Thread(target=submit, args=("chat", PRIORITY_INTERACTIVE, 0.02)))
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        
+        assert order[0] == "chat", f"Live chat should go first, got {order}"
+        assert scheduler.stats()["queued"] == 0
+        print("✅ Scheduler priority test passed")
+    
+    @staticmethod
+    def test_rejects_early_and_honours_retry_after():
+        """Test over-deadline waits fail fast and 429s wait for the retry delay"""
+        import time
+        from llm_scheduler import LLMScheduler, QuotaExceededError
+        
+        scheduler = LLMScheduler(requests_per_minute=60, tokens_per_minute=1000)
+        scheduler.acquire(tokens=1000)
+        started = time.monotonic()
+        try:
+            scheduler.call(lambda: "never", tokens=500, deadline_seconds=5)
+            assert False, "Should be rejected"
+        except QuotaExceededError as e:
+            assert e.retry_after >= 25, "TPM bucket needs ~30s to refill 500 tokens"
+        assert time.monotonic() - started < 0.5, "Rejection should be immediate"
+        
+        scheduler = LLMScheduler(requests_per_minute=6000)
+        attempts = []
+        
+        def flaky():
+            attempts.append(time.monotonic())
+            if len(attempts) == 1:
+                raise Exception("429 Resource has been exhausted. Please retry in 0.2s.")
+            return "ok"
+        
+        assert scheduler.call(flaky, tokens=10, deadline_seconds=5) == "ok"
+        assert attempts[1] - attempts[0] >= 0.19, "Retry should wait for the server's delay"
+        stats = scheduler.stats()
+        assert stats["rate_limited"] == 1 and stats["retries"] == 1
+        print("✅ Scheduler rejection and retry-after test passed")
+
+
+class TestRetrieval:
+    """Test catalog retrieval for grounded prompts"""
+    
+    @staticmethod
+    def test_context_block_is_relevant_and_bounded():
+        """Test the named school's records are packed under the budget and misses add nothing"""
+        from retrieval import CatalogIndex, grounded_prompt
+        from history import estimate_tokens
+        
+        index = CatalogIndex(DatabaseManager())
+        block = index.context_block("fees at DPS", max_tokens=160)
+        assert "₹2,50,000/year" in block and "Greenfield" not in block
+        assert estimate_tokens(block) <= 160
+        assert "Swimming Pool" in index.context_block("which school has a swimming pool?")
+        assert index.context_block("best CBSE schools in Prayagraj") == "", "Unrelated records must not be sent"
+        assert index.context_block("fees at DPS", max_tokens=10) == ""
+        
+        both = index.context_block("fees and documents at Delhi Public School")
+        assert "₹2,50,000/year" in both and "entrance exam" in both, "The school and its admissions row both fit"
+        tight = index.context_block("fees and documents at Delhi Public School", max_tokens=120)
+        assert "transportation" not in tight, "A lower-ranked record must not replace one that did not fit"
+        assert estimate_tokens(tight) <= 120
+        assert grounded_prompt("SYSTEM", "hello there") == "SYSTEM"
+        print("✅ Retrieval context test passed")
+
+class TestUsageTracker:
+    """Test token and cost accounting"""
+    
+    @staticmethod
+    def test_aggregates_costs_and_rotates_log():
+        """Test reported usage is preferred, costs follow the price table and the log rotates"""
+        import tempfile
+        from usage import UsageTracker
+        
+        log_path = os.path.join(tempfile.mkdtemp(), "usage.jsonl")
+        tracker = UsageTracker(log_path=log_path, max_log_bytes=600, backup_count=2, session_token_budget=1500)
+        reported = type("Response", (), {
+            "text": "ignored",
+            "usage_metadata": type("Usage", (), {"prompt_token_count": 1000, "candidates_token_count": 500})(),
+        })()
+        entry = tracker.record_response(reported, "chat", "gemini-2.0-flash", 120.0, session_id="s1")
+        assert not entry["estimated"] and entry["cost_usd"] == 0.0003
+        estimated = tracker.record_response(type("R", (), {"text": "x" * 40})(), "chat", "gemini-2.0-flash",
+                                            80.0, contents=["y" * 400], session_id="s1")
+        assert estimated["estimated"] and (estimated["input_tokens"], estimated["output_tokens"]) == (100, 10)
+        for _ in range(5):
+            tracker.record("chat", "gemini-2.0-flash", cache="hit", session_id="s2")
+        
+        report = tracker.report()
+        assert report["total"]["llm_calls"] == 2 and report["total"]["cache_hits"] == 5
+        assert report["top_sessions"][0]["session_id"] == "s1"
+        assert report["budgets"]["sessions_over_budget"] == ["s1"]
+        assert os.path.exists(log_path + ".1"), "Log should have rotated"
+        
+        unwritable = UsageTracker(log_path=os.path.join(log_path, "nested", "usage.jsonl"))
+        unwritable.record("chat", "gemini-2.0-flash")
+        assert unwritable.log_path is None and unwritable.report()["total"]["llm_calls"] == 1, \
+            "An unwritable log path leaves the tracker in memory"
+        print("✅ Usage tracker test passed")
+
+class TestFakeGenai:
+    """Test the local Gemini stand-in"""
+    
+    @staticmethod
+    def test_deterministic_paced_and_injects_429s():
+        """Test replies repeat per seed, streams follow the pace, tools are called and 429s look real"""
+        import time
+        from fake_genai import FakeGenerativeModel, FakeLLMConfig, sample_latency_ms
+        from llm_scheduler import is_rate_limited, retry_after_seconds
+        import random
+        
+        config = FakeLLMConfig(latency_ms="fixed:0", tokens_per_second=400, output_tokens=40, chunk_tokens=4)
+        model = FakeGenerativeModel(config=config)
+        reply = model.generate_content(["SYSTEM", "Schools in Pune"])
+        assert reply.text == FakeGenerativeModel(config=config).generate_content("Schools in Pune").text
+        assert reply.usage_metadata.candidates_token_count >= 40
+        
+        started = time.monotonic()
+        stream = model.generate_content("Schools in Pune", stream=True)
+        chunks = [chunk.text for chunk in stream]
+        assert "".join(chunks) == reply.text and len(chunks) >= 10
+        assert time.monotonic() - started >= 0.1, "Streaming should follow tokens_per_second"
+        assert stream.usage_metadata.total_token_count > 0
+        
+        tools = FakeGenerativeModel(tools=[{"name": "get_fee_structure", "parameters": {"required": ["school_id"]}}],
+                                    config=config)
+        call = tools.generate_content(["fees at DPS?"]).candidates[0].content.parts[0].function_call
+        assert (call.name, call.args) == ("get_fee_structure", {"school_id": "school_001"})
+        from google.generativeai import protos
+        feedback = {"role": "user", "parts": [protos.Part(function_response=protos.FunctionResponse(
+            name="get_fee_structure", response={"result": {}}))]}
+        assert tools.generate_content(["fees at DPS?", feedback]).text
+        
+        failing = FakeGenerativeModel(config=FakeLLMConfig(latency_ms="fixed:0", error_rate=1.0, retry_after=2))
+        try:
+            failing.generate_content("hi")
+            assert False, "Expected a 429"
+        except Exception as e:
+            assert is_rate_limited(e) and retry_after_seconds(e) == 2.0
+        
+        rng = random.Random(1)
+        assert all(50 <= sample_latency_ms("uniform:50,250", rng) <= 250 for _ in range(100))
+        print("✅ Fake Gemini test passed")
+
+class TestCatalogGenerator:
+    """Test the synthetic catalog generator"""
+    
+    @staticmethod
+    def test_reproducible_and_loadable():
+        """Test the same seed gives the same catalog, in memory and through JSONL"""
+        import tempfile
+        from catalog_generator import CITIES, CatalogGenerator, empty_db, load_into, load_jsonl, write_jsonl
+        
+        first, again = CatalogGenerator(seed=3), CatalogGenerator(seed=3)
+        assert first.school(1234) == again.school(1234)
+        assert first.school(1234) != CatalogGenerator(seed=4).school(1234)
+        assert list(first.records(50, 5)) == list(again.records(50, 5))
+        
+        db = empty_db()
+        counts = load_into(db, 500, leads=50, seed=3)
+        assert counts["school"] == counts["admission"] == len(db.schools) == 500
+        assert counts["faq"] == len(db.faqs) and counts["lead"] == len(db.leads) == 50
+        assert all(lead.school_interested in db.schools for lead in db.leads.values())
+        for school in db.schools.values():
+            assert all(fee.startswith("₹") and fee.endswith("/year") for fee in school.fee_structure.values())
+            assert any(abs(school.latitude - c[2]) < 1 and abs(school.longitude - c[3]) < 1 for c in CITIES)
+            assert school.id in db.admissions
+        assert any("lakh" in fee for s in db.schools.values() for fee in s.fee_structure.values())
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "catalog.jsonl")
+            assert write_jsonl(path, 500, leads=50, seed=3) == counts
+            loaded = empty_db()
+            assert load_jsonl(loaded, path) == counts
+            assert loaded.schools == db.schools and loaded.faqs == db.faqs and loaded.leads == db.leads
+        print("✅ Catalog generator test passed")
+
+class TestRequestTiming:
+    """Test per-request phase timing and sampled profiles"""
+    
+    @staticmethod
+    def test_server_timing_header_and_sampled_profiles():
+        """Test backend responses carry their phases and sampled requests leave a bounded set of profiles"""
+        import pstats
+        import tempfile
+        from flask import Flask, jsonify
+        import request_timing
+        
+        client = backend_app.test_client()
+        response = client.post('/api/schools/search', json={"location": "Delhi"})
+        header = response.headers['Server-Timing']
+        for name in ('parse', 'db', 'serialize', 'app', 'total'):
+            assert f"{name};dur=" in header, header
+        assert 'tools;dur=' in client.post('/api/batch', json={"operations": [
+            {"operation": "get_school_details", "params": {"school_id": "school_001"}}]}).headers['Server-Timing']
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            app = Flask(__name__)
+            profiler = request_timing.RouteProfiler(sample_rate=1.0, routes=["slow"], directory=tmp, keep=2)
+            request_timing.init_app(app, log_timings=False, profiler=profiler)
+            app.add_url_rule('/slow', 'slow', lambda: jsonify(total=sum(range(10000))))
+            app.add_url_rule('/fast', 'fast', lambda: jsonify(ok=True))
+            test_client = app.test_client()
+            headers = [test_client.get('/slow').headers['Server-Timing'] for _ in range(3)]
+            assert 'profile;desc=' not in test_client.get('/fast').headers['Server-Timing']
+            saved = sorted(os.listdir(tmp))
+            assert len(saved) == 2 and all(name.startswith('slow-') for name in saved)
+            assert saved[-1] in headers[-1]
+            assert pstats.Stats(os.path.join(tmp, saved[-1])).total_calls > 0
+        
+        with request_timing.phase('db'):
+            pass  # outside a request it is a no-op
+        print("✅ Request timing test passed")
+
+class TestMetrics:
+    """Test the Prometheus metrics endpoint"""
+    
+    @staticmethod
+    def test_counters_are_exact_under_threads_and_exposed():
+        """Test striped counters lose no updates and /metrics reports routes, latencies and table sizes"""
+        import threading
+        import metrics
+        
+        registry = metrics.Registry()
+        hits = registry.counter("test_hits_total", "Hits", ["route"])
+        latency = registry.histogram("test_seconds", "Latency", ["route"], buckets=(0.1, 1.0))
+        
+        def work():
+            for _ in range(5000):
+                hits.inc("/a")
+                latency.observe(0.5, "/a")
+        
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert hits.value("/a") == 40000 and latency.count("/a") == 40000
+        text = registry.render()
+        assert 'test_hits_total{route="/a"} 40000' in text
+        assert 'test_seconds_bucket{route="/a",le="0.1"} 0' in text
+        assert 'test_seconds_bucket{route="/a",le="+Inf"} 40000' in text
+        assert 'test_seconds_sum{route="/a"} 20000' in text
+        
+        client = backend_app.test_client()
+        client.get('/api/schools/school_001')
+        client.get('/api/schools/nope')
+        text = client.get('/metrics').get_data(as_text=True)
+        assert 'schooloo_http_requests_total{method="GET",route="/api/schools/<school_id>",status="200"}' in text
+        assert 'schooloo_http_requests_total{method="GET",route="/api/schools/<school_id>",status="404"}' in text
+        assert 'schooloo_http_request_duration_seconds_count{method="GET",route="/api/schools/<school_id>"' in text
+        assert 'schooloo_http_requests_in_flight 1' in text, "Only the scrape itself is in flight"
+        assert 'schooloo_db_records{collection="schools"}' in text
+        print("✅ Metrics test passed")
+    
+    @staticmethod
+    def test_tool_resilience_state_is_exported():
+        """Test breaker, bulkhead and coalescing state reach /metrics from the one tools module"""
+        import main
+        import metrics
+        import tools
+        
+        assert main.ToolHandler is tools.ToolHandler and 'agent.tools' not in sys.modules, \
+            "One copy of the tools module, so one set of breakers"
+        breaker = tools.breakers.get("GET /metrics-test")
+        for _ in range(tools.breakers.failure_threshold):
+            breaker.record_failure()
+        text = metrics.REGISTRY.render()
+        assert 'schooloo_tool_breaker_state{route="GET /metrics-test",state="open"} 1' in text
+        assert 'schooloo_tool_breaker_state{route="GET /metrics-test",state="closed"} 0' in text
+        assert 'schooloo_tool_bulkhead_limit{pool="admin"}' in text
+        assert 'schooloo_tool_coalesced_total{result="collapsed"}' in text
+        
+        import urllib.request
+        tools.TOOL_LATENCY.observe(0.01, "get_faqs", "ok")
+        server = metrics.start_server(0, host='127.0.0.1')
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{server.server_port}/metrics", timeout=5) as response:
+                scraped = response.read().decode()
+        finally:
+            server.shutdown()
+        assert 'schooloo_tool_call_seconds_count{tool="get_faqs",outcome="ok"}' in scraped, \
+            "The agent process serves its own tool latencies"
+        print("✅ Tool metrics test passed")
+
+class TestTracing:
+    """Test trace propagation from the agent tools into the backend"""
+    
+    @staticmethod
+    def test_trace_spans_agent_and_backend():
+        """Test one turn's spans share a trace id across the HTTP hop and the slowest view merges them"""
+        import tempfile
+        import tools
+        import tracing
+        client = backend_app.test_client()
+        
+        class ShimResponse:
+            def __init__(self, response):
+                self.status_code = response.status_code
+                self._data = response.get_json()
+            
+            def json(self):
+                return self._data
+        
+        class BackendShim:
+            @staticmethod
+            def request(method, url, json=None, headers=None, **kwargs):
+                return ShimResponse(client.open(
+                    url.replace(tools.BACKEND_URL, '/api'), method=method, json=json, headers=headers
+                ))
+        
+        original, export_dir = tools.requests, tracing.TRACER.export_dir
+        with tempfile.TemporaryDirectory() as tmp:
+            tools.requests, tracing.TRACER.export_dir = BackendShim, tmp
+            try:
+                with tracing.span("turn") as turn:
+                    ToolHandler.execute_tools([
+                        ("get_admission_info", {"school_id": "school_002"}),
+                        ("get_fee_structure", {"school_id": "school_002"}),
+                    ])
+            finally:
+                tools.requests, tracing.TRACER.export_dir = original, export_dir
+            merged = tracing.load_exported(tmp)
+        
+        agent_trace, backend_trace = [t for t in tracing.TRACER.recent(5) if t["trace_id"] == turn.trace_id]
+        assert agent_trace["root"] == "turn" and backend_trace["root"] == "POST /api/batch"
+        http = next(s for s in agent_trace["spans"] if s["name"] == "http POST /batch")
+        server = next(s for s in backend_trace["spans"] if s["name"] == "POST /api/batch")
+        assert server["parent_id"] == http["span_id"], "Backend continues the agent's span"
+        db_spans = [s for s in backend_trace["spans"] if s["name"].startswith("db.")]
+        assert len(db_spans) == 2 and all(s["parent_id"] == server["span_id"] for s in db_spans)
+        
+        [view] = tracing.slowest(merged, 1)
+        assert view["root"] == "turn" and view["spans"] == len(agent_trace["spans"]) + len(backend_trace["spans"])
+        assert {"turn", "tool.batch", "http POST /batch", "POST /api/batch", "db.get_admission_info"} <= set(view["stages"])
+        assert abs(sum(view["stages"].values()) - view["duration_ms"]) < 1.0, "Stages add up to the turn"
+        assert tracing.extract({"traceparent": "00-xyz-1-01"}) is None
+        print("✅ Tracing test passed")
+    
+    @staticmethod
+    def test_propagate_carries_only_the_span():
+        """Test pool threads continue the trace but do not share the request's timer"""
+        from concurrent.futures import ThreadPoolExecutor
+        import request_timing
+        import tracing
+        
+        token = request_timing._current.set(request_timing.RequestTimer())
+        try:
+            with tracing.span("turn") as turn:
+                with ThreadPoolExecutor(max_workers=1) as pool:
+                    seen = pool.submit(tracing.propagate(
+                        lambda: (tracing.current_span(), request_timing._current.get()))).result()
+        finally:
+            request_timing._current.reset(token)
+        assert seen == (turn, None), "The worker sees the span and no RequestTimer"
+        print("✅ Trace propagation test passed")
+
+class TestWarmSnapshot:
+    """Test cached answers survive into a new process through the warm snapshot"""
+    
+    @staticmethod
+    def test_caches_round_trip_and_untrusted_files_are_ignored():
+        """Test fresh entries and LSH planes are restored, expired ones dropped, and writable files ignored"""
+        import tempfile
+        from response_cache import ResponseCache
+        from semantic_cache import SemanticCache
+        from warm_snapshot import WarmSnapshot
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'warm.pickle')
+            cache, semantic = ResponseCache(ttl_seconds=60), SemanticCache(ttl_seconds=60)
+            cache.set("fresh", "answer")
+            semantic.add("best CBSE schools in Pune", "pune answer")
+            assert WarmSnapshot(path, {'cache': cache, 'semantic': semantic}).save()
+            
+            restored_cache, restored_semantic = ResponseCache(ttl_seconds=60), SemanticCache(ttl_seconds=60)
+            snapshot = WarmSnapshot(path, {'cache': restored_cache, 'semantic': restored_semantic})
+            assert snapshot.restore() and not snapshot.restore(), "Restores once per process"
+            assert restored_cache.get("fresh") == "answer"
+            assert restored_semantic._planes == semantic._planes, "Hyperplanes come from the snapshot"
+            assert restored_semantic.lookup("top CBSE schools in Pune")[0] == "pune answer"
+            
+            aged = ResponseCache(ttl_seconds=60)
+            aged.load_state(cache.export_state(), age_seconds=120)
+            assert aged.get("fresh") is None, "Entries past their TTL are not restored"
+            
+            os.chmod(path, 0o666)
+            untrusted = ResponseCache()
+            assert not WarmSnapshot(path, {'cache': untrusted}).restore()
+            assert untrusted.get("fresh") is None
+            
+            import time
+            background_path = os.path.join(tmp, 'background.pickle')
+            background = WarmSnapshot(background_path, {'cache': cache}, save_interval_seconds=0.05)
+            background.changed()
+            assert not os.path.exists(background_path), "The request path does not write the snapshot"
+            deadline = time.monotonic() + 5
+            while not background.stats()["saves"] and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert background.stats()["saves"] == 1, "The background thread writes it"
+            
+            closing = WarmSnapshot(os.path.join(tmp, 'closing.pickle'), {'cache': cache}, save_interval_seconds=60)
+            closing.changed()
+            closing.close()
+            assert closing.stats()["saves"] == 1, "Changes not yet saved are written at shutdown"
+        print("✅ Warm snapshot test passed")
+
+class TestIntentMatcher:
+    """Test the compiled intent tables behind the query processors"""
+    
+    @staticmethod
+    def test_word_boundaries_requires_and_groups():
+        """Test keywords match at word starts, required keywords and exclusive groups"""
+        from intent_matcher import Intent, IntentMatcher
+        from query_processor import QueryProcessor
+        
+        assert QueryProcessor.process_parent_query("Top schools near me with low fees")["suggested_tools"] == [
+            "search_schools", "get_fee_structure", "get_nearby_schools"]
+        assert QueryProcessor.process_parent_query("coffee shop")["suggested_tools"] == ["get_faqs"], \
+            "A keyword inside another word does not match"
+        assert QueryProcessor.process_student_query("school timings")["suggested_tools"] == ["get_faqs"]
+        assert "get_school_details" in QueryProcessor.process_student_query("School details please")["suggested_tools"]
+        assert QueryProcessor.process_admin_query("view all new leads")["suggested_tools"] == ["capture_lead"], \
+            "The first action of a group wins"
+        assert QueryProcessor.process_admin_query("Update lead status, then add a FAQ")["suggested_tools"] == [
+            "update_lead_status", "add_faq"]
+        
+        matcher = IntentMatcher([Intent("search", ("best school", "school")), Intent("near", ("school near",))])
+        assert matcher.match("best school nearby") == ["search", "near"], "Overlapping keywords are all found"
+        counts = matcher.count(["best schools", "hello", "School near me"])
+        assert counts == {"search": 2, "near": 1, "": 1}
+        assert list(matcher.match_many(["schools", "x"])) == [("search",), ()]
+        print("✅ Intent matcher test passed")
+
 def run_all_tests():
     """Run all tests"""
     print("\n" + "="*60)
@@ -103,6 +1018,34 @@ def run_all_tests():
         ("FAQ Retrieval", TestSchoolooBackend.test_faq_by_category),
         ("Lead Capture", TestSchoolooBackend.test_lead_capture),
         ("Tool Execution", TestToolHandler.test_tool_execution),
+        ("Batch Endpoint", TestBatchEndpoint.test_batch_runs_operations_in_order),
+        ("Tool Batching", TestBatchEndpoint.test_tool_handler_batches_pending_tools),
+        ("Batch Fallback", TestBatchEndpoint.test_failed_batch_never_replays_writes),
+        ("Circuit Breaker", TestResilience.test_circuit_breaker_opens_and_recovers),
+        ("Server Error Breaker", TestResilience.test_server_errors_open_the_route_breaker),
+        ("Bounded Retries", TestResilience.test_retry_stops_at_deadline),
+        ("Bulkhead Limits", TestResilience.test_bulkhead_rejects_when_full),
+        ("Function-calling Loop", TestFunctionCallingLoop.test_tool_calls_are_batched_and_feed_back),
+        ("Tool Registry", TestToolRegistry.test_agent_and_handler_share_registry),
+        ("Single-flight Coalescing", TestSingleFlight.test_concurrent_calls_share_one_execution),
+        ("Coalescing Key Normalization", TestSingleFlight.test_key_normalization),
+        ("Async Single-flight Cancellation", TestSingleFlight.test_async_leader_cancellation_spares_waiters),
+        ("Conversation History Budget", TestConversationHistory.test_budget_holds_over_long_session),
+        ("Local Router Resolution", TestLocalRouter.test_resolves_only_unambiguous_questions),
+        ("Local Router Alias Lookup", TestLocalRouter.test_alias_lookup_does_not_scan_the_catalog),
+        ("Scheduler Priorities", TestLLMScheduler.test_interactive_calls_jump_the_batch_queue),
+        ("Scheduler Rejection and Retry-After", TestLLMScheduler.test_rejects_early_and_honours_retry_after),
+        ("Retrieval Context", TestRetrieval.test_context_block_is_relevant_and_bounded),
+        ("Usage Tracker", TestUsageTracker.test_aggregates_costs_and_rotates_log),
+        ("Fake Gemini", TestFakeGenai.test_deterministic_paced_and_injects_429s),
+        ("Catalog Generator", TestCatalogGenerator.test_reproducible_and_loadable),
+        ("Request Timing", TestRequestTiming.test_server_timing_header_and_sampled_profiles),
+        ("Metrics", TestMetrics.test_counters_are_exact_under_threads_and_exposed),
+        ("Tool Metrics", TestMetrics.test_tool_resilience_state_is_exported),
+        ("Tracing", TestTracing.test_trace_spans_agent_and_backend),
+        ("Trace Propagation", TestTracing.test_propagate_carries_only_the_span),
+        ("Warm Snapshot", TestWarmSnapshot.test_caches_round_trip_and_untrusted_files_are_ignored),
+        ("Intent Matcher", TestIntentMatcher.test_word_boundaries_requires_and_groups),
     ]
     
     passed = 0